@@ -1,91 +1,458 @@
-"""Config file."""
+"""Config file.
+
+Settings are read from the environment the first time they are used and
+cached on `settings`, so importing this module has no side effects. Settings
+that need checking, such as ``TOKEN`` and ``AUTH_FILE``, are only checked
+when a test that needs them runs, which lets tests that need no token or
+browser login, such as ``tests/test_harness.py``, run without them.
+
+The settings can also be imported by their historical module-level names,
+e.g. ``from .config import BASE_URL``, which reads them at import time of
+the importing module.
+"""
 
 import os
-import sys
+from functools import cached_property
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
 
-import pyvo
 import structlog
 
-from .models.tap import QueryMode, TAPApplication
-from .models.test import Scenario
-from .services.filemanager import FileManagerService
+if TYPE_CHECKING:
+    from .models.test import Scenario
+
+__all__ = ["Settings", "logger", "settings"]
 
 logger = structlog.get_logger()
 
-# Test Configuration values
-HOSTNAME = os.getenv("HOSTNAME", "data-dev.lsst.cloud")
-BASE_URL = f"https://{HOSTNAME}"
-HEADLESS = os.getenv("HEADLESS", "False").lower() == "true"
-SNAPSHOTS = os.getenv("SNAPSHOTS", "False").lower() == "true"
-TOKEN = os.getenv("TOKEN", "")
-SELECTOR_TIMEOUT = 180000
-TRACING = os.getenv("TRACING", "True").lower() == "true"
-AUTH_FILE = os.getenv("AUTH_FILE", "~/auth.json")
-
-try:
-    FileManagerService.check_auth_file()
-except FileNotFoundError as e:
-    logger.exception("Auth file not found", exc_info=e)
-    sys.exit(1)
-
-# Check env variables
-if not HOSTNAME:
-    logger.error("HOSTNAME environment variable is not set.")
-    raise ValueError("HOSTNAME environment variable is not set.")
-
-if not TOKEN:
-    logger.error("TOKEN environment variable is not set.")
-    raise ValueError("TOKEN environment variable is not set.")
-
-# Capability configuration per TAP app
-capability_includes = {
-    "tap": {
-        "include_upload": os.getenv("TAP_INCLUDE_UPLOAD", "False").lower() == "true",
-        "include_datamodel": os.getenv("TAP_INCLUDE_DATAMODEL", "True").lower()
-        == "true",
-        "include_geometry": os.getenv("TAP_INCLUDE_GEOMETRY", "False").lower()
-        == "true",
-    },
-    "ssotap": {
-        "include_upload": os.getenv("SSOTAP_INCLUDE_UPLOAD", "True").lower() == "true",
-        "include_datamodel": os.getenv("SSOTAP_INCLUDE_DATAMODEL", "False").lower()
-        == "true",
-        "include_geometry": os.getenv("SSOTAP_INCLUDE_GEOMETRY", "True").lower()
-        == "true",
-    },
-}
 
-# Mapping of app name to RSP endpoint
-urls = {
-    "portal": f"{BASE_URL}/portal/app",
-    "nublado": f"{BASE_URL}/nb",
-    "api": f"{BASE_URL}/api/tap",
-    "squareone": f"{BASE_URL}/",
-    "tap": f"{BASE_URL}/api/tap",
-    "ssotap": f"{BASE_URL}/api/ssotap",
-    "datalink": f"{BASE_URL}/api/datalink",
-}
+def _getenv_bool(name: str, default: str) -> bool:
+    """Read a boolean from an environment variable."""
+    return os.getenv(name, default).lower() == "true"
 
-# Mapping of QueryMode to pyvo query methods
-query_methods = {
-    QueryMode.SYNC: pyvo.dal.TAPService.run_sync,
-    QueryMode.ASYNC: pyvo.dal.TAPService.run_async,
-}
 
-# Test scenarios for TAP queries
-SCENARIOS = [
-    Scenario(TAPApplication.SSOTAP, QueryMode.SYNC, 5),
-    Scenario(TAPApplication.SSOTAP, QueryMode.SYNC, 10),
-    Scenario(TAPApplication.SSOTAP, QueryMode.ASYNC, 1),
-    Scenario(TAPApplication.SSOTAP, QueryMode.ASYNC, 10),
-    Scenario(TAPApplication.TAP, QueryMode.SYNC, 1),
-    Scenario(TAPApplication.TAP, QueryMode.SYNC, 10),
-    Scenario(TAPApplication.TAP, QueryMode.ASYNC, 1),
-    Scenario(TAPApplication.TAP, QueryMode.ASYNC, 10),
-]
-
-# Maximum number of errors and warnings for taplint
-taplint_maximums = {
-    "tap": {"errors": 92, "warnings": 690},
-    "ssotap": {"errors": 47, "warnings": 2},
+class Settings:
+    """Settings of a validator run, read from the environment on first use."""
+
+    # Playwright timeout in milliseconds
+    selector_timeout = 180000
+
+    @cached_property
+    def hostname(self) -> str:
+        """The hostname of the RSP instance.
+
+        Raises
+        ------
+        ValueError
+            If ``HOSTNAME`` is set but empty.
+        """
+        hostname = os.getenv("HOSTNAME", "data-dev.lsst.cloud")
+        if not hostname:
+            logger.error("HOSTNAME environment variable is not set.")
+            raise ValueError("HOSTNAME environment variable is not set.")
+        return hostname
+
+    @cached_property
+    def scheme(self) -> str:
+        """The URL scheme of the RSP instance.
+
+        Set to http, with a ``HOSTNAME`` including the port, to test against
+        the local stand-in TAP server of `rspvalidator.services.localtap`.
+        """
+        return os.getenv("SCHEME", "https")
+
+    @cached_property
+    def base_url(self) -> str:
+        """The base URL of the RSP instance."""
+        return f"{self.scheme}://{self.hostname}"
+
+    @cached_property
+    def headless(self) -> bool:
+        """Whether to run the browser in headless mode."""
+        return _getenv_bool("HEADLESS", "False")
+
+    @cached_property
+    def browser_contexts(self) -> int:
+        """The number of logged in browser contexts pooled per test process."""
+        return int(os.getenv("BROWSER_CONTEXTS", "1"))
+
+    @cached_property
+    def snapshots(self) -> bool:
+        """Whether to compare pages to stored snapshots."""
+        return _getenv_bool("SNAPSHOTS", "False")
+
+    @cached_property
+    def tracing(self) -> bool:
+        """Whether to record Playwright traces."""
+        return _getenv_bool("TRACING", "True")
+
+    @cached_property
+    def token(self) -> str:
+        """The authentication token for accessing the RSP.
+
+        Raises
+        ------
+        ValueError
+            If ``TOKEN`` is not set.
+        """
+        token = os.getenv("TOKEN", "")
+        if not token:
+            logger.error("TOKEN environment variable is not set.")
+            raise ValueError("TOKEN environment variable is not set.")
+        return token
+
+    @cached_property
+    def auth_file(self) -> Path:
+        """The Playwright storage state of a logged in browser session.
+
+        Raises
+        ------
+        FileNotFoundError
+            If the file named by ``AUTH_FILE`` does not exist.
+        """
+        path = Path(os.getenv("AUTH_FILE", "~/auth.json")).expanduser().resolve()
+        if not path.exists():
+            raise FileNotFoundError(
+                f"Error: The file 'auth.json' was not found "
+                f"in the home directory: {path!s}"
+            )
+        return path
+
+    @cached_property
+    def load_engine(self) -> str:
+        """The engine used to simulate concurrent TAP users.
+
+        "threads" runs one OS thread per user with pyvo, "asyncio" runs all
+        users as tasks on one event loop.
+        """
+        return os.getenv("LOAD_ENGINE", "threads").lower()
+
+    @cached_property
+    def load_workers(self) -> int:
+        """The number of local worker processes TAP scenarios are split across."""
+        return int(os.getenv("LOAD_WORKERS", "0"))
+
+    @cached_property
+    def remote_workers(self) -> list[str]:
+        """The host:port remote workers TAP scenarios are split across."""
+        return [w for w in os.getenv("REMOTE_WORKERS", "").split(",") if w]
+
+    @cached_property
+    def worker_secret(self) -> str:
+        """The secret remote load workers and their coordinator share.
+
+        Workers only run jobs signed with it, since they run the queries
+        with their own token.
+        """
+        return os.getenv("WORKER_SECRET", "")
+
+    @cached_property
+    def load_ramp_up(self) -> float:
+        """The time in seconds that the start of distributed users is spread over."""
+        return float(os.getenv("LOAD_RAMP_UP", "0"))
+
+    @cached_property
+    def load_results_spill(self) -> int:
+        """The number of query results a load test keeps in memory.
+
+        Beyond it, results are spilled to Parquet files in a temporary
+        directory. 0 keeps every result in memory.
+        """
+        return int(os.getenv("LOAD_RESULTS_SPILL", "0"))
+
+    @cached_property
+    def latency_percentile(self) -> float:
+        """The percentile of each query's latency that is checked.
+
+        It must stay under twice the query's expected duration. 100 means
+        every single execution must.
+        """
+        return float(os.getenv("LATENCY_PERCENTILE", "100"))
+
+    @cached_property
+    def benchmark_db(self) -> str:
+        """The SQLite database that TAP query results are stored in.
+
+        An empty string disables storing results and comparing them to past
+        runs.
+        """
+        return os.getenv("BENCHMARK_DB", "~/.rspvalidator/benchmarks.sqlite")
+
+    @cached_property
+    def baseline_runs(self) -> int:
+        """The number of past runs that make up the baseline of a scenario."""
+        return int(os.getenv("BASELINE_RUNS", "10"))
+
+    @cached_property
+    def regression_alpha(self) -> float:
+        """The significance level for flagging a regression."""
+        return float(os.getenv("REGRESSION_ALPHA", "0.01"))
+
+    @cached_property
+    def regression_min_ratio(self) -> float:
+        """The minimum slowdown for flagging a regression."""
+        return float(os.getenv("REGRESSION_MIN_RATIO", "1.2"))
+
+    @cached_property
+    def cell_regression_min_seconds(self) -> float:
+        """The minimum slowdown in seconds for flagging a notebook cell."""
+        return float(os.getenv("CELL_REGRESSION_MIN_SECONDS", "1.0"))
+
+    @cached_property
+    def metrics_file(self) -> str:
+        """The file metrics are written to at the end of a test run.
+
+        An empty string disables writing them.
+        """
+        return os.getenv("METRICS_FILE", "")
+
+    @cached_property
+    def metrics_port(self) -> int:
+        """The local port metrics are served on during a test run, 0 for none."""
+        return int(os.getenv("METRICS_PORT", "0"))
+
+    @cached_property
+    def notebook_kernel(self) -> str:
+        """The Jupyter kernel notebooks are run in.
+
+        An empty string runs each notebook in the kernel named by its
+        metadata.
+        """
+        return os.getenv("NOTEBOOK_KERNEL", "")
+
+    @cached_property
+    def notebook_concurrency(self) -> int:
+        """The number of notebooks run at the same time, each in its kernel."""
+        return int(os.getenv("NOTEBOOK_CONCURRENCY", "4"))
+
+    @cached_property
+    def notebook_cell_timeout(self) -> float:
+        """The time in seconds a notebook cell may run before it is stopped."""
+        return float(os.getenv("NOTEBOOK_CELL_TIMEOUT", "600"))
+
+    @cached_property
+    def tap_pool_options(self) -> dict[str, Any]:
+        """The connection pool options of the pyvo TAP clients.
+
+        ``TAP_POOL_MAXSIZE`` should be at least the largest number of users
+        sharing a client, otherwise connections are opened and thrown away,
+        or with ``TAP_POOL_BLOCK``, users wait for one.
+        """
+        return {
+            "pool_maxsize": int(os.getenv("TAP_POOL_MAXSIZE", "100")),
+            "pool_connections": int(os.getenv("TAP_POOL_CONNECTIONS", "10")),
+            "pool_block": _getenv_bool("TAP_POOL_BLOCK", "False"),
+            "max_retries": int(os.getenv("TAP_MAX_RETRIES", "0")),
+            "retry_backoff": float(os.getenv("TAP_RETRY_BACKOFF", "0.5")),
+            "keep_alive": _getenv_bool("TAP_KEEP_ALIVE", "True"),
+        }
+
+    @cached_property
+    def tap_session_per_user(self) -> bool:
+        """Whether every simulated TAP user gets its own session.
+
+        Real users would have their own session and connection pool, instead
+        of sharing the fixture's client.
+        """
+        return _getenv_bool("TAP_SESSION_PER_USER", "False")
+
+    @cached_property
+    def capability_includes(self) -> dict[str, dict[str, bool]]:
+        """The optional capabilities expected of each TAP app."""
+        return {
+            "tap": {
+                "include_upload": _getenv_bool("TAP_INCLUDE_UPLOAD", "False"),
+                "include_datamodel": _getenv_bool("TAP_INCLUDE_DATAMODEL", "True"),
+                "include_geometry": _getenv_bool("TAP_INCLUDE_GEOMETRY", "False"),
+            },
+            "ssotap": {
+                "include_upload": _getenv_bool("SSOTAP_INCLUDE_UPLOAD", "True"),
+                "include_datamodel": _getenv_bool("SSOTAP_INCLUDE_DATAMODEL", "False"),
+                "include_geometry": _getenv_bool("SSOTAP_INCLUDE_GEOMETRY", "True"),
+            },
+        }
+
+    @cached_property
+    def urls(self) -> dict[str, str]:
+        """The RSP endpoint of each app name."""
+        return {
+            "portal": f"{self.base_url}/portal/app",
+            "nublado": f"{self.base_url}/nb",
+            "api": f"{self.base_url}/api/tap",
+            "squareone": f"{self.base_url}/",
+            "tap": f"{self.base_url}/api/tap",
+            "ssotap": f"{self.base_url}/api/ssotap",
+            "datalink": f"{self.base_url}/api/datalink",
+        }
+
+    @cached_property
+    def scenarios(self) -> "list[Scenario]":
+        """The test scenarios for TAP queries."""
+        # The models are imported when first needed, as they import NumPy
+        from .models.tap import QueryMode, TAPApplication
+        from .models.test import Scenario
+
+        return [
+            Scenario(TAPApplication.SSOTAP, QueryMode.SYNC, 5),
+            Scenario(TAPApplication.SSOTAP, QueryMode.SYNC, 10),
+            Scenario(TAPApplication.SSOTAP, QueryMode.ASYNC, 1),
+            Scenario(TAPApplication.SSOTAP, QueryMode.ASYNC, 10),
+            Scenario(TAPApplication.TAP, QueryMode.SYNC, 1),
+            Scenario(TAPApplication.TAP, QueryMode.SYNC, 10),
+            Scenario(TAPApplication.TAP, QueryMode.ASYNC, 1),
+            Scenario(TAPApplication.TAP, QueryMode.ASYNC, 10),
+        ]
+
+    @cached_property
+    def open_loop_scenarios(self) -> "list[Scenario]":
+        """The open-loop test scenarios for TAP queries.
+
+        They are run at a target arrival rate. Scenarios are separated by
+        ``;``, each given as the app, mode, number of users, rate in queries
+        per second and duration in seconds, optionally followed by the
+        arrival pattern and number of ramp steps, e.g. ``ssotap sync 10 2
+        60;tap sync 10 1 60 poisson``. Empty by default, as they put load on
+        the service for their whole duration.
+
+        Raises
+        ------
+        ValueError
+            If a scenario cannot be parsed.
+        """
+        from .models.tap import QueryMode, TAPApplication
+        from .models.test import ArrivalPattern, Scenario
+
+        scenarios = []
+        for text in os.getenv("OPEN_LOOP_SCENARIOS", "").split(";"):
+            if not text.strip():
+                continue
+            try:
+                app, mode, users, rate, duration, *rest = text.split()
+                if len(rest) > 2:
+                    raise ValueError("too many fields")
+                scenario = Scenario(
+                    TAPApplication(app.lower()),
+                    QueryMode(mode.lower()),
+                    int(users),
+                    rate=float(rate),
+                    duration=float(duration),
+                    arrival=ArrivalPattern(rest[0].lower() if rest else "constant"),
+                    ramp_steps=int(rest[1]) if len(rest) > 1 else 1,
+                )
+            except ValueError as e:
+                raise ValueError(f"Invalid open-loop scenario {text!r}: {e}") from e
+            scenarios.append(scenario)
+        return scenarios
+
+    @cached_property
+    def taplint_stage_groups(self) -> list[list[str]]:
+        """The groups of taplint stages run by parallel processes.
+
+        Groups are separated by ``;`` and stage codes by spaces, e.g.
+        ``TMV TME TMS CAP;TMS QGE QPO;TMS QAS UWS``. Empty for a single
+        process running every default stage.
+        """
+        groups = os.getenv("TAPLINT_STAGE_GROUPS", "").split(";")
+        return [group.split() for group in groups if group.strip()]
+
+    @cached_property
+    def taplint_interactive(self) -> bool:
+        """Whether to answer the credential prompts of STILTS in a terminal.
+
+        Otherwise the credentials are passed as Java system properties.
+        """
+        return _getenv_bool("TAPLINT_INTERACTIVE", "True")
+
+    @cached_property
+    def cache_dir(self) -> Path:
+        """The per-user directory downloads such as the STILTS jar are kept in.
+
+        It is shared by every run and test process of the user.
+        """
+        return Path(os.getenv("CACHE_DIR", "~/.rspvalidator/cache")).expanduser()
+
+    @cached_property
+    def stilts_sha256(self) -> str | None:
+        """The SHA-256 the downloaded STILTS jar must have, if it is pinned."""
+        return os.getenv("STILTS_SHA256") or None
+
+    @cached_property
+    def stilts_server(self) -> bool:
+        """Whether taplint runs in a resident STILTS server.
+
+        The server is shared by every taplint run of a test session or of
+        the monitor.
+
+        Off by default. The server's JVM is given the token as a system
+        property, so it shows in the process list of the host, and it runs
+        any STILTS task asked for on a local port with that token, without
+        authenticating the client. Tasks are served under a random base
+        path, but it is on the same command line as the token, so only
+        enable this on hosts whose users may use the token.
+        """
+        return _getenv_bool("STILTS_SERVER", "False")
+
+    @cached_property
+    def taplint_maximums(self) -> dict[str, dict[str, int]]:
+        """The maximum number of errors and warnings for taplint, per app."""
+        return {
+            "tap": {"errors": 92, "warnings": 690},
+            "ssotap": {"errors": 47, "warnings": 2},
+        }
+
+
+settings = Settings()
+
+# Module-level names the settings were historically available under
+_NAMES = {
+    "HOSTNAME": "hostname",
+    "SCHEME": "scheme",
+    "BASE_URL": "base_url",
+    "HEADLESS": "headless",
+    "BROWSER_CONTEXTS": "browser_contexts",
+    "SNAPSHOTS": "snapshots",
+    "TOKEN": "token",
+    "SELECTOR_TIMEOUT": "selector_timeout",
+    "TRACING": "tracing",
+    "AUTH_FILE": "auth_file",
+    "LOAD_ENGINE": "load_engine",
+    "LOAD_WORKERS": "load_workers",
+    "REMOTE_WORKERS": "remote_workers",
+    "WORKER_SECRET": "worker_secret",
+    "LOAD_RAMP_UP": "load_ramp_up",
+    "LOAD_RESULTS_SPILL": "load_results_spill",
+    "LATENCY_PERCENTILE": "latency_percentile",
+    "BENCHMARK_DB": "benchmark_db",
+    "BASELINE_RUNS": "baseline_runs",
+    "REGRESSION_ALPHA": "regression_alpha",
+    "REGRESSION_MIN_RATIO": "regression_min_ratio",
+    "CELL_REGRESSION_MIN_SECONDS": "cell_regression_min_seconds",
+    "METRICS_FILE": "metrics_file",
+    "METRICS_PORT": "metrics_port",
+    "NOTEBOOK_KERNEL": "notebook_kernel",
+    "NOTEBOOK_CONCURRENCY": "notebook_concurrency",
+    "NOTEBOOK_CELL_TIMEOUT": "notebook_cell_timeout",
+    "TAP_POOL_OPTIONS": "tap_pool_options",
+    "TAP_SESSION_PER_USER": "tap_session_per_user",
+    "capability_includes": "capability_includes",
+    "urls": "urls",
+    "SCENARIOS": "scenarios",
+    "OPEN_LOOP_SCENARIOS": "open_loop_scenarios",
+    "TAPLINT_STAGE_GROUPS": "taplint_stage_groups",
+    "TAPLINT_INTERACTIVE": "taplint_interactive",
+    "CACHE_DIR": "cache_dir",
+    "STILTS_SHA256": "stilts_sha256",
+    "STILTS_SERVER": "stilts_server",
+    "taplint_maximums": "taplint_maximums",
 }
+
+
+def __getattr__(name: str) -> Any:
+    """Read a setting by its module-level name."""
+    if name in _NAMES:
+        return getattr(settings, _NAMES[name])
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__() -> list[str]:
+    return sorted([*globals(), *_NAMES])
@@ -1,23 +1,56 @@
-"""Conftest module for the tests."""
+"""Conftest module for the tests.
+
+Services are imported by the fixtures that use them, so that runs which only
+need some of them, such as browser tests, do not pay for importing pyvo and
+Astropy.
+"""
 
 import datetime
+import re
 from pathlib import Path
-from typing import Any, Callable, Generator  # noqa: UP035
+from typing import TYPE_CHECKING, Any, Callable, Generator  # noqa: UP035
 
 import pytest
-import pyvo
-from playwright.sync_api import expect, sync_playwright
-
-from .config import AUTH_FILE, HEADLESS, SELECTOR_TIMEOUT, SNAPSHOTS, TOKEN, TRACING
-from .constants import STILTS_FILENAME, STILTS_URL
-from .factories.tap_factory import TAPFactory
-from .services.configreader import ConfigReaderService
-from .services.filemanager import FileManagerService
-from .services.snapshots import SnapshotComparatorService
-from .services.validation import TAPValidationService
 
-# Set default timeout for playwright
-expect.set_options(timeout=SELECTOR_TIMEOUT)
+from .config import (
+    BENCHMARK_DB,
+    BROWSER_CONTEXTS,
+    HEADLESS,
+    HOSTNAME,
+    METRICS_FILE,
+    METRICS_PORT,
+    NOTEBOOK_CELL_TIMEOUT,
+    NOTEBOOK_CONCURRENCY,
+    NOTEBOOK_KERNEL,
+    SELECTOR_TIMEOUT,
+    SNAPSHOTS,
+    STILTS_SERVER,
+    STILTS_SHA256,
+    TAP_POOL_OPTIONS,
+    TAPLINT_INTERACTIVE,
+    TAPLINT_STAGE_GROUPS,
+    TRACING,
+    settings,
+)
+from .constants import (
+    STILTS_FILENAME,
+    STILTS_MIN_SIZE,
+    STILTS_URL,
+    TUTORIAL_NOTEBOOKS,
+    TUTORIAL_NOTEBOOKS_DIR,
+)
+
+if TYPE_CHECKING:
+    import pyvo
+
+    from .models.notebook import NotebookResult
+    from .models.taplint import TaplintReport
+    from .services.benchmarks import BenchmarkStoreService
+    from .services.browserpool import BrowserContextPool
+    from .services.readiness import ReadinessWaiter
+    from .services.stilts import StiltsServer
+    from .services.validation import TAPValidationService
+    from .utils.http import ConnectionStats
 
 
 @pytest.fixture(scope="session")
@@ -29,6 +62,12 @@ def playwright() -> Generator:
     playwright
         The playwright instance.
     """
+    # Playwright is only imported by the tests that use it, to keep it out of
+    # TAP-only runs
+    from playwright.sync_api import expect, sync_playwright
+
+    # Set default timeout for playwright
+    expect.set_options(timeout=SELECTOR_TIMEOUT)
     with sync_playwright() as playwright:
         yield playwright
 
@@ -60,7 +99,8 @@ def auth_token() -> str:
     """Fixture to fetch an authentication token from the environment variables.
 
     This fixture will be available for all tests in the session. It raises an
-    exception if the environment variable for the token is not found.
+    exception if the environment variable for the token is not found, so
+    only tests that need the token fail without it.
 
     Returns
     -------
@@ -68,65 +108,152 @@ def auth_token() -> str:
 
     Raises
     ------
-        RuntimeError: If the environment variable for the token is not set.
+        ValueError: If the environment variable for the token is not set.
+    """
+    return settings.token
+
+
+@pytest.fixture(scope="session")
+def connection_stats() -> "dict[str, ConnectionStats]":
+    """Fixture to provide the HTTP connection counts of each TAP app's clients.
+
+    Returns
+    -------
+    dict[str, ConnectionStats]
+        The connection counts, keyed by app name.
     """
-    if not TOKEN:
-        raise RuntimeError("Authentication token not found in environment variables.")
-    return TOKEN
+    from .utils.http import ConnectionStats
+
+    return {"ssotap": ConnectionStats(), "tap": ConnectionStats()}
 
 
 @pytest.fixture(scope="session")
-def tap_client_ssotap(auth_token: str) -> pyvo.dal.TAPService:
+def tap_client_ssotap(
+    auth_token: str, connection_stats: "dict[str, ConnectionStats]"
+) -> "pyvo.dal.TAPService":
     """Fixture to create and provide a TAP client with authenticated session.
 
     Parameters
     ----------
     auth_token
         The authentication token.
+    connection_stats
+        The connection counts the client updates.
 
     Returns
     -------
     pyvo.dal.TAPService
         The TAP client object.
     """
-    return TAPFactory.make_client(auth_token=auth_token, app="ssotap")
+    from .factories.tap_factory import TAPFactory
+
+    return TAPFactory.make_client(
+        auth_token=auth_token,
+        app="ssotap",
+        stats=connection_stats["ssotap"],
+        **TAP_POOL_OPTIONS,
+    )
 
 
 @pytest.fixture(scope="session")
-def tap_client_tap(auth_token: str) -> pyvo.dal.TAPService:
+def tap_client_tap(
+    auth_token: str, connection_stats: "dict[str, ConnectionStats]"
+) -> "pyvo.dal.TAPService":
     """Fixture to create and provide a TAP client with authenticated session.
 
     Parameters
     ----------
     auth_token
         The authentication token.
+    connection_stats
+        The connection counts the client updates.
 
     Returns
     -------
     pyvo.dal.TAPService
         The TAP client object.
     """
-    return TAPFactory.make_client(auth_token=auth_token, app="tap")
+    from .factories.tap_factory import TAPFactory
 
+    return TAPFactory.make_client(
+        auth_token=auth_token,
+        app="tap",
+        stats=connection_stats["tap"],
+        **TAP_POOL_OPTIONS,
+    )
 
-@pytest.fixture(scope="function")  # noqa: PT003
-def page(browser: Any) -> Generator:
+
+@pytest.fixture(scope="session")
+def local_tap_server() -> Generator:
+    """Fixture to run a local stand-in TAP server for the session.
+
+    Returns
+    -------
+    LocalTAPServer
+        The running server, with log-normal query latencies.
     """
-    Fixture to create a playwright page object.
+    from .models.test import LatencyDistribution, LocalTAPOptions
+    from .services.localtap import LocalTAPServer
+
+    options = LocalTAPOptions(
+        latency=0.02,
+        distribution=LatencyDistribution.LOGNORMAL,
+        queue_time=0.05,
+        seed=0,
+    )
+    server = LocalTAPServer(("127.0.0.1", 0), options).start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture(scope="session")
+def browser_context_pool(browser: Any) -> Generator:
+    """
+    Fixture to create a pool of logged in browser contexts.
 
     Parameters
     ----------
     browser
         The Playwright browser object
 
+    Returns
+    -------
+    BrowserContextPool
+        The pool, with ``BROWSER_CONTEXTS`` contexts created up front.
+    """
+    from .services.browserpool import BrowserContextPool
+
+    pool = BrowserContextPool(
+        browser,
+        BROWSER_CONTEXTS,
+        storage_state=settings.auth_file,
+        timeout=SELECTOR_TIMEOUT,
+    )
+    yield pool
+    pool.close()
+
+
+@pytest.fixture(scope="function")  # noqa: PT003
+def page(browser_context_pool: "BrowserContextPool", request: Any) -> Generator:
+    """
+    Fixture to create a playwright page object.
+
+    The page is opened in a logged in context from the pool, which is reset
+    and returned to the pool after the test.
+
+    Parameters
+    ----------
+    browser_context_pool
+        The pool of logged in browser contexts.
+    request
+        The request object.
+
     Returns
     -------
     playwright.page
         The Playwright page object.
     """
-    home_auth_path = Path(AUTH_FILE).expanduser()
-    context = browser.new_context(storage_state=home_auth_path)
-    context.set_default_timeout(SELECTOR_TIMEOUT)
+    context = browser_context_pool.acquire()
 
     if TRACING:
         context.tracing.start(screenshots=True, snapshots=True, sources=True)
@@ -138,10 +265,34 @@ def page(browser: Any) -> Generator:
 
     if TRACING:
         timestamp = datetime.datetime.now(datetime.UTC).strftime("%Y%m%d_%H%M%S")
-        context.tracing.stop(path=f"{timestamp}-trace.zip")
+        # Tests running in parallel workers can finish in the same second
+        test_name = re.sub(r"[^\w.-]", "_", request.node.name)
+        context.tracing.stop(path=f"{timestamp}-{test_name}-trace.zip")
 
     page.close()
-    context.close()
+    browser_context_pool.release(context)
+
+
+@pytest.fixture(scope="function")  # noqa: PT003
+def readiness(page: Any, request: Any) -> "ReadinessWaiter":
+    """
+    Fixture to wait for the test's page to be ready.
+
+    Parameters
+    ----------
+    page
+        The Playwright page object.
+    request
+        The request object.
+
+    Returns
+    -------
+    ReadinessWaiter
+        The waiter, which tracks the page's requests from the start.
+    """
+    from .services.readiness import ReadinessWaiter
+
+    return ReadinessWaiter(page, request.node.name)
 
 
 @pytest.fixture(scope="function")  # noqa: PT003
@@ -196,13 +347,71 @@ def queries(data_dir: str, app: str) -> list[dict[str, Any]]:
         list[dict[str, Any]]: A list of queries with expected durations and
         row counts.
     """
+    from .services.configreader import ConfigReaderService
+
     return ConfigReaderService.get_queries(data_dir=data_dir, app=app)
 
 
+@pytest.fixture(scope="session")
+def benchmark_store() -> "BenchmarkStoreService | None":
+    """
+    Fixture to provide the store of past TAP query results.
+
+    Returns
+    -------
+    BenchmarkStoreService or None
+        The benchmark store, or `None` if storing results is disabled.
+    """
+    if not BENCHMARK_DB:
+        return None
+    from .services.benchmarks import BenchmarkStoreService
+
+    return BenchmarkStoreService(
+        path=Path(BENCHMARK_DB).expanduser(), hostname=HOSTNAME
+    )
+
+
+@pytest.fixture(scope="session", autouse=True)
+def metrics_exporter(worker_id: str) -> Generator:
+    """
+    Fixture to export the metrics recorded during the session.
+
+    The metrics are served on ``METRICS_PORT`` while the tests run and
+    written to ``METRICS_FILE`` once they have finished, if those are set.
+    Each pytest-xdist worker serves its own metrics on the port after that
+    of the previous worker, and writes them to a file named after itself.
+
+    Parameters
+    ----------
+    worker_id
+        The pytest-xdist worker running the session, ``master`` if none.
+
+    Returns
+    -------
+    MetricsServer or None
+        The metrics server, or `None` if metrics are not served.
+    """
+    from .services.metrics import MetricsServer, MetricsService
+
+    worker = int(worker_id.removeprefix("gw")) if worker_id != "master" else None
+    server = None
+    if METRICS_PORT:
+        port = METRICS_PORT + (worker or 0)
+        server = MetricsServer(("127.0.0.1", port)).start()
+    yield server
+    if METRICS_FILE:
+        path = Path(METRICS_FILE).expanduser()
+        if worker is not None:
+            path = path.with_stem(f"{path.stem}-{worker_id}")
+        MetricsService.write(path)
+    if server is not None:
+        server.stop()
+
+
 @pytest.fixture(scope="session")
 def tap_validation_service_ssotap(
-    tap_client_ssotap: pyvo.dal.TAPService,
-) -> TAPValidationService:
+    tap_client_ssotap: "pyvo.dal.TAPService",
+) -> "TAPValidationService":
     """Fixture to provide a TAPValidationService instance for the ssotap app.
 
     Parameters
@@ -216,13 +425,15 @@ def tap_validation_service_ssotap(
         The TAPValidationService instance.
 
     """
+    from .services.validation import TAPValidationService
+
     return TAPValidationService(tap_client=tap_client_ssotap, app="ssotap")
 
 
 @pytest.fixture(scope="session")
 def tap_validation_service_tap(
-    tap_client_tap: pyvo.dal.TAPService,
-) -> TAPValidationService:
+    tap_client_tap: "pyvo.dal.TAPService",
+) -> "TAPValidationService":
     """Fixture to provide a TAPValidationService instance for the tap app.
 
     Parameters
@@ -236,25 +447,148 @@ def tap_validation_service_tap(
         The TAPValidationService instance.
 
     """
+    from .services.validation import TAPValidationService
+
     return TAPValidationService(tap_client=tap_client_tap, app="tap")
 
 
-@pytest.fixture(scope="module")
+@pytest.fixture(scope="session")
 def stilts_jar() -> Path:
     """
-    Fixture to download the STILTS JAR file.
+    Fixture to download the STILTS JAR file into the per-user cache.
 
     Returns
     -------
     Path
         The path to the STILS JAR file.
     """
-    url = STILTS_URL
-    current_dir = Path(__file__).parent
-    file_path = current_dir / STILTS_FILENAME
-    file_path.parent.mkdir(parents=True, exist_ok=True)
-    FileManagerService.download_file(url, file_path)
-    return file_path
+    from .services.filemanager import FileManagerService
+
+    return FileManagerService.cached_download(
+        STILTS_URL,
+        Path(STILTS_FILENAME).name,
+        sha256=STILTS_SHA256,
+        min_size_bytes=STILTS_MIN_SIZE,
+    )
+
+
+@pytest.fixture(scope="session")
+def stilts_server(stilts_jar: Path, auth_token: str) -> Generator:
+    """
+    Fixture to run a resident STILTS server for the session.
+
+    Every taplint run of the session then shares one JVM instead of starting
+    its own.
+
+    Parameters
+    ----------
+    stilts_jar
+        The path to the STILTS JAR file.
+    auth_token
+        The authentication token.
+
+    Returns
+    -------
+    StiltsServer or None
+        The server, started on first use, or `None` if ``STILTS_SERVER`` is
+        not set.
+    """
+    if not STILTS_SERVER:
+        yield None
+        return
+    from .services.stilts import StiltsServer
+
+    properties = {"auth.username": "x-oauth-token", "auth.password": auth_token}
+    server = StiltsServer(stilts_jar, properties=properties)
+    yield server
+    server.close()
+
+
+@pytest.fixture(scope="module")
+def taplint_reports(
+    stilts_jar: Path, auth_token: str, stilts_server: "StiltsServer | None"
+) -> "dict[str, TaplintReport]":
+    """
+    Fixture to run STILTS taplint against the TAP apps, all at once.
+
+    Parameters
+    ----------
+    stilts_jar
+        The path to the STILTS JAR file.
+    auth_token
+        The authentication token.
+    stilts_server
+        The resident STILTS server to run taplint in, if any.
+
+    Returns
+    -------
+    dict[str, TaplintReport]
+        The report of each app, keyed by app name.
+    """
+    from .services.configreader import ConfigReaderService
+    from .services.taplint import TaplintOrchestrator
+
+    orchestrator = TaplintOrchestrator(
+        stilts_jar,
+        "x-oauth-token",
+        auth_token,
+        stage_groups=TAPLINT_STAGE_GROUPS,
+        interactive=TAPLINT_INTERACTIVE,
+        server=stilts_server,
+    )
+    return orchestrator.run(
+        {app: ConfigReaderService.get_url(app) for app in ("tap", "ssotap")}
+    )
+
+
+@pytest.fixture(scope="session")
+def tutorial_notebooks(auth_token: str) -> "dict[str, NotebookResult]":
+    """
+    Fixture to run the tutorial notebooks through the Jupyter kernel API.
+
+    The notebooks run concurrently, each in its own kernel, in the user's
+    running lab.
+
+    Parameters
+    ----------
+    auth_token
+        The authentication token.
+
+    Returns
+    -------
+    dict[str, NotebookResult]
+        The outcome of each notebook, keyed by its file name.
+    """
+    from .services.configreader import ConfigReaderService
+    from .services.jupyter import NotebookRunner
+
+    runner = NotebookRunner(
+        ConfigReaderService.get_url("nublado"),
+        auth_token,
+        kernel=NOTEBOOK_KERNEL,
+        concurrency=NOTEBOOK_CONCURRENCY,
+        cell_timeout=NOTEBOOK_CELL_TIMEOUT,
+    )
+    results = runner.run(
+        f"{TUTORIAL_NOTEBOOKS_DIR}/{name}" for name in TUTORIAL_NOTEBOOKS
+    )
+    return {result.name: result for result in results.values()}
+
+
+@pytest.fixture(scope="session")
+def snapshot_writer() -> Generator:
+    """Write the images of failed snapshot comparisons in the background.
+
+    Yields
+    ------
+    FailureWriter
+        The writer, which finishes writing when the session ends.
+    """
+    from .services.snapshots import FailureWriter
+
+    writer = FailureWriter()
+    yield writer
+    writer.close()
 
 
 @pytest.fixture(scope="function")  # noqa: PT003
@@ -277,5 +611,9 @@ def assert_snapshot(request: Any) -> Callable:
     https://pypi.org/project/pytest-playwright-visual/
     """
     if not SNAPSHOTS:
-        return lambda x: None
-    return SnapshotComparatorService.create_snapshot_fixture(request)
+        return lambda *args, **kwargs: None
+    from .services.snapshots import SnapshotComparatorService
+
+    return SnapshotComparatorService.create_snapshot_fixture(
+        request, request.getfixturevalue("snapshot_writer")
+    )
@@ -5,3 +5,31 @@ SSOTAP_APPLICATION = "ssotap"
 TAP_SCHEMA_QUERY = "SELECT TOP 1 * FROM TAP_SCHEMA.tables"
 STILTS_URL = "https://www.star.bristol.ac.uk/mbt/stilts/stilts.jar"
 STILTS_FILENAME = "libs/stilts.jar"
+# A smaller download of the STILTS jar is incomplete
+STILTS_MIN_SIZE = 15_000_000
+# Codes of the taplint stages of STILTS, which stage groups are split from
+TAPLINT_STAGES = [
+    "TMV",
+    "TME",
+    "TMS",
+    "TMC",
+    "CPV",
+    "CAP",
+    "AVV",
+    "QGE",
+    "QPO",
+    "QAS",
+    "UWS",
+    "MDQ",
+    "OBS",
+    "LOC",
+    "UPL",
+    "EXA",
+]
+TUTORIAL_NOTEBOOKS_DIR = "notebooks/tutorial-notebooks"
+TUTORIAL_NOTEBOOKS = [
+    "DP02_02b_Catalog_Queries_with_TAP.ipynb",
+    "DP02_06b_Interactive_Catalog_Visualization.ipynb",
+    "DP02_13a_Image_Cutout_SciDemo.ipynb",
+    "DP03_06_User_Uploaded_Tables.ipynb",
+]
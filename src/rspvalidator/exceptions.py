@@ -1,9 +1,27 @@
 "Exceptions for rspvalidator suite."
 
-__all__ = ["FileSizeError"]
+__all__ = ["ChecksumError", "FileSizeError", "JupyterError", "StiltsError"]
+
+
+class ChecksumError(Exception):
+    """Raised when a downloaded file does not match its pinned digest."""
+
+    error = "Checksum error"
 
 
 class FileSizeError(Exception):
     """Raised when the file size does not meet the expected size."""
 
     error = "File size error"
+
+
+class JupyterError(Exception):
+    """Raised when a notebook cannot be run on the Jupyter server."""
+
+    error = "Jupyter error"
+
+
+class StiltsError(Exception):
+    """Raised when a resident STILTS server cannot run a task."""
+
+    error = "STILTS error"
@@ -1,9 +1,13 @@
 """TAP Factory module. used to generate TAP related objects."""
 
+from typing import Any
+
 import pyvo
 import requests
 
+from ..services.aiotap import AsyncTAPClient
 from ..services.tap import TAPOperationsService
+from ..utils.http import ConnectionStats, InstrumentedHTTPAdapter
 
 __all__ = ["TAPFactory"]
 
@@ -15,7 +19,19 @@ class TAPFactory:
         pass
 
     @staticmethod
-    def make_client(auth_token: str, app: str) -> pyvo.dal.TAPService:
+    def make_client(
+        auth_token: str,
+        app: str,
+        *,
+        pool_maxsize: int = 10,
+        pool_connections: int = 10,
+        pool_block: bool = False,
+        max_retries: int = 0,
+        retry_backoff: float = 0.0,
+        keep_alive: bool = True,
+        stats: ConnectionStats | None = None,
+        base_url: str | None = None,
+    ) -> pyvo.dal.TAPService:
         """Create a TAP client with an authenticated session.
 
         Parameters
@@ -24,14 +40,46 @@ class TAPFactory:
             The authentication token.
         app
             The application name.
+        pool_maxsize
+            The maximum number of connections kept open to each host. Should
+            be at least the number of threads sharing the client.
+        pool_connections
+            The number of per-host connection pools to keep.
+        pool_block
+            Whether to wait for a free connection when the pool is full
+            instead of opening one that is discarded after use.
+        max_retries
+            The number of times to retry failed connections and 502, 503 or
+            504 responses to idempotent requests.
+        retry_backoff
+            The backoff factor between retries, in seconds.
+        keep_alive
+            Whether to keep connections open between requests.
+        stats
+            If given, the number of requests sent and connections opened by
+            the client are counted in it.
+        base_url
+            The base URL of the platform, ``BASE_URL`` by default, e.g. that
+            of a `~rspvalidator.services.localtap.LocalTAPServer`.
 
         Returns
         -------
         pyvo.dal.TAPService: The TAP client object.
         """
-        tap_url = TAPOperationsService.get_api_endpoint("tap", app)
+        tap_url = TAPOperationsService.get_api_endpoint("tap", app, base_url)
         s = requests.Session()
         s.headers["Authorization"] = "Bearer " + auth_token
+        adapter = InstrumentedHTTPAdapter(
+            stats if stats is not None else ConnectionStats(),
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            pool_block=pool_block,
+            max_retries=max_retries,
+            retry_backoff=retry_backoff,
+            keep_alive=keep_alive,
+        )
+        s.mount("https://", adapter)
+        s.mount("http://", adapter)
         auth = pyvo.auth.AuthSession()
         auth.credentials.set("lsst-token", s)
         auth.add_security_method_for_url(tap_url, "lsst-token")
@@ -39,3 +87,61 @@ class TAPFactory:
         auth.add_security_method_for_url(tap_url + "/async", "lsst-token")
         auth.add_security_method_for_url(tap_url + "/tables", "lsst-token")
         return pyvo.dal.TAPService(baseurl=tap_url, session=auth)
+
+    @staticmethod
+    def make_clients(
+        auth_token: str, app: str, count: int, **kwargs: Any
+    ) -> list[pyvo.dal.TAPService]:
+        """Create independent TAP clients, e.g. one per simulated user.
+
+        Each client has its own session and connection pool, so simulated
+        users do not share connections, as real users would not.
+
+        Parameters
+        ----------
+        auth_token
+            The authentication token.
+        app
+            The application name.
+        count
+            The number of clients to create.
+        **kwargs
+            Pool options passed to `make_client`. A ``stats`` object is shared
+            by all the clients.
+
+        Returns
+        -------
+        list[pyvo.dal.TAPService]: The TAP client objects.
+        """
+        return [
+            TAPFactory.make_client(auth_token=auth_token, app=app, **kwargs)
+            for _ in range(count)
+        ]
+
+    @staticmethod
+    def make_async_client(
+        auth_token: str,
+        app: str,
+        max_connections: int = 100,
+        base_url: str | None = None,
+    ) -> AsyncTAPClient:
+        """Create an asynchronous TAP client for the asyncio load engine.
+
+        Parameters
+        ----------
+        auth_token
+            The authentication token.
+        app
+            The application name.
+        max_connections
+            The maximum number of concurrent connections to the service.
+            Should be at least the number of users sharing the client.
+        base_url
+            The base URL of the platform, ``BASE_URL`` by default.
+
+        Returns
+        -------
+        AsyncTAPClient: The asynchronous TAP client object.
+        """
+        tap_url = TAPOperationsService.get_api_endpoint("tap", app, base_url)
+        return AsyncTAPClient(tap_url, auth_token, max_connections=max_connections)
@@ -0,0 +1,257 @@
+"""Module with notebook execution related models."""
+
+import re
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Any
+
+__all__ = [
+    "CellOutput",
+    "CellRegressionResult",
+    "CellResult",
+    "CellStatus",
+    "NotebookResult",
+]
+
+# Astropy's representation of a table, in both its text and HTML forms
+_TABLE_LENGTH = re.compile(r"Table length=(\d+)")
+
+
+class CellStatus(Enum):
+    """Enumeration of the outcomes of running a notebook cell.
+
+    Attributes
+    ----------
+    OK : str
+        The cell ran without raising an exception.
+    ERROR : str
+        The cell raised an exception.
+    TIMEOUT : str
+        The cell did not finish in time and the kernel was interrupted.
+    SKIPPED : str
+        The cell was not run because an earlier cell failed.
+    """
+
+    OK = "ok"
+    ERROR = "error"
+    TIMEOUT = "timeout"
+    SKIPPED = "skipped"
+
+
+@dataclass
+class CellOutput:
+    """
+    Dataclass to store an output of a notebook cell.
+
+    Attributes
+    ----------
+    output_type: str
+        The Jupyter output type: ``stream``, ``display_data``,
+        ``execute_result`` or ``error``.
+    data: dict[str, Any]
+        The output keyed by MIME type, for display data and execution results.
+    text: str
+        The text of a stream output.
+    ename: str
+        The name of the exception of an error output.
+    evalue: str
+        The message of the exception of an error output.
+    """
+
+    output_type: str
+    data: dict[str, Any] = field(default_factory=dict)
+    text: str = ""
+    ename: str = ""
+    evalue: str = ""
+
+    @property
+    def plain(self) -> str:
+        """The text a reader sees of the output, whatever its type."""
+        if self.output_type == "stream":
+            return self.text
+        if self.output_type == "error":
+            return f"{self.ename}: {self.evalue}"
+        parts = [
+            self.data[mime]
+            for mime in ("text/plain", "text/html", "text/markdown")
+            if isinstance(self.data.get(mime), str)
+        ]
+        return "\n".join(parts)
+
+
+@dataclass
+class CellResult:
+    """
+    Dataclass to store the outcome of running a notebook cell.
+
+    Attributes
+    ----------
+    index: int
+        The index of the cell in the notebook, counting all cell types.
+    source: str
+        The code of the cell.
+    status: CellStatus
+        The outcome of the cell.
+    duration: float
+        The time from sending the cell to the kernel until the kernel was
+        idle again, in seconds.
+    kernel_duration: float | None
+        The time the kernel was busy running the cell according to its own
+        clock, which excludes the network, or `None` if it did not say.
+    execution_count: int | None
+        The execution count the kernel gave the cell.
+    outputs: list[CellOutput]
+        The outputs of the cell.
+    """
+
+    index: int
+    source: str
+    status: CellStatus
+    duration: float = 0.0
+    kernel_duration: float | None = None
+    execution_count: int | None = None
+    outputs: list[CellOutput] = field(default_factory=list)
+
+    @property
+    def text(self) -> str:
+        """The text of every output of the cell."""
+        return "\n".join(output.plain for output in self.outputs)
+
+
+@dataclass
+class NotebookResult:
+    """
+    Dataclass to store the outcome of running a notebook.
+
+    Attributes
+    ----------
+    path: str
+        The path of the notebook on the Jupyter server.
+    kernel: str
+        The name of the kernel the notebook ran in.
+    startup: float
+        The time it took to start the kernel and for it to answer, in
+        seconds.
+    duration: float
+        The time it took to run the cells, in seconds.
+    cells: list[CellResult]
+        The outcome of each code cell that was run, in notebook order.
+    error: str
+        The error that stopped the notebook from running, e.g. the kernel
+        dying, or an empty string.
+    """
+
+    path: str
+    kernel: str
+    startup: float = 0.0
+    duration: float = 0.0
+    cells: list[CellResult] = field(default_factory=list)
+    error: str = ""
+
+    @property
+    def name(self) -> str:
+        """The file name of the notebook."""
+        return self.path.rsplit("/", 1)[-1]
+
+    @property
+    def passed(self) -> bool:
+        """Whether every code cell ran without an error."""
+        return not self.error and all(c.status == CellStatus.OK for c in self.cells)
+
+    @property
+    def errors(self) -> list[CellOutput]:
+        """The exceptions raised by the cells."""
+        return [
+            output
+            for cell in self.cells
+            for output in cell.outputs
+            if output.output_type == "error"
+        ]
+
+    @property
+    def failed_cell(self) -> CellResult | None:
+        """The first cell that did not run successfully, if any."""
+        return next((c for c in self.cells if c.status != CellStatus.OK), None)
+
+    @property
+    def text(self) -> str:
+        """The text of every output of every cell."""
+        return "\n".join(cell.text for cell in self.cells)
+
+    @property
+    def table_lengths(self) -> list[int]:
+        """The lengths of the Astropy tables displayed by the cells."""
+        lengths: list[int] = []
+        for cell in self.cells:
+            for output in cell.outputs:
+                # The text and HTML forms of a table both give its length, so
+                # only the first that does is counted
+                for mime in ("text/plain", "text/html"):
+                    text = output.data.get(mime)
+                    found = _TABLE_LENGTH.findall(text) if isinstance(text, str) else []
+                    if found:
+                        lengths.extend(int(n) for n in found)
+                        break
+        return lengths
+
+    def find(self, text: str) -> list[CellResult]:
+        """Return the cells with an output containing some text.
+
+        Parameters
+        ----------
+        text
+            The text to look for.
+
+        Returns
+        -------
+        list[CellResult]
+            The cells whose outputs contain the text.
+        """
+        return [cell for cell in self.cells if text in cell.text]
+
+
+@dataclass
+class CellRegressionResult:
+    """
+    Dataclass to store the comparison of a cell's duration to its baseline.
+
+    Attributes
+    ----------
+    notebook: str
+        The file name of the notebook.
+    cell: int
+        The index of the cell in the notebook.
+    source: str
+        The first line of the cell's code, to recognise it in a report.
+    baseline_median: float
+        The median duration of the cell over the baseline runs, in seconds.
+    current: float
+        The duration of the cell in the current run, in seconds.
+    baseline_runs: int
+        The number of baseline runs.
+    regressed: bool
+        Whether the cell was slower than in every baseline run, by at least
+        the configured ratio and minimum time.
+    """
+
+    notebook: str
+    cell: int
+    source: str
+    baseline_median: float
+    current: float
+    baseline_runs: int
+    regressed: bool
+
+    @property
+    def ratio(self) -> float:
+        """The ratio of the current duration to the baseline median."""
+        if self.baseline_median <= 0:
+            return 1.0
+        return self.current / self.baseline_median
+
+    def __str__(self) -> str:
+        return (
+            f"[{self.notebook} cell {self.cell}: {self.source}] {self.current:.2f}s "
+            f"vs baseline {self.baseline_median:.2f}s ({self.ratio:.2f}x over "
+            f"{self.baseline_runs} runs)"
+        )
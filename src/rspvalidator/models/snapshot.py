@@ -0,0 +1,34 @@
+"""Module with visual snapshot related models."""
+
+from dataclasses import dataclass
+
+__all__ = ["SnapshotEntry"]
+
+
+@dataclass
+class SnapshotEntry:
+    """
+    Dataclass to store an entry of a snapshot manifest.
+
+    Attributes
+    ----------
+    host: str
+        The hostname of the platform the snapshot was taken on.
+    name: str
+        The name of the snapshot, which includes the OS platform.
+    digest: str
+        The SHA-256 of the PNG data, which names its blob in the store.
+    width: int
+        The width of the image in pixels.
+    height: int
+        The height of the image in pixels.
+    created: float
+        The time the snapshot was stored, as a Unix timestamp.
+    """
+
+    host: str
+    name: str
+    digest: str
+    width: int
+    height: int
+    created: float
@@ -1,9 +1,35 @@
 """Module with TAP related models."""
 
-from dataclasses import dataclass
+import json
+import math
+import shutil
+import sys
+import tempfile
+import threading
+import weakref
+from collections.abc import Hashable, Iterable, Iterator
+from dataclasses import dataclass, field
 from enum import Enum
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
 
-__all__ = ["TAPApplication", "QueryMode", "QueryResult"]
+import numpy as np
+
+if TYPE_CHECKING:
+    import pyarrow as pa
+
+    from .test import LatencySummary
+
+__all__ = [
+    "TAPApplication",
+    "QueryMode",
+    "QueryPhase",
+    "QueryResult",
+    "QueryResultBatch",
+    "PhaseTransition",
+    "JobWaitResult",
+    "CapabilityDifference",
+]
 
 
 class TAPApplication(Enum):
@@ -36,7 +62,43 @@ class QueryMode(Enum):
     ASYNC = "async"
 
 
-@dataclass
+class QueryPhase(Enum):
+    """Enumeration of the phases a TAP query's duration is broken down into.
+
+    Attributes
+    ----------
+    CONNECT : str
+        Opening connections, including TLS handshakes.
+    SEND : str
+        Sending the request headers and body.
+    TTFB : str
+        Waiting for the response headers after sending the request.
+    DOWNLOAD : str
+        Receiving the response body, excluding parsing.
+    PARSE : str
+        Parsing and decoding the response body.
+    JOB_CREATE : str
+        Creating and starting the UWS job of an async query.
+    QUEUED : str
+        The time the UWS job spent queued, from the service's job times.
+    EXECUTING : str
+        The time the UWS job spent executing, from the service's job times.
+    RESULT_FETCH : str
+        Fetching the result of a completed UWS job.
+    """
+
+    CONNECT = "connect"
+    SEND = "send"
+    TTFB = "ttfb"
+    DOWNLOAD = "download"
+    PARSE = "parse"
+    JOB_CREATE = "job_create"
+    QUEUED = "queued"
+    EXECUTING = "executing"
+    RESULT_FETCH = "result_fetch"
+
+
+@dataclass(slots=True)
 class QueryResult:
     """Dataclass to store query result metadata.
 
@@ -47,13 +109,27 @@ class QueryResult:
     row_count : int
         The number of rows returned by the query.
     execution_duration : float
-        The actual query execution duration.
+        The actual query execution duration, excluding the time spent
+        decoding the response.
     expected_duration : float
         The expected query duration.
     expected_row_count : int
         The expected number of rows.
     query : str
         The query string.
+    queue_delay : float
+        The time between the scheduled start of the query and the moment it
+        actually started executing. Always zero for closed-loop runs.
+    bytes_received : int
+        The size of the response body in bytes.
+    decode_duration : float
+        The time spent parsing and decoding the response.
+    checksums : dict[str, str]
+        The checksum of each column that was asked to be checksummed.
+    phases : dict[str, float]
+        The time in seconds spent in each `QueryPhase`, keyed by its value.
+        For async queries the connection phases are those of fetching the
+        result.
     """
 
     status: str
@@ -62,3 +138,686 @@ class QueryResult:
     expected_duration: float
     expected_row_count: int
     query: str
+    queue_delay: float = 0.0
+    bytes_received: int = 0
+    decode_duration: float = 0.0
+    checksums: dict[str, str] = field(default_factory=dict)
+    phases: dict[str, float] = field(default_factory=dict)
+
+    def __post_init__(self) -> None:
+        # The same few query strings are repeated in every result, also
+        # when results are decoded from the messages of load workers
+        self.query = sys.intern(self.query)
+
+
+# The numeric columns of a QueryResultBatch and their types. Query strings,
+# statuses and sets of checksums are stored once, and referred to by id.
+_BATCH_COLUMNS: dict[str, type[np.generic]] = {
+    "user": np.int32,
+    "query_id": np.int32,
+    "status_id": np.int16,
+    "checksums_id": np.int32,
+    "row_count": np.int64,
+    "expected_row_count": np.int64,
+    "execution_duration": np.float64,
+    "expected_duration": np.float64,
+    "queue_delay": np.float64,
+    "bytes_received": np.int64,
+    "decode_duration": np.float64,
+}
+
+# The phases a QueryResultBatch stores, one float32 array each
+_BATCH_PHASES = [phase.value for phase in QueryPhase]
+
+
+class _Interned:
+    """Table of distinct values, each referred to by its index."""
+
+    __slots__ = ("entries", "ids")
+
+    def __init__(self) -> None:
+        self.entries: list[Any] = []
+        self.ids: dict[Hashable, int] = {}
+
+    def id(self, value: Hashable) -> int:
+        """Return the index of a value, adding it if it is new."""
+        index = self.ids.get(value)
+        if index is None:
+            index = self.ids[value] = len(self.entries)
+            self.entries.append(value)
+        return index
+
+
+def _grouped_percentile(
+    values: np.ndarray, starts: np.ndarray, counts: np.ndarray, percentile: float
+) -> np.ndarray:
+    """Return a percentile of each group of sorted values.
+
+    Interpolates linearly between the closest ranks, like `numpy.percentile`.
+
+    Parameters
+    ----------
+    values
+        The values, sorted within each group.
+    starts
+        The index of the first value of each group.
+    counts
+        The number of values in each group, at least one.
+    percentile
+        The percentile, between 0 and 100.
+
+    Returns
+    -------
+    numpy.ndarray
+        The percentile of each group.
+    """
+    position = (counts - 1) * (percentile / 100)
+    low = np.floor(position).astype(np.int64)
+    high = np.minimum(low + 1, counts - 1)
+    below, above = values[starts + low], values[starts + high]
+    return below + (above - below) * (position - low)
+
+
+def _read_spill(path: Path) -> tuple[dict[str, np.ndarray], np.ndarray]:
+    """Read the columns and phase durations of a spilled QueryResultBatch."""
+    import pyarrow.parquet as pq
+
+    table = pq.read_table(path)
+    columns = {name: table.column(name).to_numpy() for name in _BATCH_COLUMNS}
+    phases = np.stack(
+        [table.column(f"phase_{phase}").to_numpy() for phase in _BATCH_PHASES]
+    )
+    return columns, phases
+
+
+class QueryResultBatch:
+    """Columnar store of query results.
+
+    Long load tests produce a result for every query execution, which as
+    `QueryResult` objects take about 500 bytes each with their dictionaries.
+    A batch keeps each field in a NumPy array instead, with the query
+    strings, statuses and checksums stored once and referred to by id, and
+    the `QueryPhase` durations in one ``float32`` array per phase, NaN where
+    a phase was not measured. A result takes under 140 bytes.
+
+    Results are appended as they complete, from any thread, and can be read
+    back as `QueryResult` objects by index or iteration. Summaries are
+    computed over the arrays, and `to_arrow` exports the batch without
+    copying the numeric columns.
+
+    The arrays still grow with the number of results. With ``spill_rows``
+    set, every ``spill_rows`` results are instead moved to a Parquet file
+    in a temporary directory, so only that many are kept in memory. The
+    batch reads them back when it is iterated or its columns are read,
+    which then returns copies rather than views, and keeps the last file it
+    read for indexing. The files are removed when the batch is cleared or
+    garbage collected.
+
+    Parameters
+    ----------
+    capacity
+        The number of results to allocate room for at first. The arrays
+        double in size when they are full.
+    spill_rows
+        The number of results kept in memory before they are spilled to
+        disk, or 0 to keep every result in memory.
+    """
+
+    def __init__(self, capacity: int = 1024, *, spill_rows: int = 0) -> None:
+        self._lock = threading.Lock()
+        self._spill_rows = spill_rows
+        self._spill_dir: Path | None = None
+        self._spilled: list[Path] = []
+        self._last_spill: tuple[Path, dict[str, np.ndarray], np.ndarray] | None = None
+        if spill_rows:
+            capacity = min(capacity, spill_rows)
+        self._allocate(max(capacity, 1))
+
+    def _allocate(self, capacity: int) -> None:
+        """Start over with empty arrays and tables."""
+        self._allocate_rows(capacity)
+        self._queries: _Interned = _Interned()
+        self._statuses: _Interned = _Interned()
+        self._checksums: _Interned = _Interned()
+
+    def _allocate_rows(self, capacity: int) -> None:
+        """Start over with empty arrays, keeping the tables."""
+        self._size = 0
+        self._columns = {
+            name: np.zeros(capacity, dtype) for name, dtype in _BATCH_COLUMNS.items()
+        }
+        self._phases = np.full((len(_BATCH_PHASES), capacity), np.nan, np.float32)
+
+    @classmethod
+    def from_results(
+        cls, results: Iterable[QueryResult], user: int = -1
+    ) -> "QueryResultBatch":
+        """Create a batch from query results.
+
+        Parameters
+        ----------
+        results
+            The results.
+        user
+            The index of the user that ran the queries, or -1 if unknown.
+
+        Returns
+        -------
+        QueryResultBatch
+            The batch.
+        """
+        batch = cls()
+        batch.extend(results, user=user)
+        return batch
+
+    def append(self, result: QueryResult, user: int = -1) -> None:
+        """Add a query result.
+
+        Parameters
+        ----------
+        result
+            The result.
+        user
+            The index of the user that ran the query, or -1 if unknown.
+        """
+        with self._lock:
+            index = self._size
+            if index == len(self._columns["user"]):
+                self._grow()
+            row = {
+                "user": user,
+                "query_id": self._queries.id(result.query),
+                "status_id": self._statuses.id(result.status),
+                "checksums_id": self._checksums.id(
+                    tuple(sorted(result.checksums.items()))
+                ),
+                "row_count": result.row_count,
+                "expected_row_count": result.expected_row_count,
+                "execution_duration": result.execution_duration,
+                "expected_duration": result.expected_duration,
+                "queue_delay": result.queue_delay,
+                "bytes_received": result.bytes_received,
+                "decode_duration": result.decode_duration,
+            }
+            for name, value in row.items():
+                self._columns[name][index] = value
+            for phase, seconds in result.phases.items():
+                self._phases[_BATCH_PHASES.index(phase), index] = seconds
+            self._size += 1
+            if self._size == self._spill_rows:
+                self._spill()
+
+    def extend(self, results: Iterable[QueryResult], user: int = -1) -> None:
+        """Add query results.
+
+        Parameters
+        ----------
+        results
+            The results.
+        user
+            The index of the user that ran the queries, or -1 if unknown.
+        """
+        for result in results:
+            self.append(result, user=user)
+
+    def _grow(self) -> None:
+        """Double the capacity of the arrays, up to ``spill_rows``."""
+        capacity = 2 * len(self._columns["user"])
+        if self._spill_rows:
+            capacity = min(capacity, self._spill_rows)
+        for name, column in self._columns.items():
+            grown = np.zeros(capacity, column.dtype)
+            grown[: self._size] = column[: self._size]
+            self._columns[name] = grown
+        phases = np.full((len(_BATCH_PHASES), capacity), np.nan, np.float32)
+        phases[:, : self._size] = self._phases[:, : self._size]
+        self._phases = phases
+
+    def _spill(self) -> None:
+        """Move the results in memory to a new Parquet file."""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if self._spill_dir is None:
+            self._spill_dir = Path(tempfile.mkdtemp(prefix="rspvalidator-results-"))
+            self._remove_spill = weakref.finalize(
+                self, shutil.rmtree, self._spill_dir, ignore_errors=True
+            )
+        columns = {name: column[: self._size] for name, column in self._columns.items()}
+        for phase, durations in zip(_BATCH_PHASES, self._phases, strict=True):
+            columns[f"phase_{phase}"] = durations[: self._size]
+        path = self._spill_dir / f"{len(self._spilled):06d}.parquet"
+        pq.write_table(pa.table(columns), path)
+        self._spilled.append(path)
+        # Tables exported before keep the arrays they share
+        self._allocate_rows(len(self._columns["user"]))
+
+    def clear(self) -> None:
+        """Remove every result.
+
+        New arrays are allocated, so tables exported before keep their data.
+        """
+        with self._lock:
+            if self._spill_dir is not None:
+                self._remove_spill()
+                self._spill_dir = None
+                self._spilled = []
+                self._last_spill = None
+            self._allocate(len(self._columns["user"]))
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._spilled) * self._spill_rows + self._size
+
+    def __getitem__(self, index: int) -> QueryResult:
+        with self._lock:
+            spilled = len(self._spilled) * self._spill_rows
+            size = spilled + self._size
+            if index < 0:
+                index += size
+            if not 0 <= index < size:
+                raise IndexError("QueryResultBatch index out of range")
+            if index >= spilled:
+                return self._result(self._columns, self._phases, index - spilled)
+            path = self._spilled[index // self._spill_rows]
+        columns, phases = self._read_spill(path)
+        return self._result(columns, phases, index % self._spill_rows)
+
+    def _read_spill(self, path: Path) -> tuple[dict[str, np.ndarray], np.ndarray]:
+        """Read a spilled file, or return it from the last one read."""
+        last = self._last_spill
+        if last is not None and last[0] == path:
+            return last[1], last[2]
+        columns, phases = _read_spill(path)
+        self._last_spill = (path, columns, phases)
+        return columns, phases
+
+    def _result(
+        self, columns: dict[str, np.ndarray], phases: np.ndarray, index: int
+    ) -> QueryResult:
+        """Build the result stored at an index of a set of arrays."""
+        row = {name: column[index].item() for name, column in columns.items()}
+        return QueryResult(
+            status=self._statuses.entries[row["status_id"]],
+            row_count=row["row_count"],
+            execution_duration=row["execution_duration"],
+            expected_duration=row["expected_duration"],
+            expected_row_count=row["expected_row_count"],
+            query=self._queries.entries[row["query_id"]],
+            queue_delay=row["queue_delay"],
+            bytes_received=row["bytes_received"],
+            decode_duration=row["decode_duration"],
+            checksums=dict(self._checksums.entries[row["checksums_id"]]),
+            phases={
+                phase: float(seconds)
+                for phase, seconds in zip(_BATCH_PHASES, phases[:, index], strict=True)
+                if not math.isnan(seconds)
+            },
+        )
+
+    def __iter__(self) -> Iterator[QueryResult]:
+        # Results appended while iterating are not seen. A spill replaces
+        # the arrays rather than reusing them, so the ones taken stay valid
+        with self._lock:
+            spilled = list(self._spilled)
+            columns = dict(self._columns)
+            phases = self._phases
+            size = self._size
+        # Spilled results are read back one file at a time
+        for path in spilled:
+            spill_columns, spill_phases = _read_spill(path)
+            for index in range(spill_phases.shape[1]):
+                yield self._result(spill_columns, spill_phases, index)
+        for index in range(size):
+            yield self._result(columns, phases, index)
+
+    def _read_column(self, name: str) -> np.ndarray:
+        """Return a read-only numeric or ``phase_<phase>`` column.
+
+        The column is a view of the arrays unless results were spilled.
+        """
+        with self._lock:
+            spilled = list(self._spilled)
+            if name.startswith("phase_"):
+                index = _BATCH_PHASES.index(name.removeprefix("phase_"))
+                view = self._phases[index, : self._size]
+            else:
+                view = self._columns[name][: self._size]
+        if spilled:
+            import pyarrow.parquet as pq
+
+            chunks = [pq.read_table(p, columns=[name])[0].to_numpy() for p in spilled]
+            view = np.concatenate([*chunks, view])
+        view.flags.writeable = False
+        return view
+
+    @property
+    def queries(self) -> list[str]:
+        """The distinct query strings, in the order they were first seen."""
+        return list(self._queries.entries)
+
+    @property
+    def statuses(self) -> list[str]:
+        """The distinct statuses, in the order they were first seen."""
+        return list(self._statuses.entries)
+
+    def column(self, name: str) -> np.ndarray:
+        """Return a read-only view of a numeric column.
+
+        Parameters
+        ----------
+        name
+            The name of the column, a numeric `QueryResult` field such as
+            ``execution_duration``, ``user``, or ``query_id`` and
+            ``status_id`` for the indices of `queries` and the statuses.
+
+        Returns
+        -------
+        numpy.ndarray
+            The values of the results in the batch, a copy if some of them
+            were spilled to disk.
+
+        Raises
+        ------
+        KeyError
+            If there is no such column.
+        """
+        if name not in _BATCH_COLUMNS:
+            raise KeyError(name)
+        return self._read_column(name)
+
+    def phase(self, phase: QueryPhase) -> np.ndarray:
+        """Return a read-only view of the durations of a phase.
+
+        Parameters
+        ----------
+        phase
+            The phase.
+
+        Returns
+        -------
+        numpy.ndarray
+            The durations in seconds, NaN for results without the phase, a
+            copy if some results were spilled to disk.
+        """
+        return self._read_column(f"phase_{phase.value}")
+
+    def mask(self, query: str | None = None, status: str | None = None) -> np.ndarray:
+        """Select the results of a query, with a status, or both.
+
+        Parameters
+        ----------
+        query
+            The query string, or `None` for every query.
+        status
+            The status, or `None` for every status.
+
+        Returns
+        -------
+        numpy.ndarray
+            A boolean array that is true for the selected results.
+        """
+        selected = np.ones(len(self), bool)
+        for value, table, name in (
+            (query, self._queries, "query_id"),
+            (status, self._statuses, "status_id"),
+        ):
+            if value is not None:
+                selected &= self.column(name) == table.ids.get(value, -1)
+        return selected
+
+    def status_counts(self) -> dict[str, int]:
+        """Return the number of results with each status.
+
+        Returns
+        -------
+        dict[str, int]
+            The counts, keyed by status.
+        """
+        counts = np.bincount(
+            self.column("status_id"), minlength=len(self._statuses.entries)
+        )
+        return {
+            status: int(count)
+            for status, count in zip(self._statuses.entries, counts, strict=True)
+            if count
+        }
+
+    def mean_phases(self, query: str | None = None) -> dict[str, float]:
+        """Return the mean time spent in each phase.
+
+        Parameters
+        ----------
+        query
+            The query string, or `None` for every query.
+
+        Returns
+        -------
+        dict[str, float]
+            The mean durations in seconds over the results that measured
+            each phase, keyed by `QueryPhase` value.
+        """
+        selected = self.mask(query=query)
+        phases = np.stack([self.phase(phase)[selected] for phase in QueryPhase])
+        measured = ~np.isnan(phases)
+        counts = measured.sum(axis=1)
+        totals = np.where(measured, phases, 0).sum(axis=1, dtype=np.float64)
+        return {
+            phase: float(total / count)
+            for phase, total, count in zip(_BATCH_PHASES, totals, counts, strict=True)
+            if count
+        }
+
+    def summary(
+        self, query: str | None = None, elapsed: float = 0.0
+    ) -> "LatencySummary":
+        """Summarise the execution durations.
+
+        Parameters
+        ----------
+        query
+            The query string, or `None` for every query.
+        elapsed
+            The wall-clock time over which the queries ran, used to compute
+            the throughput.
+
+        Returns
+        -------
+        LatencySummary
+            The exact latency percentiles and throughput.
+        """
+        from .test import LatencySummary
+
+        durations = self.column("execution_duration")[self.mask(query=query)]
+        if not len(durations):
+            return LatencySummary(0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0)
+        p50, p90, p99 = np.percentile(durations, [50, 90, 99])
+        return LatencySummary(
+            count=len(durations),
+            mean=float(durations.mean()),
+            p50=float(p50),
+            p90=float(p90),
+            p99=float(p99),
+            maximum=float(durations.max()),
+            throughput=len(durations) / elapsed if elapsed > 0 else 0.0,
+        )
+
+    def summaries(self, elapsed: float = 0.0) -> dict[str, "LatencySummary"]:
+        """Summarise the execution durations of every query at once.
+
+        Parameters
+        ----------
+        elapsed
+            The wall-clock time over which the queries ran, used to compute
+            the throughput.
+
+        Returns
+        -------
+        dict[str, LatencySummary]
+            The summary of each query, keyed by query string.
+        """
+        from .test import LatencySummary
+
+        if not len(self):
+            return {}
+        ids = self.column("query_id")
+        order = np.lexsort((self.column("execution_duration"), ids))
+        durations = self.column("execution_duration")[order]
+        counts = np.bincount(ids, minlength=len(self._queries.entries))
+        present = np.flatnonzero(counts)
+        counts = counts[present]
+        starts = np.cumsum(counts) - counts
+        means = np.add.reduceat(durations, starts) / counts
+        p50, p90, p99 = (
+            _grouped_percentile(durations, starts, counts, p) for p in (50, 90, 99)
+        )
+        maxima = durations[starts + counts - 1]
+        sizes = [int(count) for count in counts]
+        return {
+            self._queries.entries[query_id]: LatencySummary(
+                count=sizes[i],
+                mean=float(means[i]),
+                p50=float(p50[i]),
+                p90=float(p90[i]),
+                p99=float(p99[i]),
+                maximum=float(maxima[i]),
+                throughput=sizes[i] / elapsed if elapsed > 0 else 0.0,
+            )
+            for i, query_id in enumerate(present)
+        }
+
+    def to_arrow(self) -> "pa.Table":
+        """Export the batch as an Arrow table.
+
+        The numeric columns share memory with the batch. The query strings,
+        statuses and checksums are dictionary encoded, the checksums as
+        JSON objects, and there is a ``phase_<phase>`` column per
+        `QueryPhase`, NaN where the phase was not measured.
+
+        Returns
+        -------
+        pyarrow.Table
+            The table, with a row per result.
+        """
+        import pyarrow as pa
+
+        def _dictionary(name: str, values: list[str]) -> pa.DictionaryArray:
+            return pa.DictionaryArray.from_arrays(
+                pa.array(self.column(name)), pa.array(values, pa.string())
+            )
+
+        checksums = [json.dumps(dict(items)) for items in self._checksums.entries]
+        columns = {
+            "query": _dictionary("query_id", self._queries.entries),
+            "status": _dictionary("status_id", self._statuses.entries),
+            "checksums": _dictionary("checksums_id", checksums),
+        }
+        for name in _BATCH_COLUMNS:
+            if not name.endswith("_id"):
+                columns[name] = pa.array(self.column(name))
+        for phase in QueryPhase:
+            columns[f"phase_{phase.value}"] = pa.array(self.phase(phase))
+        return pa.table(columns)
+
+    def to_parquet(self, path: Path, **kwargs: Any) -> None:
+        """Write the batch to a Parquet file.
+
+        Parameters
+        ----------
+        path
+            The path of the file.
+        **kwargs
+            Options of `pyarrow.parquet.write_table`, e.g. ``compression``.
+        """
+        import pyarrow.parquet as pq
+
+        pq.write_table(self.to_arrow(), path, **kwargs)
+
+
+@dataclass
+class PhaseTransition:
+    """Dataclass to store the moment a UWS job was seen entering a phase.
+
+    Attributes
+    ----------
+    phase : str
+        The UWS phase the job entered.
+    timestamp : float
+        The wall-clock (``time.time``) time the new phase was first seen.
+    """
+
+    phase: str
+    timestamp: float
+
+
+@dataclass
+class JobWaitResult:
+    """Dataclass to store the outcome of waiting for a UWS job.
+
+    Attributes
+    ----------
+    phase : str
+        The phase the job ended in.
+    job : Any
+        The final ``pyvo.io.uws.tree.JobSummary`` of the job.
+    transitions : list[PhaseTransition]
+        The phases the job was seen in, in order, starting with the phase
+        it was in when waiting started.
+    requests : int
+        The number of requests made to the job while waiting.
+    long_polling : bool
+        Whether the UWS 1.1 ``WAIT`` parameter was used.
+    """
+
+    phase: str
+    job: Any
+    transitions: list[PhaseTransition] = field(default_factory=list)
+    requests: int = 0
+    long_polling: bool = False
+
+    def phase_durations(self) -> dict[str, float]:
+        """Return the time the job was seen in each phase before the last.
+
+        Returns
+        -------
+        dict[str, float]
+            The durations in seconds, keyed by UWS phase.
+        """
+        return {
+            previous.phase: current.timestamp - previous.timestamp
+            for previous, current in zip(
+                self.transitions, self.transitions[1:], strict=False
+            )
+        }
+
+
+@dataclass
+class CapabilityDifference:
+    """Dataclass to store a difference between two capabilities documents.
+
+    Attributes
+    ----------
+    kind : str
+        ``missing`` if the node is only in the expected document,
+        ``unexpected`` if it is only in the actual one, and ``changed`` if
+        the node is in both but its attributes or text differ.
+    path : str
+        The path to the node, made of each element's name and identifying
+        attributes, e.g. ``capabilities/capability[ivo://ivoa.net/std/TAP]``.
+    expected : str | None
+        The attributes and text of the node in the expected document.
+    actual : str | None
+        The attributes and text of the node in the actual document.
+    """
+
+    kind: str
+    path: str
+    expected: str | None = None
+    actual: str | None = None
+
+    def __str__(self) -> str:
+        if self.kind == "missing":
+            return f"{self.path}: missing, expected {self.expected}"
+        if self.kind == "unexpected":
+            return f"{self.path}: unexpected {self.actual}"
+        return f"{self.path}: expected {self.expected}, got {self.actual}"
@@ -0,0 +1,163 @@
+"""Module with STILTS taplint related models."""
+
+from dataclasses import dataclass, field
+from enum import Enum
+
+__all__ = ["Severity", "TaplintFinding", "TaplintReport", "TaplintStage"]
+
+
+class Severity(Enum):
+    """Enumeration of the types of taplint reports, by their label letter.
+
+    Attributes
+    ----------
+    ERROR : str
+        The service violates a standard.
+    WARNING : str
+        The service does something questionable.
+    INFO : str
+        Information about what was checked.
+    SUMMARY : str
+        A summary of the checks of a stage.
+    FAILURE : str
+        taplint itself failed to check something.
+    """
+
+    ERROR = "E"
+    WARNING = "W"
+    INFO = "I"
+    SUMMARY = "S"
+    FAILURE = "F"
+
+
+@dataclass
+class TaplintFinding:
+    """
+    Dataclass to store a report of taplint, such as ``E-TME-CLOC-1 ...``.
+
+    Attributes
+    ----------
+    stage: str
+        The three letter code of the stage, e.g. ``TME``.
+    severity: Severity
+        The type of the report.
+    code: str
+        The four character code of the message, e.g. ``CLOC``.
+    sequence: int
+        The number of the report among those with the same code.
+    text: str
+        The text of the report, with continuation lines joined by newlines.
+    """
+
+    stage: str
+    severity: Severity
+    code: str
+    sequence: int
+    text: str
+
+    @property
+    def label(self) -> str:
+        """The label of the report as taplint prints it."""
+        return f"{self.severity.value}-{self.stage}-{self.code}-{self.sequence}"
+
+    def __str__(self) -> str:
+        return f"{self.label} {self.text}"
+
+
+@dataclass
+class TaplintStage:
+    """
+    Dataclass to store the outcome of a taplint stage.
+
+    Attributes
+    ----------
+    code: str
+        The three letter code of the stage, e.g. ``CAP``.
+    description: str
+        What the stage checks, as taplint describes it.
+    duration: float
+        The time from the start of the stage to the start of the next one
+        or the end of the run, in seconds.
+    counts: dict[Severity, int]
+        The number of reports of each type.
+    """
+
+    code: str
+    description: str
+    duration: float = 0.0
+    counts: dict[Severity, int] = field(default_factory=dict)
+
+    @property
+    def errors(self) -> int:
+        """The number of errors reported."""
+        return self.counts.get(Severity.ERROR, 0)
+
+    @property
+    def warnings(self) -> int:
+        """The number of warnings reported."""
+        return self.counts.get(Severity.WARNING, 0)
+
+
+@dataclass
+class TaplintReport:
+    """
+    Dataclass to store the outcome of a taplint run.
+
+    Attributes
+    ----------
+    stages: list[TaplintStage]
+        The stages that ran, in order.
+    findings: list[TaplintFinding]
+        The reports of the types that were kept, by default the errors,
+        warnings and failures. Other reports are only counted.
+    totals: dict[Severity, int] | None
+        The number of reports of each type from taplint's closing
+        ``Totals:`` line, or `None` if the run did not get that far.
+    exit_status: int
+        The exit status of taplint, or -1 if it was not run to the end.
+    error: str
+        Why taplint did not run to the end, or an empty string.
+    """
+
+    stages: list[TaplintStage] = field(default_factory=list)
+    findings: list[TaplintFinding] = field(default_factory=list)
+    totals: dict[Severity, int] | None = None
+    exit_status: int = 0
+    error: str = ""
+
+    @property
+    def complete(self) -> bool:
+        """Whether taplint ran to the end and printed its totals."""
+        return self.totals is not None
+
+    def count(self, severity: Severity) -> int:
+        """Return the number of reports of a type.
+
+        Parameters
+        ----------
+        severity
+            The type of the reports.
+
+        Returns
+        -------
+        int
+            The number from taplint's totals, or the number counted in the
+            stages if taplint did not print its totals.
+        """
+        if self.totals is not None:
+            return self.totals.get(severity, 0)
+        return sum(stage.counts.get(severity, 0) for stage in self.stages)
+
+    @property
+    def errors(self) -> int:
+        """The number of errors reported."""
+        return self.count(Severity.ERROR)
+
+    @property
+    def warnings(self) -> int:
+        """The number of warnings reported."""
+        return self.count(Severity.WARNING)
+
+    def stage(self, code: str) -> TaplintStage | None:
+        """Return a stage by its code, if it ran."""
+        return next((s for s in self.stages if s.code == code), None)
@@ -1,10 +1,81 @@
 """Module to define the Test related models."""
 
 from dataclasses import dataclass, field
+from enum import Enum
 
-from .tap import QueryMode, TAPApplication
+from .tap import QueryMode, QueryResultBatch, TAPApplication
 
-__all__ = ["Scenario"]
+__all__ = [
+    "ArrivalPattern",
+    "CheckResult",
+    "CheckStatus",
+    "DistributedReport",
+    "LatencyDistribution",
+    "LatencySummary",
+    "LocalTAPOptions",
+    "OpenLoopReport",
+    "RegressionResult",
+    "Scenario",
+]
+
+
+class ArrivalPattern(Enum):
+    """Enumeration of request arrival patterns for open-loop tests.
+
+    Attributes
+    ----------
+    CONSTANT : str
+        Requests arrive at fixed intervals.
+    POISSON : str
+        Requests arrive as a Poisson process with the target mean rate.
+    RAMP : str
+        The arrival rate rises in equal steps up to the target rate.
+    """
+
+    CONSTANT = "constant"
+    POISSON = "poisson"
+    RAMP = "ramp"
+
+
+class LatencyDistribution(Enum):
+    """Enumeration of the distributions of the local TAP server's latencies.
+
+    Attributes
+    ----------
+    CONSTANT : str
+        Every query takes the mean latency.
+    UNIFORM : str
+        Latencies are uniform between zero and twice the mean.
+    EXPONENTIAL : str
+        Latencies are exponentially distributed around the mean.
+    LOGNORMAL : str
+        Latencies are log-normally distributed around the mean, with a long
+        tail as often seen from real services.
+    """
+
+    CONSTANT = "constant"
+    UNIFORM = "uniform"
+    EXPONENTIAL = "exponential"
+    LOGNORMAL = "lognormal"
+
+
+class CheckStatus(Enum):
+    """Enumeration of the outcomes of a monitoring check.
+
+    Attributes
+    ----------
+    PASSED : str
+        The check's assertions held.
+    FAILED : str
+        An assertion of the check failed.
+    ERROR : str
+        The check could not be run to completion, e.g. the service could not
+        be reached.
+    """
+
+    PASSED = "passed"
+    FAILED = "failed"
+    ERROR = "error"
 
 
 @dataclass
@@ -19,16 +90,271 @@ class Scenario:
     mode: QueryMode
         The query mode (sync or async
     users: int
-        The number of concurrent users
+        The number of concurrent users. For open-loop scenarios this is the
+        maximum number of queries in flight at once.
+    rate: float | None
+        The target arrival rate in queries per second. If set, the scenario
+        is run open-loop instead of with each user running queries back to
+        back.
+    duration: float | None
+        The length of an open-loop scenario in seconds.
+    arrival: ArrivalPattern
+        The arrival pattern of an open-loop scenario.
+    ramp_steps: int
+        The number of steps used by a ramp arrival pattern.
     """
 
     app: TAPApplication
     mode: QueryMode
     users: int
+    rate: float | None = None
+    duration: float | None = None
+    arrival: ArrivalPattern = ArrivalPattern.CONSTANT
+    ramp_steps: int = 1
     description: str = field(init=False)
 
     def __post_init__(self) -> None:
-        self.description = (
-            f"{self.app.value.upper()} {self.mode.value} query [{self.users} "
-            f"user{'s' if self.users > 1 else ''}]"
+        if self.is_open_loop:
+            self.description = (
+                f"{self.app.value.upper()} {self.mode.value} query "
+                f"[{self.rate:g} qps {self.arrival.value} for "
+                f"{self.duration:g}s, max {self.users} "
+                f"user{'s' if self.users > 1 else ''}]"
+            )
+        else:
+            self.description = (
+                f"{self.app.value.upper()} {self.mode.value} query [{self.users} "
+                f"user{'s' if self.users > 1 else ''}]"
+            )
+
+    @property
+    def is_open_loop(self) -> bool:
+        """Whether the scenario is run at a target arrival rate."""
+        return self.rate is not None and self.duration is not None
+
+
+@dataclass
+class OpenLoopReport:
+    """
+    Dataclass to store the outcome of an open-loop load test.
+
+    Attributes
+    ----------
+    offered_rate: float
+        The rate at which queries were scheduled, in queries per second.
+    achieved_rate: float
+        The rate at which queries completed, in queries per second.
+    elapsed: float
+        The wall-clock time from the start of the test until the last query
+        completed.
+    scheduled: int
+        The number of queries scheduled.
+    errors: int
+        The number of queries that raised an exception.
+    results: QueryResultBatch
+        The results of the queries that completed.
+    """
+
+    offered_rate: float
+    achieved_rate: float
+    elapsed: float
+    scheduled: int
+    errors: int
+    results: QueryResultBatch
+
+    @property
+    def mean_queue_delay(self) -> float:
+        """The mean time queries waited before they started executing."""
+        if not self.results:
+            return 0.0
+        return float(self.results.column("queue_delay").mean())
+
+    @property
+    def max_queue_delay(self) -> float:
+        """The longest time a query waited before it started executing."""
+        if not self.results:
+            return 0.0
+        return float(self.results.column("queue_delay").max())
+
+    @property
+    def mean_service_time(self) -> float:
+        """The mean execution time of the queries, excluding queueing."""
+        if not self.results:
+            return 0.0
+        return float(self.results.column("execution_duration").mean())
+
+
+@dataclass
+class LatencySummary:
+    """
+    Dataclass to store a summary of recorded latencies.
+
+    Attributes
+    ----------
+    count: int
+        The number of latencies recorded.
+    mean: float
+        The mean latency in seconds.
+    p50: float
+        The median latency in seconds.
+    p90: float
+        The 90th percentile latency in seconds.
+    p99: float
+        The 99th percentile latency in seconds.
+    maximum: float
+        The largest latency in seconds.
+    throughput: float
+        The number of completed calls per second.
+    """
+
+    count: int
+    mean: float
+    p50: float
+    p90: float
+    p99: float
+    maximum: float
+    throughput: float
+
+    def __str__(self) -> str:
+        return (
+            f"n={self.count} p50={self.p50:.3f}s p90={self.p90:.3f}s "
+            f"p99={self.p99:.3f}s max={self.maximum:.3f}s "
+            f"throughput={self.throughput:.2f}/s"
         )
+
+
+@dataclass
+class RegressionResult:
+    """
+    Dataclass to store the comparison of a query's latencies to its baseline.
+
+    Attributes
+    ----------
+    query: str
+        The query string.
+    baseline_median: float
+        The median latency of the query over the baseline runs, in seconds.
+    current_median: float
+        The median latency of the query in the current run, in seconds.
+    p_value: float
+        The p-value of a one-sided Mann-Whitney U test that the current
+        latencies are larger than the baseline ones.
+    regressed: bool
+        Whether the slowdown is both statistically significant and larger
+        than the configured minimum ratio.
+    """
+
+    query: str
+    baseline_median: float
+    current_median: float
+    p_value: float
+    regressed: bool
+
+    @property
+    def ratio(self) -> float:
+        """The ratio of the current median latency to the baseline one."""
+        if self.baseline_median <= 0:
+            return 1.0
+        return self.current_median / self.baseline_median
+
+    def __str__(self) -> str:
+        return (
+            f"[{self.query}] median {self.current_median:.3f}s vs baseline "
+            f"{self.baseline_median:.3f}s ({self.ratio:.2f}x, p={self.p_value:.3g})"
+        )
+
+
+@dataclass
+class DistributedReport:
+    """
+    Dataclass to store the outcome of a distributed load test.
+
+    Attributes
+    ----------
+    workers: int
+        The number of workers that took part.
+    results: QueryResultBatch
+        The results of every query execution across all workers.
+    errors: list[str]
+        The errors reported by workers.
+    """
+
+    workers: int
+    results: QueryResultBatch = field(default_factory=QueryResultBatch)
+    errors: list[str] = field(default_factory=list)
+
+
+@dataclass
+class LocalTAPOptions:
+    """
+    Dataclass to store the behaviour of the local stand-in TAP server.
+
+    Attributes
+    ----------
+    latency: float
+        The mean time in seconds a query takes to execute, before its
+        result is returned by the sync endpoint or its UWS job completes.
+    distribution: LatencyDistribution
+        The distribution of the execution times.
+    queue_time: float
+        The time in seconds UWS jobs spend queued before executing.
+    error_rate: float
+        The fraction of queries that fail, between 0 and 1.
+    default_rows: int
+        The number of rows returned by queries without a ``TOP`` clause.
+    serialization: str
+        The VOTable serialization of results, ``BINARY2`` or ``TABLEDATA``.
+    uws_version: str
+        The UWS version reported by jobs. Only version 1.1 jobs honour the
+        ``WAIT`` parameter.
+    relative_redirects: bool
+        Whether UWS redirects give a ``Location`` relative to the server,
+        as RFC 9110 allows, rather than an absolute URL.
+    seed: int | None
+        Seed for the random number generator used for latencies and errors.
+    """
+
+    latency: float = 0.0
+    distribution: LatencyDistribution = LatencyDistribution.CONSTANT
+    queue_time: float = 0.0
+    error_rate: float = 0.0
+    default_rows: int = 1000
+    serialization: str = "BINARY2"
+    uws_version: str = "1.1"
+    relative_redirects: bool = False
+    seed: int | None = None
+
+
+@dataclass
+class CheckResult:
+    """
+    Dataclass to store the outcome of a monitoring check.
+
+    Attributes
+    ----------
+    name: str
+        The name of the check, e.g. ``tap-capabilities``.
+    status: CheckStatus
+        The outcome of the check.
+    started: float
+        The time the check started, in seconds since the epoch.
+    duration: float
+        The time the check took in seconds.
+    message: str
+        The assertion or error message if the check did not pass.
+    consecutive_failures: int
+        The number of runs in a row, up to and including this one, that the
+        check did not pass.
+    """
+
+    name: str
+    status: CheckStatus
+    started: float
+    duration: float
+    message: str = ""
+    consecutive_failures: int = 0
+
+    @property
+    def passed(self) -> bool:
+        """Whether the check passed."""
+        return self.status == CheckStatus.PASSED
@@ -0,0 +1,264 @@
+"""Asynchronous TAP client used to simulate many concurrent users."""
+
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterator
+from contextlib import asynccontextmanager, contextmanager
+from types import TracebackType
+from typing import Self
+from urllib.parse import urljoin
+
+import httpx
+from pyvo.dal import DALQueryError, DALServiceError
+
+from ..config import logger
+from ..models.tap import QueryPhase
+from ..utils.votable import VOTableRowCounter
+from .uws import AsyncUWSJobWaiter, UWSJobService
+
+__all__ = ["AsyncTAPClient"]
+
+# Query phase of each httpcore trace event that is timed
+_TRACE_PHASES = {
+    "connection.connect_tcp": QueryPhase.CONNECT,
+    "connection.start_tls": QueryPhase.CONNECT,
+    "http11.send_request_headers": QueryPhase.SEND,
+    "http11.send_request_body": QueryPhase.SEND,
+    "http11.receive_response_headers": QueryPhase.TTFB,
+    "http2.send_request_headers": QueryPhase.SEND,
+    "http2.send_request_body": QueryPhase.SEND,
+    "http2.receive_response_headers": QueryPhase.TTFB,
+}
+
+
+def _phase_tracer(
+    phases: dict[str, float],
+) -> Callable[[str, dict], Awaitable[None]]:
+    """Make an httpx trace callback adding connection phases to a dict."""
+    started: dict[str, float] = {}
+
+    async def trace(event: str, info: dict) -> None:
+        name, _, stage = event.rpartition(".")
+        phase = _TRACE_PHASES.get(name)
+        if phase is None:
+            return
+        if stage == "started":
+            started[name] = time.perf_counter()
+        elif name in started:
+            elapsed = time.perf_counter() - started.pop(name)
+            phases[phase.value] = phases.get(phase.value, 0.0) + elapsed
+
+    return trace
+
+
+@contextmanager
+def _service_errors() -> Iterator[None]:
+    """Raise HTTP error responses as pyvo does for the threaded engine."""
+    try:
+        yield
+    except httpx.HTTPStatusError as e:
+        url = str(e.request.url)
+        raise DALServiceError(str(e), e.response.status_code, e, url) from e
+
+
+class AsyncTAPClient:
+    """Minimal asyncio TAP client speaking the sync and async (UWS) protocol.
+
+    The client is configured once and can then be opened in any number of
+    event loops in turn with ``async with client:``, since the underlying
+    HTTP connection pool is bound to the loop it was created in.
+
+    Parameters
+    ----------
+    tap_url
+        The base URL of the TAP service.
+    auth_token
+        The authentication token sent as a bearer token.
+    max_connections
+        The maximum number of concurrent connections to the service. Should
+        be at least the number of users sharing the client, otherwise users
+        wait for a connection and the wait counts towards their queries'
+        durations.
+    timeout
+        The timeout in seconds for each HTTP request and for an async job to
+        finish.
+    """
+
+    def __init__(
+        self,
+        tap_url: str,
+        auth_token: str,
+        *,
+        max_connections: int = 100,
+        timeout: float = 600.0,
+    ) -> None:
+        self.tap_url = tap_url.rstrip("/")
+        self.timeout = timeout
+        self._headers = {"Authorization": f"Bearer {auth_token}"}
+        self._limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+        )
+        self._client: httpx.AsyncClient | None = None
+
+    async def __aenter__(self) -> Self:
+        self._client = httpx.AsyncClient(
+            headers=self._headers,
+            limits=self._limits,
+            timeout=self.timeout,
+        )
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        if self._client:
+            await self._client.aclose()
+            self._client = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """The open HTTP client.
+
+        Raises
+        ------
+        RuntimeError
+            If the client is used outside ``async with``.
+        """
+        if self._client is None:
+            raise RuntimeError("AsyncTAPClient used outside async with")
+        return self._client
+
+    async def count_sync(
+        self,
+        query: str,
+        counter: VOTableRowCounter,
+        phases: dict[str, float] | None = None,
+    ) -> None:
+        """Run a query through the TAP sync endpoint and stream its result.
+
+        Parameters
+        ----------
+        query
+            The ADQL query.
+        counter
+            The counter the response is fed to as it arrives.
+        phases
+            If given, the time spent in each `QueryPhase` is added to it.
+
+        Raises
+        ------
+        pyvo.dal.DALServiceError
+            If the service returns an HTTP error.
+        """
+        request = self.client.build_request(
+            "POST",
+            f"{self.tap_url}/sync",
+            data={"LANG": "ADQL", "REQUEST": "doQuery", "QUERY": query},
+        )
+        with _service_errors():
+            await self._stream(request, counter, phases)
+
+    async def count_async(
+        self,
+        query: str,
+        counter: VOTableRowCounter,
+        phases: dict[str, float] | None = None,
+    ) -> None:
+        """Run a query as a UWS job and stream its result.
+
+        Parameters
+        ----------
+        query
+            The ADQL query.
+        counter
+            The counter the result is fed to as it arrives.
+        phases
+            If given, the time spent in each `QueryPhase` is added to it. The
+            connection phases are those of fetching the result.
+
+        Raises
+        ------
+        pyvo.dal.DALServiceError
+            If the service returns an HTTP error.
+        pyvo.dal.DALQueryError
+            If the job does not complete successfully.
+        TimeoutError
+            If the job does not finish within the client timeout.
+        """
+        with _service_errors():
+            async with self._job(query, phases) as result_url:
+                start = time.perf_counter()
+                request = self.client.build_request("GET", result_url)
+                await self._stream(request, counter, phases)
+                if phases is not None:
+                    elapsed = time.perf_counter() - start
+                    phases[QueryPhase.RESULT_FETCH.value] = elapsed
+
+    @asynccontextmanager
+    async def _job(
+        self, query: str, phases: dict[str, float] | None = None
+    ) -> AsyncIterator[str]:
+        """Run a UWS job to completion, yield its result URL and delete it.
+
+        If ``phases`` is given, the time taken to create the job and the
+        time it spent queued and executing are added to it. A job that cannot
+        be deleted is logged, so that it does not hide the query's error.
+        """
+        start = time.perf_counter()
+        response = await self.client.post(
+            f"{self.tap_url}/async",
+            data={"LANG": "ADQL", "REQUEST": "doQuery", "QUERY": query, "PHASE": "RUN"},
+        )
+        if response.status_code != httpx.codes.SEE_OTHER:
+            response.raise_for_status()
+            raise DALServiceError(
+                f"Unexpected status {response.status_code} creating UWS job",
+                response.status_code,
+                url=f"{self.tap_url}/async",
+            )
+        job_url = urljoin(str(response.url), response.headers["Location"])
+        if phases is not None:
+            phases[QueryPhase.JOB_CREATE.value] = time.perf_counter() - start
+
+        try:
+            waiter = AsyncUWSJobWaiter(self.client, timeout=self.timeout)
+            waited = await waiter.wait(job_url)
+            if waited.phase != "COMPLETED":
+                message = UWSJobService.error_message(waited.job)
+                raise DALQueryError(f"Query Error: {message}", waited.phase, job_url)
+            if phases is not None:
+                phases.update(UWSJobService.query_phases(waited))
+            yield UWSJobService.result_url(job_url, waited.job) or (
+                f"{job_url}/results/result"
+            )
+        finally:
+            try:
+                await self.client.delete(job_url)
+            except httpx.HTTPError as e:
+                logger.warning(f"Could not delete UWS job {job_url}: {e!s}")
+
+    async def _stream(
+        self,
+        request: httpx.Request,
+        counter: VOTableRowCounter,
+        phases: dict[str, float] | None,
+    ) -> None:
+        """Send a request, following redirects, and feed the body to a counter."""
+        if phases is not None:
+            request.extensions["trace"] = _phase_tracer(phases)
+        response = await self.client.send(request, stream=True, follow_redirects=True)
+        start = time.perf_counter()
+        try:
+            response.raise_for_status()
+            async for chunk in response.aiter_bytes():
+                counter.feed(chunk)
+        finally:
+            await response.aclose()
+        counter.close()
+        if phases is not None:
+            elapsed = time.perf_counter() - start
+            phases[QueryPhase.DOWNLOAD.value] = elapsed - counter.decode_duration
+            phases[QueryPhase.PARSE.value] = counter.decode_duration
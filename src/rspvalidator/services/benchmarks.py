@@ -0,0 +1,503 @@
+"""Persistent store of benchmark results and regression detection.
+
+TAP query durations and the durations of the cells of tutorial notebooks
+are stored, and each run is compared with the runs before it.
+"""
+
+import hashlib
+import sqlite3
+import statistics
+import time
+import uuid
+from collections.abc import Iterator
+from contextlib import closing, contextmanager
+from pathlib import Path
+
+from ..models.notebook import CellRegressionResult, CellStatus, NotebookResult
+from ..models.tap import QueryResultBatch
+from ..models.test import RegressionResult, Scenario
+from ..utils.stats import mann_whitney_u
+
+__all__ = ["BenchmarkStoreService"]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS queries (
+    query_hash TEXT PRIMARY KEY,
+    query TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS query_results (
+    run_id TEXT NOT NULL,
+    timestamp REAL NOT NULL,
+    hostname TEXT NOT NULL,
+    app TEXT NOT NULL,
+    mode TEXT NOT NULL,
+    users INTEGER NOT NULL,
+    rate REAL,
+    query_hash TEXT NOT NULL REFERENCES queries (query_hash),
+    status TEXT NOT NULL,
+    row_count INTEGER NOT NULL,
+    duration REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS query_results_key ON query_results (
+    hostname, app, mode, users, query_hash, timestamp
+);
+CREATE TABLE IF NOT EXISTS notebook_cells (
+    run_id TEXT NOT NULL,
+    timestamp REAL NOT NULL,
+    hostname TEXT NOT NULL,
+    notebook TEXT NOT NULL,
+    cell INTEGER NOT NULL,
+    source_hash TEXT NOT NULL,
+    status TEXT NOT NULL,
+    duration REAL NOT NULL,
+    kernel_duration REAL
+);
+CREATE INDEX IF NOT EXISTS notebook_cells_key ON notebook_cells (
+    hostname, notebook, cell, source_hash, timestamp
+);
+"""
+
+
+class BenchmarkStoreService:
+    """Store benchmark results in SQLite and compare runs to past baselines.
+
+    TAP query results are keyed by hostname, app, query mode, user count,
+    arrival rate (for open-loop runs) and a hash of the query, so that runs
+    are only ever compared with runs of the same scenario against the same
+    service. Notebook cell durations are keyed by hostname, notebook, cell
+    index and a hash of the cell's code, so that a cell whose code changed
+    starts a new baseline.
+
+    Parameters
+    ----------
+    path
+        The path of the SQLite database. It is created if it does not exist.
+    hostname
+        The hostname of the RSP the results were measured against.
+    """
+
+    def __init__(self, path: Path, hostname: str) -> None:
+        self.path = path
+        self.hostname = hostname
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as connection:
+            connection.executescript(_SCHEMA)
+
+    @staticmethod
+    def query_hash(query: str) -> str:
+        """Return a short stable identifier for a query string.
+
+        Whitespace is collapsed first, so reformatting a query keeps its
+        history.
+
+        Parameters
+        ----------
+        query
+            The query string.
+
+        Returns
+        -------
+        str
+            The first 16 hex digits of the SHA-256 of the query, with runs
+            of whitespace replaced by single spaces.
+        """
+        normalized = " ".join(query.split())
+        return hashlib.sha256(normalized.encode()).hexdigest()[:16]
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Open a connection and commit on success."""
+        with closing(sqlite3.connect(self.path, timeout=30)) as connection:
+            with connection:
+                yield connection
+
+    def record(self, scenario: Scenario, results: QueryResultBatch) -> str:
+        """Store the results of a scenario run.
+
+        Parameters
+        ----------
+        scenario
+            The scenario that was run.
+        results
+            The results of every query execution in the run.
+
+        Returns
+        -------
+        str
+            The identifier of the stored run.
+        """
+        run_id = uuid.uuid4().hex
+        timestamp = time.time()
+        hashes = [self.query_hash(query) for query in results.queries]
+        statuses = results.statuses
+        scenario_columns = (
+            run_id,
+            timestamp,
+            self.hostname,
+            scenario.app.value,
+            scenario.mode.value,
+            scenario.users,
+            scenario.rate,
+        )
+        rows = [
+            (
+                *scenario_columns,
+                hashes[int(query_id)],
+                statuses[int(status_id)],
+                *values,
+            )
+            for query_id, status_id, *values in zip(
+                results.column("query_id").tolist(),
+                results.column("status_id").tolist(),
+                results.column("row_count").tolist(),
+                results.column("execution_duration").tolist(),
+                strict=True,
+            )
+        ]
+        with self._connect() as connection:
+            connection.executemany(
+                "INSERT OR IGNORE INTO queries (query_hash, query) VALUES (?, ?)",
+                zip(hashes, results.queries, strict=True),
+            )
+            connection.executemany(
+                "INSERT INTO query_results VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+        return run_id
+
+    def durations(
+        self,
+        scenario: Scenario,
+        query: str,
+        *,
+        run_id: str | None = None,
+        exclude_run_id: str | None = None,
+        max_runs: int = 10,
+    ) -> list[float]:
+        """Return the stored durations of successful executions of a query.
+
+        Parameters
+        ----------
+        scenario
+            The scenario the query was run in.
+        query
+            The query string.
+        run_id
+            If given, only return durations from this run.
+        exclude_run_id
+            If given, ignore durations from this run.
+        max_runs
+            The number of most recent runs to return durations from.
+
+        Returns
+        -------
+        list[float]
+            The execution durations in seconds.
+        """
+        key = (
+            self.hostname,
+            scenario.app.value,
+            scenario.mode.value,
+            scenario.users,
+            scenario.rate,
+            self.query_hash(query),
+        )
+        if run_id is not None:
+            runs = [run_id]
+        else:
+            with self._connect() as connection:
+                cursor = connection.execute(
+                    "SELECT run_id FROM query_results WHERE hostname = ? "
+                    "AND app = ? AND mode = ? AND users = ? AND rate IS ? "
+                    "AND query_hash = ? AND run_id IS NOT ? GROUP BY run_id "
+                    "ORDER BY MAX(timestamp) DESC LIMIT ?",
+                    (*key, exclude_run_id, max_runs),
+                )
+                runs = [row[0] for row in cursor]
+        if not runs:
+            return []
+
+        # Only the number of placeholders is interpolated, values are bound
+        placeholders = ", ".join("?" for _ in runs)
+        sql = (
+            "SELECT duration FROM query_results WHERE hostname = ? "  # noqa: S608
+            "AND app = ? AND mode = ? AND users = ? AND rate IS ? "
+            f"AND query_hash = ? AND status = 'OK' AND run_id IN ({placeholders})"
+        )
+        with self._connect() as connection:
+            cursor = connection.execute(sql, (*key, *runs))
+            return [row[0] for row in cursor]
+
+    def expected_duration(
+        self,
+        scenario: Scenario,
+        query: str,
+        *,
+        exclude_run_id: str | None = None,
+        percentile: float = 95,
+        max_runs: int = 10,
+        min_samples: int = 20,
+    ) -> float | None:
+        """Derive the expected duration of a query from past runs.
+
+        Parameters
+        ----------
+        scenario
+            The scenario the query is run in.
+        query
+            The query string.
+        exclude_run_id
+            If given, ignore durations from this run, usually the current one.
+        percentile
+            The percentile of the past durations to use.
+        max_runs
+            The number of most recent runs to use.
+        min_samples
+            The minimum number of past durations needed for a baseline.
+
+        Returns
+        -------
+        float or None
+            The expected duration in seconds, or `None` if there is not yet
+            enough history.
+        """
+        durations = self.durations(
+            scenario, query, exclude_run_id=exclude_run_id, max_runs=max_runs
+        )
+        if len(durations) < max(min_samples, 2):
+            return None
+        return statistics.quantiles(durations, n=100, method="inclusive")[
+            min(max(round(percentile), 1), 99) - 1
+        ]
+
+    def compare_to_baseline(
+        self,
+        scenario: Scenario,
+        run_id: str,
+        queries: list[str],
+        *,
+        alpha: float = 0.01,
+        min_ratio: float = 1.2,
+        max_runs: int = 10,
+        min_samples: int = 3,
+    ) -> list[RegressionResult]:
+        """Compare the durations of a run with those of earlier runs.
+
+        A query is flagged as regressed if a one-sided Mann-Whitney U test
+        finds its current durations significantly larger than the baseline
+        at level ``alpha``, and its median slowed down by at least
+        ``min_ratio``, so that tiny but consistent slowdowns on large samples
+        are not reported.
+
+        Parameters
+        ----------
+        scenario
+            The scenario that was run.
+        run_id
+            The identifier of the run to compare.
+        queries
+            The queries to compare.
+        alpha
+            The significance level of the test.
+        min_ratio
+            The minimum ratio of current to baseline median to flag.
+        max_runs
+            The number of most recent earlier runs forming the baseline.
+        min_samples
+            The minimum number of durations needed on each side to compare a
+            query. Queries with less history are skipped.
+
+        Returns
+        -------
+        list[RegressionResult]
+            The comparison of each query that had enough history.
+        """
+        comparisons = []
+        for query in queries:
+            current = self.durations(scenario, query, run_id=run_id)
+            baseline = self.durations(
+                scenario, query, exclude_run_id=run_id, max_runs=max_runs
+            )
+            if len(current) < min_samples or len(baseline) < min_samples:
+                continue
+            _, p_value = mann_whitney_u(current, baseline)
+            baseline_median = statistics.median(baseline)
+            current_median = statistics.median(current)
+            comparisons.append(
+                RegressionResult(
+                    query=query,
+                    baseline_median=baseline_median,
+                    current_median=current_median,
+                    p_value=p_value,
+                    regressed=(
+                        p_value < alpha
+                        and current_median >= min_ratio * baseline_median
+                    ),
+                )
+            )
+        return comparisons
+
+    def record_notebook(self, result: NotebookResult) -> str:
+        """Store the cell durations of a notebook run.
+
+        Parameters
+        ----------
+        result
+            The outcome of the notebook.
+
+        Returns
+        -------
+        str
+            The identifier of the stored run.
+        """
+        run_id = uuid.uuid4().hex
+        timestamp = time.time()
+        rows = [
+            (
+                run_id,
+                timestamp,
+                self.hostname,
+                result.name,
+                cell.index,
+                self.query_hash(cell.source),
+                cell.status.value,
+                cell.duration,
+                cell.kernel_duration,
+            )
+            for cell in result.cells
+            if cell.status != CellStatus.SKIPPED
+        ]
+        with self._connect() as connection:
+            connection.executemany(
+                "INSERT INTO notebook_cells VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows
+            )
+        return run_id
+
+    def cell_durations(
+        self,
+        notebook: str,
+        cell: int,
+        source: str,
+        *,
+        run_id: str | None = None,
+        exclude_run_id: str | None = None,
+        max_runs: int = 10,
+    ) -> list[float]:
+        """Return the stored durations of successful runs of a notebook cell.
+
+        The time the kernel reports it was busy is used where known, since
+        it excludes the network between the validator and the lab.
+
+        Parameters
+        ----------
+        notebook
+            The file name of the notebook.
+        cell
+            The index of the cell in the notebook.
+        source
+            The code of the cell. Only runs of the same code are returned.
+        run_id
+            If given, only return the duration from this run.
+        exclude_run_id
+            If given, ignore the duration from this run.
+        max_runs
+            The number of most recent runs to return durations from.
+
+        Returns
+        -------
+        list[float]
+            The durations in seconds, most recent first.
+        """
+        sql = (
+            "SELECT COALESCE(kernel_duration, duration) FROM notebook_cells "
+            "WHERE hostname = ? AND notebook = ? AND cell = ? AND source_hash = ? "
+            "AND status = ? AND run_id IS NOT ?"
+        )
+        parameters: tuple = (
+            self.hostname,
+            notebook,
+            cell,
+            self.query_hash(source),
+            CellStatus.OK.value,
+            exclude_run_id,
+        )
+        if run_id is not None:
+            sql += " AND run_id = ?"
+            parameters += (run_id,)
+        sql += " ORDER BY timestamp DESC LIMIT ?"
+        with self._connect() as connection:
+            cursor = connection.execute(sql, (*parameters, max_runs))
+            return [row[0] for row in cursor]
+
+    def compare_notebook_to_baseline(
+        self,
+        result: NotebookResult,
+        run_id: str,
+        *,
+        min_ratio: float = 1.2,
+        min_seconds: float = 1.0,
+        max_runs: int = 10,
+        min_runs: int = 3,
+    ) -> list[CellRegressionResult]:
+        """Compare the cell durations of a notebook run with earlier runs.
+
+        A run has a single duration per cell, too few for a significance
+        test, so a cell is flagged as regressed if it was slower than in
+        every baseline run, by at least ``min_ratio`` times and
+        ``min_seconds`` over the baseline median. The latter keeps jitter of
+        cells that take a fraction of a second from being reported.
+
+        Parameters
+        ----------
+        result
+            The outcome of the notebook.
+        run_id
+            The identifier of the run, as returned by `record_notebook`.
+        min_ratio
+            The minimum ratio of the current duration to the baseline median
+            to flag.
+        min_seconds
+            The minimum slowdown over the baseline median to flag, in
+            seconds.
+        max_runs
+            The number of most recent earlier runs forming the baseline.
+        min_runs
+            The minimum number of baseline runs needed to compare a cell.
+            Cells with less history are skipped.
+
+        Returns
+        -------
+        list[CellRegressionResult]
+            The comparison of each cell that had enough history.
+        """
+        comparisons = []
+        for cell in result.cells:
+            current = self.cell_durations(
+                result.name, cell.index, cell.source, run_id=run_id, max_runs=1
+            )
+            baseline = self.cell_durations(
+                result.name,
+                cell.index,
+                cell.source,
+                exclude_run_id=run_id,
+                max_runs=max_runs,
+            )
+            if not current or len(baseline) < min_runs:
+                continue
+            baseline_median = statistics.median(baseline)
+            comparisons.append(
+                CellRegressionResult(
+                    notebook=result.name,
+                    cell=cell.index,
+                    source=cell.source.strip().splitlines()[0][:60],
+                    baseline_median=baseline_median,
+                    current=current[0],
+                    baseline_runs=len(baseline),
+                    regressed=(
+                        current[0] > max(baseline)
+                        and current[0] >= min_ratio * baseline_median
+                        and current[0] - baseline_median >= min_seconds
+                    ),
+                )
+            )
+        return comparisons
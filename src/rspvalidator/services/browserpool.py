@@ -0,0 +1,120 @@
+"""Pool of logged in browser contexts reused between browser tests."""
+
+import json
+import time
+from pathlib import Path
+from typing import Any
+
+from ..config import logger
+
+__all__ = ["BrowserContextPool"]
+
+
+class BrowserContextPool:
+    """A pool of logged in browser contexts that are reused between tests.
+
+    Creating a context and loading the login state into it is done once per
+    pooled context instead of once per test. Between uses a context is reset:
+    its pages are closed, which drops their session storage, its cookies are
+    put back to those of the login state, and granted permissions are
+    revoked. Local storage and caches are kept, like in a browser a user
+    keeps open.
+
+    Playwright's synchronous API can only be used from the thread that
+    started it, so contexts are not shared across threads. Tests run in
+    parallel with pytest-xdist, where every worker process has its own
+    browser and pool.
+
+    Parameters
+    ----------
+    browser
+        The Playwright browser to create the contexts in.
+    size
+        The number of contexts created up front.
+    storage_state
+        The Playwright storage state file with the login cookies.
+    timeout
+        The default timeout of the contexts in milliseconds.
+    """
+
+    def __init__(
+        self, browser: Any, size: int, *, storage_state: Path, timeout: float
+    ) -> None:
+        self.browser = browser
+        self.storage_state = storage_state
+        self.timeout = timeout
+        self.created = 0
+        self.acquired = 0
+        self._cookies = json.loads(storage_state.read_text()).get("cookies", [])
+        self._idle = [self._new_context() for _ in range(size)]
+        self._in_use: list[Any] = []
+
+    def _new_context(self) -> Any:
+        """Create a logged in context."""
+        context = self.browser.new_context(storage_state=self.storage_state)
+        context.set_default_timeout(self.timeout)
+        self.created += 1
+        return context
+
+    def acquire(self) -> Any:
+        """Take a logged in context out of the pool.
+
+        A new context is created if none is idle, so a test never waits for
+        another to release one.
+
+        Returns
+        -------
+        playwright.sync_api.BrowserContext
+            The context, with no pages open.
+        """
+        self.acquired += 1
+        context = self._idle.pop() if self._idle else self._new_context()
+        self._in_use.append(context)
+        return context
+
+    def release(self, context: Any) -> None:
+        """Reset a context and return it to the pool.
+
+        A context that cannot be reset, e.g. because the browser crashed, is
+        closed and replaced by a new one the next time one is needed.
+
+        Parameters
+        ----------
+        context
+            A context taken from the pool with `acquire`.
+        """
+        self._in_use.remove(context)
+        start = time.perf_counter()
+        try:
+            self._reset(context)
+        except Exception:
+            logger.exception("Could not reset browser context, discarding it")
+            try:
+                context.close()
+            except Exception:
+                logger.debug("Could not close browser context")
+            return
+        self._idle.append(context)
+        logger.debug(f"Browser context reset in {time.perf_counter() - start:.3f}s")
+
+    def _reset(self, context: Any) -> None:
+        """Put a context back to the login state."""
+        for page in list(context.pages):
+            page.close()
+        context.clear_cookies()
+        if self._cookies:
+            context.add_cookies(self._cookies)
+        context.clear_permissions()
+        context.set_extra_http_headers({})
+        context.set_default_timeout(self.timeout)
+
+    def close(self) -> None:
+        """Close every context of the pool."""
+        for context in self._idle + self._in_use:
+            context.close()
+        self._idle.clear()
+        self._in_use.clear()
+        logger.info(
+            f"Browser context pool created {self.created} contexts for "
+            f"{self.acquired} tests"
+        )
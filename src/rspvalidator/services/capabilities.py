@@ -0,0 +1,284 @@
+"""Render the expected VOSI capabilities of a TAP app and compare them."""
+
+import functools
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+
+from jinja2 import Environment, FileSystemLoader, Template
+from lxml import etree
+
+from ..models.tap import CapabilityDifference
+
+__all__ = ["CapabilitiesService"]
+
+_XSI_TYPE = "{http://www.w3.org/2001/XMLSchema-instance}type"
+
+# Attributes that tell apart sibling elements of the same name, in the order
+# they are shown in paths
+_KEY_ATTRIBUTES = ("standardID", _XSI_TYPE, "role", "version", "use", "ivo-id")
+
+# Child elements whose text tells apart sibling elements of the same name,
+# e.g. the name of a language or the form of a language feature
+_KEY_CHILDREN = ("name", "form", "mime")
+
+_PARSER = etree.XMLParser(
+    remove_blank_text=True,
+    remove_comments=True,
+    remove_pis=True,
+    resolve_entities=False,
+    no_network=True,
+)
+
+
+@dataclass(frozen=True)
+class _Node:
+    """An element of a capabilities document, in a canonical form."""
+
+    tag: str
+    """The element's local name."""
+    label: str
+    """The element's name and identifying attributes, used to pair it."""
+    own: str
+    """The element's name, attributes and text."""
+    canonical: str
+    """The element's own part and those of its children, sorted."""
+    children: tuple["_Node", ...]
+
+
+def _attribute_value(element: etree._Element, name: str, value: str) -> str:
+    """Return an attribute value with any QName prefix resolved."""
+    if name != _XSI_TYPE or ":" not in value:
+        return value
+    prefix, localname = value.split(":", 1)
+    namespace = element.nsmap.get(prefix)
+    return f"{{{namespace}}}{localname}" if namespace else value
+
+
+def _node(element: etree._Element) -> _Node:
+    """Convert an element and its descendants to canonical nodes.
+
+    Namespaces are compared by URI rather than prefix, whitespace around
+    text is ignored, and children are compared regardless of their order.
+    """
+    tag = etree.QName(element).localname
+    attributes = {
+        name: _attribute_value(element, name, value)
+        for name, value in element.attrib.items()
+    }
+    text = (element.text or "").strip()
+    own = " ".join(
+        [tag]
+        + [
+            f'{etree.QName(name).localname}="{value}"'
+            for name, value in sorted(attributes.items())
+        ]
+    ) + (f": {text}" if text else "")
+
+    children = tuple(_node(child) for child in element.iterchildren(etree.Element))
+    keys = [
+        attributes[name].rsplit("}", 1)[-1]
+        for name in _KEY_ATTRIBUTES
+        if name in attributes
+    ]
+    keys += [
+        (child.text or "").strip()
+        for child in element.iterchildren(etree.Element)
+        if etree.QName(child).localname in _KEY_CHILDREN
+    ]
+    label = f"{tag}[{', '.join(keys)}]" if keys else tag
+    canonical = (
+        f"<{etree.QName(element).text} {own}>"
+        + "".join(sorted(child.canonical for child in children))
+        + "</>"
+    )
+    return _Node(tag, label, own, canonical, children)
+
+
+def _unmatched(nodes: tuple[_Node, ...], others: tuple[_Node, ...]) -> list[_Node]:
+    """Return the nodes that have no identical counterpart among the others."""
+    counts = Counter(other.canonical for other in others)
+    unmatched = []
+    for node in nodes:
+        if counts[node.canonical]:
+            counts[node.canonical] -= 1
+        else:
+            unmatched.append(node)
+    return unmatched
+
+
+def _diff(
+    expected: _Node, actual: _Node, path: str, differences: list[CapabilityDifference]
+) -> None:
+    """Add the differences between two paired nodes to a list."""
+    if expected.own != actual.own:
+        differences.append(
+            CapabilityDifference("changed", path, expected.own, actual.own)
+        )
+    missing = _unmatched(expected.children, actual.children)
+    unexpected = _unmatched(actual.children, expected.children)
+
+    # Pair the remaining children, first by label and then by name, and look
+    # for differences inside them, so that a changed attribute deep in an
+    # interface is reported there rather than as a whole missing and a whole
+    # unexpected capability
+    for key in (lambda n: n.label, lambda n: n.tag):
+        for node in list(missing):
+            match = next((n for n in unexpected if key(n) == key(node)), None)
+            if match is not None:
+                missing.remove(node)
+                unexpected.remove(match)
+                _diff(node, match, f"{path}/{node.label}", differences)
+    differences.extend(
+        CapabilityDifference("missing", f"{path}/{node.label}", expected=node.own)
+        for node in missing
+    )
+    differences.extend(
+        CapabilityDifference("unexpected", f"{path}/{node.label}", actual=node.own)
+        for node in unexpected
+    )
+
+
+@functools.cache
+def _template() -> Template:
+    """Load and compile the capabilities template once."""
+    templates_dir = Path(__file__).parent.parent / "templates"
+    environment = Environment(  # noqa: S701
+        loader=FileSystemLoader(templates_dir),
+        trim_blocks=True,
+        lstrip_blocks=True,
+    )
+    return environment.get_template("capabilities.xml")
+
+
+@functools.lru_cache(maxsize=128)
+def _expected_node(
+    base_url: str,
+    app: str,
+    include_datamodel: bool,  # noqa: FBT001
+    include_geometry: bool,  # noqa: FBT001
+    include_upload: bool,  # noqa: FBT001
+) -> _Node:
+    """Parse the expected capabilities once per deployment and app."""
+    document = CapabilitiesService.render(
+        base_url,
+        app,
+        include_datamodel=include_datamodel,
+        include_geometry=include_geometry,
+        include_upload=include_upload,
+    )
+    return _node(etree.fromstring(document, _PARSER))  # noqa: S320
+
+
+class CapabilitiesService:
+    """Service class for the VOSI capabilities of TAP apps."""
+
+    def __init__(self) -> None:
+        pass
+
+    @staticmethod
+    @functools.lru_cache(maxsize=128)
+    def render(
+        base_url: str,
+        app: str,
+        *,
+        include_datamodel: bool = False,
+        include_geometry: bool = False,
+        include_upload: bool = False,
+    ) -> bytes:
+        """Render the capabilities an app is expected to have.
+
+        The rendered document is cached, since it only depends on the
+        arguments.
+
+        Parameters
+        ----------
+        base_url
+            The base URL of the platform.
+        app
+            The application name.
+        include_datamodel
+            Whether to include the Obscore datamodel in the capabilities.
+        include_geometry
+            Whether to include the additional ADQL geometry in the
+            capabilities.
+        include_upload
+            Whether to include TAP_UPLOAD in the capabilities.
+
+        Returns
+        -------
+        bytes
+            The capabilities XML.
+        """
+        return (
+            _template()
+            .render(
+                BASE_URL=base_url,
+                app=app,
+                include_datamodel=include_datamodel,
+                include_geometry=include_geometry,
+                include_upload=include_upload,
+            )
+            .encode()
+        )
+
+    @staticmethod
+    def compare(
+        actual: bytes,
+        base_url: str,
+        app: str,
+        *,
+        include_datamodel: bool = False,
+        include_geometry: bool = False,
+        include_upload: bool = False,
+    ) -> list[CapabilityDifference]:
+        """Compare a capabilities document to the expected one.
+
+        The documents are compared as trees, regardless of the order of
+        sibling elements, of namespace prefixes and of whitespace. Elements
+        that differ are paired by name and identifying attributes, such as a
+        capability's ``standardID`` or an interface's type, role and
+        version, so that differences are reported at the deepest node that
+        differs. The parsed expected document is cached.
+
+        Parameters
+        ----------
+        actual
+            The capabilities XML returned by the service.
+        base_url
+            The base URL of the platform.
+        app
+            The application name.
+        include_datamodel
+            Whether to expect the Obscore datamodel in the capabilities.
+        include_geometry
+            Whether to expect the additional ADQL geometry in the
+            capabilities.
+        include_upload
+            Whether to expect TAP_UPLOAD in the capabilities.
+
+        Returns
+        -------
+        list[CapabilityDifference]
+            The differences, empty if the documents are equivalent.
+
+        Raises
+        ------
+        lxml.etree.XMLSyntaxError
+            If the actual document is not well-formed.
+        """
+        expected = _expected_node(
+            base_url, app, include_datamodel, include_geometry, include_upload
+        )
+        actual_node = _node(etree.fromstring(actual, _PARSER))  # noqa: S320
+        if expected.canonical == actual_node.canonical:
+            return []
+        if expected.label != actual_node.label:
+            return [
+                CapabilityDifference(
+                    "changed", actual_node.label, expected.own, actual_node.own
+                )
+            ]
+        differences: list[CapabilityDifference] = []
+        _diff(expected, actual_node, expected.label, differences)
+        return differences
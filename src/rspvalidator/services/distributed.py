@@ -0,0 +1,433 @@
+"""Coordinator and workers for running TAP load tests across processes.
+
+A scenario's users are split across local worker processes and/or remote
+workers. Remote workers are started with::
+
+    WORKER_SECRET=... python -m rspvalidator.services.distributed --port 9876
+
+and read the authentication token from their own ``TOKEN`` environment
+variable, so it is never sent over the wire. A worker runs the queries of
+any job it accepts with that token, so it listens on the loopback interface
+by default and only accepts jobs signed with the shared ``WORKER_SECRET``.
+Reach it through an SSH tunnel, e.g. ``ssh -L 9876:localhost:9876 host``,
+rather than binding it to a public interface: the protocol is not
+encrypted.
+
+The protocol is newline-delimited JSON over TCP. The worker sends a
+``challenge`` message with a random nonce, and the coordinator replies with
+a single job message carrying the HMAC-SHA256 of the nonce and the job under
+the shared secret, so a signature cannot be replayed with other queries. The
+worker then replies with one ``result`` message per query
+execution, an ``error`` message if the job failed, and a final ``done``
+message.
+"""
+
+import argparse
+import hmac
+import json
+import multiprocessing
+import queue
+import secrets
+import socket
+import socketserver
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import asdict
+from multiprocessing.process import BaseProcess
+from typing import Any
+
+from ..config import logger, settings
+from ..factories.tap_factory import TAPFactory
+from ..models.tap import QueryMode, QueryResult, QueryResultBatch
+from ..models.test import DistributedReport, Scenario
+from ..utils.histogram import LatencyRecorder
+from .tap import TAPOperationsService, TAPQueryRunnerService
+
+__all__ = ["DistributedRunner", "WorkerServer"]
+
+DEFAULT_PORT = 9876
+
+# How often the coordinator checks that workers are alive while waiting
+_POLL_INTERVAL = 1.0
+
+# TCP keepalive of connections to remote workers, so that a worker whose host
+# went away is noticed: idle time, probe interval and probe count
+_KEEPALIVE = {"TCP_KEEPIDLE": 30, "TCP_KEEPINTVL": 10, "TCP_KEEPCNT": 3}
+
+# How long a worker waits for the job after sending its challenge, and the
+# largest job message it reads
+_JOB_TIMEOUT = 30.0
+_MAX_JOB_BYTES = 16 * 1024 * 1024
+
+
+def _split_users(users: int, parts: int) -> list[int]:
+    """Split a number of users as evenly as possible into parts."""
+    share, remainder = divmod(users, parts)
+    return [share + (1 if i < remainder else 0) for i in range(parts)]
+
+
+def _parse_address(address: str) -> tuple[str, int]:
+    """Parse a ``host:port`` worker address."""
+    host, _, port = address.rpartition(":")
+    if not host:
+        return port, DEFAULT_PORT
+    return host, int(port)
+
+
+def _sign(secret: str, nonce: str, job: dict[str, Any]) -> str:
+    """Return the signature of a job for a worker's challenge nonce.
+
+    The signature covers the canonical JSON of the job, without its ``auth``
+    member, so that it is only valid for that job.
+    """
+    body = {key: value for key, value in job.items() if key != "auth"}
+    message = f"{nonce}\n{json.dumps(body, sort_keys=True)}"
+    return hmac.new(secret.encode(), message.encode(), "sha256").hexdigest()
+
+
+def _run_job(job: dict[str, Any], emit: Callable[[dict[str, Any]], None]) -> None:
+    """Run a load job and emit its results as protocol messages.
+
+    Parameters
+    ----------
+    job
+        The job message, with the app, query mode, queries and one start
+        time per user.
+    emit
+        The function used to send each message back to the coordinator.
+    """
+
+    def _run_user(client: Any, start_time: float) -> None:
+        time.sleep(max(start_time - time.time(), 0))
+        for data in job["queries"]:
+            result = TAPQueryRunnerService.run_query_test(client, data, mode)
+            emit({"type": "result", "result": asdict(result)})
+
+    clients: list[Any] = []
+    try:
+        # The clients are made as for a run in a single process, with the
+        # worker's own pool options
+        users = len(job["start_times"])
+        if settings.tap_session_per_user:
+            clients = TAPFactory.make_clients(
+                settings.token, job["app"], users, **settings.tap_pool_options
+            )
+        else:
+            clients = [
+                TAPFactory.make_client(
+                    auth_token=settings.token,
+                    app=job["app"],
+                    **settings.tap_pool_options,
+                )
+            ]
+        mode = QueryMode(job["mode"])
+        with ThreadPoolExecutor(max_workers=users) as executor:
+            futures = [
+                executor.submit(_run_user, clients[user % len(clients)], start_time)
+                for user, start_time in enumerate(job["start_times"])
+            ]
+            for future in as_completed(futures):
+                future.result()
+    except Exception as e:
+        logger.exception(f"Load job failed: {e!s}")
+        emit({"type": "error", "message": f"{type(e).__name__}: {e!s}"})
+    finally:
+        for client in clients:
+            TAPOperationsService.close_client(client)
+        emit({"type": "done"})
+
+
+def _run_local_worker(worker: int, job: dict[str, Any], messages: Any) -> None:
+    """Entry point of a local worker process."""
+    _run_job(job, lambda message: messages.put({**message, "worker": worker}))
+
+
+def _run_remote_worker(
+    worker: int,
+    address: str,
+    job: dict[str, Any],
+    messages: Any,
+    timeout: float,
+    secret: str,
+) -> None:
+    """Send a job to a remote worker and relay its messages."""
+
+    def put(message: dict[str, Any]) -> None:
+        messages.put({**message, "worker": worker})
+
+    try:
+        host, port = _parse_address(address)
+        with socket.create_connection((host, port), timeout=timeout) as sock:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+            for option, value in _KEEPALIVE.items():
+                if hasattr(socket, option):
+                    sock.setsockopt(socket.IPPROTO_TCP, getattr(socket, option), value)
+            with sock.makefile("r", encoding="utf-8") as stream:
+                challenge = json.loads(stream.readline())
+                sock.settimeout(None)
+                signed = {**job, "auth": _sign(secret, challenge["nonce"], job)}
+                sock.sendall((json.dumps(signed) + "\n").encode())
+                for line in stream:
+                    message = json.loads(line)
+                    put(message)
+                    if message["type"] == "done":
+                        return
+        put({"type": "error", "message": f"{address}: connection closed"})
+    except Exception as e:
+        put({"type": "error", "message": f"{address}: {e!s}"})
+    put({"type": "done"})
+
+
+def _collect_messages(
+    messages: Any,
+    report: DistributedReport,
+    recorder: LatencyRecorder | None,
+    workers: dict[int, tuple[str, BaseProcess | threading.Thread]],
+) -> None:
+    """Gather worker messages into a report until every worker is done.
+
+    A worker that exits without saying it is done is recorded as an error
+    instead of being waited for.
+
+    Parameters
+    ----------
+    messages
+        The queue the workers' messages arrive on.
+    report
+        The report to add the results and errors to.
+    recorder
+        If given, the execution duration of every result is recorded in it.
+    workers
+        The name and the process or relaying thread of each worker, keyed by
+        the worker index its messages are tagged with.
+    """
+    pending = dict(workers)
+    while pending:
+        try:
+            message = messages.get(timeout=_POLL_INTERVAL)
+        except queue.Empty:
+            for worker, (name, runner) in list(pending.items()):
+                if not runner.is_alive():
+                    exitcode = getattr(runner, "exitcode", None)
+                    status = "" if exitcode is None else f" with exit code {exitcode}"
+                    report.errors.append(f"{name}: exited{status} before finishing")
+                    del pending[worker]
+            continue
+        if message["type"] == "result":
+            result = QueryResult(**message["result"])
+            if recorder is not None:
+                recorder.record(result.query, result.execution_duration)
+            report.results.append(result)
+        elif message["type"] == "error":
+            report.errors.append(message["message"])
+        elif message["type"] == "done":
+            pending.pop(message["worker"], None)
+
+
+class _WorkerRequestHandler(socketserver.StreamRequestHandler):
+    """Run the job sent by a coordinator and stream back the results."""
+
+    server: "WorkerServer"
+
+    def handle(self) -> None:
+        lock = threading.Lock()
+
+        def emit(message: dict[str, Any]) -> None:
+            with lock:
+                self.wfile.write((json.dumps(message) + "\n").encode())
+                self.wfile.flush()
+
+        nonce = secrets.token_hex(16)
+        emit({"type": "challenge", "nonce": nonce})
+
+        # A client that never sends its job, or sends an endless line, must
+        # not hold the worker's thread
+        self.request.settimeout(_JOB_TIMEOUT)
+        try:
+            line = self.rfile.readline(_MAX_JOB_BYTES + 1)
+        except TimeoutError:
+            logger.warning(f"No job received from {self.client_address[0]}")
+            return
+        self.request.settimeout(None)
+        if len(line) > _MAX_JOB_BYTES:
+            logger.warning(f"Rejected an oversized job from {self.client_address[0]}")
+            emit({"type": "error", "message": "Job too large"})
+            emit({"type": "done"})
+            return
+
+        job = json.loads(line) if line.strip() else {}
+        if not hmac.compare_digest(
+            str(job.get("auth", "")), _sign(self.server.secret, nonce, job)
+        ):
+            logger.warning(
+                f"Rejected a job with a bad signature from {self.client_address[0]}"
+            )
+            emit({"type": "error", "message": "Job signature rejected"})
+            emit({"type": "done"})
+            return
+        logger.info(
+            f"Running {len(job['start_times'])} users of {job['app']} "
+            f"{job['mode']} load for {self.client_address[0]}"
+        )
+        _run_job(job, emit)
+
+
+class WorkerServer(socketserver.ThreadingTCPServer):
+    """TCP server that runs load jobs sent by a remote coordinator.
+
+    Parameters
+    ----------
+    address
+        The host and port to listen on.
+    secret
+        The secret shared with the coordinators, which jobs must be signed
+        with.
+
+    Raises
+    ------
+    ValueError
+        If the secret is empty.
+    """
+
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, address: tuple[str, int], secret: str) -> None:
+        if not secret:
+            raise ValueError("A worker needs a secret to accept jobs")
+        self.secret = secret
+        super().__init__(address, _WorkerRequestHandler)
+
+
+class DistributedRunner:
+    """Coordinator that splits a scenario's users across workers."""
+
+    def __init__(self) -> None:
+        pass
+
+    @staticmethod
+    def run(
+        scenario: Scenario,
+        queries: list[dict[str, Any]],
+        *,
+        local_workers: int = 0,
+        remote_workers: list[str] | None = None,
+        start_delay: float = 5.0,
+        ramp_up: float = 0.0,
+        recorder: LatencyRecorder | None = None,
+        connect_timeout: float = 30.0,
+        secret: str | None = None,
+    ) -> DistributedReport:
+        """
+        Run a closed-loop scenario across local processes and remote workers.
+
+        Every user is given an absolute wall-clock start time, so users
+        across all workers start together, or staggered evenly over
+        ``ramp_up`` seconds, however long the workers took to start. Remote
+        workers should have their clocks synchronised, e.g. with NTP.
+
+        Parameters
+        ----------
+        scenario
+            The scenario to run. Its users are split across the workers.
+        queries
+            The queries each user runs in turn.
+        local_workers
+            The number of local worker processes.
+        remote_workers
+            The ``host:port`` addresses of remote workers.
+        start_delay
+            The time in seconds allowed for workers to start before the
+            first user begins.
+        ramp_up
+            The time in seconds over which users are started.
+        recorder
+            If given, the execution duration of every query is recorded in
+            it as results arrive.
+        connect_timeout
+            The timeout in seconds for connecting to remote workers.
+        secret
+            The secret shared with the remote workers, by default
+            ``WORKER_SECRET``.
+
+        Returns
+        -------
+        DistributedReport
+            The merged results of all workers.
+
+        Raises
+        ------
+        ValueError
+            If no workers are given, or remote workers without a secret.
+        """
+        workers = ["local"] * local_workers + list(remote_workers or [])
+        if not workers:
+            raise ValueError("At least one worker is required")
+        secret = secret or settings.worker_secret
+        if remote_workers and not secret:
+            raise ValueError("WORKER_SECRET is required to use remote workers")
+        shares = _split_users(scenario.users, len(workers))
+
+        start = time.time() + start_delay
+        context = multiprocessing.get_context("spawn")
+        messages = context.Queue()
+        runners: dict[int, tuple[str, BaseProcess | threading.Thread]] = {}
+        user_index = 0
+        for index, (worker, share) in enumerate(zip(workers, shares, strict=True)):
+            if share == 0:
+                continue
+            job = {
+                "app": scenario.app.value,
+                "mode": scenario.mode.value,
+                "queries": queries,
+                "start_times": [
+                    start + ramp_up * (user_index + i) / scenario.users
+                    for i in range(share)
+                ],
+            }
+            user_index += share
+            runner: BaseProcess | threading.Thread
+            if worker == "local":
+                runner = context.Process(
+                    target=_run_local_worker, args=(index, job, messages), daemon=True
+                )
+            else:
+                runner = threading.Thread(
+                    target=_run_remote_worker,
+                    args=(index, worker, job, messages, connect_timeout, secret),
+                    daemon=True,
+                )
+            runner.start()
+            runners[index] = (f"{worker} worker {index}", runner)
+
+        report = DistributedReport(
+            workers=len(runners),
+            results=QueryResultBatch(spill_rows=settings.load_results_spill),
+        )
+        _collect_messages(messages, report, recorder, runners)
+
+        for _, runner in runners.values():
+            runner.join()
+        return report
+
+
+def main() -> None:
+    """Run a remote load worker until interrupted."""
+    parser = argparse.ArgumentParser(description="Run a TAP load test worker.")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to bind to")
+    parser.add_argument(
+        "--port", type=int, default=DEFAULT_PORT, help="Port to listen on"
+    )
+    args = parser.parse_args()
+    if not settings.worker_secret:
+        parser.error("WORKER_SECRET must be set to the coordinator's secret")
+
+    with WorkerServer((args.host, args.port), settings.worker_secret) as server:
+        logger.info(f"Load worker listening on {args.host}:{args.port}")
+        server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
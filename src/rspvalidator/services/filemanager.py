@@ -1,16 +1,59 @@
-"""Provide utility methods for configuration files."""
+"""Provide utility methods for configuration files and downloads.
 
+Downloads are streamed to a ``.part`` file next to their destination, which
+is resumed with an HTTP range request if the download is interrupted, and
+renamed into place only once it is complete and its SHA-256 matches. The
+digest of each completed download is kept in a ``.sha256`` file, so a file
+that was truncated or corrupted later is fetched again rather than used. A
+lock file keeps parallel test processes from downloading the same file at
+the same time.
+"""
+
+import fcntl
+import hashlib
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
 from pathlib import Path
 
 import requests
 
-from ..exceptions import FileSizeError
+from ..config import logger
+from ..exceptions import ChecksumError, FileSizeError
 
 __all__ = ["FileManagerService"]
 
+# Size of the chunks downloads are written and hashed in
+CHUNK_SIZE = 64 * 1024
+
+
+def _sha256(path: Path) -> str:
+    """Return the SHA-256 of a file."""
+    digest = hashlib.sha256()
+    with path.open("rb") as file:
+        while chunk := file.read(CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _sidecar(path: Path, suffix: str) -> Path:
+    """Return the path of a file kept next to a download."""
+    return path.with_name(f"{path.name}{suffix}")
+
+
+@contextmanager
+def _locked(path: Path) -> Iterator[None]:
+    """Hold an exclusive lock on a download while it is checked or made."""
+    with _sidecar(path, ".lock").open("w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
 
 class FileManagerService:
-    """A class that provides utility methods for reading onfiguration
+    """A class that provides utility methods for reading configuration
     files.
     """
 
@@ -27,43 +70,50 @@ class FileManagerService:
         FileNotFoundError
             If the auth.json file is not found in the user's home directory.
         """
-        from ..config import AUTH_FILE
+        from ..config import settings
 
-        auth_file_path = Path(AUTH_FILE).expanduser().resolve()
-
-        if not auth_file_path.exists():
-            raise FileNotFoundError(
-                f"Error: The file 'auth.json' was not found "
-                f"in the home directory: {auth_file_path!s}"
-            )
+        # The setting checks that the file exists when it is first read
+        _ = settings.auth_file
 
     @staticmethod
-    def file_exists_and_valid(
-        file_path: Path, min_size_bytes: int = 15_000_000
+    def is_complete(
+        file_path: Path, *, sha256: str | None = None, min_size_bytes: int = 0
     ) -> bool:
         """
-        Check if a file exists and meets the minimum size requirement.
+        Check that a downloaded file is complete and unchanged.
 
-        Args:
-            file_path (Path): The path to the file.
-            min_size_bytes (int): The minimum file size in bytes (default:
-            15MB).
+        Parameters
+        ----------
+        file_path
+            The path to the file.
+        sha256
+            The expected SHA-256 of the file. Without it, the file must
+            match the digest recorded when it was downloaded.
+        min_size_bytes
+            The minimum size of the file in bytes.
 
         Returns
         -------
-            bool: True if the file exists and is valid, False otherwise.
+        bool
+            Whether the file can be used as it is.
         """
-        if file_path.exists() and file_path.is_file():
-            if file_path.stat().st_size >= min_size_bytes:
-                return True
-            else:
-                raise FileSizeError(f"File {file_path} is smaller than expected.")
-        return False
+        recorded = _sidecar(file_path, ".sha256")
+        if not file_path.is_file() or file_path.stat().st_size < min_size_bytes:
+            return False
+        expected = sha256 or (recorded.read_text().strip() if recorded.exists() else "")
+        return bool(expected) and _sha256(file_path) == expected.lower()
 
     @staticmethod
-    def download_file(url: str, file_path: Path) -> None:
+    def download_file(
+        url: str,
+        file_path: Path,
+        *,
+        sha256: str | None = None,
+        min_size_bytes: int = 15_000_000,
+        attempts: int = 3,
+    ) -> None:
         """
-        Download a file from a given URL.
+        Download a file from a given URL, unless it is already downloaded.
 
         Parameters
         ----------
@@ -71,12 +121,162 @@ class FileManagerService:
             The URL to download the file from.
         file_path
             The path to save the file to.
+        sha256
+            The expected SHA-256 of the file, if it is pinned.
+        min_size_bytes
+            The minimum size of the file in bytes (default: 15MB).
+        attempts
+            The number of times to try downloading the file, each resuming
+            where the previous one stopped.
+
+        Raises
+        ------
+        ChecksumError
+            If the downloaded file does not match ``sha256``.
+        FileSizeError
+            If the downloaded file is smaller than expected.
+        requests.RequestException
+            If the file could not be downloaded in the given attempts.
+        """
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        with _locked(file_path):
+            if FileManagerService.is_complete(
+                file_path, sha256=sha256, min_size_bytes=min_size_bytes
+            ):
+                return
+            if file_path.exists():
+                logger.warning(f"Downloading {file_path} again, it is incomplete")
+
+            part = _sidecar(file_path, ".part")
+            start = time.perf_counter()
+            for attempt in range(1, attempts + 1):
+                try:
+                    FileManagerService._fetch(url, part)
+                    break
+                except requests.RequestException as e:
+                    if attempt == attempts:
+                        raise
+                    logger.warning(f"Download of {url} failed, resuming: {e}")
 
+            size = part.stat().st_size
+            digest = _sha256(part)
+            error: Exception | None = None
+            if size < min_size_bytes:
+                error = FileSizeError(f"File {file_path} is smaller than expected.")
+            elif sha256 and digest != sha256.lower():
+                error = ChecksumError(
+                    f"SHA-256 of {url} is {digest}, expected {sha256.lower()}"
+                )
+            if error is not None:
+                # A wrong download would otherwise be resumed as it is
+                part.unlink()
+                _sidecar(part, ".validator").unlink(missing_ok=True)
+                raise error
+            part.replace(file_path)
+            _sidecar(file_path, ".sha256").write_text(f"{digest}\n")
+            _sidecar(part, ".validator").unlink(missing_ok=True)
+            logger.info(
+                f"Downloaded {url} ({size / 1e6:.1f}MB) in "
+                f"{time.perf_counter() - start:.1f}s"
+            )
+
+    @staticmethod
+    def _fetch(url: str, part: Path) -> None:
+        """Download a URL into a partial file, resuming what it holds.
+
+        The ETag or modification time of the first response is kept next
+        to the partial file, so a download is only resumed if the file on
+        the server has not changed since. A partial file that already holds
+        the whole file is left as it is, to be verified by the caller, and
+        one larger than the file is discarded.
+        """
+        validator = _sidecar(part, ".validator")
+        offset = part.stat().st_size if part.exists() else 0
+        headers = {}
+        if offset and validator.exists():
+            headers = {"Range": f"bytes={offset}-", "If-Range": validator.read_text()}
+
+        with requests.get(url, headers=headers, stream=True, timeout=120) as response:
+            if (
+                headers
+                and response.status_code
+                == requests.codes.requested_range_not_satisfiable
+            ):
+                # The partial file already holds the whole file, unless the
+                # server reports a different size for it
+                total = response.headers.get("Content-Range", "").rpartition("/")[2]
+                if not total.isdigit() or int(total) == offset:
+                    logger.info(f"Download of {url} is already complete")
+                    return
+                # Resuming it would fail the same way on every attempt
+                logger.warning(
+                    f"Partial download of {url} has {offset} bytes but the file "
+                    f"has {total}, downloading it again"
+                )
+                response.close()
+                part.unlink()
+                validator.unlink(missing_ok=True)
+                FileManagerService._fetch(url, part)
+                return
+            response.raise_for_status()
+            resumed = response.status_code == requests.codes.partial_content
+            if resumed:
+                logger.info(f"Resuming download of {url} from byte {offset}")
+            else:
+                tag = response.headers.get("ETag") or response.headers.get(
+                    "Last-Modified"
+                )
+                if tag:
+                    validator.write_text(tag)
+                else:
+                    validator.unlink(missing_ok=True)
+            with part.open("ab" if resumed else "wb") as file:
+                for chunk in response.iter_content(CHUNK_SIZE):
+                    file.write(chunk)
+
+            # A connection closed early ends the body without an error
+            length = response.headers.get("Content-Length")
+            expected = (offset if resumed else 0) + int(length) if length else None
+            if expected is not None and part.stat().st_size != expected:
+                raise requests.ConnectionError(
+                    f"Download of {url} stopped at byte {part.stat().st_size} "
+                    f"of {expected}"
+                )
+
+    @staticmethod
+    def cached_download(
+        url: str,
+        name: str,
+        *,
+        cache_dir: Path | None = None,
+        sha256: str | None = None,
+        min_size_bytes: int = 0,
+    ) -> Path:
+        """
+        Download a file into the per-user cache, unless it is cached.
+
+        Parameters
+        ----------
+        url
+            The URL to download the file from.
+        name
+            The file name in the cache.
+        cache_dir
+            The cache directory, ``CACHE_DIR`` by default.
+        sha256
+            The expected SHA-256 of the file, if it is pinned.
+        min_size_bytes
+            The minimum size of the file in bytes.
+
+        Returns
+        -------
+        Path
+            The path of the cached file.
         """
-        if FileManagerService.file_exists_and_valid(file_path):
-            return
+        from ..config import settings
 
-        response = requests.get(url, timeout=120)
-        response.raise_for_status()
-        with file_path.open("wb") as file:
-            file.write(response.content)
+        path = (cache_dir or settings.cache_dir) / name
+        FileManagerService.download_file(
+            url, path, sha256=sha256, min_size_bytes=min_size_bytes
+        )
+        return path
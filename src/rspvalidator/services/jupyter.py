@@ -0,0 +1,588 @@
+"""Run notebooks on the user's Jupyter server without a browser.
+
+The client talks to the Nublado lab of the token's user over the Jupyter
+server REST API and the kernel WebSocket protocol. Each notebook gets its own
+kernel, its code cells are sent to the kernel one by one, and their outputs
+and timings are collected. Notebooks run concurrently.
+"""
+
+import asyncio
+import json
+import time
+import uuid
+from collections.abc import AsyncIterator, Iterable
+from contextlib import asynccontextmanager
+from datetime import UTC, datetime
+from types import TracebackType
+from typing import Any, Self
+from urllib.parse import quote, urlsplit
+
+import httpx
+from websockets.asyncio.client import ClientConnection, connect
+from websockets.exceptions import WebSocketException
+
+from ..config import logger
+from ..exceptions import JupyterError
+from ..models.notebook import CellOutput, CellResult, CellStatus, NotebookResult
+from .metrics import MetricsService
+
+__all__ = ["JupyterClient", "KernelConnection", "NotebookRunner"]
+
+# Version of the Jupyter messaging protocol the messages are written in
+_PROTOCOL_VERSION = "5.3"
+
+# Message types of the outputs of a cell
+_OUTPUT_TYPES = ("stream", "display_data", "execute_result", "error")
+
+
+def _timestamp(message: dict[str, Any]) -> float | None:
+    """Return the time a message was sent by the kernel, if it says."""
+    try:
+        return datetime.fromisoformat(message["header"]["date"]).timestamp()
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def _output(msg_type: str, content: dict[str, Any]) -> CellOutput:
+    """Make the output of a cell from an output message."""
+    if msg_type == "stream":
+        return CellOutput(msg_type, text=content.get("text", ""))
+    if msg_type == "error":
+        return CellOutput(
+            msg_type, ename=content.get("ename", ""), evalue=content.get("evalue", "")
+        )
+    return CellOutput(msg_type, data=content.get("data", {}))
+
+
+def _add_output(
+    result: CellResult,
+    msg_type: str,
+    content: dict[str, Any],
+    *,
+    clear_pending: bool,
+) -> bool:
+    """Apply an output or clear output message to the outputs of a cell.
+
+    Returns
+    -------
+    bool
+        Whether the outputs are to be cleared when the next output arrives.
+    """
+    if msg_type == "clear_output":
+        if content.get("wait"):
+            return True
+        result.outputs.clear()
+    elif msg_type in _OUTPUT_TYPES:
+        if clear_pending:
+            result.outputs.clear()
+        result.outputs.append(_output(msg_type, content))
+        if msg_type == "error":
+            result.status = CellStatus.ERROR
+    else:
+        return clear_pending
+    return False
+
+
+class KernelConnection:
+    """A WebSocket connection to a kernel, speaking the Jupyter protocol.
+
+    Parameters
+    ----------
+    websocket
+        The open WebSocket of the kernel's channels.
+    kernel_id
+        The ID of the kernel.
+    """
+
+    def __init__(self, websocket: ClientConnection, kernel_id: str) -> None:
+        self.websocket = websocket
+        self.kernel_id = kernel_id
+        self.session = uuid.uuid4().hex
+
+    async def send(
+        self, msg_type: str, content: dict[str, Any], channel: str = "shell"
+    ) -> str:
+        """Send a message to the kernel.
+
+        Returns
+        -------
+        str
+            The ID of the message, which replies refer to.
+        """
+        msg_id = uuid.uuid4().hex
+        message = {
+            "header": {
+                "msg_id": msg_id,
+                "msg_type": msg_type,
+                "session": self.session,
+                "username": "rspvalidator",
+                "date": datetime.now(UTC).isoformat(),
+                "version": _PROTOCOL_VERSION,
+            },
+            "parent_header": {},
+            "metadata": {},
+            "content": content,
+            "channel": channel,
+            "buffers": [],
+        }
+        await self.websocket.send(json.dumps(message))
+        return msg_id
+
+    async def _receive(self, msg_id: str) -> dict[str, Any]:
+        """Return the next message replying to a message.
+
+        Raises
+        ------
+        JupyterError
+            If the kernel died or restarted.
+        """
+        while True:
+            message = json.loads(await self.websocket.recv())
+            content = message.get("content", {})
+            if message.get("msg_type") == "status" and content.get(
+                "execution_state"
+            ) in ("dead", "restarting"):
+                raise JupyterError(f"Kernel {self.kernel_id} died")
+            if message.get("parent_header", {}).get("msg_id") == msg_id:
+                return message
+
+    async def wait_ready(self, timeout: float) -> None:
+        """Wait for the kernel to answer requests.
+
+        Parameters
+        ----------
+        timeout
+            The time in seconds to wait.
+
+        Raises
+        ------
+        JupyterError
+            If the kernel does not answer in time.
+        """
+        try:
+            async with asyncio.timeout(timeout):
+                while True:
+                    # A kernel that is still starting drops requests, so ask
+                    # again until it answers
+                    msg_id = await self.send("kernel_info_request", {})
+                    try:
+                        async with asyncio.timeout(1.0):
+                            while True:
+                                message = await self._receive(msg_id)
+                                if message["msg_type"] == "kernel_info_reply":
+                                    return
+                    except TimeoutError:
+                        continue
+        except TimeoutError:
+            raise JupyterError(
+                f"Kernel {self.kernel_id} did not answer in {timeout:g}s"
+            ) from None
+
+    async def execute(
+        self,
+        code: str,
+        *,
+        index: int,
+        timeout: float,
+    ) -> CellResult:
+        """Run the code of a cell and collect its outputs.
+
+        Parameters
+        ----------
+        code
+            The code to run.
+        index
+            The index of the cell in its notebook.
+        timeout
+            The time in seconds the code may run.
+
+        Returns
+        -------
+        CellResult
+            The outcome of the cell. If it timed out, the kernel is still
+            running it and should be interrupted.
+        """
+        result = CellResult(index, code, CellStatus.OK)
+        start = time.perf_counter()
+        msg_id = await self.send(
+            "execute_request",
+            {
+                "code": code,
+                "silent": False,
+                "store_history": True,
+                "user_expressions": {},
+                "allow_stdin": False,
+                "stop_on_error": True,
+            },
+        )
+        busy = idle = None
+        replied = finished = False
+        clear_pending = False
+        try:
+            async with asyncio.timeout(timeout):
+                # The cell is done once the kernel has replied on the shell
+                # channel and gone idle on the IOPub channel, in either order
+                while not (replied and finished):
+                    message = await self._receive(msg_id)
+                    msg_type = message["msg_type"]
+                    content = message.get("content", {})
+                    if msg_type == "status":
+                        if content.get("execution_state") == "busy":
+                            busy = _timestamp(message)
+                        elif content.get("execution_state") == "idle":
+                            idle = _timestamp(message)
+                            finished = True
+                    elif msg_type == "execute_reply":
+                        replied = True
+                        result.execution_count = content.get("execution_count")
+                        if content.get("status") != "ok":
+                            result.status = CellStatus.ERROR
+                    else:
+                        clear_pending = _add_output(
+                            result, msg_type, content, clear_pending=clear_pending
+                        )
+        except TimeoutError:
+            result.status = CellStatus.TIMEOUT
+        result.duration = time.perf_counter() - start
+        if busy is not None and idle is not None:
+            result.kernel_duration = idle - busy
+        return result
+
+
+class JupyterClient:
+    """Client of the Jupyter server of the token's user in Nublado.
+
+    The lab must already be running. The client is used with
+    ``async with client:``, which logs in to the lab.
+
+    Parameters
+    ----------
+    hub_url
+        The URL of the Nublado hub, e.g. ``https://data.lsst.cloud/nb``.
+    auth_token
+        The authentication token sent as a bearer token.
+    username
+        The user the token belongs to. It is looked up if not given.
+    timeout
+        The timeout in seconds for each HTTP request.
+    """
+
+    def __init__(
+        self,
+        hub_url: str,
+        auth_token: str,
+        *,
+        username: str | None = None,
+        timeout: float = 60.0,
+    ) -> None:
+        self.hub_url = hub_url.rstrip("/")
+        self.username = username
+        self.timeout = timeout
+        self._headers = {"Authorization": f"Bearer {auth_token}"}
+        self._client: httpx.AsyncClient | None = None
+
+    async def __aenter__(self) -> Self:
+        self._client = httpx.AsyncClient(
+            headers=self._headers, follow_redirects=True, timeout=self.timeout
+        )
+        try:
+            await self.login()
+        except BaseException:
+            await self._client.aclose()
+            self._client = None
+            raise
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        if self._client:
+            await self._client.aclose()
+            self._client = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """The open HTTP client.
+
+        Raises
+        ------
+        RuntimeError
+            If the client is used outside ``async with``.
+        """
+        if self._client is None:
+            raise RuntimeError("JupyterClient used outside async with")
+        return self._client
+
+    @property
+    def lab_url(self) -> str:
+        """The URL of the user's lab."""
+        if self.username is None:
+            raise RuntimeError("JupyterClient used before logging in")
+        return f"{self.hub_url}/user/{quote(self.username)}"
+
+    def _cookie(self, name: str) -> str | None:
+        """Return the value of a cookie set by the lab or the hub."""
+        return next((c.value for c in self.client.cookies.jar if c.name == name), None)
+
+    def _xsrf_headers(self) -> dict[str, str]:
+        """Return the header the lab checks requests against XSRF with."""
+        xsrf = self._cookie("_xsrf")
+        return {"X-XSRFToken": xsrf} if xsrf else {}
+
+    async def login(self) -> None:
+        """Log in to the user's lab.
+
+        Raises
+        ------
+        JupyterError
+            If the user has no running lab.
+        """
+        if self.username is None:
+            url = urlsplit(self.hub_url)
+            response = await self.client.get(
+                f"{url.scheme}://{url.netloc}/auth/api/v1/user-info"
+            )
+            response.raise_for_status()
+            self.username = response.json()["username"]
+
+        # Loading the lab runs the hub's OAuth flow, which sets the lab's
+        # session and XSRF cookies
+        response = await self.client.get(f"{self.lab_url}/lab")
+        if not str(response.url).startswith(self.lab_url):
+            raise JupyterError(
+                f"No lab is running for {self.username}, the lab redirected "
+                f"to {response.url}"
+            )
+        response.raise_for_status()
+        await self._api("GET", "status")
+
+    async def _api(self, method: str, path: str, **kwargs: Any) -> Any:
+        """Make a request to the lab's REST API and return the JSON reply."""
+        response = await self.client.request(
+            method,
+            f"{self.lab_url}/api/{path}",
+            headers=self._xsrf_headers(),
+            **kwargs,
+        )
+        response.raise_for_status()
+        return response.json() if response.content else None
+
+    async def get_notebook(self, path: str) -> dict[str, Any]:
+        """Return the content of a notebook.
+
+        Parameters
+        ----------
+        path
+            The path of the notebook, relative to the lab's root.
+
+        Returns
+        -------
+        dict[str, Any]
+            The notebook in the nbformat JSON structure.
+        """
+        model = await self._api(
+            "GET", f"contents/{quote(path)}", params={"type": "notebook"}
+        )
+        return model["content"]
+
+    async def interrupt(self, kernel_id: str) -> None:
+        """Interrupt what a kernel is running.
+
+        Parameters
+        ----------
+        kernel_id
+            The ID of the kernel.
+        """
+        await self._api("POST", f"kernels/{kernel_id}/interrupt")
+
+    @asynccontextmanager
+    async def kernel(
+        self, path: str, kernel_name: str
+    ) -> AsyncIterator[KernelConnection]:
+        """Start a kernel for a notebook and connect to it.
+
+        The kernel is shut down on exit.
+
+        Parameters
+        ----------
+        path
+            The path of the notebook, relative to the lab's root. The kernel
+            runs in the notebook's directory.
+        kernel_name
+            The name of the kernel spec.
+
+        Yields
+        ------
+        KernelConnection
+            The connection to the kernel.
+        """
+        # The lab hands out the existing session of a path, e.g. that of a
+        # notebook the user has open, so the session gets a path of its own
+        # in the notebook's directory
+        session_path = f"{path}.rspvalidator-{uuid.uuid4().hex[:8]}"
+        session = await self._api(
+            "POST",
+            "sessions",
+            json={
+                "path": session_path,
+                "name": path.rsplit("/", 1)[-1],
+                "type": "notebook",
+                "kernel": {"name": kernel_name},
+            },
+        )
+        kernel_id = session["kernel"]["id"]
+        try:
+            url = urlsplit(f"{self.lab_url}/api/kernels/{kernel_id}/channels")
+            scheme = "wss" if url.scheme == "https" else "ws"
+            cookies = "; ".join(f"{c.name}={c.value}" for c in self.client.cookies.jar)
+            headers = {**self._headers, **self._xsrf_headers(), "Cookie": cookies}
+            async with connect(
+                url._replace(scheme=scheme).geturl(),
+                additional_headers=headers,
+                max_size=None,
+                open_timeout=self.timeout,
+            ) as websocket:
+                yield KernelConnection(websocket, kernel_id)
+        finally:
+            # Deleting the session also shuts down its kernel
+            await self._api("DELETE", f"sessions/{session['id']}")
+
+
+class NotebookRunner:
+    """Run notebooks on the user's lab, concurrently and each in its kernel.
+
+    The code cells of a notebook are run in order, like "Run All Cells" in
+    JupyterLab: once a cell fails the remaining cells are skipped.
+
+    Parameters
+    ----------
+    hub_url
+        The URL of the Nublado hub.
+    auth_token
+        The authentication token.
+    kernel
+        The kernel spec the notebooks are run in. An empty string uses the
+        kernel named by each notebook's metadata.
+    concurrency
+        The number of notebooks run at the same time.
+    cell_timeout
+        The time in seconds a cell may run.
+    startup_timeout
+        The time in seconds a kernel may take to start.
+    """
+
+    def __init__(
+        self,
+        hub_url: str,
+        auth_token: str,
+        *,
+        kernel: str = "",
+        concurrency: int = 4,
+        cell_timeout: float = 600.0,
+        startup_timeout: float = 300.0,
+    ) -> None:
+        self.hub_url = hub_url
+        self.auth_token = auth_token
+        self.kernel = kernel
+        self.concurrency = concurrency
+        self.cell_timeout = cell_timeout
+        self.startup_timeout = startup_timeout
+
+    async def _run(
+        self, client: JupyterClient, path: str, semaphore: asyncio.Semaphore
+    ) -> NotebookResult:
+        """Run a notebook once a slot is free."""
+        result = NotebookResult(path, self.kernel)
+        async with semaphore:
+            try:
+                notebook = await client.get_notebook(path)
+                result.kernel = (
+                    self.kernel
+                    or notebook.get("metadata", {}).get("kernelspec", {}).get("name")
+                    or "python3"
+                )
+                start = time.perf_counter()
+                async with client.kernel(path, result.kernel) as connection:
+                    await connection.wait_ready(self.startup_timeout)
+                    result.startup = time.perf_counter() - start
+                    start = time.perf_counter()
+                    await self._run_cells(client, connection, notebook, result)
+                    result.duration = time.perf_counter() - start
+            except (JupyterError, WebSocketException, httpx.HTTPError, OSError) as e:
+                # One broken kernel should not hide the outcome of the other
+                # notebooks
+                logger.exception(f"Notebook {result.name} could not be run")
+                result.error = str(e) or type(e).__name__
+
+        MetricsService.record_notebook(result)
+        if result.error:
+            return result
+        failed = result.failed_cell
+        logger.info(
+            f"Notebook {result.name} ran {len(result.cells)} cells in "
+            f"{result.duration:.1f}s after a {result.startup:.1f}s kernel start"
+            + (f", cell {failed.index} {failed.status.value}" if failed else "")
+        )
+        return result
+
+    async def _run_cells(
+        self,
+        client: JupyterClient,
+        connection: KernelConnection,
+        notebook: dict[str, Any],
+        result: NotebookResult,
+    ) -> None:
+        """Run the code cells of a notebook, adding their outcome to a result."""
+        for index, cell in enumerate(notebook.get("cells", [])):
+            source = cell.get("source", "")
+            if not isinstance(source, str):
+                source = "".join(source)
+            if cell.get("cell_type") != "code" or not source.strip():
+                continue
+            if result.failed_cell is not None:
+                result.cells.append(CellResult(index, source, CellStatus.SKIPPED))
+                continue
+            cell_result = await connection.execute(
+                source, index=index, timeout=self.cell_timeout
+            )
+            result.cells.append(cell_result)
+            if cell_result.status == CellStatus.TIMEOUT:
+                await client.interrupt(connection.kernel_id)
+
+    async def run_async(self, paths: Iterable[str]) -> list[NotebookResult]:
+        """Run notebooks concurrently.
+
+        Parameters
+        ----------
+        paths
+            The paths of the notebooks, relative to the lab's root.
+
+        Returns
+        -------
+        list[NotebookResult]
+            The outcome of each notebook, in the order of the paths.
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+        async with JupyterClient(self.hub_url, self.auth_token) as client:
+            return await asyncio.gather(
+                *(self._run(client, path, semaphore) for path in paths)
+            )
+
+    def run(self, paths: Iterable[str]) -> dict[str, NotebookResult]:
+        """Run notebooks concurrently, from synchronous code.
+
+        Parameters
+        ----------
+        paths
+            The paths of the notebooks, relative to the lab's root.
+
+        Returns
+        -------
+        dict[str, NotebookResult]
+            The outcome of each notebook, keyed by its path.
+        """
+        results = asyncio.run(self.run_async(paths))
+        return {result.path: result for result in results}
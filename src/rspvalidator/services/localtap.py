@@ -0,0 +1,668 @@
+"""Local stand-in for the RSP TAP services, used to test the validator itself.
+
+The server speaks enough TAP, UWS and VOSI for the TAP query runners, the
+UWS job waiters and the table and capability validators to run against it
+without a Science Platform or a token. Query results are synthetic VOTables
+with as many rows as the query's ``TOP`` clause asks for, returned after an
+execution time drawn from a configurable distribution, and a configurable
+fraction of queries fail. It is started with::
+
+    python -m rspvalidator.services.localtap --port 8080 --latency 0.05
+
+and the tests pointed at it with ``HOSTNAME=127.0.0.1:8080 SCHEME=http``.
+Any bearer token is accepted.
+"""
+
+import argparse
+import base64
+import functools
+import itertools
+import math
+import random
+import re
+import socket
+import sys
+import threading
+import time
+from collections import deque
+from datetime import UTC, datetime
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Self
+from urllib.parse import parse_qs, urlsplit
+from xml.sax.saxutils import escape
+
+import numpy as np
+
+from ..config import capability_includes, logger
+from ..models.test import LatencyDistribution, LocalTAPOptions
+from .capabilities import CapabilitiesService
+
+__all__ = ["LocalTAPServer"]
+
+DEFAULT_PORT = 8080
+
+# UWS phases in which a job blocks a request with WAIT until it changes
+_ACTIVE_PHASES = ("PENDING", "QUEUED", "EXECUTING")
+
+# Longest time a request with WAIT=-1 is held
+_MAX_WAIT = 60.0
+
+# Number of the latest query execution times a server keeps, so soak runs
+# against it do not grow without bound
+_MAX_LATENCIES = 100_000
+
+# Columns returned for ``SELECT *`` and for select lists that are not plain
+# column names
+_DEFAULT_COLUMNS = (
+    ("objectId", "long"),
+    ("coord_ra", "double"),
+    ("coord_dec", "double"),
+)
+
+# Tables listed by the tables endpoint, per schema
+_TABLES = {
+    "TAP_SCHEMA": ("schemas", "tables", "columns", "keys", "key_columns"),
+    "dp02_dc2_catalogs": ("Object", "TruthSummary"),
+    "dp03_catalogs_10yr": ("SSObject", "DiaSource"),
+}
+
+_SELECT = re.compile(
+    r"^\s*SELECT\s+(?:TOP\s+(?P<top>\d+)\s+)?(?P<columns>.+?)\s+FROM\s",
+    re.IGNORECASE | re.DOTALL,
+)
+_COLUMN_NAME = re.compile(r"(?:\w+\.)*(\w+)(?:\s+AS\s+(\w+))?", re.IGNORECASE)
+
+_UWS_NAMESPACES = (
+    'xmlns:uws="http://www.ivoa.net/xml/UWS/v1.0" '
+    'xmlns:xlink="http://www.w3.org/1999/xlink" '
+    'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance"'
+)
+
+
+def _columns(query: str) -> tuple[tuple[str, str], ...]:
+    """Return the names and datatypes of the columns a query selects."""
+    match = _SELECT.match(query)
+    if match is None or match.group("columns").strip() == "*":
+        return _DEFAULT_COLUMNS
+    columns = []
+    for item in match.group("columns").split(","):
+        name = _COLUMN_NAME.fullmatch(item.strip())
+        if name is None:
+            return _DEFAULT_COLUMNS
+        column = name.group(2) or name.group(1)
+        columns.append((column, "long" if column.lower().endswith("id") else "double"))
+    return tuple(columns)
+
+
+def _row_count(query: str, default_rows: int) -> int:
+    """Return the number of rows a query returns before any MAXREC limit."""
+    match = _SELECT.match(query)
+    if match is None or match.group("top") is None:
+        return default_rows
+    return int(match.group("top"))
+
+
+@functools.lru_cache(maxsize=32)
+def _table_data(
+    columns: tuple[tuple[str, str], ...], rows: int, serialization: str
+) -> str:
+    """Serialise deterministic synthetic values of the given columns.
+
+    The data of a given shape is cached, so serving it costs little more
+    than writing it to the socket.
+    """
+    values: list[np.ndarray] = []
+    for i, (_, datatype) in enumerate(columns):
+        if datatype == "long":
+            values.append(np.arange(1, rows + 1, dtype=">i8"))
+        else:
+            step = 360.0 / (rows + i + 1)
+            values.append((np.arange(rows) * step).astype(">f8"))
+
+    if serialization == "TABLEDATA":
+        cells = [column.astype(str) for column in values]
+        body = "".join(
+            "<TR>" + "".join(f"<TD>{cell}</TD>" for cell in row) + "</TR>\n"
+            for row in zip(*cells, strict=True)
+        )
+        return f"<TABLEDATA>\n{body}</TABLEDATA>"
+    if serialization != "BINARY2":
+        raise ValueError(f"Unsupported serialization {serialization}")
+
+    dtype: list[tuple[Any, ...]] = [("nulls", "u1", (math.ceil(len(columns) / 8),))]
+    dtype += [(f"c{i}", column.dtype) for i, column in enumerate(values)]
+    table = np.zeros(rows, dtype=dtype)
+    for i, column in enumerate(values):
+        table[f"c{i}"] = column
+    stream = base64.encodebytes(table.tobytes()).decode()
+    return f'<BINARY2>\n<STREAM encoding="base64">\n{stream}</STREAM>\n</BINARY2>'
+
+
+def _votable(
+    query: str,
+    options: LocalTAPOptions,
+    maxrec: int | None = None,
+    error: str | None = None,
+) -> bytes:
+    """Build the VOTable returned for a query, or the error document."""
+    header = (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<VOTABLE version="1.4" xmlns="http://www.ivoa.net/xml/VOTable/v1.3">\n'
+        '<RESOURCE type="results">\n'
+    )
+    if error is not None:
+        return (
+            f'{header}<INFO name="QUERY_STATUS" value="ERROR">{escape(error)}'
+            "</INFO>\n</RESOURCE>\n</VOTABLE>\n"
+        ).encode()
+
+    columns = _columns(query)
+    rows = _row_count(query, options.default_rows)
+    overflow = False
+    if maxrec is not None and rows > maxrec:
+        rows, overflow = maxrec, True
+    fields = "".join(
+        f'<FIELD name="{name}" datatype="{datatype}"/>\n' for name, datatype in columns
+    )
+    data = _table_data(columns, rows, options.serialization)
+    trailer = '<INFO name="QUERY_STATUS" value="OVERFLOW"/>\n' if overflow else ""
+    return (
+        f'{header}<INFO name="QUERY_STATUS" value="OK"/>\n<TABLE>\n{fields}'
+        f"<DATA>\n{data}\n</DATA>\n</TABLE>\n{trailer}</RESOURCE>\n</VOTABLE>\n"
+    ).encode()
+
+
+def _timestamp(seconds: float | None) -> str | None:
+    """Format a ``time.time`` timestamp as a UWS date."""
+    if seconds is None:
+        return None
+    moment = datetime.fromtimestamp(seconds, UTC)
+    return moment.isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+
+class _Job:
+    """A UWS job run by the local server."""
+
+    def __init__(self, job_id: str, query: str, maxrec: int | None) -> None:
+        self.job_id = job_id
+        self.query = query
+        self.maxrec = maxrec
+        self.phase = "PENDING"
+        self.creation_time = time.time()
+        self.start_time: float | None = None
+        self.end_time: float | None = None
+        self.error: str | None = None
+        self.changed = threading.Condition()
+
+    def set_phase(self, phase: str, *, only_from: tuple[str, ...] = ()) -> bool:
+        """Move the job to a phase and wake up requests waiting on it.
+
+        Parameters
+        ----------
+        phase
+            The new phase.
+        only_from
+            If given, the phases the job must be in to change phase.
+
+        Returns
+        -------
+        bool
+            Whether the phase was changed.
+        """
+        with self.changed:
+            if only_from and self.phase not in only_from:
+                return False
+            self.phase = phase
+            if phase == "EXECUTING":
+                self.start_time = time.time()
+            elif phase not in _ACTIVE_PHASES:
+                self.end_time = time.time()
+            self.changed.notify_all()
+            return True
+
+    def wait(self, seconds: float, phase: str | None) -> None:
+        """Block until the job leaves an active phase or a timeout.
+
+        Parameters
+        ----------
+        seconds
+            The longest time to block.
+        phase
+            If given, only block while the job is in this phase.
+        """
+        with self.changed:
+            start = self.phase
+            if start not in _ACTIVE_PHASES or phase not in {None, start}:
+                return
+            self.changed.wait_for(lambda: self.phase != start, timeout=seconds)
+
+    def to_xml(self, base_url: str, app: str, version: str) -> bytes:
+        """Serialise the job as a UWS job document."""
+        times = {
+            "creationTime": _timestamp(self.creation_time),
+            "startTime": _timestamp(self.start_time),
+            "endTime": _timestamp(self.end_time),
+        }
+        elements = "".join(
+            f"<uws:{name}>{value}</uws:{name}>"
+            if value
+            else f'<uws:{name} xsi:nil="true"/>'
+            for name, value in times.items()
+        )
+        results = "<uws:results/>"
+        if self.phase == "COMPLETED":
+            href = f"{base_url}/api/{app}/results/{self.job_id}"
+            results = (
+                f'<uws:results><uws:result id="result" xlink:href="{href}"/>'
+                "</uws:results>"
+            )
+        error = ""
+        if self.error is not None:
+            error = (
+                '<uws:errorSummary type="fatal" hasDetail="false">'
+                f"<uws:message>{escape(self.error)}</uws:message></uws:errorSummary>"
+            )
+        destruction = _timestamp(self.creation_time + 7 * 24 * 3600)
+        version_attribute = f' version="{version}"' if version != "1.0" else ""
+        return (
+            f'<?xml version="1.0" encoding="UTF-8"?>\n'
+            f"<uws:job {_UWS_NAMESPACES}{version_attribute}>"
+            f"<uws:jobId>{self.job_id}</uws:jobId>"
+            "<uws:runId/><uws:ownerId>local</uws:ownerId>"
+            f"<uws:phase>{self.phase}</uws:phase>"
+            f"<uws:quote>{destruction}</uws:quote>{elements}"
+            "<uws:executionDuration>600</uws:executionDuration>"
+            f"<uws:destruction>{destruction}</uws:destruction>"
+            '<uws:parameters><uws:parameter id="LANG">ADQL</uws:parameter>'
+            f'<uws:parameter id="QUERY">{escape(self.query)}</uws:parameter>'
+            f"</uws:parameters>{results}{error}</uws:job>"
+        ).encode()
+
+
+class _TAPRequestHandler(BaseHTTPRequestHandler):
+    """Serve the TAP, UWS and VOSI endpoints of every app."""
+
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately, which Nagle's algorithm would
+    # hold up until the client's delayed ACK
+    disable_nagle_algorithm = True
+    server: "LocalTAPServer"
+
+    def do_GET(self) -> None:  # noqa: N802
+        self._dispatch("GET")
+
+    def do_POST(self) -> None:  # noqa: N802
+        self._dispatch("POST")
+
+    def do_DELETE(self) -> None:  # noqa: N802
+        self._dispatch("DELETE")
+
+    def log_message(self, format: str, *args: object) -> None:  # noqa: A002
+        # Access logs would swamp the output of a load test
+        pass
+
+    @property
+    def base_url(self) -> str:
+        """The URL of the server as seen by the client."""
+        return f"http://{self.headers.get('Host', self.server.address)}"
+
+    def _dispatch(self, method: str) -> None:
+        """Route a request to the handler of its endpoint."""
+        url = urlsplit(self.path)
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length).decode() if length else ""
+        params = {
+            key.upper(): values[-1]
+            for key, values in (
+                parse_qs(url.query) | parse_qs(body, keep_blank_values=True)
+            ).items()
+        }
+        parts = url.path.strip("/").split("/")
+        if len(parts) < 3 or parts[0] != "api":
+            self._send(HTTPStatus.NOT_FOUND, b"Not found\n", "text/plain")
+            return
+        app, endpoint, rest = parts[1], parts[2], parts[3:]
+
+        if endpoint == "capabilities" and method == "GET":
+            self._send_xml(self.server.capabilities(self.base_url, app))
+        elif endpoint == "availability" and method == "GET":
+            self._send_xml(self.server.availability())
+        elif "Authorization" not in self.headers:
+            self._send(HTTPStatus.UNAUTHORIZED, b"Unauthorized\n", "text/plain")
+        elif endpoint == "tables" and method == "GET":
+            self._send_xml(self.server.tableset())
+        elif endpoint == "sync" and method in {"GET", "POST"}:
+            self._sync(params)
+        elif endpoint == "async":
+            self._async(method, app, rest, params)
+        elif endpoint == "results" and len(rest) == 1 and method == "GET":
+            job = self.server.jobs.get(rest[0])
+            if job is None or job.phase != "COMPLETED":
+                self._send(HTTPStatus.NOT_FOUND, b"No such result\n", "text/plain")
+            else:
+                self._send_xml(_votable(job.query, self.server.options, job.maxrec))
+        else:
+            self._send(HTTPStatus.NOT_FOUND, b"Not found\n", "text/plain")
+
+    def _sync(self, params: dict[str, str]) -> None:
+        """Run a query and return its result."""
+        query = params.get("QUERY", "")
+        maxrec = int(params["MAXREC"]) if params.get("MAXREC") else None
+        latency, error = self.server.execute()
+        time.sleep(latency)
+        if error is not None:
+            document = _votable(query, self.server.options, error=error)
+            self._send_xml(document, HTTPStatus.INTERNAL_SERVER_ERROR)
+        else:
+            self._send_xml(_votable(query, self.server.options, maxrec))
+
+    def _async(
+        self, method: str, app: str, rest: list[str], params: dict[str, str]
+    ) -> None:
+        """Create UWS jobs and route requests for existing ones."""
+        jobs_url = f"{self.base_url}/api/{app}/async"
+        job = self.server.jobs.get(rest[0]) if rest else None
+        if not rest and method == "POST":
+            job = self.server.create_job(params)
+            if params.get("PHASE") == "RUN":
+                self.server.run_job(job)
+            self._redirect(f"{jobs_url}/{job.job_id}")
+        elif job is None:
+            self._send(HTTPStatus.NOT_FOUND, b"No such job\n", "text/plain")
+        elif method == "DELETE" or (
+            method == "POST" and not rest[1:] and params.get("ACTION") == "DELETE"
+        ):
+            self.server.delete_job(job)
+            self._redirect(jobs_url)
+        else:
+            self._job(method, app, job, rest[1:], params)
+
+    def _job(
+        self,
+        method: str,
+        app: str,
+        job: _Job,
+        resource: list[str],
+        params: dict[str, str],
+    ) -> None:
+        """Read a UWS job or one of its resources, or change its phase."""
+        version = self.server.options.uws_version
+        if method == "GET" and not resource:
+            if "WAIT" in params and version == "1.1":
+                wait = float(params["WAIT"])
+                job.wait(_MAX_WAIT if wait < 0 else wait, params.get("PHASE"))
+            self._send_xml(job.to_xml(self.base_url, app, version))
+        elif method == "GET" and resource == ["phase"]:
+            self._send(HTTPStatus.OK, job.phase.encode(), "text/plain")
+        elif method == "POST" and resource == ["phase"]:
+            if params.get("PHASE") == "RUN":
+                self.server.run_job(job)
+            elif params.get("PHASE") == "ABORT":
+                job.set_phase("ABORTED", only_from=_ACTIVE_PHASES)
+            self._redirect(f"{self.base_url}/api/{app}/async/{job.job_id}")
+        elif method == "GET" and resource == ["error"] and job.error is not None:
+            self._send_xml(_votable(job.query, self.server.options, error=job.error))
+        else:
+            self._send(HTTPStatus.NOT_FOUND, b"Not found\n", "text/plain")
+
+    def _redirect(self, location: str) -> None:
+        """Send a UWS See Other redirect."""
+        if self.server.options.relative_redirects:
+            location = location.removeprefix(self.base_url)
+        self.send_response(HTTPStatus.SEE_OTHER)
+        self.send_header("Location", location)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def _send_xml(self, body: bytes, status: HTTPStatus = HTTPStatus.OK) -> None:
+        """Send an XML document."""
+        self._send(status, body, "application/xml")
+
+    def _send(self, status: HTTPStatus, body: bytes, content_type: str) -> None:
+        """Send a complete response, keeping the connection open."""
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class LocalTAPServer(ThreadingHTTPServer):
+    """HTTP server standing in for the TAP services of a Science Platform.
+
+    Every app under ``/api/`` is served with the same behaviour, so the
+    ``tap`` and ``ssotap`` apps can both be pointed at it.
+
+    Parameters
+    ----------
+    address
+        The host and port to listen on. Port 0 picks a free port.
+    options
+        The latency, error rate and result format of the server.
+
+    Attributes
+    ----------
+    latencies : collections.deque[float]
+        The execution time drawn for each of the latest queries run, in
+        seconds, up to 100,000 of them.
+    """
+
+    allow_reuse_address = True
+    daemon_threads = True
+    # Load tests open many connections at once
+    request_queue_size = 1024
+
+    def __init__(
+        self, address: tuple[str, int], options: LocalTAPOptions | None = None
+    ) -> None:
+        super().__init__(address, _TAPRequestHandler)
+        self.options = options or LocalTAPOptions()
+        self.jobs: dict[str, _Job] = {}
+        self.latencies: deque[float] = deque(maxlen=_MAX_LATENCIES)
+        self._lock = threading.Lock()
+        self._random = random.Random(self.options.seed)  # noqa: S311
+        self._job_ids = itertools.count(1)
+        self._thread: threading.Thread | None = None
+
+    def handle_error(
+        self, request: socket.socket | tuple[bytes, socket.socket], client_address: Any
+    ) -> None:
+        # Clients drop idle keep-alive connections whenever they like
+        if isinstance(sys.exc_info()[1], ConnectionError):
+            return
+        super().handle_error(request, client_address)
+
+    @property
+    def address(self) -> str:
+        """The host and port the server listens on."""
+        host, port = self.server_address[:2]
+        if isinstance(host, bytes):
+            host = host.decode()
+        return f"{host}:{port}"
+
+    @property
+    def base_url(self) -> str:
+        """The base URL of the server, to use in place of ``BASE_URL``."""
+        return f"http://{self.address}"
+
+    def start(self) -> Self:
+        """Serve requests in a background thread.
+
+        Returns
+        -------
+        LocalTAPServer
+            The server itself.
+        """
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop serving requests started with `start` and close the socket."""
+        self.shutdown()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.server_close()
+
+    def execute(self) -> tuple[float, str | None]:
+        """Draw the execution time and outcome of a query.
+
+        Returns
+        -------
+        tuple[float, str or None]
+            The time in seconds the query takes to execute, and its error
+            message if it fails.
+        """
+        options = self.options
+        mean = options.latency
+        with self._lock:
+            if mean <= 0:
+                latency = 0.0
+            elif options.distribution == LatencyDistribution.UNIFORM:
+                latency = self._random.uniform(0, 2 * mean)
+            elif options.distribution == LatencyDistribution.EXPONENTIAL:
+                latency = self._random.expovariate(1 / mean)
+            elif options.distribution == LatencyDistribution.LOGNORMAL:
+                # A sigma of 1 puts the 99th percentile near 6 times the mean
+                latency = self._random.lognormvariate(math.log(mean) - 0.5, 1.0)
+            else:
+                latency = mean
+            failed = self._random.random() < options.error_rate
+            self.latencies.append(latency)
+        return latency, "Injected query failure" if failed else None
+
+    def create_job(self, params: dict[str, str]) -> _Job:
+        """Create a pending UWS job from the parameters of a request."""
+        maxrec = int(params["MAXREC"]) if params.get("MAXREC") else None
+        job = _Job(str(next(self._job_ids)), params.get("QUERY", ""), maxrec)
+        self.jobs[job.job_id] = job
+        return job
+
+    def run_job(self, job: _Job) -> None:
+        """Start running a pending job in the background."""
+        if job.set_phase("QUEUED", only_from=("PENDING",)):
+            threading.Thread(target=self._run_job, args=(job,), daemon=True).start()
+
+    def delete_job(self, job: _Job) -> None:
+        """Abort a job if it is still running and forget it."""
+        job.set_phase("ABORTED", only_from=_ACTIVE_PHASES)
+        self.jobs.pop(job.job_id, None)
+
+    def _run_job(self, job: _Job) -> None:
+        """Take a job through its phases, as the service would."""
+        time.sleep(self.options.queue_time)
+        if not job.set_phase("EXECUTING", only_from=("QUEUED",)):
+            return
+        latency, error = self.execute()
+        time.sleep(latency)
+        job.error = error
+        job.set_phase(
+            "ERROR" if error is not None else "COMPLETED", only_from=("EXECUTING",)
+        )
+
+    @staticmethod
+    def capabilities(base_url: str, app: str) -> bytes:
+        """Return the capabilities the validator expects of an app."""
+        includes = capability_includes.get(app, {})
+        return CapabilitiesService.render(base_url, app, **includes)
+
+    @staticmethod
+    def availability() -> bytes:
+        """Return the VOSI availability document."""
+        return (
+            b'<?xml version="1.0" encoding="UTF-8"?>\n'
+            b"<vosi:availability "
+            b'xmlns:vosi="http://www.ivoa.net/xml/VOSIAvailability/v1.0">'
+            b"<vosi:available>true</vosi:available>"
+            b"<vosi:note>Local TAP server is accepting queries</vosi:note>"
+            b"</vosi:availability>\n"
+        )
+
+    @staticmethod
+    def tableset() -> bytes:
+        """Return the VOSI tableset listing the known tables."""
+        schemas = "".join(
+            f"<schema><name>{schema}</name>"
+            + "".join(
+                f'<table type="table"><name>{schema}.{table}</name></table>'
+                for table in tables
+            )
+            + "</schema>"
+            for schema, tables in _TABLES.items()
+        )
+        return (
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<vosi:tableset xmlns:vosi="http://www.ivoa.net/xml/VOSITables/v1.0" '
+            'xmlns:vs="http://www.ivoa.net/xml/VODataService/v1.1">'
+            f"{schemas}</vosi:tableset>\n"
+        ).encode()
+
+
+def main() -> None:
+    """Run a local TAP server until interrupted."""
+    parser = argparse.ArgumentParser(description="Run a local stand-in TAP server.")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to bind to")
+    parser.add_argument(
+        "--port", type=int, default=DEFAULT_PORT, help="Port to listen on"
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="Mean query execution time"
+    )
+    parser.add_argument(
+        "--distribution",
+        choices=[d.value for d in LatencyDistribution],
+        default=LatencyDistribution.CONSTANT.value,
+        help="Distribution of query execution times",
+    )
+    parser.add_argument(
+        "--queue-time", type=float, default=0.0, help="Time UWS jobs spend queued"
+    )
+    parser.add_argument(
+        "--error-rate", type=float, default=0.0, help="Fraction of queries that fail"
+    )
+    parser.add_argument(
+        "--default-rows",
+        type=int,
+        default=1000,
+        help="Rows returned by queries without TOP",
+    )
+    parser.add_argument(
+        "--serialization",
+        choices=["BINARY2", "TABLEDATA"],
+        default="BINARY2",
+        help="VOTable serialization of results",
+    )
+    parser.add_argument(
+        "--uws-version",
+        choices=["1.0", "1.1"],
+        default="1.1",
+        help="UWS version, only 1.1 supports WAIT",
+    )
+    parser.add_argument(
+        "--relative-redirects",
+        action="store_true",
+        help="Redirect UWS requests with relative URLs",
+    )
+    parser.add_argument("--seed", type=int, help="Random seed")
+    args = parser.parse_args()
+
+    options = LocalTAPOptions(
+        latency=args.latency,
+        distribution=LatencyDistribution(args.distribution),
+        queue_time=args.queue_time,
+        error_rate=args.error_rate,
+        default_rows=args.default_rows,
+        serialization=args.serialization,
+        uws_version=args.uws_version,
+        relative_redirects=args.relative_redirects,
+        seed=args.seed,
+    )
+    with LocalTAPServer((args.host, args.port), options) as server:
+        logger.info(f"Local TAP server listening on {server.base_url}")
+        server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
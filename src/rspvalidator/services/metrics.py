@@ -0,0 +1,352 @@
+"""Metrics of validation runs, for dashboards and alerts.
+
+TAP query latencies and row counts, UWS phase timings, taplint findings and
+stage durations, browser step durations and readiness waits, notebook cell
+durations, snapshot mismatches and monitor check results are recorded in
+`MetricsService.registry` and exposed in the Prometheus text format. A test
+run serves them on ``/metrics`` while it runs if ``METRICS_PORT`` is set and
+writes them to ``METRICS_FILE`` when it ends, e.g. for the node_exporter
+textfile collector. The monitor serves them on its own ``/metrics``.
+"""
+
+import threading
+import time
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Self
+from urllib.parse import urlsplit
+
+from ..config import logger
+from ..models.notebook import CellStatus, NotebookResult
+from ..models.tap import QueryMode, QueryResult
+from ..models.taplint import TaplintReport
+from ..models.test import CheckResult
+from ..utils.metrics import CONTENT_TYPE, MetricsRegistry
+from .benchmarks import BenchmarkStoreService
+
+__all__ = ["MetricsServer", "MetricsService"]
+
+_registry = MetricsRegistry()
+
+# Ids of the TAP queries whose text has been logged
+_logged_queries: set[str] = set()
+
+_QUERY_DURATION = _registry.histogram(
+    "rspvalidator_tap_query_duration_seconds",
+    "Duration of TAP queries, excluding response decoding.",
+    ("app", "mode", "query_id"),
+)
+_QUERY_PHASE = _registry.histogram(
+    "rspvalidator_tap_query_phase_seconds",
+    "Time TAP queries spent in each phase, including UWS job phases.",
+    ("app", "mode", "phase"),
+)
+_QUERY_ROWS = _registry.gauge(
+    "rspvalidator_tap_query_rows",
+    "Number of rows returned by the latest run of a TAP query.",
+    ("app", "mode", "query_id"),
+)
+_QUERIES = _registry.counter(
+    "rspvalidator_tap_queries_total",
+    "Number of TAP queries run, by status.",
+    ("app", "mode", "status"),
+)
+_TAPLINT_FINDINGS = _registry.gauge(
+    "rspvalidator_taplint_findings",
+    "Number of errors and warnings reported by the latest taplint run.",
+    ("app", "severity"),
+)
+_TAPLINT_STAGE_DURATION = _registry.gauge(
+    "rspvalidator_taplint_stage_duration_seconds",
+    "Duration of each stage of the latest taplint run.",
+    ("app", "stage"),
+)
+_TAPLINT_STAGE_FINDINGS = _registry.gauge(
+    "rspvalidator_taplint_stage_findings",
+    "Number of errors and warnings of each stage of the latest taplint run.",
+    ("app", "stage", "severity"),
+)
+_BROWSER_STEP = _registry.histogram(
+    "rspvalidator_browser_step_duration_seconds",
+    "Duration of steps of browser tests.",
+    ("test", "step"),
+)
+_BROWSER_WAIT = _registry.histogram(
+    "rspvalidator_browser_wait_seconds",
+    "Time browser tests waited for a page to be ready, by readiness signal.",
+    ("test", "signal"),
+)
+_NOTEBOOK_CELL = _registry.histogram(
+    "rspvalidator_notebook_cell_duration_seconds",
+    "Duration of the cells of notebooks run through the kernel API.",
+    ("notebook", "cell"),
+)
+_NOTEBOOK_DURATION = _registry.gauge(
+    "rspvalidator_notebook_duration_seconds",
+    "Duration of the latest run of a notebook, by phase.",
+    ("notebook", "phase"),
+)
+_NOTEBOOK_PASSED = _registry.gauge(
+    "rspvalidator_notebook_passed",
+    "Whether every cell of the latest run of a notebook succeeded.",
+    ("notebook",),
+)
+_SNAPSHOT_MISMATCH = _registry.gauge(
+    "rspvalidator_snapshot_mismatch_pixels",
+    "Number of pixels that differ from the stored snapshot.",
+    ("test", "snapshot"),
+)
+_CHECK_PASSED = _registry.gauge(
+    "rspvalidator_check_passed",
+    "Whether the latest run of a monitor check passed.",
+    ("check",),
+)
+_CHECK_DURATION = _registry.gauge(
+    "rspvalidator_check_duration_seconds",
+    "Duration of the latest run of a monitor check.",
+    ("check",),
+)
+_CHECK_LAST_RUN = _registry.gauge(
+    "rspvalidator_check_last_run_timestamp_seconds",
+    "Time the latest run of a monitor check started.",
+    ("check",),
+)
+_CHECKS = _registry.counter(
+    "rspvalidator_checks_total",
+    "Number of monitor check runs, by status.",
+    ("check", "status"),
+)
+
+
+class MetricsService:
+    """Record metrics of validation runs."""
+
+    registry = _registry
+
+    def __init__(self) -> None:
+        pass
+
+    @staticmethod
+    def record_queries(
+        app: str, mode: QueryMode, results: Iterable[QueryResult], errors: int = 0
+    ) -> None:
+        """Record the results of TAP queries.
+
+        Queries are labelled with the short id of
+        `BenchmarkStoreService.query_hash` rather than their text, which is
+        logged the first time an id is recorded.
+
+        Parameters
+        ----------
+        app
+            The application name.
+        mode
+            The query mode.
+        results
+            The results of the queries.
+        errors
+            The number of queries that raised an error instead of returning
+            a result.
+        """
+        for result in results:
+            query_id = BenchmarkStoreService.query_hash(result.query)
+            if query_id not in _logged_queries:
+                _logged_queries.add(query_id)
+                logger.info(f"TAP query {query_id}: {' '.join(result.query.split())}")
+            _QUERY_DURATION.observe(
+                result.execution_duration, app=app, mode=mode.value, query_id=query_id
+            )
+            _QUERY_ROWS.set(
+                result.row_count, app=app, mode=mode.value, query_id=query_id
+            )
+            _QUERIES.inc(app=app, mode=mode.value, status=result.status)
+            for phase, seconds in result.phases.items():
+                _QUERY_PHASE.observe(seconds, app=app, mode=mode.value, phase=phase)
+        if errors:
+            _QUERIES.inc(errors, app=app, mode=mode.value, status="ERROR")
+
+    @staticmethod
+    def record_taplint(app: str, report: TaplintReport) -> None:
+        """Record the findings and stage durations of a taplint run.
+
+        Parameters
+        ----------
+        app
+            The application name.
+        report
+            The report of the run.
+        """
+        _TAPLINT_FINDINGS.set(report.errors, app=app, severity="error")
+        _TAPLINT_FINDINGS.set(report.warnings, app=app, severity="warning")
+        for stage in report.stages:
+            _TAPLINT_STAGE_DURATION.set(stage.duration, app=app, stage=stage.code)
+            _TAPLINT_STAGE_FINDINGS.set(
+                stage.errors, app=app, stage=stage.code, severity="error"
+            )
+            _TAPLINT_STAGE_FINDINGS.set(
+                stage.warnings, app=app, stage=stage.code, severity="warning"
+            )
+
+    @staticmethod
+    def record_snapshot(test: str, snapshot: str, mismatch: int) -> None:
+        """Record the comparison of a page to its stored snapshot.
+
+        Parameters
+        ----------
+        test
+            The name of the test.
+        snapshot
+            The name of the snapshot.
+        mismatch
+            The number of pixels that differ.
+        """
+        _SNAPSHOT_MISMATCH.set(mismatch, test=test, snapshot=snapshot)
+
+    @staticmethod
+    def record_wait(test: str, signal: str, seconds: float) -> None:
+        """Record how long a browser test waited for a page to be ready.
+
+        Parameters
+        ----------
+        test
+            The name of the test.
+        signal
+            The readiness signal waited for, e.g. ``firefly_rendered``.
+        seconds
+            The time waited.
+        """
+        _BROWSER_WAIT.observe(seconds, test=test, signal=signal)
+
+    @staticmethod
+    def record_notebook(result: NotebookResult) -> None:
+        """Record the run of a notebook through the kernel API.
+
+        Parameters
+        ----------
+        result
+            The outcome of the notebook.
+        """
+        for cell in result.cells:
+            if cell.status != CellStatus.SKIPPED:
+                _NOTEBOOK_CELL.observe(
+                    cell.duration, notebook=result.name, cell=cell.index
+                )
+        _NOTEBOOK_DURATION.set(result.startup, notebook=result.name, phase="startup")
+        _NOTEBOOK_DURATION.set(result.duration, notebook=result.name, phase="run")
+        _NOTEBOOK_PASSED.set(int(result.passed), notebook=result.name)
+
+    @staticmethod
+    def record_check(result: CheckResult) -> None:
+        """Record the result of a monitor check.
+
+        Parameters
+        ----------
+        result
+            The result of the check.
+        """
+        _CHECK_PASSED.set(int(result.passed), check=result.name)
+        _CHECK_DURATION.set(result.duration, check=result.name)
+        _CHECK_LAST_RUN.set(result.started, check=result.name)
+        _CHECKS.inc(check=result.name, status=result.status.value)
+
+    @staticmethod
+    @contextmanager
+    def step(test: str, step: str) -> Iterator[None]:
+        """Time a step of a browser test.
+
+        The step is only recorded if it completes.
+
+        Parameters
+        ----------
+        test
+            The name of the test.
+        step
+            The name of the step, e.g. ``search``.
+        """
+        start = time.perf_counter()
+        yield
+        duration = time.perf_counter() - start
+        _BROWSER_STEP.observe(duration, test=test, step=step)
+        logger.info(f"{test} step {step} took {duration:.3f}s")
+
+    @staticmethod
+    def render() -> str:
+        """Return every metric in the Prometheus text format."""
+        return _registry.render()
+
+    @staticmethod
+    def write(path: Path) -> None:
+        """Write every metric to a file in the Prometheus text format.
+
+        Parameters
+        ----------
+        path
+            The file to write, which is replaced atomically.
+        """
+        _registry.write(path)
+
+
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+    """Serve the metrics on ``/metrics``."""
+
+    def log_message(self, format: str, *args: object) -> None:  # noqa: A002
+        # Scrapes every few seconds would swamp the test logs
+        pass
+
+    def do_GET(self) -> None:  # noqa: N802
+        if urlsplit(self.path).path.rstrip("/") != "/metrics":
+            self.send_error(HTTPStatus.NOT_FOUND)
+            return
+        content = MetricsService.render().encode()
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+
+class MetricsServer(ThreadingHTTPServer):
+    """HTTP server for the metrics, to be scraped by Prometheus.
+
+    Parameters
+    ----------
+    address
+        The host and port to listen on. Port 0 picks a free port.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address: tuple[str, int]) -> None:
+        super().__init__(address, _MetricsRequestHandler)
+        self._thread: threading.Thread | None = None
+
+    @property
+    def address(self) -> str:
+        """The host and port the server listens on."""
+        host, port = self.server_address[:2]
+        if isinstance(host, bytes):
+            host = host.decode()
+        return f"{host}:{port}"
+
+    def start(self) -> Self:
+        """Serve requests in a background thread.
+
+        Returns
+        -------
+        MetricsServer
+            The server itself.
+        """
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop serving requests started with `start` and close the socket."""
+        self.shutdown()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.server_close()
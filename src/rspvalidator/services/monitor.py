@@ -0,0 +1,524 @@
+"""Long-running monitor that runs the validations on a schedule.
+
+Instead of paying for a fresh browser, TAP clients and STILTS download on
+every run of the test suite, and with ``STILTS_SERVER`` set for a fresh JVM
+on each taplint run, the monitor keeps them between runs, so each check only
+takes as long as the check itself. It is started with::
+
+    python -m rspvalidator.services.monitor --port 9090
+
+and serves the latest result of each check as JSON on ``/results``, on
+``/healthz`` with a 503 status if any check is not passing, and with the
+other metrics of `MetricsService` on ``/metrics``. Checks are named after
+the app and validation they run, e.g. ``tap-capabilities`` or
+``squareone-homepage``.
+"""
+
+import argparse
+import heapq
+import json
+import sys
+import threading
+import time
+from dataclasses import asdict
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Self
+from urllib.parse import urlsplit
+
+import pyvo
+
+from ..config import logger, settings
+from ..constants import STILTS_FILENAME, STILTS_MIN_SIZE, STILTS_URL
+from ..factories.tap_factory import TAPFactory
+from ..models.test import CheckResult, CheckStatus
+from ..utils.metrics import CONTENT_TYPE
+from .filemanager import FileManagerService
+from .metrics import MetricsService
+from .stilts import StiltsServer
+from .tap import TAPOperationsService
+from .taplint import TaplintOrchestrator
+from .validation import (
+    SquareOneValidationService,
+    TaplintValidationService,
+    TAPValidationService,
+)
+
+__all__ = ["MonitorDaemon"]
+
+DEFAULT_PORT = 9090
+
+# TAP apps and the checks run against each of them
+TAP_APPS = ("tap", "ssotap")
+TAP_CHECKS = ("capabilities", "tables", "uws", "taplint")
+
+
+def _result_dict(result: CheckResult) -> dict[str, Any]:
+    """Convert a check result to JSON-serializable form."""
+    return asdict(result) | {"status": result.status.value}
+
+
+class MonitorDaemon:
+    """Run validations on a schedule, reusing warm clients and browser.
+
+    The TAP clients, the browser and the STILTS jar are created the first
+    time a check needs them and kept until `close`. If a check raises an
+    error rather than failing an assertion, the resources it used are
+    discarded and created again for its next run.
+
+    Parameters
+    ----------
+    checks
+        The names of the checks to run, all of `available_checks` by
+        default.
+    interval
+        The time in seconds between the starts of two runs of a check.
+    taplint_interval
+        The time in seconds between the starts of two runs of a taplint
+        check, which takes far longer than the others.
+    base_url
+        The base URL of the platform, that of the settings by default.
+    auth_token
+        The authentication token, ``TOKEN`` by default.
+
+    Raises
+    ------
+    ValueError
+        If a check name is not known.
+    """
+
+    def __init__(
+        self,
+        checks: list[str] | None = None,
+        *,
+        interval: float = 600.0,
+        taplint_interval: float = 3600.0,
+        base_url: str | None = None,
+        auth_token: str | None = None,
+    ) -> None:
+        unknown = set(checks or []) - set(self.available_checks())
+        if unknown:
+            raise ValueError(f"Unknown checks: {', '.join(sorted(unknown))}")
+        self.checks = list(checks) if checks else self.available_checks()
+        self.interval = interval
+        self.taplint_interval = taplint_interval
+        self.results: dict[str, CheckResult] = {}
+        self._base_url = base_url
+        self._auth_token = auth_token
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._http: _MonitorHTTPServer | None = None
+        self._tap_clients: dict[str, pyvo.dal.TAPService] = {}
+        self._playwright: Any = None
+        self._browser: Any = None
+        self._context: Any = None
+        self._page: Any = None
+        self._stilts_jar: Path | None = None
+        self._stilts_server: StiltsServer | None = None
+
+    @staticmethod
+    def available_checks() -> list[str]:
+        """Return the names of all the checks the monitor can run."""
+        return [f"{app}-{check}" for app in TAP_APPS for check in TAP_CHECKS] + [
+            "squareone-homepage"
+        ]
+
+    @property
+    def base_url(self) -> str:
+        """The base URL of the platform."""
+        return self._base_url or settings.base_url
+
+    @property
+    def auth_token(self) -> str:
+        """The authentication token."""
+        return self._auth_token or settings.token
+
+    @property
+    def address(self) -> str | None:
+        """The host and port results are served on, if they are."""
+        if self._http is None:
+            return None
+        host, port = self._http.server_address[:2]
+        if isinstance(host, bytes):
+            host = host.decode()
+        return f"{host}:{port}"
+
+    def tap_client(self, app: str) -> pyvo.dal.TAPService:
+        """Return the TAP client of an app, created on first use.
+
+        Parameters
+        ----------
+        app
+            The application name.
+
+        Returns
+        -------
+        pyvo.dal.TAPService
+            The TAP client, with its connections kept open between checks.
+        """
+        if app not in self._tap_clients:
+            self._tap_clients[app] = TAPFactory.make_client(
+                auth_token=self.auth_token,
+                app=app,
+                base_url=self.base_url,
+                **settings.tap_pool_options,
+            )
+        return self._tap_clients[app]
+
+    def page(self) -> Any:
+        """Return the logged in browser page, created on first use.
+
+        Playwright's synchronous API must be used from a single thread, so
+        the page is only used by the thread that runs the checks.
+
+        Returns
+        -------
+        playwright.sync_api.Page
+            The page, in a browser kept running between checks.
+        """
+        if self._browser is None:
+            from playwright.sync_api import expect, sync_playwright
+
+            expect.set_options(timeout=settings.selector_timeout)
+            self._playwright = sync_playwright().start()
+            self._browser = self._playwright.chromium.launch(headless=settings.headless)
+        if self._page is None:
+            self._context = self._browser.new_context(storage_state=settings.auth_file)
+            self._context.set_default_timeout(settings.selector_timeout)
+            self._page = self._context.new_page()
+        return self._page
+
+    def stilts_jar(self) -> Path:
+        """Return the path to the STILTS jar, downloaded on first use."""
+        if self._stilts_jar is None:
+            self._stilts_jar = FileManagerService.cached_download(
+                STILTS_URL,
+                Path(STILTS_FILENAME).name,
+                sha256=settings.stilts_sha256,
+                min_size_bytes=STILTS_MIN_SIZE,
+            )
+        return self._stilts_jar
+
+    def stilts_server(self) -> StiltsServer | None:
+        """Return the resident STILTS server, if enabled, created on first use.
+
+        Returns
+        -------
+        StiltsServer | None
+            The server, logged in with the token, or `None` if
+            ``STILTS_SERVER`` is not set.
+        """
+        if not settings.stilts_server:
+            return None
+        if self._stilts_server is None:
+            properties = {
+                "auth.username": "x-oauth-token",
+                "auth.password": self.auth_token,
+            }
+            self._stilts_server = StiltsServer(self.stilts_jar(), properties=properties)
+        return self._stilts_server
+
+    def run_check(self, name: str) -> CheckResult:
+        """Run a check and record its result.
+
+        Parameters
+        ----------
+        name
+            The name of the check.
+
+        Returns
+        -------
+        CheckResult
+            The outcome of the check.
+        """
+        app, _, check = name.partition("-")
+        started = time.time()
+        start = time.perf_counter()
+        status, message = CheckStatus.PASSED, ""
+        try:
+            getattr(self, f"_check_{check}")(app)
+        except AssertionError as e:
+            status, message = CheckStatus.FAILED, str(e) or "Assertion failed"
+        except Exception as e:
+            status, message = CheckStatus.ERROR, f"{type(e).__name__}: {e}"
+            logger.exception(f"Check {name} raised an error")
+            self._discard(app)
+        duration = time.perf_counter() - start
+
+        with self._lock:
+            previous = self.results.get(name)
+            failures = 0
+            if status != CheckStatus.PASSED:
+                failures = 1 + (previous.consecutive_failures if previous else 0)
+            result = CheckResult(name, status, started, duration, message, failures)
+            self.results[name] = result
+        MetricsService.record_check(result)
+        logger.info(
+            f"Check {name} {status.value} in {duration:.3f}s"
+            + (f": {message}" if message else "")
+        )
+        return result
+
+    def run_once(self) -> list[CheckResult]:
+        """Run every check once, one after the other.
+
+        Returns
+        -------
+        list[CheckResult]
+            The outcome of each check.
+        """
+        return [self.run_check(name) for name in self.checks]
+
+    def latest(self) -> list[CheckResult]:
+        """Return the latest result of each check that has run."""
+        with self._lock:
+            return list(self.results.values())
+
+    def run(self) -> None:
+        """Run the checks on their schedule until `stop` is called.
+
+        Every check runs as soon as the monitor starts, and then at its
+        interval. A check that is still running when its next run is due
+        runs again as soon as it finishes, but missed runs are not made up.
+        """
+        now = time.monotonic()
+        schedule = [(now, index, name) for index, name in enumerate(self.checks)]
+        try:
+            while schedule and not self._stop.is_set():
+                due, index, name = schedule[0]
+                if self._stop.wait(max(due - time.monotonic(), 0)):
+                    break
+                heapq.heappop(schedule)
+                self.run_check(name)
+                interval = (
+                    self.taplint_interval
+                    if name.endswith("-taplint")
+                    else self.interval
+                )
+                next_due = max(due + interval, time.monotonic())
+                heapq.heappush(schedule, (next_due, index, name))
+        finally:
+            self.close()
+
+    def start(self, address: tuple[str, int] | None = None) -> Self:
+        """Run the checks in a background thread.
+
+        Parameters
+        ----------
+        address
+            The host and port to serve the results on, if any.
+
+        Returns
+        -------
+        MonitorDaemon
+            The monitor itself.
+        """
+        if address is not None:
+            self._http = _MonitorHTTPServer(address, self)
+            threading.Thread(target=self._http.serve_forever, daemon=True).start()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, daemon=True)
+        self._thread.start()
+        return self
+
+    def wait(self) -> None:
+        """Wait for the checks started with `start` to stop."""
+        # Join with a timeout so that KeyboardInterrupt is still delivered
+        while self._thread is not None and self._thread.is_alive():
+            self._thread.join(1.0)
+
+    def stop(self) -> None:
+        """Stop the checks and the results server started with `start`.
+
+        A check that is running is allowed to finish first.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._http is not None:
+            self._http.shutdown()
+            self._http.server_close()
+            self._http = None
+
+    def close(self) -> None:
+        """Close the browser, the TAP clients' connections and STILTS server."""
+        self._discard("squareone")
+        if self._stilts_server is not None:
+            self._stilts_server.close()
+            self._stilts_server = None
+        for app in list(self._tap_clients):
+            self._discard(app)
+
+    def _discard(self, app: str) -> None:
+        """Close the warm resources a check of an app uses.
+
+        The browser is closed too, since it may have crashed, and errors
+        while closing are only logged, so a broken resource cannot stop
+        the checks.
+        """
+        if app == "squareone":
+            closers = [r.close for r in (self._context, self._browser) if r]
+            if self._playwright is not None:
+                closers.append(self._playwright.stop)
+            self._playwright = self._browser = self._context = self._page = None
+        elif app in self._tap_clients:
+            client = self._tap_clients.pop(app)
+            closers = [lambda: TAPOperationsService.close_client(client)]
+        else:
+            return
+        for close in closers:
+            try:
+                close()
+            except Exception:
+                logger.exception(f"Could not close the resources of {app}")
+
+    def _check_capabilities(self, app: str) -> None:
+        """Validate the capabilities of a TAP app."""
+        url = TAPOperationsService.get_api_endpoint("capabilities", app, self.base_url)
+        session = TAPOperationsService.get_session(self.tap_client(app))
+        response = session.get(url, timeout=60)
+        response.raise_for_status()
+        TAPValidationService.validate_capabilities(
+            app,
+            actual_capabilities=response.content,
+            base_url=self.base_url,
+            **settings.capability_includes[app],
+        )
+
+    def _check_tables(self, app: str) -> None:
+        """Validate the tables of a TAP app."""
+        client = self.tap_client(app)
+        # pyvo caches the tables of a client, which would make every run
+        # after the first a no-op
+        client._tables = None  # noqa: SLF001
+        TAPValidationService(tap_client=client, app=app).validate_tables()
+
+    def _check_uws(self, app: str) -> None:
+        """Validate the UWS endpoint of a TAP app."""
+        client = self.tap_client(app)
+        TAPValidationService(tap_client=client, app=app).validate_uws_endpoint()
+
+    def _check_taplint(self, app: str) -> None:
+        """Validate a TAP app with STILTS taplint."""
+        tap_url = f"{self.base_url}/api/{app}"
+        orchestrator = TaplintOrchestrator(
+            self.stilts_jar(),
+            "x-oauth-token",
+            self.auth_token,
+            stage_groups=settings.taplint_stage_groups,
+            interactive=settings.taplint_interactive,
+            server=self.stilts_server(),
+        )
+        report = orchestrator.run({app: tap_url})[app]
+        TaplintValidationService(app=app, report=report).validate_summary()
+
+    def _check_homepage(self, app: str) -> None:
+        """Validate the squareone homepage."""
+        SquareOneValidationService(page=self.page()).validate_squareone_homepage()
+
+
+class _MonitorRequestHandler(BaseHTTPRequestHandler):
+    """Serve the latest check results of a monitor."""
+
+    server: "_MonitorHTTPServer"
+
+    def log_message(self, format: str, *args: object) -> None:  # noqa: A002
+        # Scrapes every few seconds would swamp the check logs
+        pass
+
+    def do_GET(self) -> None:  # noqa: N802
+        path = urlsplit(self.path).path.rstrip("/")
+        results = self.server.monitor.latest()
+        if path == "/results":
+            self._send_json(HTTPStatus.OK, [_result_dict(r) for r in results])
+        elif path == "/metrics":
+            content = MetricsService.render().encode()
+            self._send(HTTPStatus.OK, content, CONTENT_TYPE)
+        elif path == "/healthz":
+            failing = [r.name for r in results if not r.passed]
+            status = HTTPStatus.SERVICE_UNAVAILABLE if failing else HTTPStatus.OK
+            self._send_json(status, {"healthy": not failing, "failing": failing})
+        else:
+            self._send_json(HTTPStatus.NOT_FOUND, {"error": f"No such path {path}"})
+
+    def _send_json(self, status: HTTPStatus, body: Any) -> None:
+        """Send a JSON response."""
+        self._send(status, json.dumps(body).encode(), "application/json")
+
+    def _send(self, status: HTTPStatus, content: bytes, content_type: str) -> None:
+        """Send a response."""
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+
+class _MonitorHTTPServer(ThreadingHTTPServer):
+    """HTTP server for the results of a monitor."""
+
+    daemon_threads = True
+
+    def __init__(self, address: tuple[str, int], monitor: MonitorDaemon) -> None:
+        super().__init__(address, _MonitorRequestHandler)
+        self.monitor = monitor
+
+
+def main() -> None:
+    """Run the monitor until interrupted."""
+    parser = argparse.ArgumentParser(
+        description="Run the RSP validations on a schedule."
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="Address to bind to")
+    parser.add_argument(
+        "--port", type=int, default=DEFAULT_PORT, help="Port to serve results on"
+    )
+    parser.add_argument(
+        "--interval", type=float, default=600.0, help="Seconds between checks"
+    )
+    parser.add_argument(
+        "--taplint-interval",
+        type=float,
+        default=3600.0,
+        help="Seconds between taplint checks",
+    )
+    parser.add_argument(
+        "--checks",
+        help="Comma-separated checks to run, out of: "
+        + ", ".join(MonitorDaemon.available_checks()),
+    )
+    parser.add_argument(
+        "--once",
+        action="store_true",
+        help="Run every check once, print the results and exit",
+    )
+    args = parser.parse_args()
+
+    monitor = MonitorDaemon(
+        args.checks.split(",") if args.checks else None,
+        interval=args.interval,
+        taplint_interval=args.taplint_interval,
+    )
+    if args.once:
+        try:
+            results = monitor.run_once()
+        finally:
+            monitor.close()
+        print(json.dumps([_result_dict(r) for r in results], indent=2))  # noqa: T201
+        sys.exit(0 if all(r.passed for r in results) else 1)
+
+    monitor.start((args.host, args.port))
+    logger.info(f"Monitor results served on http://{monitor.address}/results")
+    try:
+        monitor.wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        monitor.stop()
+
+
+if __name__ == "__main__":
+    main()
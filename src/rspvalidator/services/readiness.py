@@ -0,0 +1,139 @@
+"""Wait for browser pages to be ready, instead of sleeping a fixed time.
+
+Each wait returns as soon as a concrete signal says the page is ready, such
+as the portal's tables finishing loading or the network going quiet, and
+records how long it took, so the waits also measure the front-end latency
+of the Science Platform.
+"""
+
+import time
+from typing import Any
+
+from ..config import SELECTOR_TIMEOUT, logger
+from .metrics import MetricsService
+
+__all__ = ["ReadinessWaiter"]
+
+# Firefly overlays a loading mask on tables, charts and images until they
+# have rendered
+FIREFLY_LOADING = ".loading-mask"
+
+# Waits for all images to load and decode, ignoring broken ones
+_DECODE_IMAGES = """
+async () => {
+    const images = Array.from(document.images);
+    await Promise.all(images.map((image) => image.decode().catch(() => null)));
+    return images.length;
+}
+"""
+
+
+class ReadinessWaiter:
+    """Wait for readiness signals of a page and record the time taken.
+
+    The waiter starts tracking the page's requests when it is created, so it
+    should be created before the page starts loading.
+
+    Parameters
+    ----------
+    page
+        The Playwright page.
+    test
+        The name of the test, used to label the recorded waits.
+    timeout
+        The maximum time of a single wait in milliseconds.
+    """
+
+    def __init__(
+        self, page: Any, test: str, *, timeout: float = SELECTOR_TIMEOUT
+    ) -> None:
+        self.page = page
+        self.test = test
+        self.timeout = timeout
+        self.waits: list[tuple[str, float]] = []
+        self._in_flight: set[Any] = set()
+        self._last_activity = time.monotonic()
+        page.on("request", self._request_started)
+        page.on("requestfinished", self._request_ended)
+        page.on("requestfailed", self._request_ended)
+
+    def _request_started(self, request: Any) -> None:
+        self._in_flight.add(request)
+        self._last_activity = time.monotonic()
+
+    def _request_ended(self, request: Any) -> None:
+        self._in_flight.discard(request)
+        self._last_activity = time.monotonic()
+
+    def _record(self, signal: str, start: float) -> float:
+        """Record the duration of a wait that started at ``start``."""
+        duration = time.perf_counter() - start
+        self.waits.append((signal, duration))
+        MetricsService.record_wait(self.test, signal, duration)
+        logger.info(f"{self.test} waited {duration:.3f}s for {signal}")
+        return duration
+
+    def firefly_rendered(self) -> float:
+        """Wait for the portal's tables, charts and images to render.
+
+        Returns
+        -------
+        float
+            The time waited in seconds.
+        """
+        from playwright.sync_api import expect
+
+        start = time.perf_counter()
+        self.page.get_by_role("grid").first.wait_for(
+            state="visible", timeout=self.timeout
+        )
+        expect(self.page.locator(FIREFLY_LOADING)).to_have_count(
+            0, timeout=self.timeout
+        )
+        return self._record("firefly_rendered", start)
+
+    def network_idle(self, quiet: float = 0.5) -> float:
+        """Wait until the page has made no requests for a while.
+
+        Unlike Playwright's ``networkidle`` load state, this also covers the
+        requests a single-page app makes after the page has loaded.
+
+        Parameters
+        ----------
+        quiet
+            The time in seconds without any request in flight or finishing
+            that counts as idle.
+
+        Returns
+        -------
+        float
+            The time waited in seconds.
+
+        Raises
+        ------
+        TimeoutError
+            If the page is still making requests after the timeout.
+        """
+        start = time.perf_counter()
+        deadline = time.monotonic() + self.timeout / 1000
+        while self._in_flight or time.monotonic() - self._last_activity < quiet:
+            if time.monotonic() > deadline:
+                raise TimeoutError(
+                    f"{len(self._in_flight)} requests still in flight after "
+                    f"{self.timeout / 1000:g}s"
+                )
+            # Lets Playwright dispatch the request events meanwhile
+            self.page.wait_for_timeout(50)
+        return self._record("network_idle", start)
+
+    def images_decoded(self) -> float:
+        """Wait for every image of the page to load and decode.
+
+        Returns
+        -------
+        float
+            The time waited in seconds.
+        """
+        start = time.perf_counter()
+        self.page.evaluate(_DECODE_IMAGES)
+        return self._record("images_decoded", start)
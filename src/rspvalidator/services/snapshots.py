@@ -1,30 +1,234 @@
-"""Utility class for comparing visual snapshots in tests."""
+"""Utility classes for comparing visual snapshots in tests."""
 
 import shutil
 import sys
-from collections.abc import Callable
+import threading
+from collections.abc import Callable, Iterable, Mapping
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from functools import lru_cache
 from io import BytesIO
 from pathlib import Path
 from typing import Any
 
+import numpy as np
 import pytest
 from PIL import Image
-from pixelmatch.contrib.PIL import pixelmatch
 
-__all__ = ["SnapshotComparatorService"]
+from ..config import logger, settings
+from ..utils.imagediff import ImageDiff, ignore_mask, pixelmatch
+from .metrics import MetricsService
+from .snapshotstore import SnapshotStore
+
+__all__ = ["FailureWriter", "SnapshotComparatorService"]
+
+# A region of a page to ignore, as (x, y, width, height) or a bounding box
+Region = tuple[float, float, float, float] | Mapping[str, float]
+
+
+def _decode(data: bytes) -> np.ndarray:
+    """Decode an image into an RGBA array."""
+    with Image.open(BytesIO(data)) as image:
+        return np.asarray(image.convert("RGBA"))
+
+
+@lru_cache(maxsize=32)
+def _decode_snapshot(path: Path, mtime_ns: int) -> tuple[bytes, np.ndarray]:
+    """Read and decode a stored snapshot, once per version of the file."""
+    data = path.read_bytes()
+    return data, _decode(data)
+
+
+class FailureWriter:
+    """Write the images of failed snapshot comparisons in background threads.
+
+    Encoding a full-page PNG takes long enough to hold up a browser test, so
+    the test only hands the images over. Tasks on the same directory run in
+    the order they were submitted.
+
+    Parameters
+    ----------
+    max_workers
+        The number of threads writing images.
+    """
+
+    def __init__(self, max_workers: int = 2) -> None:
+        self._executor = ThreadPoolExecutor(
+            max_workers, thread_name_prefix="snapshot-failures"
+        )
+        self._lock = threading.Lock()
+        self._pending: dict[Path, Future] = {}
+
+    def _submit(self, directory: Path, task: Callable[[], None]) -> Future:
+        """Run a task on a directory after the tasks submitted before it."""
+        with self._lock:
+            previous = self._pending.get(directory)
+            future = self._executor.submit(self._run, previous, directory, task)
+            self._pending[directory] = future
+        return future
+
+    @staticmethod
+    def _run(
+        previous: Future | None, directory: Path, task: Callable[[], None]
+    ) -> None:
+        if previous is not None:
+            wait([previous])
+        try:
+            task()
+        except Exception:
+            logger.exception(f"Could not write the snapshot failures in {directory}")
+            raise
+
+    def clear(self, directory: Path) -> Future:
+        """Remove the images of a past run of a test.
+
+        Parameters
+        ----------
+        directory
+            The directory of the test's images.
+
+        Returns
+        -------
+        Future
+            The future of the task.
+        """
+        return self._submit(
+            directory, lambda: shutil.rmtree(directory, ignore_errors=True)
+        )
+
+    def write(
+        self,
+        directory: Path,
+        name: str,
+        actual: bytes,
+        expected: Path,
+        *,
+        diff: ImageDiff,
+        pixels: np.ndarray,
+    ) -> Future:
+        """Write the actual, expected and diff images of a failed comparison.
+
+        The actual and expected images are written as they are, so only the
+        diff image is encoded.
+
+        Parameters
+        ----------
+        directory
+            The directory of the test's images.
+        name
+            The name of the snapshot.
+        actual
+            The PNG data of the page.
+        expected
+            The stored snapshot.
+        diff
+            The pixels that differ.
+        pixels
+            The decoded page, which the diff is drawn over.
+
+        Returns
+        -------
+        Future
+            The future of the task.
+        """
+
+        def task() -> None:
+            directory.mkdir(parents=True, exist_ok=True)
+            (directory / f"Actual_{name}").write_bytes(actual)
+            shutil.copyfile(expected, directory / f"Expected_{name}")
+            if pixels.shape[:2] == diff.shape:
+                image = Image.fromarray(diff.render(pixels))
+                image.save(directory / f"Diff_{name}")
+
+        return self._submit(directory, task)
+
+    def flush(self) -> None:
+        """Wait for every submitted task to finish."""
+        with self._lock:
+            pending = list(self._pending.values())
+            self._pending.clear()
+        wait(pending)
+
+    def close(self) -> None:
+        """Wait for every submitted task and stop the threads."""
+        self.flush()
+        self._executor.shutdown()
 
 
 class SnapshotComparatorService:
     """Utility class for comparing visual snapshots in tests."""
 
     @staticmethod
-    def create_snapshot_fixture(request: Any) -> Callable:
+    def compare_images(
+        actual: bytes,
+        expected: Path,
+        *,
+        threshold: float = 0.1,
+        ignore: Iterable[Region] = (),
+    ) -> tuple[np.ndarray, np.ndarray, ImageDiff]:
+        """Compare an image against a stored snapshot.
+
+        Byte-identical images are not decoded, and decoded images with
+        identical pixels outside the ignored regions are not compared
+        further. The decoded snapshot is kept until its file changes, so a
+        monitor comparing the same page on every run only decodes the new
+        screenshot.
+
+        Parameters
+        ----------
+        actual
+            The image data to compare, e.g. a PNG screenshot.
+        expected
+            The stored snapshot.
+        threshold
+            The matching threshold from 0 to 1; smaller is more sensitive.
+        ignore
+            The regions of the page to ignore, such as timestamps, as
+            ``(x, y, width, height)`` in pixels or Playwright bounding boxes.
+
+        Returns
+        -------
+        tuple[np.ndarray, np.ndarray, ImageDiff]
+            The decoded actual and expected images and the pixels that
+            differ between them.
+        """
+        data, expected_pixels = _decode_snapshot(expected, expected.stat().st_mtime_ns)
+        shape = expected_pixels.shape[:2]
+        if actual == data:
+            empty = (np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp))
+            return expected_pixels, expected_pixels, ImageDiff(shape, empty, empty)
+
+        actual_pixels = _decode(actual)
+        if actual_pixels.shape != expected_pixels.shape:
+            # Every pixel of a page that changed size counts as different
+            height = max(actual_pixels.shape[0], shape[0])
+            width = max(actual_pixels.shape[1], shape[1])
+            ys, xs = np.indices((height, width)).reshape(2, -1)
+            empty = (np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp))
+            return (
+                actual_pixels,
+                expected_pixels,
+                ImageDiff((height, width), (ys, xs), empty),
+            )
+
+        mask = ignore_mask(shape, ignore)
+        return (
+            actual_pixels,
+            expected_pixels,
+            pixelmatch(
+                actual_pixels, expected_pixels, threshold=threshold, ignore=mask
+            ),
+        )
+
+    @staticmethod
+    def create_snapshot_fixture(request: Any, writer: FailureWriter) -> Callable:
         """Create a fixture for snapshot comparison.
 
         Parameters
         ----------
         request : Any
             The pytest request object
+        writer : FailureWriter
+            The writer of the images of failed comparisons
 
         Returns
         -------
@@ -33,6 +237,21 @@ class SnapshotComparatorService:
         """
         test_function_name = request.node.name.split("[")[0]
         test_name = f"{test_function_name}[{sys.platform!s}]"
+        test_file_name = str(Path(request.node.fspath).name).strip(".py")
+        test_dir = Path(request.node.fspath).parent.resolve()
+        store = SnapshotStore(test_dir / "snapshots", settings.hostname)
+
+        # Create a dir where all snapshot test failures will go, and remove the
+        # images of this test's past run in the background
+        test_results_dir = (
+            test_dir
+            / "snapshot_tests_failures"
+            / test_file_name
+            / test_function_name
+            / test_name
+        )
+        if test_results_dir.exists():
+            writer.clear(test_results_dir)
 
         def compare(
             img: bytes,
@@ -40,6 +259,7 @@ class SnapshotComparatorService:
             threshold: float = 0.1,
             name: str = f"{test_name}.png",
             fail_fast: bool = False,
+            ignore: Iterable[Region] = (),
         ) -> None:
             """Compare the given image against a stored snapshot.
 
@@ -50,55 +270,34 @@ class SnapshotComparatorService:
             threshold : float, optional
                 Comparison threshold value, by default 0.1
             name : str, optional
-                Name of the snapshot file
+                Name of the snapshot
             fail_fast : bool, optional
-                Whether to fail on first pixel difference
+                Whether to count any difference as a single pixel
+            ignore : Iterable[Region], optional
+                Regions of the page to ignore, such as timestamps, as
+                ``(x, y, width, height)`` or Playwright bounding boxes
 
             Raises
             ------
             pytest.fail
                 If images don't match or new snapshot is created
             """
-            test_file_name = str(Path(request.node.fspath).name).strip(".py")
-
-            filepath = (
-                Path(request.node.fspath).parent.resolve()
-                / "snapshots"
-                / test_file_name
-                / test_function_name
-            )
-            filepath.mkdir(parents=True, exist_ok=True)
-            file = filepath / name
-
-            # Create a dir where all snapshot test failures will go
-            results_dir_name = (
-                Path(request.node.fspath).parent.resolve() / "snapshot_tests_failures"
-            )
-            test_results_dir = (
-                results_dir_name / test_file_name / test_function_name / test_name
-            )
-
-            # Remove a single test's past run dir with actual, diff and expected images
-            if test_results_dir.exists():
-                shutil.rmtree(test_results_dir)
-            if not file.exists():
-                file.write_bytes(img)
+            file = store.get(test_file_name, test_function_name, name)
+            if file is None:
+                store.put(test_file_name, test_function_name, name, img)
                 pytest.fail("New snapshot(s) created. Please review images")
+            else:
+                # Compare images
+                actual, _, diff = SnapshotComparatorService.compare_images(
+                    img, file, threshold=threshold, ignore=ignore
+                )
+                mismatch = min(diff.mismatch, 1) if fail_fast else diff.mismatch
 
-            # Compare images
-            img_a = Image.open(BytesIO(img))
-            img_b = Image.open(file)
-            img_diff = Image.new("RGBA", img_a.size)
-
-            mismatch = pixelmatch(
-                img_a, img_b, img_diff, threshold=threshold, fail_fast=fail_fast
-            )
-
-            if mismatch > 0:
-                test_results_dir.mkdir(parents=True, exist_ok=True)
-                img_diff.save(f"{test_results_dir}/Diff_{name}")
-                img_a.save(f"{test_results_dir}/Actual_{name}")
-                img_b.save(f"{test_results_dir}/Expected_{name}")
-                pytest.fail("Snapshots DO NOT match!")
+                MetricsService.record_snapshot(test_name, name, mismatch)
+                if mismatch > 0:
+                    writer.write(
+                        test_results_dir, name, img, file, diff=diff, pixels=actual
+                    )
+                    pytest.fail("Snapshots DO NOT match!")
 
         return compare
@@ -0,0 +1,221 @@
+"""Content-addressed store of visual snapshots.
+
+Each snapshot is stored once as a blob named after the SHA-256 of its PNG
+data, under ``blobs/<first two hex digits>/<digest>.png``, so identical
+snapshots of different OS platforms or hosts share a file. A JSON manifest
+per test, under ``manifests/<test file>/<test function>.json``, maps each
+host and snapshot name to its blob. Blobs are never modified in place, so
+a reader never sees a partly written snapshot.
+
+Snapshots stored as loose PNGs in the former ``<test file>/<test
+function>/<name>`` layout are imported into the store the first time they
+are looked up.
+"""
+
+import fcntl
+import hashlib
+import json
+import os
+import tempfile
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import asdict
+from io import BytesIO
+from pathlib import Path
+
+from PIL import Image
+
+from ..config import logger
+from ..models.snapshot import SnapshotEntry
+
+__all__ = ["SnapshotStore"]
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    """Write a file by renaming a complete temporary file over it."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, temp_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    try:
+        with os.fdopen(fd, "wb") as file:
+            file.write(data)
+        Path(temp_name).chmod(0o644)
+        Path(temp_name).replace(path)
+    except BaseException:
+        Path(temp_name).unlink(missing_ok=True)
+        raise
+
+
+class SnapshotStore:
+    """Store snapshots by content, with a manifest per test.
+
+    Manifests are updated under a file lock, so tests running in parallel
+    processes can store snapshots of the same test.
+
+    Parameters
+    ----------
+    root
+        The directory of the store.
+    host
+        The hostname of the platform, which keeps the snapshots of
+        different platforms apart in the manifests.
+    """
+
+    def __init__(self, root: Path, host: str) -> None:
+        self.root = root
+        self.host = host
+
+    def blob_path(self, digest: str) -> Path:
+        """Return the path of the blob of a snapshot.
+
+        Parameters
+        ----------
+        digest
+            The SHA-256 of the snapshot's PNG data.
+
+        Returns
+        -------
+        Path
+            The path of the blob, which may not exist.
+        """
+        return self.root / "blobs" / digest[:2] / f"{digest}.png"
+
+    def manifest_path(self, test_file: str, test_function: str) -> Path:
+        """Return the path of the manifest of a test."""
+        return self.root / "manifests" / test_file / f"{test_function}.json"
+
+    def put_blob(self, data: bytes) -> str:
+        """Store PNG data as a blob, unless an identical blob is stored.
+
+        Parameters
+        ----------
+        data
+            The PNG data.
+
+        Returns
+        -------
+        str
+            The SHA-256 of the data.
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.blob_path(digest)
+        if not path.exists():
+            _write_atomic(path, data)
+        return digest
+
+    def entries(self, test_file: str, test_function: str) -> list[SnapshotEntry]:
+        """Return the entries of the manifest of a test, for every host.
+
+        Parameters
+        ----------
+        test_file
+            The name of the test file, without its extension.
+        test_function
+            The name of the test function.
+
+        Returns
+        -------
+        list[SnapshotEntry]
+            The entries, or an empty list if the test has no manifest.
+        """
+        path = self.manifest_path(test_file, test_function)
+        if not path.exists():
+            return []
+        content = json.loads(path.read_text())
+        return [SnapshotEntry(**entry) for entry in content["snapshots"]]
+
+    def get(self, test_file: str, test_function: str, name: str) -> Path | None:
+        """Return the blob of a snapshot of the store's host.
+
+        Parameters
+        ----------
+        test_file
+            The name of the test file, without its extension.
+        test_function
+            The name of the test function.
+        name
+            The name of the snapshot.
+
+        Returns
+        -------
+        Path | None
+            The path of the blob, or `None` if the snapshot is not stored.
+        """
+        for entry in self.entries(test_file, test_function):
+            if entry.host == self.host and entry.name == name:
+                return self.blob_path(entry.digest)
+
+        legacy = self.root / test_file / test_function / name
+        if legacy.is_file():
+            logger.info(f"Importing snapshot {legacy} into the snapshot store")
+            digest = self.put(test_file, test_function, name, legacy.read_bytes())
+            return self.blob_path(digest)
+        return None
+
+    def put(self, test_file: str, test_function: str, name: str, data: bytes) -> str:
+        """Store a snapshot of the store's host, replacing any previous one.
+
+        Parameters
+        ----------
+        test_file
+            The name of the test file, without its extension.
+        test_function
+            The name of the test function.
+        name
+            The name of the snapshot.
+        data
+            The PNG data.
+
+        Returns
+        -------
+        str
+            The SHA-256 of the data.
+        """
+        digest = self.put_blob(data)
+        with Image.open(BytesIO(data)) as image:
+            width, height = image.size
+        entry = SnapshotEntry(self.host, name, digest, width, height, time.time())
+
+        path = self.manifest_path(test_file, test_function)
+        with self._locked(path):
+            entries = [
+                e
+                for e in self.entries(test_file, test_function)
+                if (e.host, e.name) != (self.host, name)
+            ]
+            entries.append(entry)
+            entries.sort(key=lambda e: (e.host, e.name))
+            content = {"snapshots": [asdict(e) for e in entries]}
+            _write_atomic(path, (json.dumps(content, indent=2) + "\n").encode())
+        return digest
+
+    def prune(self) -> list[Path]:
+        """Delete the blobs no manifest refers to.
+
+        Returns
+        -------
+        list[Path]
+            The deleted blobs.
+        """
+        referenced = {
+            entry["digest"]
+            for path in self.root.glob("manifests/*/*.json")
+            for entry in json.loads(path.read_text())["snapshots"]
+        }
+        deleted = []
+        for blob in self.root.glob("blobs/*/*.png"):
+            if blob.stem not in referenced:
+                blob.unlink()
+                deleted.append(blob)
+        return deleted
+
+    @contextmanager
+    def _locked(self, path: Path) -> Iterator[None]:
+        """Hold an exclusive lock on a manifest while it is updated."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.with_suffix(".lock").open("w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
@@ -0,0 +1,269 @@
+"""Resident STILTS server, to run STILTS tasks without starting a JVM each time.
+
+Starting a JVM and loading STILTS takes seconds, which a taplint run in
+every monitor cycle pays again each time. `StiltsServer` keeps one JVM
+running STILTS' own ``server`` command, which runs tasks requested as
+``<base path>/task/<task>?<parameter>=<value>...`` on a local port and
+streams their output as the response, e.g. ``taplint`` or ``votlint``.
+
+Tasks run in the server's JVM, so settings such as the credentials of
+STILTS' ``auth.username`` and ``auth.password`` system properties are given
+when it starts. Callers should fall back to running STILTS on its own if the
+server fails, see `TaplintService.run`.
+
+The server does not authenticate its clients, and any task it runs, such as
+``taplint`` or ``tcopy``, uses those credentials. Its tasks are served
+under a random base path that is new for every start, so only a client that
+knows it can run them. The path, like the credentials, is on the JVM's
+command line, so any user of the host who can list its processes can use
+the server: only run it on hosts whose users may use the token.
+"""
+
+import secrets
+import socket
+import subprocess
+import threading
+import time
+from collections import deque
+from collections.abc import Iterator, Mapping
+from pathlib import Path
+from types import TracebackType
+from typing import Self
+
+import requests
+
+from ..config import logger
+from ..exceptions import StiltsError
+
+__all__ = ["StiltsServer"]
+
+
+def _free_port() -> int:
+    """Return a local TCP port that is not in use."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class StiltsServer:
+    """Run STILTS tasks in a resident JVM.
+
+    The server is started on first use and started again if it dies or
+    stops answering its health check.
+
+    Parameters
+    ----------
+    jar_path
+        Path to the STILTS JAR file.
+    properties
+        Java system properties of the JVM, e.g. ``auth.username`` and
+        ``auth.password``. They show in the process list of the host.
+    startup_timeout
+        The time in seconds to wait for the server to answer after starting
+        it.
+    health_timeout
+        The time in seconds a health check may take.
+    """
+
+    def __init__(
+        self,
+        jar_path: Path,
+        *,
+        properties: Mapping[str, str] | None = None,
+        startup_timeout: float = 60.0,
+        health_timeout: float = 5.0,
+    ) -> None:
+        self.jar_path = jar_path
+        self.properties = dict(properties or {})
+        self.startup_timeout = startup_timeout
+        self.health_timeout = health_timeout
+        self.starts = 0
+        self._process: subprocess.Popen | None = None
+        self._stderr: deque[str] = deque(maxlen=20)
+        self._port: int | None = None
+        self._base_path = ""
+        self._lock = threading.Lock()
+        self._session = requests.Session()
+
+    @property
+    def url(self) -> str:
+        """The base URL of the server's tasks.
+
+        Raises
+        ------
+        StiltsError
+            If the server is not running.
+        """
+        if self._port is None:
+            raise StiltsError("STILTS server is not running")
+        return f"http://127.0.0.1:{self._port}{self._base_path}"
+
+    @property
+    def running(self) -> bool:
+        """Whether the server's JVM is running."""
+        return self._process is not None and self._process.poll() is None
+
+    def healthy(self) -> bool:
+        """Check that the server runs a trivial task.
+
+        Returns
+        -------
+        bool
+            Whether the server is running and evaluated ``1+1`` in time.
+        """
+        if not self.running:
+            return False
+        try:
+            response = self._session.get(
+                f"{self.url}/task/calc",
+                params={"expression": "1+1"},
+                timeout=self.health_timeout,
+            )
+        except requests.RequestException:
+            return False
+        return response.ok and response.text.strip() == "2"
+
+    def start(self) -> Self:
+        """Start the server, stopping any previous one first.
+
+        Returns
+        -------
+        StiltsServer
+            The server itself.
+
+        Raises
+        ------
+        StiltsError
+            If the server exits or does not answer within the startup
+            timeout.
+        """
+        self.stop()
+        self._port = _free_port()
+        self._base_path = f"/stilts-{secrets.token_hex(16)}"
+        options = [f"-D{name}={value}" for name, value in self.properties.items()]
+        command = ["java", *options, "-jar", str(self.jar_path), "server"]
+        command += [f"port={self._port}", f"basepath={self._base_path}"]
+        start = time.perf_counter()
+        self._process = subprocess.Popen(
+            command,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+        )
+        self.starts += 1
+        self._stderr.clear()
+        drain = threading.Thread(target=self._drain, args=(self._process,), daemon=True)
+        drain.start()
+
+        deadline = time.monotonic() + self.startup_timeout
+        while not self.healthy():
+            if self._process.poll() is not None:
+                drain.join(timeout=1)
+                self.stop()
+                error = "\n".join(self._stderr)
+                raise StiltsError(f"STILTS server exited: {error}")
+            if time.monotonic() > deadline:
+                self.stop()
+                raise StiltsError(
+                    f"STILTS server did not answer within {self.startup_timeout}s"
+                )
+            time.sleep(0.2)
+        logger.info(
+            f"STILTS server started on {self.url} in {time.perf_counter() - start:.1f}s"
+        )
+        return self
+
+    def _drain(self, process: subprocess.Popen) -> None:
+        """Keep the last lines the server writes to its standard error."""
+        if process.stderr is None:
+            return
+        for line in process.stderr:
+            self._stderr.append(line.decode(errors="replace").rstrip())
+
+    def ensure_running(self) -> None:
+        """Start the server if it is not running or not healthy.
+
+        Raises
+        ------
+        StiltsError
+            If the server cannot be started.
+        """
+        with self._lock:
+            if self.healthy():
+                return
+            if self._process is not None:
+                logger.warning("STILTS server is not healthy, restarting it")
+            self.start()
+
+    def run_task(
+        self, task: str, parameters: Mapping[str, str], *, timeout: float | None = None
+    ) -> Iterator[str]:
+        """Run a STILTS task and yield the lines of its output as they come.
+
+        Parameters
+        ----------
+        task
+            The name of the task, e.g. ``taplint``.
+        parameters
+            The parameters of the task, e.g. ``{"tapurl": ...}``.
+        timeout
+            The longest time in seconds to wait for the next output.
+
+        Yields
+        ------
+        str
+            The lines of output, without line endings.
+
+        Raises
+        ------
+        StiltsError
+            If the server cannot be started or the task fails.
+        """
+        self.ensure_running()
+        try:
+            with self._session.get(
+                f"{self.url}/task/{task}",
+                params=parameters,
+                stream=True,
+                timeout=timeout,
+            ) as response:
+                if not response.ok:
+                    raise StiltsError(
+                        f"STILTS {task} failed with status "
+                        f"{response.status_code}: {response.text.strip()}"
+                    )
+                for line in response.iter_lines():
+                    yield line.decode(errors="replace")
+        except requests.RequestException as e:
+            raise StiltsError(f"STILTS {task} failed: {e}") from e
+
+    def stop(self) -> None:
+        """Stop the server if it is running."""
+        process, self._process = self._process, None
+        self._port = None
+        if process is None:
+            return
+        if process.poll() is None:
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+
+    def close(self) -> None:
+        """Stop the server and close its connections."""
+        self.stop()
+        self._session.close()
+
+    def __enter__(self) -> Self:
+        self.ensure_running()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self.close()
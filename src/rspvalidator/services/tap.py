@@ -1,14 +1,59 @@
 """TAP service module."""
 
+import time
 from typing import Any
 
 import pyvo
+import requests
+from pyvo.dal import DALQueryError, DALServiceError
 
 from ..config import BASE_URL, logger
-from ..models.tap import QueryMode, QueryResult
-from ..utils.timer import timer
+from ..models.tap import QueryMode, QueryPhase, QueryResult
+from ..utils.histogram import LatencyRecorder
+from ..utils.http import record_phases
+from ..utils.votable import VOTableRowCounter
+from .aiotap import AsyncTAPClient
+from .uws import UWSJobService, UWSJobWaiter
 
-__all__ = ["TAPQueryRunnerService", "TAPOperationsService"]
+__all__ = [
+    "AsyncTAPQueryRunnerService",
+    "TAPOperationsService",
+    "TAPQueryRunnerService",
+]
+
+# Size of the chunks a streamed response is read in
+_CHUNK_SIZE = 64 * 1024
+
+
+def _check_status(counter: VOTableRowCounter, url: str) -> None:
+    """Raise the error reported by a VOTable, as pyvo does when parsing it."""
+    if counter.status.lower() not in {"ok", "overflow"}:
+        raise DALQueryError(counter.status_message, counter.status, url)
+
+
+def _make_result(
+    query: dict[str, Any],
+    counter: VOTableRowCounter,
+    phases: dict[str, float],
+    elapsed: float,
+    recorder: LatencyRecorder | None,
+) -> QueryResult:
+    """Build the result of a streamed query and record its duration."""
+    execution_duration = elapsed - counter.decode_duration
+    if recorder is not None:
+        recorder.record(query["query"], execution_duration)
+    return QueryResult(
+        status=counter.status,
+        row_count=counter.row_count,
+        execution_duration=execution_duration,
+        expected_duration=query["expected_duration"],
+        expected_row_count=query["expected_row_count"],
+        query=query["query"],
+        bytes_received=counter.bytes_received,
+        decode_duration=counter.decode_duration,
+        checksums=counter.checksums,
+        phases=phases,
+    )
 
 
 class TAPQueryRunnerService:
@@ -22,9 +67,15 @@ class TAPQueryRunnerService:
         client: pyvo.dal.TAPService,
         query: dict[str, Any],
         mode: QueryMode,
+        recorder: LatencyRecorder | None = None,
     ) -> QueryResult:
         """Run a query test and return the results.
 
+        The response is streamed and its rows counted as it arrives rather
+        than loaded into a table, so large results cost little memory or CPU
+        in the load generator. A query may name ``checksum_columns`` whose
+        values are checksummed on the way.
+
         Parameters
         ----------
         client
@@ -33,6 +84,9 @@ class TAPQueryRunnerService:
             The query to run.
         mode
             The query mode.
+        recorder
+            If given, the execution duration, excluding the time spent
+            decoding the response, is recorded in it under the query string.
 
         Returns
         -------
@@ -41,24 +95,179 @@ class TAPQueryRunnerService:
         if mode not in (QueryMode.SYNC, QueryMode.ASYNC):
             raise ValueError("Invalid query mode")
 
-        sql_query: str = query["query"]
-        expected_duration: float = query["expected_duration"]
-        expected_row_count: int = query["expected_row_count"]
-        result, execution_duration = (
-            timer(client.run_sync, sql_query)
-            if mode == QueryMode.SYNC
-            else timer(client.run_async, sql_query)
-        )
-        row_count: int = len(result.to_table())
-
-        return QueryResult(
-            status=result.status[0],
-            row_count=row_count,
-            execution_duration=execution_duration,
-            expected_duration=expected_duration,
-            expected_row_count=expected_row_count,
-            query=sql_query,
-        )
+        counter = VOTableRowCounter(query.get("checksum_columns", ()))
+        phases: dict[str, float] = {}
+        start = time.perf_counter()
+        if mode == QueryMode.SYNC:
+            TAPQueryRunnerService.stream_sync(client, query["query"], counter, phases)
+        else:
+            TAPQueryRunnerService.stream_async(client, query["query"], counter, phases)
+        elapsed = time.perf_counter() - start
+        return _make_result(query, counter, phases, elapsed, recorder)
+
+    @staticmethod
+    def stream_sync(
+        client: pyvo.dal.TAPService,
+        query: str,
+        counter: VOTableRowCounter,
+        phases: dict[str, float] | None = None,
+    ) -> None:
+        """Run a query through the TAP sync endpoint and stream its result.
+
+        Parameters
+        ----------
+        client
+            The TAP client object.
+        query
+            The ADQL query.
+        counter
+            The counter the response is fed to as it arrives.
+        phases
+            If given, the time spent in each `QueryPhase` is added to it.
+            Connection phases are only timed for clients made by
+            `TAPFactory`.
+
+        Raises
+        ------
+        pyvo.dal.DALServiceError
+            If the service returns an HTTP error.
+        pyvo.dal.DALQueryError
+            If the service reports that the query failed.
+        """
+        phases = phases if phases is not None else {}
+        tap_query = client.create_query(query, mode="sync")
+        with record_phases(phases):
+            response = tap_query.submit()
+            TAPQueryRunnerService._read_response(response, counter, phases)
+        _check_status(counter, tap_query.queryurl)
+
+    @staticmethod
+    def stream_async(
+        client: pyvo.dal.TAPService,
+        query: str,
+        counter: VOTableRowCounter,
+        phases: dict[str, float] | None = None,
+    ) -> None:
+        """Run a query as a UWS job and stream its result.
+
+        The job is deleted once its result is read, as with
+        ``pyvo.dal.TAPService.run_async``.
+
+        Parameters
+        ----------
+        client
+            The TAP client object.
+        query
+            The ADQL query.
+        counter
+            The counter the result is fed to as it arrives.
+        phases
+            If given, the time spent in each `QueryPhase` is added to it. The
+            connection phases are those of fetching the result.
+
+        Raises
+        ------
+        pyvo.dal.DALServiceError
+            If the service returns an HTTP error.
+        pyvo.dal.DALQueryError
+            If the job or the query failed.
+        """
+        phases = phases if phases is not None else {}
+        session = TAPOperationsService.get_session(client)
+        start = time.perf_counter()
+        job = client.submit_job(query).run()
+        phases[QueryPhase.JOB_CREATE.value] = time.perf_counter() - start
+        try:
+            waited = UWSJobWaiter(session).wait(job.url)
+            if waited.phase != "COMPLETED":
+                # job.raise_if_error() would check the job state pyvo fetched
+                # before the job ran, so use the state the waiter saw
+                message = UWSJobService.error_message(waited.job)
+                raise DALQueryError(f"Query Error: {message}", waited.phase, job.url)
+            phases.update(UWSJobService.query_phases(waited))
+
+            # pyvo only reads job results through astropy, so fetch it with
+            # the client's authenticated session instead
+            result_url = UWSJobService.result_url(job.url, waited.job)
+            if result_url is None:
+                raise DALServiceError("No result URI available", job.url)
+            start = time.perf_counter()
+            with record_phases(phases):
+                response = session.get(result_url, stream=True)
+                TAPQueryRunnerService._read_response(response, counter, phases)
+            phases[QueryPhase.RESULT_FETCH.value] = time.perf_counter() - start
+            _check_status(counter, result_url)
+        finally:
+            job.delete()
+
+    @staticmethod
+    def _read_response(
+        response: requests.Response,
+        counter: VOTableRowCounter,
+        phases: dict[str, float],
+    ) -> None:
+        """Feed a streamed response body to a counter in chunks."""
+        start = time.perf_counter()
+        with response:
+            try:
+                response.raise_for_status()
+            except requests.RequestException as e:
+                raise DALServiceError.from_except(e, response.url) from e
+            for chunk in response.iter_content(chunk_size=_CHUNK_SIZE):
+                counter.feed(chunk)
+        counter.close()
+        elapsed = time.perf_counter() - start
+        phases[QueryPhase.DOWNLOAD.value] = elapsed - counter.decode_duration
+        phases[QueryPhase.PARSE.value] = counter.decode_duration
+
+
+class AsyncTAPQueryRunnerService:
+    """TAP query runner class for the asyncio load engine."""
+
+    def __init__(self) -> None:
+        pass
+
+    @staticmethod
+    async def run_query_test(
+        client: AsyncTAPClient,
+        query: dict[str, Any],
+        mode: QueryMode,
+        recorder: LatencyRecorder | None = None,
+    ) -> QueryResult:
+        """Run a query test and return the results.
+
+        The response is streamed and counted as with
+        `TAPQueryRunnerService.run_query_test`.
+
+        Parameters
+        ----------
+        client
+            The open asynchronous TAP client.
+        query
+            The query to run.
+        mode
+            The query mode.
+        recorder
+            If given, the execution duration, excluding the time spent
+            decoding the response, is recorded in it under the query string.
+
+        Returns
+        -------
+            QueryResult: The query test result metadata.
+        """
+        if mode not in (QueryMode.SYNC, QueryMode.ASYNC):
+            raise ValueError("Invalid query mode")
+
+        counter = VOTableRowCounter(query.get("checksum_columns", ()))
+        phases: dict[str, float] = {}
+        start = time.perf_counter()
+        if mode == QueryMode.SYNC:
+            await client.count_sync(query["query"], counter, phases)
+        else:
+            await client.count_async(query["query"], counter, phases)
+        elapsed = time.perf_counter() - start
+        _check_status(counter, client.tap_url)
+        return _make_result(query, counter, phases, elapsed, recorder)
 
 
 class TAPOperationsService:
@@ -68,7 +277,7 @@ class TAPOperationsService:
         pass
 
     @staticmethod
-    def get_api_endpoint(endpoint: str, app: str) -> str:
+    def get_api_endpoint(endpoint: str, app: str, base_url: str | None = None) -> str:
         """
         Get the API endpoint for the given application and endpoint.
 
@@ -78,6 +287,8 @@ class TAPOperationsService:
             The endpoint.
         app
             The application name.
+        base_url
+            The base URL of the platform, ``BASE_URL`` by default.
 
         Returns
         -------
@@ -89,12 +300,13 @@ class TAPOperationsService:
         ValueError
             If the endpoint is not valid.
         """
+        base_url = base_url or BASE_URL
         api_endpoints: dict[str, str] = {
-            "capabilities": f"{BASE_URL}/api/{app}/capabilities",
-            "availability": f"{BASE_URL}/api/{app}/availability",
-            "logcontrol": f"{BASE_URL}/api/{app}/logging/control",
-            "tables": f"{BASE_URL}/api/{app}/tables",
-            "tap": f"{BASE_URL}/api/{app}",
+            "capabilities": f"{base_url}/api/{app}/capabilities",
+            "availability": f"{base_url}/api/{app}/availability",
+            "logcontrol": f"{base_url}/api/{app}/logging/control",
+            "tables": f"{base_url}/api/{app}/tables",
+            "tap": f"{base_url}/api/{app}",
         }
 
         if endpoint not in api_endpoints:
@@ -102,3 +314,42 @@ class TAPOperationsService:
             raise ValueError(f"Invalid endpoint: {endpoint}")
 
         return api_endpoints[endpoint]
+
+    @staticmethod
+    def get_session(
+        client: pyvo.dal.TAPService,
+    ) -> requests.Session | pyvo.auth.AuthSession:
+        """
+        Get the session a TAP client sends its requests with.
+
+        pyvo has no public accessor for it, but it is needed to make
+        requests pyvo does not, such as streaming a job result.
+
+        Parameters
+        ----------
+        client
+            The TAP client object.
+
+        Returns
+        -------
+        requests.Session or pyvo.auth.AuthSession
+            The client's session.
+        """
+        return client._session  # noqa: SLF001
+
+    @staticmethod
+    def close_client(client: pyvo.dal.TAPService) -> None:
+        """
+        Close the connections of a TAP client's session.
+
+        Parameters
+        ----------
+        client
+            The TAP client object.
+        """
+        session = TAPOperationsService.get_session(client)
+        if isinstance(session, pyvo.auth.AuthSession):
+            for credential_session in session.credentials.credentials.values():
+                credential_session.close()
+        else:
+            session.close()
@@ -1,25 +1,240 @@
-"""TAPlint related Services."""
+"""TAPlint related Services.
+
+taplint prints a line for each stage it starts, such as ``Section TME:
+Check content of tables metadata from /tables``, a line for each report,
+labelled with its type, stage, message code and sequence number, such as
+``W-TME-CDTY-1 ...``, and a closing ``Totals:`` line. `TaplintParser` reads
+the output a line at a time as taplint prints it, so a run is never held in
+memory as a whole and the time taken by each stage is known.
+"""
 
 import re
+import subprocess
+import threading
+import time
+from collections.abc import Callable, Collection, Iterable, Mapping, Sequence
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 import pexpect
 
 from ..config import logger
+from ..constants import TAPLINT_STAGES
+from ..exceptions import StiltsError
+from ..models.taplint import Severity, TaplintFinding, TaplintReport, TaplintStage
+from .stilts import StiltsServer
+
+__all__ = [
+    "TaplintOrchestrator",
+    "TaplintParser",
+    "TaplintParserService",
+    "TaplintService",
+]
+
+# Timeout of a taplint run, and of each prompt of an interactive one, in
+# seconds
+TAPLINT_TIMEOUT = 150000
+
+_SECTION = re.compile(r"^Section ([A-Z]{3}): (.*)$")
+_RECORD = re.compile(r"^([EWISF])-([A-Z]{3})-([A-Z0-9]{4})-(\d+)([ +])(.*)$")
+_TOTAL = re.compile(r"(\w+):\s+(\d+)")
+
+# Names of the report types in the totals line
+_TOTAL_NAMES = {
+    "Errors": Severity.ERROR,
+    "Warnings": Severity.WARNING,
+    "Infos": Severity.INFO,
+    "Summaries": Severity.SUMMARY,
+    "Failures": Severity.FAILURE,
+}
+
+
+class TaplintParser:
+    """Parse taplint output incrementally into a report.
+
+    Parameters
+    ----------
+    keep
+        The types of reports to keep in the report's findings. Reports of
+        other types, usually the bulk of the output, are only counted.
+    clock
+        The clock stage durations are measured with.
+    """
+
+    def __init__(
+        self,
+        *,
+        keep: Collection[Severity] = (
+            Severity.ERROR,
+            Severity.WARNING,
+            Severity.FAILURE,
+        ),
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.report = TaplintReport()
+        self._keep = frozenset(keep)
+        self._clock = clock
+        self._stage: TaplintStage | None = None
+        self._stage_start = 0.0
+        self._last: TaplintFinding | None = None
+
+    def _start_stage(self, code: str, description: str) -> TaplintStage:
+        self._end_stage()
+        stage = self._stage = TaplintStage(code, description)
+        self._stage_start = self._clock()
+        self.report.stages.append(stage)
+        return stage
+
+    def _end_stage(self) -> None:
+        stage = self._stage
+        if stage is None:
+            return
+        stage.duration = self._clock() - self._stage_start
+        logger.info(
+            f"taplint stage {stage.code} took {stage.duration:.1f}s: "
+            f"{stage.errors} errors, {stage.warnings} warnings"
+        )
+        self._stage = None
+
+    def feed(self, line: str) -> TaplintFinding | None:
+        """Parse a line of output.
 
-__all__ = ["TaplintService", "TaplintParserService"]
+        Parameters
+        ----------
+        line
+            The line, with or without its line ending.
+
+        Returns
+        -------
+        TaplintFinding | None
+            The report the line starts, if it starts one. Continuation lines
+            are added to the text of the report they continue.
+        """
+        line = line.rstrip("\r\n")
+        if section := _SECTION.match(line):
+            self._start_stage(section.group(1), section.group(2))
+            self._last = None
+            return None
+
+        if line.startswith("Totals:"):
+            self._end_stage()
+            self.report.totals = {
+                _TOTAL_NAMES[name]: int(count)
+                for name, count in _TOTAL.findall(line)
+                if name in _TOTAL_NAMES
+            }
+            self._last = None
+            return None
+
+        record = _RECORD.match(line)
+        if record is None:
+            # Indented lines continue the previous report
+            if self._last is not None and line[:1].isspace():
+                self._last.text += "\n" + line.strip()
+            return None
+        letter, stage, code, sequence, separator, text = record.groups()
+        if separator == "+" and self._last is not None:
+            self._last.text += "\n" + text
+            return None
+
+        finding = TaplintFinding(stage, Severity(letter), code, int(sequence), text)
+        current = self._stage
+        if current is None or current.code != stage:
+            current = self._start_stage(stage, "")
+        counts = current.counts
+        counts[finding.severity] = counts.get(finding.severity, 0) + 1
+        if finding.severity in self._keep:
+            self.report.findings.append(finding)
+        self._last = finding
+        return finding
+
+    def close(self) -> TaplintReport:
+        """Finish parsing, ending the stage that is running.
+
+        Returns
+        -------
+        TaplintReport
+            The report of the run.
+        """
+        self._end_stage()
+        self._last = None
+        return self.report
+
+    @classmethod
+    def parse(cls, lines: Iterable[str]) -> TaplintReport:
+        """Parse the complete output of a run.
+
+        Parameters
+        ----------
+        lines
+            The lines of output.
+
+        Returns
+        -------
+        TaplintReport
+            The report of the run.
+        """
+        parser = cls()
+        for line in lines:
+            parser.feed(line)
+        return parser.close()
 
 
 class TaplintService:
     """Handles the execution of STILTS TAPLINT."""
 
+    @staticmethod
+    def command(
+        jar_path: Path,
+        tap_url: str,
+        *,
+        stages: str | None = None,
+        properties: Mapping[str, str] | None = None,
+    ) -> list[str]:
+        """
+        Return the command line of a taplint run.
+
+        Parameters
+        ----------
+        jar_path
+            Path to the STILTS JAR file.
+        tap_url
+            The TAP URL to test.
+        stages
+            The value of taplint's ``stages`` option, e.g. ``+QGE -QAS``, or
+            `None` to run the default stages.
+        properties
+            Java system properties to set.
+
+        Returns
+        -------
+        list[str]
+            The program and its arguments.
+        """
+        options = [f"-D{name}={value}" for name, value in (properties or {}).items()]
+        command = ["java", *options, "-jar", str(jar_path), "taplint"]
+        command.append(f"tapurl={tap_url}")
+        if stages:
+            command.append(f"stages={stages}")
+        return command
+
     @staticmethod
     def run(
-        jar_path: Path, tap_url: str, username: str, password: str
-    ) -> tuple[str, int]:
+        jar_path: Path,
+        tap_url: str,
+        username: str,
+        password: str,
+        *,
+        stages: str | None = None,
+        interactive: bool = True,
+        server: StiltsServer | None = None,
+    ) -> TaplintReport:
         """
         Run STILTS TAPLINT on a given TAP URL.
 
+        The output is parsed as taplint prints it, and each stage is logged
+        as it ends.
+
         Parameters
         ----------
         jar_path
@@ -30,16 +245,45 @@ class TaplintService:
             The username for authentication.
         password
             The password for authentication.
+        stages
+            The value of taplint's ``stages`` option, e.g. ``+QGE -QAS``, or
+            `None` to run the default stages.
+        interactive
+            Whether to answer STILTS' username and password prompts through
+            a pseudo-terminal. Otherwise the credentials are passed as the
+            ``auth.username`` and ``auth.password`` system properties, which
+            needs no terminal but shows them in the process list of the
+            host.
+        server
+            A resident STILTS server to run taplint in, which must have been
+            started with the credentials. If it fails, taplint is run in
+            its own JVM instead.
 
         Returns
         -------
-            Tuple[str, int]: A tuple containing the output and exit status.
+        TaplintReport
+            The findings, stage timings and exit status of the run.
         """
+        if server is not None:
+            try:
+                return TaplintService._run_server(server, tap_url, stages)
+            except StiltsError as e:
+                logger.warning(f"Running taplint in its own JVM instead: {e}")
+
+        if not interactive:
+            properties = {"auth.username": username, "auth.password": password}
+            command = TaplintService.command(
+                jar_path, tap_url, stages=stages, properties=properties
+            )
+            return TaplintService._run_batch(command)
+
+        command = TaplintService.command(jar_path, tap_url, stages=stages)
         child = None
-        command = f"java -jar {jar_path} taplint tapurl={tap_url}"
-        timeout = 150000
+        parser = TaplintParser()
+        report = parser.report
+        timeout = TAPLINT_TIMEOUT
         try:
-            child = pexpect.spawn(command, timeout=timeout)
+            child = pexpect.spawn(command[0], command[1:], timeout=timeout)
 
             child.expect("Username:", timeout=timeout)
             child.sendline(username)
@@ -47,10 +291,10 @@ class TaplintService:
             child.expect("Password:", timeout=timeout)
             child.sendline(password)
 
-            output = child.read().decode(errors="replace")
+            while line := child.readline():
+                parser.feed(line.decode(errors="replace"))
             child.close()
-
-            return output, child.exitstatus  # noqa: TRY300
+            report.exit_status = child.exitstatus
         except pexpect.TIMEOUT:
             error_output = (
                 child.before.decode(errors="replace")
@@ -58,7 +302,8 @@ class TaplintService:
                 else "No output available"
             )
             logger.exception(f"Timeout occurred. Last output: {error_output}")
-            return f"Timeout occurred after {timeout} seconds", -1
+            report.error = f"Timeout occurred after {timeout} seconds"
+            report.exit_status = -1
         except pexpect.EOF:
             error_output = (
                 child.before.decode(errors="replace")
@@ -66,11 +311,239 @@ class TaplintService:
                 else "No output available"
             )
             logger.exception(f"EOF encountered. Last output: {error_output}")
-            exitstatus = child.exitstatus if child else -1
-            return "Process ended unexpectedly", exitstatus
+            report.error = "Process ended unexpectedly"
+            report.exit_status = child.exitstatus if child else -1
         except Exception as e:
             logger.exception(f"An error occurred: {e!s}")
-            return f"Error: {e!s}", -1
+            report.error = f"Error: {e!s}"
+            report.exit_status = -1
+        finally:
+            parser.close()
+        return report
+
+    @staticmethod
+    def _run_server(
+        server: StiltsServer, tap_url: str, stages: str | None
+    ) -> TaplintReport:
+        """Run taplint in a resident STILTS server.
+
+        The server does not report the exit status of its tasks, so a run
+        that did not print its totals counts as failed.
+        """
+        parser = TaplintParser()
+        parameters = {"tapurl": tap_url}
+        if stages:
+            parameters["stages"] = stages
+        try:
+            for line in server.run_task("taplint", parameters, timeout=TAPLINT_TIMEOUT):
+                parser.feed(line)
+        finally:
+            parser.close()
+        report = parser.report
+        if not report.complete:
+            report.exit_status = 1
+            report.error = "taplint ended before printing its totals"
+        return report
+
+    @staticmethod
+    def _run_batch(command: list[str]) -> TaplintReport:
+        """Run taplint without a terminal, killing it after the timeout."""
+        parser = TaplintParser()
+        report = parser.report
+        timed_out = threading.Event()
+        try:
+            process = subprocess.Popen(
+                command,
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+            )
+        except OSError as e:
+            logger.exception(f"An error occurred: {e!s}")
+            report.error = f"Error: {e!s}"
+            report.exit_status = -1
+            return parser.close()
+
+        def kill() -> None:
+            timed_out.set()
+            process.kill()
+
+        timer = threading.Timer(TAPLINT_TIMEOUT, kill)
+        timer.start()
+        # The output is always piped
+        assert process.stdout is not None  # noqa: S101
+        try:
+            with process:
+                for line in process.stdout:
+                    parser.feed(line.decode(errors="replace"))
+        finally:
+            timer.cancel()
+            parser.close()
+        if timed_out.is_set():
+            report.error = f"Timeout occurred after {TAPLINT_TIMEOUT} seconds"
+            report.exit_status = -1
+        else:
+            report.exit_status = process.returncode
+        return report
+
+
+class TaplintOrchestrator:
+    """Run taplint against several TAP apps at once, optionally split by stage.
+
+    Each app is checked by its own taplint process, all running at the same
+    time. A run can also be split into groups of stages run by separate
+    processes, whose reports are merged back into one. The first group also
+    runs every stage not listed in any group, so no default stage is lost.
+    Stages that need the table metadata, such as the query stages, only
+    have it if their group also runs a metadata stage such as ``TMS``; a
+    stage run by several groups is counted once, from the first of them.
+
+    Parameters
+    ----------
+    jar_path
+        Path to the STILTS JAR file.
+    username
+        The username for authentication.
+    password
+        The password for authentication.
+    stage_groups
+        The groups of stage codes to run in parallel, e.g. ``[["TMS", "QGE",
+        "QPO"], ["TMS", "QAS", "UWS"]]``. A single run of the default stages
+        if empty.
+    interactive
+        Whether to answer STILTS' prompts for the credentials through a
+        pseudo-terminal, see `TaplintService.run`.
+    server
+        A resident STILTS server to run taplint in, see
+        `TaplintService.run`.
+    """
+
+    def __init__(
+        self,
+        jar_path: Path,
+        username: str,
+        password: str,
+        *,
+        stage_groups: Sequence[Sequence[str]] = (),
+        interactive: bool = True,
+        server: StiltsServer | None = None,
+    ) -> None:
+        self.jar_path = jar_path
+        self.username = username
+        self.password = password
+        self.stage_groups = [list(group) for group in stage_groups]
+        self.interactive = interactive
+        self.server = server
+
+    def stage_options(self) -> list[str | None]:
+        """Return the ``stages`` option of each process of a run.
+
+        Returns
+        -------
+        list[str | None]
+            One option per stage group, or `None` for a single run of the
+            default stages.
+        """
+        if len(self.stage_groups) < 2:
+            return [None]
+        grouped = {code for group in self.stage_groups for code in group}
+        options: list[str | None] = []
+        for i, group in enumerate(self.stage_groups):
+            # Later groups also skip the known stages in no group
+            skipped = grouped if i == 0 else grouped | set(TAPLINT_STAGES)
+            words = [f"+{code}" for code in group]
+            words += [f"-{code}" for code in sorted(skipped - set(group))]
+            options.append(" ".join(words))
+        return options
+
+    def run(self, tap_urls: Mapping[str, str]) -> dict[str, TaplintReport]:
+        """Run taplint against TAP apps.
+
+        Parameters
+        ----------
+        tap_urls
+            The TAP URL of each app, keyed by app name.
+
+        Returns
+        -------
+        dict[str, TaplintReport]
+            The merged report of each app.
+        """
+        options = self.stage_options()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=len(tap_urls) * len(options)) as pool:
+            futures = {
+                app: [
+                    pool.submit(
+                        TaplintService.run,
+                        self.jar_path,
+                        url,
+                        self.username,
+                        self.password,
+                        stages=stages,
+                        interactive=self.interactive,
+                        server=self.server,
+                    )
+                    for stages in options
+                ]
+                for app, url in tap_urls.items()
+            }
+            reports = {
+                app: self.merge([future.result() for future in app_futures])
+                for app, app_futures in futures.items()
+            }
+        logger.info(
+            f"taplint of {', '.join(tap_urls)} took "
+            f"{time.perf_counter() - start:.1f}s in {len(options)} parts each"
+        )
+        return reports
+
+    @staticmethod
+    def merge(reports: Sequence[TaplintReport]) -> TaplintReport:
+        """Merge the reports of runs of different stages into one.
+
+        Parameters
+        ----------
+        reports
+            The reports, in the order of their stage groups.
+
+        Returns
+        -------
+        TaplintReport
+            The stages, findings and totals of all the runs, each stage
+            counted once. The totals are only known if every run printed
+            them, and the exit status is the first that is not zero.
+        """
+        if len(reports) == 1:
+            return reports[0]
+        merged = TaplintReport(totals={})
+        for report in reports:
+            seen = {stage.code for stage in merged.stages}
+            stages = [s for s in report.stages if s.code not in seen]
+            merged.stages.extend(stages)
+            kept = {stage.code for stage in stages}
+            merged.findings.extend(f for f in report.findings if f.stage in kept)
+
+            if report.totals is None or merged.totals is None:
+                merged.totals = None
+            else:
+                # Taplint's totals include reports it did not print, so the
+                # stages counted twice are taken off them rather than the
+                # totals being counted from the stages
+                for severity, count in report.totals.items():
+                    duplicates = sum(
+                        s.counts.get(severity, 0)
+                        for s in report.stages
+                        if s.code not in kept
+                    )
+                    merged.totals[severity] = (
+                        merged.totals.get(severity, 0) + count - duplicates
+                    )
+            if report.exit_status and not merged.exit_status:
+                merged.exit_status = report.exit_status
+            if report.error:
+                merged.error = "; ".join(filter(None, [merged.error, report.error]))
+        return merged
 
 
 class TaplintParserService:
@@ -91,15 +564,5 @@ class TaplintParserService:
         tuple[int, int]
             A tuple containing the number of errors and warnings.
         """
-        errors, warnings = 0, 0
-        lines = output.split("\n")
-        for line in reversed(lines):
-            if line.startswith("Totals:"):
-                error_match = re.search(r"Errors:\s+(\d+)", line)
-                if error_match:
-                    errors = int(error_match.group(1))
-                warning_match = re.search(r"Warnings:\s+(\d+)", line)
-                if warning_match:
-                    warnings = int(warning_match.group(1))
-                break
-        return errors, warnings
+        report = TaplintParser.parse(output.splitlines())
+        return report.errors, report.warnings
@@ -1,10 +1,16 @@
 """Runner service module, used for running tests concurrently."""
 
+import asyncio
+import threading
+import time
 from collections.abc import Callable
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import Any
 
-from ..models.tap import QueryResult
+from ..config import logger, settings
+from ..models.tap import QueryResultBatch
+from ..models.test import ArrivalPattern, OpenLoopReport
+from ..utils.arrivals import arrival_offsets
 
 __all__ = ["Runner"]
 
@@ -21,7 +27,7 @@ class Runner:
         test_data: list[dict[str, Any]],
         user_count: int,
         **kwargs: Any,
-    ) -> list[list[QueryResult]]:
+    ) -> QueryResultBatch:
         """
         Run a test function concurrently with a specified number of users.
 
@@ -33,29 +39,219 @@ class Runner:
             The data to be passed to each test function call.
         user_count
             The number of concurrent users (threads) to simulate.
+        **kwargs
+            Additional keyword arguments to pass to the test function. A
+            ``start_times`` keyword, if given, is a list of one wall-clock
+            (``time.time``) start time per user and is not passed on; each
+            user waits until its start time before running its tests. A
+            ``clients`` keyword, if given, is a list of one client per user
+            used instead of the shared ``client``.
+
+        Returns
+        -------
+        QueryResultBatch
+            The results of the test function calls in the order they
+            completed, with the index of the user that made each.
+        """
+        client = kwargs.pop("client", None)
+        clients = kwargs.pop("clients", None) or [client] * user_count
+        mode = kwargs.pop("mode", None)
+        start_times = kwargs.pop("start_times", None) or [None] * user_count
+        results = QueryResultBatch(spill_rows=settings.load_results_spill)
+
+        def _run_user_tests(user: int, client: Any, start_time: float | None) -> None:
+            """
+            Run the tests of a single user one after another.
+
+            Parameters
+            ----------
+            user
+                The index of the user.
+            client
+                The client used by this user.
+            start_time
+                The wall-clock time to start at, or `None` to start at once.
+            """
+            if start_time is not None:
+                time.sleep(max(start_time - time.time(), 0))
+            for data in test_data:
+                results.append(test_function(client, data, mode, **kwargs), user)
+
+        with ThreadPoolExecutor(max_workers=user_count) as executor:
+            futures = [
+                executor.submit(_run_user_tests, user, c, t)
+                for user, (c, t) in enumerate(zip(clients, start_times, strict=True))
+            ]
+            for future in as_completed(futures):
+                future.result()
+        return results
+
+    @staticmethod
+    def run_concurrent_test_async(
+        test_function: Callable,
+        test_data: list[dict[str, Any]],
+        user_count: int,
+        **kwargs: Any,
+    ) -> QueryResultBatch:
+        """
+        Run a coroutine test function concurrently on one event loop.
+
+        Each simulated user is a task rather than an OS thread, so thousands
+        of users can be driven from one process. The client, if given, must
+        be an asynchronous context manager and is opened for the run.
+
+        Parameters
+        ----------
+        test_function
+            The coroutine function to be executed concurrently.
+        test_data
+            The data to be passed to each test function call.
+        user_count
+            The number of concurrent users (tasks) to simulate.
         **kwargs
             Additional keyword arguments to pass to the test function.
 
         Returns
         -------
-        List[Dict[str, Any]]
-            A list of results from the test function calls
+        QueryResultBatch
+            The results of the test function calls in the order they
+            completed, with the index of the user that made each.
         """
         client = kwargs.pop("client", None)
         mode = kwargs.pop("mode", None)
+        results = QueryResultBatch(spill_rows=settings.load_results_spill)
 
-        def _run_user_tests() -> list[QueryResult]:
+        async def _run_user_tests(user: int) -> None:
             """
-            Run the user tests concurrently.
+            Run the tests of a single user one after another.
 
-            Returns
-            -------
-            List[QueryResult]
-                A list of results from the test function calls
+            Parameters
+            ----------
+            user
+                The index of the user.
+            """
+            for data in test_data:
+                results.append(await test_function(client, data, mode, **kwargs), user)
 
+        async def _run_all_users() -> None:
+            """Run the tests of all users concurrently."""
+            if client is None:
+                await asyncio.gather(*(_run_user_tests(u) for u in range(user_count)))
+                return
+            async with client:
+                await asyncio.gather(*(_run_user_tests(u) for u in range(user_count)))
+
+        asyncio.run(_run_all_users())
+        return results
+
+    @staticmethod
+    def run_open_loop_test(
+        test_function: Callable,
+        test_data: list[dict[str, Any]],
+        rate: float,
+        duration: float,
+        max_workers: int,
+        *,
+        arrival: ArrivalPattern = ArrivalPattern.CONSTANT,
+        ramp_steps: int = 1,
+        seed: int | None = None,
+        **kwargs: Any,
+    ) -> OpenLoopReport:
+        """
+        Run a test function at a target arrival rate.
+
+        Unlike ``run_concurrent_test``, queries are started on a fixed
+        schedule regardless of how long earlier queries take, so a slow
+        service shows up as growing queueing delay instead of as a lower
+        offered load. Queries are taken from ``test_data`` in turn.
+
+        Parameters
+        ----------
+        test_function
+            The function to be executed for each arrival.
+        test_data
+            The data to be passed to the test function calls, used
+            round-robin.
+        rate
+            The target arrival rate in calls per second.
+        duration
+            The length of the test in seconds.
+        max_workers
+            The maximum number of calls in flight at once. Arrivals beyond
+            this wait for a free worker, which counts as queueing delay.
+        arrival
+            The arrival pattern.
+        ramp_steps
+            The number of steps used by a ramp arrival pattern.
+        seed
+            Seed for the random number generator used by Poisson arrivals.
+        **kwargs
+            Additional keyword arguments to pass to the test function.
+
+        Returns
+        -------
+        OpenLoopReport
+            The offered and achieved rates and the individual results.
+        """
+        client = kwargs.pop("client", None)
+        mode = kwargs.pop("mode", None)
+        if not test_data:
+            raise ValueError("No test data provided")
+
+        start = time.perf_counter()
+        finished_at = start
+        finished_lock = threading.Lock()
+        errors = 0
+        results = QueryResultBatch(spill_rows=settings.load_results_spill)
+
+        def _run_scheduled(data: dict[str, Any], scheduled: float) -> None:
             """
-            return [test_function(client, data, mode, **kwargs) for data in test_data]
+            Run a single call and record how long it waited to start.
 
-        with ThreadPoolExecutor(max_workers=user_count) as executor:
-            futures = [executor.submit(_run_user_tests) for _ in range(user_count)]
-            return [future.result() for future in as_completed(futures)]
+            Parameters
+            ----------
+            data
+                The data to pass to the test function.
+            scheduled
+                The ``perf_counter`` time the call was due to start.
+            """
+            nonlocal finished_at
+            started = time.perf_counter()
+            try:
+                result = test_function(client, data, mode, **kwargs)
+            finally:
+                # Failed calls also count towards the length of the run
+                with finished_lock:
+                    finished_at = max(finished_at, time.perf_counter())
+            result.queue_delay = started - scheduled
+            results.append(result)
+
+        futures = []
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            offsets = arrival_offsets(
+                arrival, rate, duration, ramp_steps=ramp_steps, seed=seed
+            )
+            for i, offset in enumerate(offsets):
+                scheduled = start + offset
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                data = test_data[i % len(test_data)]
+                futures.append(executor.submit(_run_scheduled, data, scheduled))
+
+        for future in futures:
+            try:
+                future.result()
+            except Exception as e:
+                errors += 1
+                logger.exception(f"Open-loop call failed: {e!s}")
+
+        elapsed = finished_at - start
+        return OpenLoopReport(
+            offered_rate=len(futures) / duration,
+            achieved_rate=len(results) / elapsed if elapsed > 0 else 0.0,
+            elapsed=elapsed,
+            scheduled=len(futures),
+            errors=errors,
+            results=results,
+        )
@@ -0,0 +1,396 @@
+"""Helpers for the UWS jobs that run TAP async queries."""
+
+import asyncio
+import time
+from io import BytesIO
+from urllib.parse import urljoin
+
+import httpx
+import pyvo
+import requests
+from pyvo.io.uws import parse_job
+from pyvo.io.uws.tree import JobSummary
+
+from ..models.tap import JobWaitResult, PhaseTransition, QueryPhase
+
+__all__ = ["AsyncUWSJobWaiter", "UWSJobService", "UWSJobWaiter"]
+
+# UWS phases in which a job is still waiting for or producing its result
+ACTIVE_PHASES = ("PENDING", "QUEUED", "EXECUTING")
+
+# Phases in which a UWS 1.1 service blocks on WAIT until the phase changes
+_BLOCKING_PHASES = ("QUEUED", "EXECUTING")
+
+# Number of WAIT requests answered early with no phase change after which
+# the service is assumed to ignore WAIT
+_MAX_EARLY_RETURNS = 2
+
+
+class UWSJobService:
+    """UWS job helper class."""
+
+    def __init__(self) -> None:
+        pass
+
+    @staticmethod
+    def phase_durations(job: JobSummary) -> dict[str, float]:
+        """Return the time a finished job spent queued and executing.
+
+        The durations are taken from the job's creation, start and end
+        times as reported by the service, so they exclude the time taken to
+        poll the job. Times the service did not report are left out.
+
+        Parameters
+        ----------
+        job
+            The summary of the finished job.
+
+        Returns
+        -------
+        dict[str, float]
+            The durations in seconds, keyed by `QueryPhase` value.
+        """
+        phases = {}
+        if job.creationtime is not None and job.starttime is not None:
+            queued = job.starttime - job.creationtime
+            phases[QueryPhase.QUEUED.value] = float(queued.sec)
+        if job.starttime is not None and job.endtime is not None:
+            executing = job.endtime - job.starttime
+            phases[QueryPhase.EXECUTING.value] = float(executing.sec)
+        return phases
+
+    @staticmethod
+    def query_phases(waited: JobWaitResult) -> dict[str, float]:
+        """Return the time a finished job spent queued and executing.
+
+        The service's job times are used when it reports them, and the
+        phase transitions seen while waiting for the job otherwise.
+
+        Parameters
+        ----------
+        waited
+            The outcome of waiting for the job.
+
+        Returns
+        -------
+        dict[str, float]
+            The durations in seconds, keyed by `QueryPhase` value.
+        """
+        observed = waited.phase_durations()
+        phases = {
+            phase.value: observed[uws_phase]
+            for phase, uws_phase in (
+                (QueryPhase.QUEUED, "QUEUED"),
+                (QueryPhase.EXECUTING, "EXECUTING"),
+            )
+            if uws_phase in observed
+        }
+        phases.update(UWSJobService.phase_durations(waited.job))
+        return phases
+
+    @staticmethod
+    def error_message(job: JobSummary) -> str:
+        """Return the error message of a failed job.
+
+        Parameters
+        ----------
+        job
+            The summary of the failed job.
+
+        Returns
+        -------
+        str
+            The message of the job's error summary, or a placeholder if the
+            service gave none.
+        """
+        summary = job.errorsummary
+        if summary is not None and summary.message is not None:
+            message = (summary.message.content or "").strip()
+            if message:
+                return message
+        return "<No useful error from server>"
+
+    @staticmethod
+    def result_url(job_url: str, job: JobSummary) -> str | None:
+        """Return the URL of the standard TAP result of a job.
+
+        Parameters
+        ----------
+        job_url
+            The URL of the job, against which relative links are resolved.
+        job
+            The summary of the finished job.
+
+        Returns
+        -------
+        str or None
+            The URL of the ``results/result`` result, or of the result with
+            the ID ``result``, or `None` if the job has neither.
+        """
+        results = [r for r in job.results if r.href and r.href.strip()]
+        for result in results:
+            if result.href.endswith("results/result"):
+                return urljoin(job_url, result.href)
+        for result in results:
+            if result.id_ == "result":
+                return urljoin(job_url, result.href)
+        return None
+
+
+class _WaitState:
+    """The progress of waiting for one job, shared by both waiters."""
+
+    def __init__(
+        self,
+        job_url: str,
+        *,
+        timeout: float,
+        long_poll: float,
+        min_interval: float,
+        max_interval: float,
+    ) -> None:
+        self.job_url = job_url
+        self.timeout = timeout
+        self.long_poll = long_poll
+        self.max_interval = max_interval
+        self.deadline = time.monotonic() + timeout
+        self.interval = min_interval
+        self.job: JobSummary | None = None
+        self.transitions: list[PhaseTransition] = []
+        self.requests = 0
+        self.long_polling = False
+        self.early_returns = 0
+        self.requested_wait = 0
+
+    def remaining(self) -> float:
+        """Return the time left before the wait times out."""
+        return self.deadline - time.monotonic()
+
+    def params(self) -> dict[str, str]:
+        """Return the query parameters of the next request for the job."""
+        self.requested_wait = 0
+        if self.job is None or not self.long_polling:
+            return {}
+        self.requested_wait = max(int(min(self.long_poll, self.remaining())), 1)
+        return {"WAIT": str(self.requested_wait), "PHASE": self.job.phase}
+
+    def request_timeout(self) -> float:
+        """Return the HTTP timeout of the next request, beyond any WAIT."""
+        return self.requested_wait + 30.0
+
+    def observe(self, job: JobSummary, elapsed: float) -> float | None:
+        """Record the state of the job returned by a request.
+
+        Parameters
+        ----------
+        job
+            The job summary returned.
+        elapsed
+            The time the request took.
+
+        Returns
+        -------
+        float or None
+            The time to sleep before the next request, or `None` if the job
+            has finished.
+
+        Raises
+        ------
+        TimeoutError
+            If the job is still active and the wait has timed out.
+        """
+        self.requests += 1
+        previous = self.job.phase if self.job is not None else None
+        self.job = job
+        if job.phase != previous:
+            self.transitions.append(PhaseTransition(job.phase, time.time()))
+        if job.phase not in ACTIVE_PHASES:
+            return None
+        if self.remaining() <= 0:
+            raise TimeoutError(
+                f"UWS job {self.job_url} still {job.phase} after {self.timeout}s"
+            )
+
+        if previous is None:
+            version = getattr(job, "version", None)
+            self.long_polling = self.long_poll > 0 and version == "1.1"
+        elif (
+            self.long_polling
+            and job.phase == previous
+            and job.phase in _BLOCKING_PHASES
+            and elapsed < self.requested_wait / 2
+        ):
+            # The service returned long before the WAIT without a phase
+            # change, so it probably ignores WAIT
+            self.early_returns += 1
+            self.long_polling = self.early_returns < _MAX_EARLY_RETURNS
+
+        if self.long_polling and job.phase in _BLOCKING_PHASES:
+            return 0.0
+        delay = min(self.interval, self.remaining())
+        self.interval = min(self.interval * 2, self.max_interval)
+        return delay
+
+    def result(self) -> JobWaitResult:
+        """Return the outcome of the wait."""
+        if self.job is None:
+            raise RuntimeError("No job state has been observed")
+        return JobWaitResult(
+            phase=self.job.phase,
+            job=self.job,
+            transitions=self.transitions,
+            requests=self.requests,
+            long_polling=self.long_polling,
+        )
+
+
+class UWSJobWaiter:
+    """Wait for UWS jobs to finish with as few requests as possible.
+
+    If the service speaks UWS 1.1, each request blocks on the ``WAIT``
+    parameter until the job's phase changes, so phase transitions are seen
+    as soon as they happen with one request per transition. Otherwise, or
+    if the service turns out to ignore ``WAIT``, the job is polled with
+    exponential backoff.
+
+    Parameters
+    ----------
+    session
+        The authenticated session used to read the jobs.
+    timeout
+        The maximum time in seconds to wait for a job.
+    long_poll
+        The maximum ``WAIT`` in seconds of a single request. 0 disables
+        long polling.
+    min_interval
+        The first polling interval in seconds when not long polling.
+    max_interval
+        The polling interval in seconds that backoff stops at.
+    """
+
+    def __init__(
+        self,
+        session: requests.Session | pyvo.auth.AuthSession,
+        *,
+        timeout: float = 600.0,
+        long_poll: float = 60.0,
+        min_interval: float = 0.1,
+        max_interval: float = 2.0,
+    ) -> None:
+        self.session = session
+        self.timeout = timeout
+        self.long_poll = long_poll
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+
+    def wait(self, job_url: str) -> JobWaitResult:
+        """Wait until a job leaves the active phases.
+
+        Parameters
+        ----------
+        job_url
+            The URL of the job.
+
+        Returns
+        -------
+        JobWaitResult
+            The final state of the job and the phases it went through.
+
+        Raises
+        ------
+        TimeoutError
+            If the job is still active after the timeout.
+        requests.HTTPError
+            If reading the job fails.
+        """
+        state = _WaitState(
+            job_url,
+            timeout=self.timeout,
+            long_poll=self.long_poll,
+            min_interval=self.min_interval,
+            max_interval=self.max_interval,
+        )
+        while True:
+            start = time.perf_counter()
+            response = self.session.get(
+                job_url, params=state.params(), timeout=state.request_timeout()
+            )
+            response.raise_for_status()
+            job = parse_job(BytesIO(response.content))
+            delay = state.observe(job, time.perf_counter() - start)
+            if delay is None:
+                return state.result()
+            time.sleep(delay)
+
+
+class AsyncUWSJobWaiter:
+    """Asynchronous equivalent of `UWSJobWaiter`.
+
+    Parameters
+    ----------
+    client
+        The open authenticated HTTP client used to read the jobs.
+    timeout
+        The maximum time in seconds to wait for a job.
+    long_poll
+        The maximum ``WAIT`` in seconds of a single request. 0 disables
+        long polling.
+    min_interval
+        The first polling interval in seconds when not long polling.
+    max_interval
+        The polling interval in seconds that backoff stops at.
+    """
+
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        *,
+        timeout: float = 600.0,
+        long_poll: float = 60.0,
+        min_interval: float = 0.1,
+        max_interval: float = 2.0,
+    ) -> None:
+        self.client = client
+        self.timeout = timeout
+        self.long_poll = long_poll
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+
+    async def wait(self, job_url: str) -> JobWaitResult:
+        """Wait until a job leaves the active phases.
+
+        Parameters
+        ----------
+        job_url
+            The URL of the job.
+
+        Returns
+        -------
+        JobWaitResult
+            The final state of the job and the phases it went through.
+
+        Raises
+        ------
+        TimeoutError
+            If the job is still active after the timeout.
+        httpx.HTTPStatusError
+            If reading the job fails.
+        """
+        state = _WaitState(
+            job_url,
+            timeout=self.timeout,
+            long_poll=self.long_poll,
+            min_interval=self.min_interval,
+            max_interval=self.max_interval,
+        )
+        while True:
+            start = time.perf_counter()
+            response = await self.client.get(
+                job_url, params=state.params(), timeout=state.request_timeout()
+            )
+            response.raise_for_status()
+            job = parse_job(BytesIO(response.content))
+            delay = state.observe(job, time.perf_counter() - start)
+            if delay is None:
+                return state.result()
+            await asyncio.sleep(delay)
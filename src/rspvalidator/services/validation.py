@@ -1,18 +1,18 @@
 """Validators used to assert the expected behavior of the Rubin Science Platform."""
 
-import time
 from abc import ABC, abstractmethod
-from pathlib import Path
+from typing import Any
 
 import pyvo
-from jinja2 import Environment, FileSystemLoader
-from lxml import etree
-from playwright.sync_api import Page, expect
 
 from ..config import BASE_URL, logger, taplint_maximums
 from ..constants import TAP_SCHEMA_QUERY
+from ..models.taplint import TaplintReport
+from .capabilities import CapabilitiesService
 from .configreader import ConfigReaderService
-from .taplint import TaplintParserService
+from .metrics import MetricsService
+from .tap import TAPOperationsService
+from .uws import UWSJobWaiter
 
 __all__ = [
     "TAPValidationService",
@@ -51,16 +51,24 @@ class TAPValidationService:
         query = TAP_SCHEMA_QUERY
         job = self.tap_client.submit_job(query)
         job.run()
-        start_time = time.time()
-        timedout = False
-
-        while job.phase in ("EXECUTING", "PENDING", "QUEUED"):
-            if time.time() - start_time > 30:
-                timedout = True
-                break
-            time.sleep(1)
+        waiter = UWSJobWaiter(
+            TAPOperationsService.get_session(self.tap_client), timeout=30
+        )
+        try:
+            waited = waiter.wait(job.url)
+        except TimeoutError:
+            waited = None
+        assert waited is not None, "UWS job did not finish within 30 seconds"
+        transitions = ", ".join(
+            f"{t.phase} at {t.timestamp:.3f}" for t in waited.transitions
+        )
+        logger.info(
+            f"UWS job {job.job_id} went through {transitions} in "
+            f"{waited.requests} requests"
+            + (" using WAIT" if waited.long_polling else "")
+        )
 
-        assert not timedout
+        assert waited.phase == "COMPLETED"
         assert job.phase == "COMPLETED"
         assert job.destruction is not None
         assert job.owner is not None
@@ -68,7 +76,7 @@ class TAPValidationService:
         assert job.execution_duration is not None
         assert job.job_id is not None
         assert job.query == TAP_SCHEMA_QUERY
-        assert job.result.href.startswith(f"{BASE_URL}/api/{self.app}/results")
+        assert job.result.href.startswith(f"{self.tap_client.baseurl}/results")
         job.delete()
 
     @staticmethod
@@ -79,6 +87,7 @@ class TAPValidationService:
         include_geometry: bool = False,
         include_upload: bool = False,
         actual_capabilities: bytes,
+        base_url: str | None = None,
     ) -> None:
         """
         Validate the /capabilities endpoint.
@@ -95,40 +104,23 @@ class TAPValidationService:
             Whether to include TAP_UPLOAD in the capabilities.
         actual_capabilities
             The actual capabilities XML.
+        base_url
+            The base URL the capabilities should point to, by default that of
+            the platform under test.
         """
-        # Go up one directory level and then into the 'templates' directory
-        templates_dir = Path(__file__).parent.parent / "templates"
-        env = Environment(  # noqa: S701
-            loader=FileSystemLoader(templates_dir),
-            trim_blocks=True,
-            lstrip_blocks=True,
-        )
-        template = env.get_template("capabilities.xml")
-
-        # Render the template
-        expected_capabilities = template.render(
-            BASE_URL=BASE_URL,
-            app=app,
+        differences = CapabilitiesService.compare(
+            actual_capabilities,
+            base_url or BASE_URL,
+            app,
             include_datamodel=include_datamodel,
             include_geometry=include_geometry,
             include_upload=include_upload,
         )
-        expected_root = etree.fromstring(  # noqa: S320
-            expected_capabilities.encode()
-        )
-        actual_root = etree.fromstring(actual_capabilities)  # noqa: S320
-
-        actual_xml_str = etree.tostring(
-            actual_root, pretty_print=True, encoding="unicode"
-        )
-        expected_xml_str = etree.tostring(
-            expected_root, pretty_print=True, encoding="unicode"
+        assert not differences, (
+            "The actual XML does not match the expected XML:\n"
+            + "\n".join(str(difference) for difference in differences)
         )
 
-        assert (
-            actual_xml_str == expected_xml_str
-        ), "The actual XML does not match the expected XML"
-
     def validate_tables(self) -> None:
         """Validate that the TAP client has tables."""
         tables = self.tap_client.tables
@@ -141,7 +133,7 @@ class SquareOneValidationService:
     Rubin Science Platform's squareone app.
     """
 
-    def __init__(self, page: Page) -> None:
+    def __init__(self, page: Any) -> None:
         self.page = page
 
     def validate(self) -> None:
@@ -150,6 +142,8 @@ class SquareOneValidationService:
 
     def validate_squareone_homepage(self) -> None:
         """Validate the RSP (squareone) homepage."""
+        from playwright.sync_api import expect
+
         self.page.goto(ConfigReaderService.get_url("squareone"))
         expect(self.page.locator("h1")).to_contain_text("Rubin Science Platform")
         expect(self.page.locator("section")).to_contain_text("Portal")
@@ -162,10 +156,11 @@ class TaplintValidationService:
     Rubin Science Platform's tap & ssotap apps using taplint.
     """
 
-    def __init__(self, app: str, output: str) -> None:
+    def __init__(self, app: str, report: TaplintReport) -> None:
+        self.app = app
         self._max_errors = taplint_maximums[app]["errors"]
         self._max_warnings = taplint_maximums[app]["warnings"]
-        self.output = output
+        self.report = report
 
     def validate(self) -> None:
         """Validate the Rubin Science Platform's squareone app."""
@@ -173,9 +168,16 @@ class TaplintValidationService:
 
     def validate_summary(self) -> None:
         """Validate an RSP Taplint run."""
-        error_count, warning_count = TaplintParserService.parse_summary(self.output)
+        report = self.report
+        MetricsService.record_taplint(self.app, report)
+
+        assert report.exit_status == 0, (
+            f"STILTS TAPLINT failed with exit status {report.exit_status}"
+            + (f": {report.error}" if report.error else "")
+        )
+        assert report.complete, "Failed to parse TAPLINT summary"
 
-        assert error_count is not None, "Failed to parse TAPLINT summary"
+        error_count, warning_count = report.errors, report.warnings
 
         assert error_count <= self._max_errors, (
             f"TAPLINT reported {error_count} errors, which exceeds the limit "
@@ -187,5 +189,10 @@ class TaplintValidationService:
             f"limit of {self._max_warnings}"
         )
 
-        logger.info("Full output:")
-        logger.info(self.output)
+        for stage in report.stages:
+            logger.info(
+                f"Stage {stage.code} ({stage.description}): {stage.duration:.1f}s, "
+                f"{stage.errors} errors, {stage.warnings} warnings"
+            )
+        for finding in report.findings:
+            logger.info(str(finding))
@@ -4,21 +4,131 @@ from typing import Any
 
 import pytest
 import pyvo
-from playwright.sync_api import Page
 
-from ..config import SCENARIOS, capability_includes, logger
+from ..config import (
+    BASELINE_RUNS,
+    LATENCY_PERCENTILE,
+    LOAD_ENGINE,
+    LOAD_RAMP_UP,
+    LOAD_WORKERS,
+    OPEN_LOOP_SCENARIOS,
+    REGRESSION_ALPHA,
+    REGRESSION_MIN_RATIO,
+    REMOTE_WORKERS,
+    SCENARIOS,
+    TAP_POOL_OPTIONS,
+    TAP_SESSION_PER_USER,
+    capability_includes,
+    logger,
+)
+from ..factories.tap_factory import TAPFactory
+from ..models.tap import QueryResultBatch
 from ..models.test import Scenario
+from ..services.benchmarks import BenchmarkStoreService
 from ..services.configreader import ConfigReaderService
-from ..services.tap import TAPOperationsService, TAPQueryRunnerService
+from ..services.distributed import DistributedRunner
+from ..services.metrics import MetricsService
+from ..services.tap import (
+    AsyncTAPQueryRunnerService,
+    TAPOperationsService,
+    TAPQueryRunnerService,
+)
 from ..services.testrunner import Runner
 from ..services.validation import TAPValidationService
+from ..utils.histogram import LatencyRecorder
+
+
+def _phase_breakdown(results: QueryResultBatch, query: str) -> str:
+    """Format the mean time the results of a query spent in each phase."""
+    return ", ".join(
+        f"{phase} {seconds:.3f}s"
+        for phase, seconds in results.mean_phases(query).items()
+    )
+
+
+def _check_latencies(
+    scenario: Scenario,
+    recorder: LatencyRecorder,
+    queries: list[dict[str, Any]],
+    results: QueryResultBatch,
+    benchmark_store: BenchmarkStoreService | None,
+) -> None:
+    """Check the latencies of a scenario run against expectations.
+
+    Each query's latency at the configured percentile must be under twice
+    its expected duration. Once enough past runs are stored, the expected
+    duration is derived from them instead of from the queries file, and the
+    run is also checked for statistically significant regressions.
+
+    Parameters
+    ----------
+    scenario
+        The scenario that was run.
+    recorder
+        The recorder holding the latencies of the scenario.
+    queries
+        The queries that were run, with their expected durations.
+    results
+        The results of every query execution in the run.
+    benchmark_store
+        The store of past results, or `None` if disabled.
+    """
+    run_id = benchmark_store.record(scenario, results) if benchmark_store else None
+
+    logger.info(f"{scenario.description}: {recorder.summary()}")
+    recorded = set(recorder.recorded_keys())
+    for query in queries:
+        sql_query = query["query"]
+        if sql_query not in recorded:
+            # Failed queries are checked by the caller, so this query was
+            # never started, e.g. by an open-loop run too short to reach it
+            logger.warning(f"{scenario.description} [{sql_query}]: not run")
+            continue
+        expected_duration = query["expected_duration"]
+        if benchmark_store:
+            expected_duration = (
+                benchmark_store.expected_duration(
+                    scenario,
+                    sql_query,
+                    exclude_run_id=run_id,
+                    max_runs=BASELINE_RUNS,
+                )
+                or expected_duration
+            )
+        latency = recorder.percentile(LATENCY_PERCENTILE, key=sql_query)
+        logger.info(
+            f"{scenario.description} [{sql_query}]: {recorder.summary(sql_query)}"
+        )
+        if results.mask(query=sql_query).any():
+            logger.info(
+                f"{scenario.description} [{sql_query}] mean phases: "
+                f"{_phase_breakdown(results, sql_query)}"
+            )
+        assert latency <= 2 * expected_duration, (
+            f"p{LATENCY_PERCENTILE:g} query execution time ({latency:.2f}s) is more "
+            f"than twice the expected duration ({expected_duration:.2f}s)"
+        )
+
+    if benchmark_store and run_id:
+        comparisons = benchmark_store.compare_to_baseline(
+            scenario,
+            run_id,
+            [query["query"] for query in queries],
+            alpha=REGRESSION_ALPHA,
+            min_ratio=REGRESSION_MIN_RATIO,
+            max_runs=BASELINE_RUNS,
+        )
+        for comparison in comparisons:
+            logger.info(f"{scenario.description} {comparison}")
+        regressions = [str(c) for c in comparisons if c.regressed]
+        assert not regressions, "Latency regressions: " + "; ".join(regressions)
 
 
 def test_tap_capabilities_ssotap(
     tap_client_ssotap: pyvo.dal.TAPService,
     tap_validation_service_ssotap: TAPValidationService,
     data_dir: str,
-    page: Page,
+    page: Any,
 ) -> None:
     """Test SSO TAP capabilities endpoint.
 
@@ -57,7 +167,7 @@ def test_tap_capabilities_tap(
     tap_client_tap: pyvo.dal.TAPService,
     tap_validation_service_tap: TAPValidationService,
     data_dir: str,
-    page: Page,
+    page: Any,
 ) -> None:
     """Test TAP capabilities endpoint.
 
@@ -89,11 +199,15 @@ def test_tap_capabilities_tap(
     )
 
 
+# Load tests are run one at a time on a single worker, as their latencies
+# would be skewed by each other's load
+@pytest.mark.xdist_group("tap-load")
 @pytest.mark.parametrize("scenario", SCENARIOS, ids=lambda s: s.description)
 def test_tap_queries(
     request: Any,
     scenario: Scenario,
     data_dir: str,
+    benchmark_store: BenchmarkStoreService | None,
 ) -> None:
     """
     Test synchronous TAP queries for execution time and row count with
@@ -101,37 +215,151 @@ def test_tap_queries(
 
     This test fetches SQL queries from a JSON file, executes each query
     using a TAP sync query concurrently with a specified number of
-    users, and checks if the execution time < 2 * expected duration and if
-    the row count matches the expected row count.
+    users, and checks if the execution time at the configured percentile
+    < 2 * expected duration and if the row count matches the expected row
+    count.
+    """
+    app = scenario.app.value.lower()
+    queries = ConfigReaderService().get_queries(data_dir=data_dir, app=app)
+    recorder = LatencyRecorder()
+    if LOAD_WORKERS or REMOTE_WORKERS:
+        report = DistributedRunner.run(
+            scenario,
+            queries,
+            local_workers=LOAD_WORKERS,
+            remote_workers=REMOTE_WORKERS,
+            ramp_up=LOAD_RAMP_UP,
+            recorder=recorder,
+        )
+        assert not report.errors, f"Load workers failed: {report.errors}"
+        results = report.results
+    elif LOAD_ENGINE == "asyncio":
+        results = Runner.run_concurrent_test_async(
+            test_function=AsyncTAPQueryRunnerService.run_query_test,
+            test_data=queries,
+            user_count=scenario.users,
+            # Every user gets a connection, so none waits for one during its
+            # queries
+            client=TAPFactory.make_async_client(
+                auth_token=request.getfixturevalue("auth_token"),
+                app=app,
+                max_connections=scenario.users,
+            ),
+            mode=scenario.mode,
+            recorder=recorder,
+        )
+    else:
+        stats = request.getfixturevalue("connection_stats")[app]
+        clients = None
+        if TAP_SESSION_PER_USER:
+            clients = TAPFactory.make_clients(
+                request.getfixturevalue("auth_token"),
+                app,
+                scenario.users,
+                stats=stats,
+                **TAP_POOL_OPTIONS,
+            )
+        stats.reset()
+        try:
+            results = Runner.run_concurrent_test(
+                test_function=TAPQueryRunnerService.run_query_test,
+                test_data=queries,
+                user_count=scenario.users,
+                client=request.getfixturevalue("tap_client_" + app),
+                clients=clients,
+                mode=scenario.mode,
+                recorder=recorder,
+            )
+        finally:
+            for client in clients or []:
+                TAPOperationsService.close_client(client)
+        logger.info(f"{scenario.description}: {stats}")
+    MetricsService.record_queries(app, scenario.mode, results)
+    expected_checksums = {q["query"]: q.get("expected_checksums") for q in queries}
+    for result in results:
+        assert result.status == "OK", "Response status is not OK"
+        assert result.row_count == result.expected_row_count, (
+            f"Row count ({result.row_count}) does not match the expected row count "
+            f"({result.expected_row_count})"
+        )
+        if expected_checksums[result.query]:
+            assert result.checksums == expected_checksums[result.query], (
+                f"Column checksums {result.checksums} do not match the expected "
+                f"checksums {expected_checksums[result.query]}"
+            )
+
+        logger.info(
+            f"{scenario.app.value.upper()} {scenario.mode.value} query "
+            f"[{result.query}] test "
+            f"completed successfully with {scenario.users}"
+            f" users after {result.execution_duration:.2f} seconds, "
+            f"receiving {result.bytes_received} bytes decoded in "
+            f"{result.decode_duration:.2f} seconds."
+        )
+
+    _check_latencies(scenario, recorder, queries, results, benchmark_store)
+
+
+@pytest.mark.xdist_group("tap-load")
+# None are configured by default, which a lambda for ids cannot handle
+@pytest.mark.parametrize(
+    "scenario", OPEN_LOOP_SCENARIOS, ids=[s.description for s in OPEN_LOOP_SCENARIOS]
+)
+def test_tap_queries_open_loop(
+    request: Any,
+    scenario: Scenario,
+    data_dir: str,
+    benchmark_store: BenchmarkStoreService | None,
+) -> None:
+    """
+    Test TAP queries fired at a target arrival rate.
+
+    Queries are started on the scenario's arrival schedule no matter how long
+    earlier queries take, so that a saturated service shows up as queueing
+    delay instead of silently lowering the offered load. Checks that every
+    query completed with the expected row count and that the service time of
+    each query at the configured percentile is < 2 * expected duration.
     """
     app = scenario.app.value.lower()
     client = request.getfixturevalue("tap_client_" + app)
-    results_all_users = Runner.run_concurrent_test(
+    queries = ConfigReaderService().get_queries(data_dir=data_dir, app=app)
+    recorder = LatencyRecorder()
+    if scenario.rate is None or scenario.duration is None:
+        pytest.fail(f"{scenario.description} has no arrival rate and duration")
+    else:
+        rate, duration = scenario.rate, scenario.duration
+    report = Runner.run_open_loop_test(
         test_function=TAPQueryRunnerService.run_query_test,
-        test_data=ConfigReaderService().get_queries(data_dir=data_dir, app=app),
-        user_count=scenario.users,
+        test_data=queries,
+        rate=rate,
+        duration=duration,
+        max_workers=scenario.users,
+        arrival=scenario.arrival,
+        ramp_steps=scenario.ramp_steps,
         client=client,
         mode=scenario.mode,
+        recorder=recorder,
     )
-    for user_result in results_all_users:
-        for result in user_result:
-            assert result.status == "OK", "Response status is not OK"
-            assert result.execution_duration <= 2 * result.expected_duration, (
-                f"Query execution time ({result.execution_duration:.2f}s) is more "
-                f"than twice the expected duration ("
-                f"{result.expected_duration:.2f}s)"
-            )
-            assert result.row_count == result.expected_row_count, (
-                f"Row count ({result.row_count}) does not match the expected row count "
-                f"({result.expected_row_count})"
-            )
 
-            logger.info(
-                f"{scenario.app.value.upper()} {scenario.mode.value} query "
-                f"[{result.query}] test "
-                f"completed successfully with {scenario.users}"
-                f" users after {result.execution_duration:.2f} seconds."
-            )
+    logger.info(
+        f"{scenario.description}: offered {report.offered_rate:.2f} qps, "
+        f"achieved {report.achieved_rate:.2f} qps, mean queue delay "
+        f"{report.mean_queue_delay:.2f}s (max {report.max_queue_delay:.2f}s), "
+        f"mean service time {report.mean_service_time:.2f}s."
+    )
+
+    MetricsService.record_queries(
+        app, scenario.mode, report.results, errors=report.errors
+    )
+    assert report.errors == 0, f"{report.errors} queries failed"
+    for result in report.results:
+        assert result.status == "OK", "Response status is not OK"
+        assert result.row_count == result.expected_row_count, (
+            f"Row count ({result.row_count}) does not match the expected row count "
+            f"({result.expected_row_count})"
+        )
+
+    _check_latencies(scenario, recorder, queries, report.results, benchmark_store)
 
 
 def test_tap_get_tables_ssotap(
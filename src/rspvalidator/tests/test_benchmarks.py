@@ -0,0 +1,105 @@
+"""Tests of the benchmark store and its regression detection."""
+
+from pathlib import Path
+
+import pytest
+
+from ..models.notebook import CellResult, CellStatus, NotebookResult
+from ..models.tap import QueryMode, QueryResult, QueryResultBatch, TAPApplication
+from ..models.test import Scenario
+from ..services.benchmarks import BenchmarkStoreService
+from ..utils.stats import mann_whitney_u
+
+
+def test_mann_whitney_u() -> None:
+    """Test the Mann-Whitney U test against values worked out by hand."""
+    u, p_value = mann_whitney_u([5, 6, 7, 8], [1, 2, 3, 4])
+    assert u == 16
+    assert p_value == pytest.approx(0.015191, abs=1e-6)
+
+    # Tied values share their average rank and shrink the variance
+    u, p_value = mann_whitney_u([1, 2, 2, 3, 4], [2, 2, 3, 5])
+    assert u == 7.5
+    assert p_value == pytest.approx(0.779657, abs=1e-6)
+
+    assert mann_whitney_u([3, 3, 3], [3, 3, 3]) == (4.5, 1.0)
+    with pytest.raises(ValueError, match="non-empty"):
+        mann_whitney_u([], [1])
+
+
+def test_compare_to_baseline(tmp_path: Path) -> None:
+    """Test that only significant slowdowns are flagged as regressions."""
+    store = BenchmarkStoreService(tmp_path / "benchmarks.db", "localhost")
+    scenario = Scenario(TAPApplication.TAP, QueryMode.SYNC, 1)
+
+    def run(durations: dict[str, list[float]]) -> str:
+        batch = QueryResultBatch()
+        for query, values in durations.items():
+            for value in values:
+                batch.append(QueryResult("OK", 1, value, 10.0, 1, query))
+        return store.record(scenario, batch)
+
+    baseline = [1.0, 1.1, 0.9, 1.05, 0.95]
+    for _ in range(3):
+        run({"SELECT 1": baseline, "SELECT 2": baseline})
+    run_id = run(
+        {
+            "SELECT 1": [x * 2 for x in baseline],
+            "SELECT 2": baseline,
+            "SELECT 3": baseline,
+        }
+    )
+
+    queries = ["SELECT 1", "SELECT 2", "SELECT 3"]
+    comparisons = store.compare_to_baseline(scenario, run_id, queries)
+    # SELECT 3 has no history, so is not compared
+    assert [c.query for c in comparisons] == ["SELECT 1", "SELECT 2"]
+    slower, same = comparisons
+    assert slower.regressed
+    assert slower.ratio == pytest.approx(2.0)
+    assert slower.baseline_median == 1.0
+    assert not same.regressed
+    assert same.p_value > 0.5
+
+    # A significant slowdown below the minimum ratio is not flagged
+    comparisons = store.compare_to_baseline(scenario, run_id, queries, min_ratio=3)
+    assert not any(c.regressed for c in comparisons)
+
+    # A reformatted query keeps its history
+    (reformatted,) = store.compare_to_baseline(scenario, run_id, ["SELECT\n    1"])
+    assert reformatted.regressed
+
+
+def test_notebook_regressions(tmp_path: Path) -> None:
+    """Test that slower notebook cells are flagged against past runs."""
+    store = BenchmarkStoreService(tmp_path / "benchmarks.sqlite", "localhost")
+
+    def run(query: float, plot: float, *, source: str = "plot()") -> NotebookResult:
+        return NotebookResult(
+            "notebooks/tutorial.ipynb",
+            "python3",
+            cells=[
+                CellResult(
+                    1, "service.search(query)", CellStatus.OK, query + 0.1, query
+                ),
+                CellResult(3, source, CellStatus.OK, plot),
+            ],
+        )
+
+    for i in range(5):
+        store.record_notebook(run(10.0 + i / 10, 0.1 + i / 100))
+
+    # Only a cell that is both much slower and slower by a noticeable time
+    # than every past run is flagged
+    current = run(30.0, 0.5)
+    run_id = store.record_notebook(current)
+    comparisons = store.compare_notebook_to_baseline(current, run_id)
+    assert [(c.cell, c.regressed) for c in comparisons] == [(1, True), (3, False)]
+    assert comparisons[0].baseline_median == pytest.approx(10.2)
+    assert comparisons[0].current == 30.0
+
+    # A cell whose code changed starts a new baseline
+    current = run(10.0, 5.0, source="plot(bins=100)")
+    run_id = store.record_notebook(current)
+    comparisons = store.compare_notebook_to_baseline(current, run_id)
+    assert [(c.cell, c.regressed) for c in comparisons] == [(1, False)]
@@ -0,0 +1,118 @@
+"""Tests of the pool of logged in browser contexts, with a fake browser."""
+
+import json
+from pathlib import Path
+from typing import Any
+
+from ..services.browserpool import BrowserContextPool
+
+LOGIN_COOKIES = [{"name": "gafaelfawr", "value": "login", "path": "/"}]
+
+
+class _FakePage:
+    def __init__(self, context: "_FakeContext") -> None:
+        self.context = context
+
+    def close(self) -> None:
+        self.context.pages.remove(self)
+
+
+class _FakeContext:
+    """Stand in for a Playwright browser context, recording its state."""
+
+    def __init__(self, storage_state: Path) -> None:
+        self.storage_state = storage_state
+        self.cookies = list(LOGIN_COOKIES)
+        self.pages: list[_FakePage] = []
+        self.permissions = ["geolocation"]
+        self.headers: dict[str, str] = {}
+        self.timeout: float | None = None
+        self.closed = False
+        self.broken = False
+
+    def set_default_timeout(self, timeout: float) -> None:
+        self.timeout = timeout
+
+    def new_page(self) -> _FakePage:
+        self.pages.append(_FakePage(self))
+        return self.pages[-1]
+
+    def clear_cookies(self) -> None:
+        if self.broken:
+            raise RuntimeError("Target page, context or browser has been closed")
+        self.cookies = []
+
+    def add_cookies(self, cookies: list[dict[str, Any]]) -> None:
+        self.cookies.extend(cookies)
+
+    def clear_permissions(self) -> None:
+        self.permissions = []
+
+    def set_extra_http_headers(self, headers: dict[str, str]) -> None:
+        self.headers = headers
+
+    def close(self) -> None:
+        self.closed = True
+
+
+class _FakeBrowser:
+    def __init__(self) -> None:
+        self.contexts: list[_FakeContext] = []
+
+    def new_context(self, *, storage_state: Path) -> _FakeContext:
+        self.contexts.append(_FakeContext(storage_state))
+        return self.contexts[-1]
+
+
+def _make_pool(tmp_path: Path, size: int) -> tuple[BrowserContextPool, _FakeBrowser]:
+    storage_state = tmp_path / "auth.json"
+    storage_state.write_text(json.dumps({"cookies": LOGIN_COOKIES}))
+    browser = _FakeBrowser()
+    pool = BrowserContextPool(browser, size, storage_state=storage_state, timeout=1000)
+    return pool, browser
+
+
+def test_browser_context_pool(tmp_path: Path) -> None:
+    """Test that contexts are created up front, reused and reset."""
+    pool, browser = _make_pool(tmp_path, 2)
+    assert pool.created == 2
+    assert all(c.storage_state == tmp_path / "auth.json" for c in browser.contexts)
+    assert all(c.timeout == 1000 for c in browser.contexts)
+
+    # A test's changes to its context are undone before the next test
+    context = pool.acquire()
+    context.new_page()
+    context.cookies.append({"name": "session", "value": "test", "path": "/"})
+    context.set_extra_http_headers({"Authorization": "Bearer token"})
+    context.set_default_timeout(5)
+    pool.release(context)
+    assert pool.acquire() is context
+    assert context.pages == []
+    assert context.cookies == LOGIN_COOKIES
+    assert context.permissions == []
+    assert context.headers == {}
+    assert context.timeout == 1000
+
+    # With every context in use, another is created instead of waiting
+    pool.acquire()
+    pool.acquire()
+    assert (pool.created, pool.acquired) == (3, 4)
+
+    pool.close()
+    assert all(c.closed for c in browser.contexts)
+
+
+def test_browser_context_pool_broken_context(tmp_path: Path) -> None:
+    """Test that a context that cannot be reset is closed and replaced."""
+    pool, browser = _make_pool(tmp_path, 1)
+    context = pool.acquire()
+    context.broken = True
+    pool.release(context)
+    assert context.closed
+
+    replacement = pool.acquire()
+    assert replacement is not context
+    assert pool.created == 2
+    pool.release(replacement)
+    pool.close()
+    assert browser.contexts == [context, replacement]
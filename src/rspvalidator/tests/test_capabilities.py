@@ -0,0 +1,35 @@
+"""Tests of the comparison of capabilities documents."""
+
+from lxml import etree
+
+from ..config import BASE_URL, capability_includes
+from ..services.capabilities import CapabilitiesService
+
+
+def test_capabilities_differences() -> None:
+    """Test that capability differences are reported node by node."""
+    includes = capability_includes["tap"]
+    expected = CapabilitiesService.render(BASE_URL, "tap", **includes)
+    root = etree.fromstring(expected)  # noqa: S320
+
+    # Reordering capabilities is not a difference
+    root[:] = reversed(root)
+    actual = etree.tostring(root)
+    assert CapabilitiesService.compare(actual, BASE_URL, "tap", **includes) == []
+
+    # A changed interface version and a dropped output format are reported
+    # where they are, not as a whole changed capability
+    tap = "capability[@standardID='ivo://ivoa.net/std/TAP']"
+    interface = root.find(f"{tap}/interface")
+    interface.set("version", "1.2")
+    output_format = root.find(f"{tap}/outputFormat")
+    output_format.getparent().remove(output_format)
+    differences = CapabilitiesService.compare(
+        etree.tostring(root), BASE_URL, "tap", **includes
+    )
+    kinds = sorted(difference.kind for difference in differences)
+    assert kinds == ["changed", "missing"], [str(d) for d in differences]
+    for difference in differences:
+        assert difference.path.startswith(
+            "capabilities/capability[ivo://ivoa.net/std/TAP"
+        )
@@ -0,0 +1,101 @@
+"""Tests of the resumable, verified downloads into the cache."""
+
+import hashlib
+import threading
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import ClassVar
+
+import pytest
+
+from ..exceptions import ChecksumError
+from ..services.filemanager import FileManagerService
+
+
+class _FlakyFileHandler(BaseHTTPRequestHandler):
+    """Serve a file with range requests, dropping the first connection."""
+
+    content = bytes(range(256)) * 4096
+    requests: ClassVar[list[str | None]] = []
+
+    def log_message(self, format: str, *args: object) -> None:  # noqa: A002
+        pass
+
+    def do_GET(self) -> None:  # noqa: N802
+        self.requests.append(self.headers.get("Range"))
+        start = 0
+        total = len(self.content)
+        if self.headers.get("Range") and self.headers.get("If-Range") == '"v1"':
+            start = int(self.headers["Range"].removeprefix("bytes=").split("-")[0])
+            if start >= total:
+                self.send_response(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+                self.send_header("Content-Range", f"bytes */{total}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(HTTPStatus.PARTIAL_CONTENT)
+            self.send_header("Content-Range", f"bytes {start}-{total - 1}/{total}")
+        else:
+            self.send_response(HTTPStatus.OK)
+        self.send_header("ETag", '"v1"')
+        self.send_header("Content-Length", str(len(self.content) - start))
+        self.end_headers()
+        body = self.content[start:]
+        if len(self.requests) == 1:
+            # Drops the connection half way through the first download
+            body = body[: len(body) // 2]
+        self.wfile.write(body)
+
+
+def test_download(tmp_path: Path) -> None:
+    """Test that downloads resume, are verified and are fetched once."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _FlakyFileHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/stilts.jar"
+    content = _FlakyFileHandler.content
+    digest = hashlib.sha256(content).hexdigest()
+    try:
+        path = FileManagerService.cached_download(
+            url, "stilts.jar", cache_dir=tmp_path, sha256=digest
+        )
+        assert path.read_bytes() == content
+        assert _FlakyFileHandler.requests == [None, f"bytes={len(content) // 2}-"]
+
+        # A complete download is not fetched again, a corrupted one is
+        FileManagerService.cached_download(url, "stilts.jar", cache_dir=tmp_path)
+        assert len(_FlakyFileHandler.requests) == 2
+        path.write_bytes(content[:100])
+        FileManagerService.cached_download(url, "stilts.jar", cache_dir=tmp_path)
+        assert len(_FlakyFileHandler.requests) == 3
+        assert path.read_bytes() == content
+
+        # A download that does not match its pinned digest is not kept
+        with pytest.raises(ChecksumError):
+            FileManagerService.cached_download(
+                url, "other.jar", cache_dir=tmp_path, sha256="0" * 64
+            )
+        assert not (tmp_path / "other.jar").exists()
+
+        # A partial download that is already complete is verified and kept
+        (tmp_path / "done.jar.part").write_bytes(content)
+        (tmp_path / "done.jar.part.validator").write_text('"v1"')
+        path = FileManagerService.cached_download(
+            url, "done.jar", cache_dir=tmp_path, sha256=digest
+        )
+        assert _FlakyFileHandler.requests[-1] == f"bytes={len(content)}-"
+        assert path.read_bytes() == content
+        assert not (tmp_path / "done.jar.part").exists()
+
+        # A partial download larger than the file is discarded, not resumed
+        (tmp_path / "long.jar.part").write_bytes(content + b"extra")
+        (tmp_path / "long.jar.part.validator").write_text('"v1"')
+        path = FileManagerService.cached_download(
+            url, "long.jar", cache_dir=tmp_path, sha256=digest
+        )
+        assert _FlakyFileHandler.requests[-2:] == [f"bytes={len(content) + 5}-", None]
+        assert path.read_bytes() == content
+    finally:
+        server.shutdown()
+        server.server_close()
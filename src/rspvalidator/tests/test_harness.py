@@ -0,0 +1,273 @@
+"""Tests of the validator's own TAP harness against a local stand-in server.
+
+These tests need neither a Science Platform nor a token. They run the TAP
+query runners and validators against the server, and measure the overhead
+the harness adds on top of the server's query latency and the throughput it
+can drive. The server runs in the test process, so with many users the
+overhead includes the server's own share of the interpreter; for cleaner
+numbers run it on its own with ``python -m rspvalidator.services.localtap``
+and point ``test_api.py`` at it.
+"""
+
+import asyncio
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import Any
+
+import numpy as np
+import pytest
+from pyvo.dal import DALQueryError, DALServiceError
+
+from ..config import TAP_POOL_OPTIONS, capability_includes, logger
+from ..factories.tap_factory import TAPFactory
+from ..models.tap import QueryMode, QueryResult, QueryResultBatch
+from ..services.configreader import ConfigReaderService
+from ..services.localtap import LocalTAPServer
+from ..services.tap import (
+    AsyncTAPQueryRunnerService,
+    TAPOperationsService,
+    TAPQueryRunnerService,
+)
+from ..services.testrunner import Runner
+from ..services.uws import UWSJobWaiter
+from ..services.validation import TAPValidationService
+from ..utils.histogram import LatencyRecorder
+from ..utils.http import ConnectionStats
+
+# The harness measurements share one local server and should not compete with
+# each other for the CPU
+pytestmark = pytest.mark.xdist_group("harness")
+
+# Number of concurrent users driven against the local server
+HARNESS_USERS = 10
+
+# Token sent to the local server, which accepts any
+LOCAL_TOKEN = "local"
+
+
+@contextmanager
+def _local_server(**options: Any) -> Iterator[LocalTAPServer]:
+    """Run a local TAP server with non-default options for one test."""
+    server = LocalTAPServer(("127.0.0.1", 0))
+    for name, value in options.items():
+        setattr(server.options, name, value)
+    server.start()
+    try:
+        yield server
+    finally:
+        server.stop()
+
+
+def _check_results(
+    results: QueryResultBatch,
+    server: LocalTAPServer,
+    mode: QueryMode,
+    elapsed: float,
+    description: str,
+) -> None:
+    """Check the row counts of a harness run and log its overhead."""
+    assert results.status_counts() == {"OK": len(results)}, "Response status is not OK"
+    for index in np.flatnonzero(
+        results.column("row_count") != results.column("expected_row_count")
+    ):
+        result = results[int(index)]
+        raise AssertionError(
+            f"Row count ({result.row_count}) does not match the expected row count "
+            f"({result.expected_row_count})"
+        )
+
+    # The time the server was busy with each query, on average
+    server_time = sum(server.latencies) / len(server.latencies)
+    if mode == QueryMode.ASYNC:
+        server_time += server.options.queue_time
+    mean_duration = results.column("execution_duration").mean()
+    logger.info(
+        f"{description}: {len(results) / elapsed:.1f} queries/s, mean duration "
+        f"{mean_duration * 1000:.1f} ms of which harness overhead "
+        f"{(mean_duration - server_time) * 1000:.1f} ms"
+    )
+
+
+@pytest.mark.parametrize("mode", list(QueryMode), ids=lambda m: m.value)
+def test_harness_tap_queries(
+    local_tap_server: LocalTAPServer, data_dir: str, mode: QueryMode
+) -> None:
+    """
+    Run the TAP queries with concurrent threads against the local server.
+
+    Checks that every query returns its expected row count, and logs the
+    throughput and the overhead the harness adds to the server's latency.
+    """
+    queries = ConfigReaderService.get_queries(data_dir=data_dir, app="tap")
+    stats = ConnectionStats()
+    client = TAPFactory.make_client(
+        auth_token=LOCAL_TOKEN,
+        app="tap",
+        stats=stats,
+        base_url=local_tap_server.base_url,
+        **TAP_POOL_OPTIONS,
+    )
+    local_tap_server.latencies.clear()
+    start = time.perf_counter()
+    results = Runner.run_concurrent_test(
+        test_function=TAPQueryRunnerService.run_query_test,
+        test_data=queries,
+        user_count=HARNESS_USERS,
+        client=client,
+        mode=mode,
+        recorder=LatencyRecorder(),
+    )
+    elapsed = time.perf_counter() - start
+
+    description = f"Local TAP {mode.value} threads [{HARNESS_USERS} users]"
+    _check_results(results, local_tap_server, mode, elapsed, description)
+    logger.info(f"{description}: {stats}")
+
+
+@pytest.mark.parametrize("mode", list(QueryMode), ids=lambda m: m.value)
+def test_harness_tap_queries_asyncio(
+    local_tap_server: LocalTAPServer, data_dir: str, mode: QueryMode
+) -> None:
+    """
+    Run the TAP queries as asyncio tasks against the local server.
+
+    Checks that every query returns its expected row count, and logs the
+    throughput and the overhead the harness adds to the server's latency.
+    """
+    queries = ConfigReaderService.get_queries(data_dir=data_dir, app="tap")
+    local_tap_server.latencies.clear()
+    start = time.perf_counter()
+    results = Runner.run_concurrent_test_async(
+        test_function=AsyncTAPQueryRunnerService.run_query_test,
+        test_data=queries,
+        user_count=HARNESS_USERS,
+        client=TAPFactory.make_async_client(
+            auth_token=LOCAL_TOKEN, app="tap", base_url=local_tap_server.base_url
+        ),
+        mode=mode,
+        recorder=LatencyRecorder(),
+    )
+    elapsed = time.perf_counter() - start
+
+    description = f"Local TAP {mode.value} asyncio [{HARNESS_USERS} users]"
+    _check_results(results, local_tap_server, mode, elapsed, description)
+
+
+@pytest.mark.parametrize("engine", ["threads", "asyncio"])
+@pytest.mark.parametrize(
+    ("mode", "error", "message"),
+    [
+        (QueryMode.SYNC, DALServiceError, "500"),
+        (QueryMode.ASYNC, DALQueryError, "Injected query failure"),
+    ],
+    ids=["sync", "async"],
+)
+def test_harness_query_errors(
+    mode: QueryMode, error: type[Exception], message: str, engine: str
+) -> None:
+    """Test that both engines report failed queries as the same errors."""
+    query = {
+        "query": "SELECT TOP 10 * FROM TAP_SCHEMA.tables",
+        "expected_duration": 5.0,
+        "expected_row_count": 10,
+    }
+    with _local_server(error_rate=1.0) as server:
+        if engine == "threads":
+            client = TAPFactory.make_client(
+                auth_token=LOCAL_TOKEN, app="tap", base_url=server.base_url
+            )
+            with pytest.raises(error, match=message):
+                TAPQueryRunnerService.run_query_test(client, query, mode)
+        else:
+            async_client = TAPFactory.make_async_client(
+                auth_token=LOCAL_TOKEN, app="tap", base_url=server.base_url
+            )
+
+            async def run() -> None:
+                async with async_client:
+                    await AsyncTAPQueryRunnerService.run_query_test(
+                        async_client, query, mode
+                    )
+
+            with pytest.raises(error, match=message):
+                asyncio.run(run())
+
+
+@pytest.mark.parametrize("engine", ["threads", "asyncio"])
+def test_harness_relative_redirects(engine: str) -> None:
+    """Test that both engines follow UWS redirects to relative URLs."""
+    query = {
+        "query": "SELECT TOP 10 * FROM TAP_SCHEMA.tables",
+        "expected_duration": 5.0,
+        "expected_row_count": 10,
+    }
+    with _local_server(relative_redirects=True) as server:
+        if engine == "threads":
+            client = TAPFactory.make_client(
+                auth_token=LOCAL_TOKEN, app="tap", base_url=server.base_url
+            )
+            result = TAPQueryRunnerService.run_query_test(
+                client, query, QueryMode.ASYNC
+            )
+        else:
+            async_client = TAPFactory.make_async_client(
+                auth_token=LOCAL_TOKEN, app="tap", base_url=server.base_url
+            )
+
+            async def run() -> QueryResult:
+                async with async_client:
+                    return await AsyncTAPQueryRunnerService.run_query_test(
+                        async_client, query, QueryMode.ASYNC
+                    )
+
+            result = asyncio.run(run())
+    assert (result.status, result.row_count) == ("OK", 10)
+
+
+@pytest.mark.parametrize("uws_version", ["1.0", "1.1"])
+def test_harness_uws_wait(uws_version: str) -> None:
+    """Test that UWS jobs are long polled only if the service supports it."""
+    with _local_server(latency=0.2, queue_time=0.2, uws_version=uws_version) as server:
+        client = TAPFactory.make_client(
+            auth_token=LOCAL_TOKEN, app="tap", base_url=server.base_url
+        )
+        job = client.submit_job("SELECT TOP 1 * FROM TAP_SCHEMA.tables").run()
+        session = TAPOperationsService.get_session(client)
+        waited = UWSJobWaiter(session, timeout=30).wait(job.url)
+        job.delete()
+
+    assert waited.phase == "COMPLETED"
+    assert waited.long_polling == (uws_version == "1.1")
+    phases = [transition.phase for transition in waited.transitions]
+    assert phases[-1] == "COMPLETED"
+    if uws_version == "1.1":
+        # One request per phase, each answered when the phase changes
+        assert phases == ["QUEUED", "EXECUTING", "COMPLETED"]
+        assert waited.requests == 3
+
+
+def test_harness_tables(local_tap_server: LocalTAPServer) -> None:
+    """Test the tables validator against the local server."""
+    client = TAPFactory.make_client(
+        auth_token=LOCAL_TOKEN, app="tap", base_url=local_tap_server.base_url
+    )
+    TAPValidationService(tap_client=client, app="tap").validate_tables()
+
+
+@pytest.mark.parametrize("app", ["tap", "ssotap"])
+def test_harness_capabilities(local_tap_server: LocalTAPServer, app: str) -> None:
+    """Test the capabilities validator against the local server."""
+    client = TAPFactory.make_client(
+        auth_token=LOCAL_TOKEN, app=app, base_url=local_tap_server.base_url
+    )
+    response = TAPOperationsService.get_session(client).get(
+        f"{local_tap_server.base_url}/api/{app}/capabilities"
+    )
+    response.raise_for_status()
+    TAPValidationService.validate_capabilities(
+        app,
+        actual_capabilities=response.content,
+        base_url=local_tap_server.base_url,
+        **capability_includes[app],
+    )
@@ -0,0 +1,38 @@
+"""Tests of the latency histograms."""
+
+import math
+
+import numpy as np
+import pytest
+
+from ..utils.histogram import LatencyHistogram
+
+
+def test_latency_histogram() -> None:
+    """Test histogram buckets, merging and percentile accuracy."""
+    # Any latency, from a microsecond to days, is kept to within the
+    # histogram's precision
+    for value in map(float, np.geomspace(1e-6, 1e6, 2000)):
+        histogram = LatencyHistogram()
+        for latency in (0.0, value, value, 1e7):
+            histogram.record(latency)
+        assert histogram.percentile(50) == pytest.approx(value, rel=2**-7, abs=1e-6)
+
+    rng = np.random.default_rng(0)
+    values = [float(v) for v in rng.lognormal(mean=-3, sigma=1.5, size=10_000)]
+    whole, first, second = LatencyHistogram(), LatencyHistogram(), LatencyHistogram()
+    for i, value in enumerate(values):
+        whole.record(value)
+        (first if i % 2 else second).record(value)
+    first.merge(second)
+    assert first.buckets() == whole.buckets()
+    assert first.count == whole.count
+    assert first.minimum == whole.minimum
+    assert first.maximum == whole.maximum
+    assert first.total == pytest.approx(whole.total)
+
+    ordered = sorted(values)
+    for percentile in (1, 25, 50, 90, 99, 99.9):
+        exact = ordered[math.ceil(percentile / 100 * len(values)) - 1]
+        assert whole.percentile(percentile) == pytest.approx(exact, rel=2**-7, abs=1e-6)
+    assert whole.percentile(100) == max(values)
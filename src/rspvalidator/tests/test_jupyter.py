@@ -0,0 +1,131 @@
+"""Tests of running notebook cells over the kernel protocol, with a fake kernel."""
+
+import asyncio
+import json
+from collections.abc import Callable
+from typing import Any
+
+import pytest
+
+from ..exceptions import JupyterError
+from ..models.notebook import CellOutput, CellResult, CellStatus
+from ..services.jupyter import KernelConnection
+
+Replies = Callable[[str], list[dict[str, Any]]]
+
+
+def _message(
+    msg_type: str,
+    content: dict[str, Any],
+    parent: str | None,
+    date: str = "2026-01-01T00:00:00+00:00",
+) -> dict[str, Any]:
+    return {
+        "msg_type": msg_type,
+        "header": {"msg_type": msg_type, "date": date},
+        "parent_header": {"msg_id": parent} if parent else {},
+        "content": content,
+    }
+
+
+class _FakeKernelSocket:
+    """Stand in for a kernel's WebSocket that answers with scripted messages.
+
+    A request that has no more replies waits forever, like a busy kernel.
+    """
+
+    def __init__(self, replies: Replies) -> None:
+        self.replies = replies
+        self.queue: asyncio.Queue[str] = asyncio.Queue()
+
+    async def send(self, data: str) -> None:
+        message = json.loads(data)
+        for reply in self.replies(message["header"]["msg_id"]):
+            self.queue.put_nowait(json.dumps(reply))
+
+    async def recv(self) -> str:
+        return await self.queue.get()
+
+
+def _execute(replies: Replies, timeout: float = 10) -> CellResult:
+    async def run() -> CellResult:
+        websocket: Any = _FakeKernelSocket(replies)
+        kernel = KernelConnection(websocket, "kernel-1")
+        return await kernel.execute("plot()", index=3, timeout=timeout)
+
+    return asyncio.run(run())
+
+
+def test_kernel_execute() -> None:
+    """Test that a cell's outputs, status and kernel timings are collected."""
+
+    def replies(msg_id: str) -> list[dict[str, Any]]:
+        return [
+            _message("status", {"execution_state": "busy"}, msg_id),
+            _message("stream", {"name": "stdout", "text": "other"}, "other-cell"),
+            _message("stream", {"name": "stdout", "text": "0%"}, msg_id),
+            # Waits for the next output, as progress bars do
+            _message("clear_output", {"wait": True}, msg_id),
+            _message("stream", {"name": "stdout", "text": "100%"}, msg_id),
+            _message("display_data", {"data": {"text/plain": "plot"}}, msg_id),
+            _message(
+                "status",
+                {"execution_state": "idle"},
+                msg_id,
+                date="2026-01-01T00:00:02.5+00:00",
+            ),
+            # The reply on the shell channel may come after going idle
+            _message("execute_reply", {"status": "ok", "execution_count": 7}, msg_id),
+        ]
+
+    result = _execute(replies)
+    assert result.status == CellStatus.OK
+    assert (result.index, result.execution_count) == (3, 7)
+    assert result.kernel_duration == 2.5
+    assert result.outputs == [
+        CellOutput("stream", text="100%"),
+        CellOutput("display_data", data={"text/plain": "plot"}),
+    ]
+
+
+def test_kernel_execute_error() -> None:
+    """Test that a cleared output is dropped and an error fails the cell."""
+
+    def replies(msg_id: str) -> list[dict[str, Any]]:
+        return [
+            _message("stream", {"name": "stdout", "text": "loading"}, msg_id),
+            _message("clear_output", {"wait": False}, msg_id),
+            _message("error", {"ename": "KeyError", "evalue": "'ra'"}, msg_id),
+            _message("execute_reply", {"status": "error"}, msg_id),
+            _message("status", {"execution_state": "idle"}, msg_id),
+        ]
+
+    result = _execute(replies)
+    assert result.status == CellStatus.ERROR
+    assert result.outputs == [CellOutput("error", ename="KeyError", evalue="'ra'")]
+
+
+def test_kernel_execute_timeout() -> None:
+    """Test that a cell still running after its timeout is timed out."""
+
+    def replies(msg_id: str) -> list[dict[str, Any]]:
+        return [
+            _message("status", {"execution_state": "busy"}, msg_id),
+            _message("stream", {"name": "stdout", "text": "working"}, msg_id),
+        ]
+
+    result = _execute(replies, timeout=0.2)
+    assert result.status == CellStatus.TIMEOUT
+    assert result.outputs == [CellOutput("stream", text="working")]
+    assert result.duration >= 0.2
+    assert result.kernel_duration is None
+
+
+def test_kernel_execute_dead() -> None:
+    """Test that a kernel dying while it runs a cell is an error."""
+
+    def replies(msg_id: str) -> list[dict[str, Any]]:
+        return [_message("status", {"execution_state": "dead"}, None)]
+
+    with pytest.raises(JupyterError, match="Kernel kernel-1 died"):
+        _execute(replies)
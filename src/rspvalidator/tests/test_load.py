@@ -0,0 +1,161 @@
+"""Tests of the open-loop and distributed load runners."""
+
+import json
+import multiprocessing
+import socket
+import threading
+import time
+from typing import Any
+
+import pytest
+from pyvo.dal import DALServiceError
+
+from ..config import Settings
+from ..models.tap import QueryMode, QueryResult, TAPApplication
+from ..models.test import ArrivalPattern, Scenario
+from ..services.distributed import DistributedRunner, WorkerServer
+from ..services.testrunner import Runner
+from ..utils.arrivals import arrival_offsets
+
+
+def test_arrival_offsets() -> None:
+    """Test the arrival schedules of open-loop runs."""
+    constant = list(arrival_offsets(ArrivalPattern.CONSTANT, 4, 1))
+    assert constant == [0.0, 0.25, 0.5, 0.75]
+
+    poisson = list(arrival_offsets(ArrivalPattern.POISSON, 100, 10, seed=1))
+    assert poisson == list(arrival_offsets(ArrivalPattern.POISSON, 100, 10, seed=1))
+    assert poisson != list(arrival_offsets(ArrivalPattern.POISSON, 100, 10, seed=2))
+    assert poisson == sorted(poisson)
+    assert poisson[0] > 0
+    assert poisson[-1] < 10
+    assert len(poisson) == pytest.approx(1000, rel=0.1)
+
+    # The rate steps up to the target, each step starting on time
+    ramp = list(arrival_offsets(ArrivalPattern.RAMP, 4, 2, ramp_steps=2))
+    assert ramp == [0.0, 0.5, 1.0, 1.25, 1.5, 1.75]
+
+    with pytest.raises(ValueError, match="must be positive"):
+        list(arrival_offsets(ArrivalPattern.CONSTANT, 0, 1))
+    with pytest.raises(ValueError, match="at least one step"):
+        list(arrival_offsets(ArrivalPattern.RAMP, 1, 1, ramp_steps=0))
+
+
+def _failing_query(client: Any, data: dict[str, Any], mode: Any) -> QueryResult:
+    time.sleep(0.2)
+    raise DALServiceError("Service unavailable")
+
+
+def test_open_loop_scenarios(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that open-loop scenarios are only run when configured."""
+    monkeypatch.delenv("OPEN_LOOP_SCENARIOS", raising=False)
+    assert Settings().open_loop_scenarios == []
+
+    monkeypatch.setenv(
+        "OPEN_LOOP_SCENARIOS", "ssotap sync 10 2 60; tap ASYNC 5 1 30 ramp 3;"
+    )
+    assert Settings().open_loop_scenarios == [
+        Scenario(TAPApplication.SSOTAP, QueryMode.SYNC, 10, rate=2.0, duration=60.0),
+        Scenario(
+            TAPApplication.TAP,
+            QueryMode.ASYNC,
+            5,
+            rate=1.0,
+            duration=30.0,
+            arrival=ArrivalPattern.RAMP,
+            ramp_steps=3,
+        ),
+    ]
+
+    monkeypatch.setenv("OPEN_LOOP_SCENARIOS", "tap sync 10 2")
+    with pytest.raises(ValueError, match="Invalid open-loop scenario 'tap sync 10 2'"):
+        _ = Settings().open_loop_scenarios
+
+
+def test_open_loop_errors() -> None:
+    """Test that failed open-loop calls count towards the length of the run."""
+    report = Runner.run_open_loop_test(
+        _failing_query, [{"query": "SELECT 1"}], rate=10, duration=0.1, max_workers=1
+    )
+    assert (report.scheduled, report.errors, len(report.results)) == (1, 1, 0)
+    assert report.elapsed >= 0.2
+
+
+def test_distributed_workers(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that workers reject unsigned jobs and dead workers are not awaited."""
+    scenario = Scenario(TAPApplication.TAP, QueryMode.SYNC, 2)
+    with WorkerServer(("127.0.0.1", 0), "secret") as server:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        address = f"127.0.0.1:{server.server_address[1]}"
+        report = DistributedRunner.run(
+            scenario, [], remote_workers=[address], start_delay=0, secret="wrong"
+        )
+        server.shutdown()
+    assert report.errors == ["Job signature rejected"]
+
+    # A local worker killed while it waits for its users' start time, so it
+    # never sends "done"
+    def kill_worker() -> None:
+        deadline = time.monotonic() + 30
+        while not multiprocessing.active_children() and time.monotonic() < deadline:
+            time.sleep(0.05)
+        for process in multiprocessing.active_children():
+            process.kill()
+
+    monkeypatch.setenv("TOKEN", "local")
+    threading.Thread(target=kill_worker, daemon=True).start()
+    report = DistributedRunner.run(
+        scenario, [{"query": "SELECT 1"}], local_workers=1, start_delay=60
+    )
+    assert report.errors == [
+        "local worker 0: exited with exit code -9 before finishing"
+    ]
+
+
+def test_distributed_job_signature(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that a signed job cannot be altered and a silent client times out."""
+    scenario = Scenario(TAPApplication.TAP, QueryMode.SYNC, 1)
+    relay = socket.create_server(("127.0.0.1", 0))
+    monkeypatch.setattr("rspvalidator.services.distributed._JOB_TIMEOUT", 0.5)
+    with WorkerServer(("127.0.0.1", 0), "secret") as server:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        address = ("127.0.0.1", server.server_address[1])
+        worker = socket.create_connection(address)
+        worker_stream = worker.makefile("rw", encoding="utf-8")
+
+        # Relay the worker's challenge to a coordinator and alter its job on
+        # the way back, as someone on the link could
+        def tamper() -> None:
+            connection, _ = relay.accept()
+            with connection, connection.makefile("rw", encoding="utf-8") as stream:
+                stream.write(worker_stream.readline())
+                stream.flush()
+                job = json.loads(stream.readline())
+                job["queries"] = [{"query": "SELECT * FROM dp02_dc2_catalogs.Object"}]
+                worker_stream.write(json.dumps(job) + "\n")
+                worker_stream.flush()
+                for line in worker_stream:
+                    stream.write(line)
+                    stream.flush()
+                    if json.loads(line)["type"] == "done":
+                        break
+
+        threading.Thread(target=tamper, daemon=True).start()
+        report = DistributedRunner.run(
+            scenario,
+            [{"query": "SELECT 1"}],
+            remote_workers=[f"127.0.0.1:{relay.getsockname()[1]}"],
+            start_delay=0,
+            secret="secret",
+        )
+        assert report.errors == ["Job signature rejected"]
+
+        # A client that never sends a job is disconnected
+        with socket.create_connection(address) as silent:
+            silent.settimeout(10)
+            with silent.makefile("r", encoding="utf-8") as stream:
+                assert json.loads(stream.readline())["type"] == "challenge"
+                assert stream.readline() == ""
+        server.shutdown()
+    worker.close()
+    relay.close()
@@ -0,0 +1,54 @@
+"""Tests of the Prometheus metrics exporter."""
+
+from pathlib import Path
+
+import requests
+
+from ..factories.tap_factory import TAPFactory
+from ..models.tap import QueryMode
+from ..services.benchmarks import BenchmarkStoreService
+from ..services.configreader import ConfigReaderService
+from ..services.localtap import LocalTAPServer
+from ..services.metrics import MetricsServer, MetricsService
+from ..services.tap import TAPQueryRunnerService
+
+# Token sent to the local server, which accepts any
+LOCAL_TOKEN = "local"
+
+
+def test_metrics(
+    local_tap_server: LocalTAPServer, data_dir: str, tmp_path: Path
+) -> None:
+    """Test that query metrics are served and written in the Prometheus format."""
+    queries = ConfigReaderService.get_queries(data_dir=data_dir, app="tap")
+    client = TAPFactory.make_client(
+        auth_token=LOCAL_TOKEN, app="tap", base_url=local_tap_server.base_url
+    )
+    results = [
+        TAPQueryRunnerService.run_query_test(client, query, QueryMode.ASYNC)
+        for query in queries
+    ]
+    MetricsService.record_queries("tap", QueryMode.ASYNC, results)
+
+    server = MetricsServer(("127.0.0.1", 0)).start()
+    try:
+        response = requests.get(f"http://{server.address}/metrics", timeout=10)
+    finally:
+        server.stop()
+    assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+    path = tmp_path / "rspvalidator.prom"
+    MetricsService.write(path)
+
+    for text in (response.text, path.read_text()):
+        assert "# TYPE rspvalidator_tap_query_duration_seconds histogram" in text
+        for query in queries:
+            query_id = BenchmarkStoreService.query_hash(query["query"])
+            labels = f'app="tap",mode="async",query_id="{query_id}"'
+            assert f"rspvalidator_tap_query_duration_seconds_count{{{labels}}}" in text
+            assert (
+                f"rspvalidator_tap_query_rows{{{labels}}} "
+                f"{float(query['expected_row_count'])!r}"
+            ) in text
+        for phase in ("queued", "executing", "result_fetch"):
+            labels = f'app="tap",mode="async",phase="{phase}"'
+            assert f"rspvalidator_tap_query_phase_seconds_count{{{labels}}}" in text
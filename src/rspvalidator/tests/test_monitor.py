@@ -0,0 +1,134 @@
+"""Tests of the monitor against a local stand-in TAP server and fake browsers."""
+
+import time
+from pathlib import Path
+from typing import Any
+
+import pytest
+import requests
+
+from ..config import logger, settings
+from ..services.localtap import LocalTAPServer
+from ..services.monitor import MonitorDaemon
+
+# Token sent to the local server, which accepts any
+LOCAL_TOKEN = "local"
+
+
+def test_monitor(local_tap_server: LocalTAPServer) -> None:
+    """Test that the monitor reuses its clients and serves its results."""
+    checks = ["tap-capabilities", "tap-tables", "tap-uws"]
+    monitor = MonitorDaemon(
+        checks, base_url=local_tap_server.base_url, auth_token=LOCAL_TOKEN
+    )
+    try:
+        first = monitor.run_once()
+        client = monitor.tap_client("tap")
+        second = monitor.run_once()
+        assert monitor.tap_client("tap") is client
+    finally:
+        monitor.close()
+    for result in first + second:
+        assert result.passed, f"{result.name}: {result.message}"
+    logger.info(
+        "Monitor check durations (cold, warm): "
+        + ", ".join(
+            f"{a.name} {a.duration * 1000:.1f} ms, {b.duration * 1000:.1f} ms"
+            for a, b in zip(first, second, strict=True)
+        )
+    )
+
+    # A scheduled monitor runs every check as soon as it starts
+    monitor = MonitorDaemon(
+        checks, base_url=local_tap_server.base_url, auth_token=LOCAL_TOKEN
+    ).start(("127.0.0.1", 0))
+    try:
+        deadline = time.monotonic() + 30
+        while len(monitor.latest()) < len(checks) and time.monotonic() < deadline:
+            time.sleep(0.05)
+        results = requests.get(f"http://{monitor.address}/results", timeout=10)
+        health = requests.get(f"http://{monitor.address}/healthz", timeout=10)
+        metrics = requests.get(f"http://{monitor.address}/metrics", timeout=10)
+    finally:
+        monitor.stop()
+    assert sorted(r["name"] for r in results.json()) == sorted(checks)
+    assert health.status_code == 200, health.json()
+    for check in checks:
+        assert f'rspvalidator_check_passed{{check="{check}"}} 1' in metrics.text
+
+
+class _FakeBrowser:
+    """Stand in for a Chromium browser, which may have crashed."""
+
+    def __init__(self, *, crashed: bool) -> None:
+        self.crashed = crashed
+        self.closed = False
+
+    def new_context(self, **kwargs: Any) -> Any:
+        if self.crashed:
+            raise RuntimeError("Target page, context or browser has been closed")
+        return _FakeContext()
+
+    def close(self) -> None:
+        self.closed = True
+        if self.crashed:
+            raise RuntimeError("Browser has been closed")
+
+
+class _FakeContext:
+    def set_default_timeout(self, timeout: float) -> None:
+        pass
+
+    def new_page(self) -> object:
+        return object()
+
+    def close(self) -> None:
+        pass
+
+
+class _FakeValidator:
+    def __init__(self, page: object) -> None:
+        self.page = page
+
+    def validate_squareone_homepage(self) -> None:
+        pass
+
+
+class _FakePlaywright:
+    """Stand in for Playwright, launching a crashed browser first."""
+
+    def __init__(self, browsers: list[_FakeBrowser]) -> None:
+        self.browsers = browsers
+        self.chromium = self
+
+    def start(self) -> "_FakePlaywright":
+        return self
+
+    def launch(self, **kwargs: Any) -> _FakeBrowser:
+        self.browsers.append(_FakeBrowser(crashed=not self.browsers))
+        return self.browsers[-1]
+
+    def stop(self) -> None:
+        pass
+
+
+def test_monitor_browser_crash(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    """Test that the monitor launches a new browser after one crashed."""
+    browsers: list[_FakeBrowser] = []
+    monkeypatch.setitem(vars(settings), "auth_file", tmp_path / "auth.json")
+    monkeypatch.setattr(
+        "playwright.sync_api.sync_playwright", lambda: _FakePlaywright(browsers)
+    )
+    monkeypatch.setattr(
+        "rspvalidator.services.monitor.SquareOneValidationService", _FakeValidator
+    )
+    monitor = MonitorDaemon(["squareone-homepage"])
+    try:
+        crashed = monitor.run_check("squareone-homepage")
+        assert not crashed.passed
+        assert browsers[0].closed
+        recovered = monitor.run_check("squareone-homepage")
+        assert recovered.passed, recovered.message
+        assert len(browsers) == 2
+    finally:
+        monitor.close()
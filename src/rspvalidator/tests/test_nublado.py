@@ -1,15 +1,74 @@
 """Test Nublado tutorial notebooks."""
 
-import re
-import time
-
+import pytest
 from playwright.sync_api import Page, expect
 
-from ..config import BASE_URL
+from ..config import (
+    BASE_URL,
+    BASELINE_RUNS,
+    CELL_REGRESSION_MIN_SECONDS,
+    REGRESSION_MIN_RATIO,
+    logger,
+)
+from ..models.notebook import NotebookResult
+from ..services.benchmarks import BenchmarkStoreService
 from ..services.configreader import ConfigReaderService
 
-# Note: The content of these tests is probably too lengthy, maybe break out
-# into helper methods or read validation content from a config
+# The notebooks run in the lab started by the first test, and restarting the
+# kernels would break those run by another worker
+pytestmark = pytest.mark.xdist_group("nublado")
+
+
+def _assert_passed(result: NotebookResult) -> None:
+    """Assert that every cell of a notebook ran without an error."""
+    assert not result.error, f"{result.name} could not be run: {result.error}"
+    failed = result.failed_cell
+    assert (
+        failed is None
+    ), f"Cell {failed.index} of {result.name} {failed.status.value}:\n{failed.text}"
+    assert "Traceback" not in result.text
+
+
+def _check_cell_timings(
+    result: NotebookResult, benchmark_store: BenchmarkStoreService | None
+) -> None:
+    """Check the cell durations of a notebook run against past runs.
+
+    The durations are logged and stored, and once enough runs are stored
+    every cell must be no slower than its baseline.
+
+    Parameters
+    ----------
+    result
+        The outcome of the notebook.
+    benchmark_store
+        The store of past results, or `None` if disabled.
+    """
+    for cell in result.cells:
+        kernel = (
+            f" ({cell.kernel_duration:.2f}s in the kernel)"
+            if cell.kernel_duration is not None
+            else ""
+        )
+        logger.info(
+            f"{result.name} cell {cell.index} {cell.status.value} in "
+            f"{cell.duration:.2f}s{kernel}"
+        )
+    if not benchmark_store:
+        return
+
+    run_id = benchmark_store.record_notebook(result)
+    comparisons = benchmark_store.compare_notebook_to_baseline(
+        result,
+        run_id,
+        min_ratio=REGRESSION_MIN_RATIO,
+        min_seconds=CELL_REGRESSION_MIN_SECONDS,
+        max_runs=BASELINE_RUNS,
+    )
+    for comparison in sorted(comparisons, key=lambda c: c.ratio, reverse=True):
+        logger.info(str(comparison))
+    regressions = [str(c) for c in comparisons if c.regressed]
+    assert not regressions, "Cell regressions: " + "; ".join(regressions)
 
 
 def test_ensure_server_running(page: Page) -> None:
@@ -35,228 +94,61 @@ def test_restart_kernels(page: Page) -> None:
     page.get_by_role("button", name="Shut Down All").click()
 
 
-def test_nublado_dp02_02b_catalog_access(page: Page) -> None:
+def test_nublado_dp02_02b_catalog_access(
+    tutorial_notebooks: dict[str, NotebookResult],
+    benchmark_store: BenchmarkStoreService | None,
+) -> None:
     """Test the Nublado tutorial dp02 catalog access notebook."""
-    # Go to Nublado homepage
-    page.goto(ConfigReaderService.get_url("nublado"))
-
-    # Go to main directory
-    locator = page.locator("[title^='/home/']").first
-    locator.locator("path").dblclick()
-    page.get_by_text("File", exact=True).click()
-    page.locator("#jp-mainmenu-file").get_by_text("Open from Path…").click()
-    page.get_by_placeholder("/path/relative/to/jlab/root").fill(
-        "/notebooks/tutorial-notebooks/DP02_02b_Catalog_Queries_with_TAP.ipynb"
-    )
-    page.get_by_placeholder("/path/relative/to/jlab/root").press("Enter")
-
-    # Wait for tab to load
-    expect(
-        page.get_by_text(
-            "Description: Execute complex ADQL queries with the TAP service."
-        )
-    ).to_be_visible()
-
-    # This is a hack, need to figure out why run is started before things
-    # are loaded
-    time.sleep(5)
-
-    # Run notebook
-    page.get_by_text("Run", exact=True).click()
-    page.locator("#jp-mainmenu-run").get_by_text("Run All Cells", exact=True).click()
+    result = tutorial_notebooks["DP02_02b_Catalog_Queries_with_TAP.ipynb"]
+    _assert_passed(result)
+    _check_cell_timings(result, benchmark_store)
 
     # Validate some of the expected output
-    expect(
-        page.get_by_label("DP02_02b_Catalog_Queries_with_TAP.ipynb").get_by_label(
-            "Cells", exact=True
-        )
-    ).to_contain_text("173 rows")
-
-    expect(
-        page.get_by_label("DP02_02b_Catalog_Queries_with_TAP.ipynb").get_by_label(
-            "Cells", exact=True
-        )
-    ).to_contain_text("1651589610221899038")
+    assert result.find("173 rows")
+    assert result.find("1651589610221899038")
 
-    # Check that there are no errors
-    expect(
-        page.get_by_label("DP02_02b_Catalog_Queries_with_TAP.ipynb").get_by_label(
-            "Cells", exact=True
-        )
-    ).not_to_contain_text("Traceback")
-    expect(
-        page.get_by_label("DP02_02b_Catalog_Queries_with_TAP.ipynb").get_by_label(
-            "Cells", exact=True
-        )
-    ).not_to_contain_text("Error")
 
-
-def test_nublado_dp02_06b_interactive_visualization(page: Page) -> None:
+def test_nublado_dp02_06b_interactive_visualization(
+    tutorial_notebooks: dict[str, NotebookResult],
+    benchmark_store: BenchmarkStoreService | None,
+) -> None:
     """Test the Nublado tutorial dp02 interactive visualization notebook."""
-    # Go to Nublado homepage
-    page.goto(ConfigReaderService.get_url("nublado"))
-
-    # Open Notebook
-    home_dir = page.locator("[title^='/home/']").first
-    home_dir.locator("path").dblclick()
-    page.get_by_text("File", exact=True).click()
-    page.locator("#jp-mainmenu-file").get_by_text("Open from Path…").click()
-    page.get_by_placeholder("/path/relative/to/jlab/root").fill(
-        "/notebooks/tutorial-notebooks/"
-        "DP02_06b_Interactive_Catalog_Visualization.ipynb"
-    )
-    page.get_by_placeholder("/path/relative/to/jlab/root").press("Enter")
-
-    # Ensures that tab is loaded before running
-    expect(page.get_by_text("Description: Interactive")).to_be_visible()
-
-    # This is a hack, need to figure out why run is started before things
-    # are loaded
-    time.sleep(5)
-
-    # Run notebook
-    page.get_by_text("Run", exact=True).click()
-    page.locator("#jp-mainmenu-run").get_by_text("Run All Cells", exact=True).click()
-
-    # Validate some of the expected output
-    expect(
-        page.get_by_label(
-            "DP02_06b_Interactive_Catalog_Visualization.ipynb"
-        ).get_by_label("Cells", exact=True)
-    ).to_have_text(re.compile(r"BokehJS .+ successfully loaded\."))
-
-    expect(
-        page.get_by_label(
-            "DP02_06b_Interactive_Catalog_Visualization.ipynb"
-        ).get_by_label("Cells", exact=True)
-    ).to_contain_text("26914")
+    result = tutorial_notebooks["DP02_06b_Interactive_Catalog_Visualization.ipynb"]
+    _assert_passed(result)
+    _check_cell_timings(result, benchmark_store)
 
-    # Check that there are no errors
-    expect(
-        page.get_by_label(
-            "DP02_06b_Interactive_Catalog_Visualization.ipynb"
-        ).get_by_label("Cells", exact=True)
-    ).not_to_contain_text("Traceback")
+    # Validate some of the expected output. BokehJS is loaded by the
+    # browser, so only the output that loads it can be checked
+    assert result.find("BokehJS")
+    assert result.find("26914")
 
-    expect(
-        page.get_by_label(
-            "DP02_06b_Interactive_Catalog_Visualization.ipynb"
-        ).get_by_label("Cells", exact=True)
-    ).not_to_contain_text("Error")
 
-
-def test_nublado_dp03_06_upload_tables(page: Page) -> None:
+def test_nublado_dp03_06_upload_tables(
+    tutorial_notebooks: dict[str, NotebookResult],
+    benchmark_store: BenchmarkStoreService | None,
+) -> None:
     """Test the Nublado tutorial dp03 table upload notebook."""
-    page.goto(ConfigReaderService.get_url("nublado"))
-
-    # Open Notebook
-    home_dir = page.locator("[title^='/home/']").first
-    home_dir.locator("path").dblclick()
-    page.get_by_text("File", exact=True).click()
-    page.locator("#jp-mainmenu-file").get_by_text("Open from Path…").click()
-    page.get_by_placeholder("/path/relative/to/jlab/root").fill(
-        "/notebooks/tutorial-notebooks/DP03_06_User_Uploaded_Tables.ipynb"
-    )
-    page.get_by_placeholder("/path/relative/to/jlab/root").press("Enter")
-
-    # Ensures that tab is loaded before running
-    page.get_by_text("Description: Use the TAP").click()
-
-    # This is a hack, need to figure out why run is started before things
-    # are loaded
-    time.sleep(5)
-
-    # Run notebook
-    page.get_by_text("Run", exact=True).click()
-    page.locator("#jp-mainmenu-run").get_by_text("Run All Cells", exact=True).click()
+    result = tutorial_notebooks["DP03_06_User_Uploaded_Tables.ipynb"]
+    _assert_passed(result)
+    _check_cell_timings(result, benchmark_store)
 
     # Validate some of the expected output
-    expect(
-        page.get_by_label("DP03_06_User_Uploaded_Tables.ipynb").get_by_label(
-            "Cells", exact=True
-        )
-    ).to_contain_text("Table length=15")
-    expect(
-        page.get_by_label("DP03_06_User_Uploaded_Tables.ipynb").get_by_label(
-            "Cells", exact=True
-        )
-    ).to_contain_text("Job phase is COMPLETED")
-    expect(
-        page.get_by_label("DP03_06_User_Uploaded_Tables.ipynb").get_by_label(
-            "Cells", exact=True
-        )
-    ).to_contain_text("Table length=672")
-    expect(
-        page.get_by_label("DP03_06_User_Uploaded_Tables.ipynb").get_by_label(
-            "Cells", exact=True
-        )
-    ).to_contain_text("4350915375550808373")
-
-    # Check that there are no errors
-    expect(
-        page.get_by_label("DP03_06_User_Uploaded_Tables.ipynb").get_by_label(
-            "Cells", exact=True
-        )
-    ).not_to_contain_text("Traceback")
-    expect(
-        page.get_by_label("DP03_06_User_Uploaded_Tables.ipynb").get_by_label(
-            "Cells", exact=True
-        )
-    ).not_to_contain_text("Error")
+    assert 15 in result.table_lengths
+    assert 672 in result.table_lengths
+    assert result.find("Job phase is COMPLETED")
+    assert result.find("4350915375550808373")
 
 
-def test_nublado_dp02_13a_image_cutout(page: Page) -> None:
+def test_nublado_dp02_13a_image_cutout(
+    tutorial_notebooks: dict[str, NotebookResult],
+    benchmark_store: BenchmarkStoreService | None,
+) -> None:
     """Test the Nublado tutorial dp02 Image Cutout demo notebook."""
-    # Go to Nublado page
-    page.goto(ConfigReaderService.get_url("nublado"))
-
-    # Open Notebook
-    home_dir = page.locator("[title^='/home/']").first
-    home_dir.locator("path").dblclick()
-    page.get_by_text("File", exact=True).click()
-    page.locator("#jp-mainmenu-file").get_by_text("Open from Path…").click()
-    page.get_by_placeholder("/path/relative/to/jlab/root").fill(
-        "/notebooks/tutorial-notebooks/DP02_13a_Image_Cutout_SciDemo.ipynb"
-    )
-    page.get_by_placeholder("/path/relative/to/jlab/root").press("Enter")
-
-    # Ensures that tab is loaded before running
-    page.get_by_label("DP02_13a_Image_Cutout_SciDemo.ipynb").get_by_role(
-        "heading", name="Using the image cutout tool"
-    ).click()
-
-    # This is a hack, need to figure out why run is started before things
-    # are loaded
-    time.sleep(5)
-
-    page.get_by_text("Run", exact=True).click()
-    page.locator("#jp-mainmenu-run").get_by_text("Run All Cells", exact=True).click()
+    result = tutorial_notebooks["DP02_13a_Image_Cutout_SciDemo.ipynb"]
+    _assert_passed(result)
+    _check_cell_timings(result, benchmark_store)
 
     # Validate some of the expected output
-    expect(
-        page.get_by_label("DP02_13a_Image_Cutout_SciDemo.ipynb").get_by_label(
-            "Cells", exact=True
-        )
-    ).to_contain_text(f"{BASE_URL}/api/datalink/links?")
-    expect(
-        page.get_by_label("DP02_13a_Image_Cutout_SciDemo.ipynb").get_by_label(
-            "Cells", exact=True
-        )
-    ).to_contain_text("Table length=162452")
-    expect(
-        page.get_by_label("DP02_13a_Image_Cutout_SciDemo.ipynb").get_by_label(
-            "Cells", exact=True
-        )
-    ).to_contain_text("Table length=1")
-
-    # Check that there are no errors
-    expect(
-        page.get_by_label("DP02_13a_Image_Cutout_SciDemo.ipynb").get_by_label(
-            "Cells", exact=True
-        )
-    ).not_to_contain_text("Traceback")
-    expect(
-        page.get_by_label("DP02_13a_Image_Cutout_SciDemo.ipynb").get_by_label(
-            "Cells", exact=True
-        )
-    ).not_to_contain_text("Error")
+    assert result.find(f"{BASE_URL}/api/datalink/links?")
+    assert 162452 in result.table_lengths
+    assert 1 in result.table_lengths
@@ -1,22 +1,24 @@
 """Test the portal page."""
 
 import re
-import time
 from collections.abc import Callable
 
 from playwright.sync_api import Page, expect
 
 from ..services.configreader import ConfigReaderService
+from ..services.metrics import MetricsService
+from ..services.readiness import ReadinessWaiter
 
 
 def test_query_dp02(page: Page) -> None:
     """Test the portal with a dp02 query."""
     # Go to Portal page
     portal_url = ConfigReaderService.get_url("portal")
-    page.goto(portal_url)
+    with MetricsService.step("test_query_dp02", "load"):
+        page.goto(portal_url)
 
-    # Open DP03 Tab and execute ADQL query
-    page.get_by_role("tab", name="Search DP0.2 catalogs").click()
+        # Open DP03 Tab and execute ADQL query
+        page.get_by_role("tab", name="Search DP0.2 catalogs").click()
     page.locator("div").filter(
         has_text=re.compile(r"^View: UI assistedEdit ADQL$")
     ).first.click()
@@ -31,11 +33,10 @@ def test_query_dp02(page: Page) -> None:
         """
     )
 
-    # Run query
-    page.get_by_role("button", name="Search").click()
-
-    # Validate results
-    expect(page.get_by_role("grid")).to_contain_text("62.0620699")
+    # Run query and validate results
+    with MetricsService.step("test_query_dp02", "search"):
+        page.get_by_role("button", name="Search").click()
+        expect(page.get_by_role("grid")).to_contain_text("62.0620699")
 
     # Check UWS job info
     page.get_by_role("button", name="Show additional table info").click()
@@ -45,10 +46,11 @@ def test_query_dp02(page: Page) -> None:
 def test_query_dp03(page: Page) -> None:
     """Test the portal with a DP03 query."""
     # Go to Portal page
-    page.goto(ConfigReaderService.get_url("portal"))
+    with MetricsService.step("test_query_dp03", "load"):
+        page.goto(ConfigReaderService.get_url("portal"))
 
-    # Open DP03 Tab and execute ADQL query
-    page.get_by_role("tab", name="Search DP0.3 catalogs").click()
+        # Open DP03 Tab and execute ADQL query
+        page.get_by_role("tab", name="Search DP0.3 catalogs").click()
     page.locator("div").filter(
         has_text=re.compile(r"^View: UI assistedEdit ADQL$")
     ).first.click()
@@ -57,11 +59,10 @@ def test_query_dp03(page: Page) -> None:
         "SELECT TOP 1000 * FROM dp03_catalogs_10yr.SSObject ORDER BY ssObjectId"
     )
 
-    # Run query
-    page.get_by_role("button", name="Search").click()
-
-    # Check first row value
-    expect(page.get_by_role("grid")).to_contain_text("112.6117")
+    # Run query and check first row value
+    with MetricsService.step("test_query_dp03", "search"):
+        page.get_by_role("button", name="Search").click()
+        expect(page.get_by_role("grid")).to_contain_text("112.6117")
     expect(page.get_by_role("grid")).to_contain_text("60513")
 
     # Check UWS job info
@@ -69,13 +70,16 @@ def test_query_dp03(page: Page) -> None:
     expect(page.locator("#dialogRootDiv")).to_contain_text("COMPLETED")
 
 
-def test_query_dp02_obscore(page: Page, assert_snapshot: Callable) -> None:
+def test_query_dp02_obscore(
+    page: Page, readiness: ReadinessWaiter, assert_snapshot: Callable
+) -> None:
     """Test the portal with a dp02 obscore query."""
     # Go to Portal page
-    page.goto(ConfigReaderService.get_url("portal"))
+    with MetricsService.step("test_query_dp02_obscore", "load"):
+        page.goto(ConfigReaderService.get_url("portal"))
 
-    # Open DP03 Tab and execute ADQL query
-    page.get_by_role("tab", name="Search DP0.2 catalogs").click()
+        # Open DP03 Tab and execute ADQL query
+        page.get_by_role("tab", name="Search DP0.2 catalogs").click()
     page.locator("div").filter(
         has_text=re.compile(r"^View: UI assistedEdit ADQL$")
     ).first.click()
@@ -84,16 +88,17 @@ def test_query_dp02_obscore(page: Page, assert_snapshot: Callable) -> None:
         "SELECT TOP 5 * FROM ivoa.ObsCore ORDER BY obs_id ASC"
     )
 
-    # Run query
-    page.get_by_role("button", name="Search").click()
-
-    # Check Datalink exists
-    expect(page.get_by_role("grid")).to_contain_text(
-        f"{ConfigReaderService.get_url('datalink')}/links?ID=butler"
-    )
-
-    time.sleep(20)
-    # Take a screenshot and assert it is as expected
+    # Run query and check Datalink exists
+    with MetricsService.step("test_query_dp02_obscore", "search"):
+        page.get_by_role("button", name="Search").click()
+        expect(page.get_by_role("grid")).to_contain_text(
+            f"{ConfigReaderService.get_url('datalink')}/links?ID=butler"
+        )
+
+    # Take a screenshot once the results are fully drawn
+    readiness.firefly_rendered()
+    readiness.network_idle()
+    readiness.images_decoded()
     assert_snapshot(page.screenshot())
 
     # Check UWS job info
@@ -0,0 +1,66 @@
+"""Tests of the page readiness waits, with a fake page."""
+
+import time
+from collections.abc import Callable
+from typing import Any
+
+import pytest
+
+from ..services.readiness import ReadinessWaiter
+
+
+class _FakePage:
+    """Stand in for a Playwright page that fires scripted request events.
+
+    Each call to ``wait_for_timeout`` sleeps and then fires the next batch of
+    events, as Playwright dispatches events while the test waits.
+    """
+
+    def __init__(self, script: list[list[tuple[str, object]]]) -> None:
+        self.script = script
+        self.handlers: dict[str, Callable[[Any], None]] = {}
+        self.waits = 0
+
+    def on(self, event: str, handler: Callable[[Any], None]) -> None:
+        self.handlers[event] = handler
+
+    def fire(self, event: str, request: object) -> None:
+        self.handlers[event](request)
+
+    def wait_for_timeout(self, timeout: float) -> None:
+        time.sleep(timeout / 1000)
+        if self.waits < len(self.script):
+            for event, request in self.script[self.waits]:
+                self.fire(event, request)
+        self.waits += 1
+
+
+def test_network_idle() -> None:
+    """Test that the page is idle once no request ran for the quiet time."""
+    first, second = object(), object()
+    page = _FakePage(
+        [
+            [("requestfinished", first), ("request", second)],
+            [],
+            [("requestfailed", second)],
+        ]
+    )
+    waiter = ReadinessWaiter(page, "test_network_idle", timeout=10_000)
+    page.fire("request", first)
+
+    waited = waiter.network_idle(quiet=0.2)
+    # The quiet time starts when the last request fails, on the third wait,
+    # and lasts at least four more waits of 50 ms
+    assert page.waits >= 7
+    assert waited >= 0.3
+    assert waiter.waits == [("network_idle", waited)]
+
+
+def test_network_idle_timeout() -> None:
+    """Test that a request that never finishes times the wait out."""
+    page = _FakePage([])
+    waiter = ReadinessWaiter(page, "test_network_idle_timeout", timeout=300)
+    page.fire("request", object())
+    with pytest.raises(TimeoutError, match="1 requests still in flight after 0.3s"):
+        waiter.network_idle(quiet=0.1)
+    assert waiter.waits == []
@@ -0,0 +1,116 @@
+"""Tests of the columnar batch of TAP query results."""
+
+import tempfile
+from dataclasses import asdict
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from ..models.tap import QueryPhase, QueryResult, QueryResultBatch
+
+
+def test_result_batch(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that a result batch keeps, summarises and exports query results."""
+    rng = np.random.default_rng(0)
+    queries = ["SELECT 1", "SELECT 2", "SELECT 3"]
+    results = [
+        QueryResult(
+            status="ERROR" if i % 10 == 0 else "OK",
+            row_count=i % 7,
+            execution_duration=float(rng.exponential()),
+            expected_duration=1.0,
+            expected_row_count=i % 7,
+            query=queries[i % 3],
+            queue_delay=i / 1000,
+            bytes_received=i * 100,
+            checksums={"id": "0f1e"} if i % 3 == 0 else {},
+            phases={"connect": 0.25, "ttfb": 0.5} if i % 2 else {},
+        )
+        for i in range(1000)
+    ]
+    batch = QueryResultBatch(capacity=8)
+    for i, result in enumerate(results):
+        batch.append(result, user=i % 4)
+
+    assert len(batch) == len(results)
+    assert list(batch) == results
+    assert batch[-1] == results[-1]
+    batch_counts = batch.status_counts()
+    assert batch_counts == {"ERROR": 100, "OK": 900}
+    assert batch.mean_phases() == {"connect": 0.25, "ttfb": 0.5}
+    assert not batch.mask(query="SELECT 4").any()
+    summaries = batch.summaries(elapsed=10.0)
+    assert list(summaries) == queries
+    for query in queries:
+        durations = [r.execution_duration for r in results if r.query == query]
+        summary = summaries[query]
+        assert asdict(summary) == pytest.approx(asdict(batch.summary(query, 10.0)))
+        assert summary.count == len(durations)
+        assert summary.p90 == pytest.approx(np.percentile(durations, 90))
+        assert summary.maximum == max(durations)
+        assert summary.throughput == len(durations) / 10.0
+
+    table = batch.to_arrow()
+    assert table.num_rows == len(results)
+    assert table["query"].to_pylist() == [r.query for r in results]
+    # Numeric columns are exported without a copy
+    durations = table["execution_duration"].chunk(0)
+    assert (
+        durations.buffers()[1].address == batch.column("execution_duration").ctypes.data
+    )
+
+    path = tmp_path / "results.parquet"
+    batch.to_parquet(path)
+    columns = ["query", "status", "user", "row_count", "execution_duration"]
+    assert (
+        pq.read_table(path, columns=columns).to_pylist()
+        == table.select(columns).to_pylist()
+    )
+
+    # Tables exported before the batch is cleared keep their rows
+    batch.clear()
+    batch.append(results[1])
+    assert len(batch) == 1
+    assert table["query"][0].as_py() == results[0].query
+
+    # A spilling batch writes every spill_rows results to a temporary file
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+    spilling = QueryResultBatch(spill_rows=300)
+    for i, result in enumerate(results):
+        spilling.append(result, user=i % 4)
+    (spill_dir,) = tmp_path.glob("rspvalidator-results-*")
+    spilled = sorted(spill_dir.iterdir())
+    assert [pq.read_metadata(path).num_rows for path in spilled] == [300] * 3
+    assert len(spilling) == len(results)
+    assert list(spilling) == results
+
+    # Indexing in order reads each spilled file once
+    reads = []
+    read_table = pq.read_table
+
+    def count_reads(path: Path, **kwargs: Any) -> pa.Table:
+        reads.append(path)
+        return read_table(path, **kwargs)
+
+    monkeypatch.setattr(pq, "read_table", count_reads)
+    assert [spilling[i] for i in range(600)] == results[:600]
+    assert reads == spilled[:2]
+    assert spilling[299] == results[299]
+    assert spilling[-1] == results[-1]
+    assert spilling.status_counts() == batch_counts
+    assert spilling.mean_phases() == {"connect": 0.25, "ttfb": 0.5}
+    assert spilling.summaries(elapsed=10.0) == summaries
+    exported = spilling.to_arrow()
+    phase_columns = [f"phase_{phase.value}" for phase in QueryPhase]
+    assert exported.drop(phase_columns).equals(table.drop(phase_columns))
+    for name in phase_columns:
+        assert np.array_equal(
+            exported[name].to_numpy(), table[name].to_numpy(), equal_nan=True
+        )
+    spilling.clear()
+    assert len(spilling) == 0
+    assert not spill_dir.exists()
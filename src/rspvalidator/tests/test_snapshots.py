@@ -0,0 +1,107 @@
+"""Tests of the snapshot comparison and the content-addressed store."""
+
+from io import BytesIO
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+from PIL import Image
+
+from ..services.snapshots import FailureWriter, SnapshotComparatorService
+from ..services.snapshotstore import SnapshotStore
+from ..utils.imagediff import pixelmatch
+
+
+def test_snapshot_diff(tmp_path: Path) -> None:
+    """Test that snapshots differ by real changes, not anti-aliasing."""
+    expected = np.full((20, 30, 4), 255, dtype=np.uint8)
+    expected[5:10, 5:10, :3] = 0
+    snapshot = tmp_path / "snapshot.png"
+    Image.fromarray(expected).save(snapshot)
+
+    def compare(actual: np.ndarray, **kwargs: Any) -> tuple[int, int]:
+        buffer = BytesIO()
+        Image.fromarray(actual).save(buffer, format="PNG")
+        diff = SnapshotComparatorService.compare_images(
+            buffer.getvalue(), snapshot, **kwargs
+        )[2]
+        return diff.mismatch, len(diff.antialiased[0])
+
+    assert compare(expected) == (0, 0)
+
+    # A grey pixel on the edge of the square is anti-aliasing, a faint change
+    # is below the threshold and a red square is a real change
+    actual = expected.copy()
+    actual[4, 7, :3] = 128
+    actual[15, 2, :3] = 250
+    actual[12:16, 20:24] = (255, 0, 0, 255)
+    assert compare(actual) == (16, 1)
+    assert compare(actual, threshold=0.0) == (17, 1)
+
+    # Ignored regions may be given as boxes or Playwright bounding boxes
+    assert compare(actual, ignore=[(20, 12, 4, 4)]) == (0, 1)
+    region = {"x": 19.5, "y": 11.5, "width": 2.0, "height": 2.0}
+    assert compare(actual, ignore=[region]) == (12, 1)
+
+    # A page of a different size differs everywhere
+    assert compare(expected[:10])[0] == 20 * 30
+
+
+def test_snapshot_store(tmp_path: Path) -> None:
+    """Test that snapshots are stored once by content, per host and name."""
+    pixels = np.full((10, 20, 4), 255, dtype=np.uint8)
+    buffer = BytesIO()
+    Image.fromarray(pixels).save(buffer, format="PNG")
+    data = buffer.getvalue()
+
+    # A snapshot in the former layout is imported on first use, for any host
+    legacy = tmp_path / "test_portal" / "test_query" / "test_query[linux].png"
+    legacy.parent.mkdir(parents=True)
+    legacy.write_bytes(data)
+    store = SnapshotStore(tmp_path, "data.lsst.cloud")
+    blob = store.get("test_portal", "test_query", "test_query[linux].png")
+    assert blob is not None
+    assert blob.read_bytes() == data
+
+    # Identical snapshots of other platforms and hosts share the blob
+    store.put("test_portal", "test_query", "test_query[darwin].png", data)
+    other = SnapshotStore(tmp_path, "data-dev.lsst.cloud")
+    assert other.get("test_portal", "test_query", "test_query[darwin].png") is None
+    other.put("test_portal", "test_query", "test_query[darwin].png", data)
+    entries = store.entries("test_portal", "test_query")
+    assert len(entries) == 3
+    assert other.get("test_portal", "test_query", "test_query[linux].png") == blob
+    assert len(store.entries("test_portal", "test_query")) == 4
+    assert {e.digest for e in entries} == {blob.stem}
+    assert (entries[0].width, entries[0].height) == (20, 10)
+    assert list(tmp_path.glob("blobs/*/*.png")) == [blob]
+
+    # Replacing a snapshot leaves its old blob to be pruned
+    Image.fromarray(pixels[:5]).save(buffer := BytesIO(), format="PNG")
+    store.put("test_portal", "test_query", "test_query[linux].png", buffer.getvalue())
+    assert store.prune() == []
+    store.put("test_portal", "test_query", "test_query[darwin].png", buffer.getvalue())
+    for name in ("test_query[linux].png", "test_query[darwin].png"):
+        other.put("test_portal", "test_query", name, buffer.getvalue())
+    assert store.prune() == [blob]
+
+    # Failed comparisons are written in the background, in order
+    writer = FailureWriter()
+    failures = tmp_path / "failures"
+    changed = pixels.copy()
+    changed[2:4, 2:4] = (255, 0, 0, 255)
+    diff = pixelmatch(changed, pixels)
+    writer.clear(failures)
+    writer.write(failures, "a.png", data, legacy, diff=diff, pixels=changed)
+    writer.close()
+    assert sorted(p.name for p in failures.iterdir()) == [
+        "Actual_a.png",
+        "Diff_a.png",
+        "Expected_a.png",
+    ]
+    assert np.asarray(Image.open(failures / "Diff_a.png"))[3, 3].tolist() == [
+        255,
+        0,
+        0,
+        255,
+    ]
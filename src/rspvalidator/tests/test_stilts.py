@@ -0,0 +1,133 @@
+"""Tests of the resident STILTS server, with a fake ``java`` command."""
+
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+from ..exceptions import StiltsError
+from ..models.taplint import TaplintReport
+from ..services.stilts import StiltsServer
+from ..services.taplint import TaplintService
+from .test_taplint_parser import TAPLINT_OUTPUT
+
+TAP_URL = "https://example.org/api/tap"
+
+FAKE_JAVA = """\
+import http.server
+import os
+import sys
+from pathlib import Path
+from urllib.parse import urlsplit
+
+args = sys.argv[1:]
+output = Path(os.environ["FAKE_TAPLINT_OUTPUT"])
+if "taplint" in args:
+    sys.stdout.write(output.read_text())
+    sys.exit(0)
+if os.environ.get("FAKE_STILTS_SERVER") == "fail":
+    sys.stderr.write("Address already in use\\n")
+    sys.exit(1)
+options = dict(a.split("=", 1) for a in args if "=" in a and a[0] != "-")
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        task = urlsplit(self.path).path.removeprefix(options["basepath"])
+        if task == "/task/exit":
+            os._exit(1)
+        bodies = {"/task/calc": "2\\n", "/task/taplint": output.read_text()}
+        if task not in bodies:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.end_headers()
+        self.wfile.write(bodies[task].encode())
+
+    def log_message(self, *args):
+        pass
+
+
+server = http.server.HTTPServer(("127.0.0.1", int(options["port"])), Handler)
+server.serve_forever()
+"""
+
+
+@pytest.fixture
+def taplint_output(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    """Put a fake ``java`` first on the path, printing the returned file.
+
+    The fake runs taplint by printing the file, and runs STILTS' server
+    command as a small HTTP server, which fails to start if
+    ``FAKE_STILTS_SERVER`` is ``fail``.
+    """
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    java = bin_dir / "java"
+    java.write_text(f"#!{sys.executable}\n{FAKE_JAVA}")
+    java.chmod(0o755)
+    output = tmp_path / "taplint.txt"
+    output.write_text(TAPLINT_OUTPUT)
+    monkeypatch.setenv("PATH", f"{bin_dir}:{Path(sys.executable).parent}")
+    monkeypatch.setenv("FAKE_TAPLINT_OUTPUT", str(output))
+    return output
+
+
+def _run_taplint(server: StiltsServer) -> TaplintReport:
+    return TaplintService.run(
+        Path("stilts.jar"),
+        TAP_URL,
+        "x-oauth-token",
+        "token",
+        interactive=False,
+        server=server,
+    )
+
+
+def test_stilts_server_restart(taplint_output: Path) -> None:
+    """Test that a server that died is started again."""
+    with StiltsServer(Path("stilts.jar"), startup_timeout=10) as server:
+        assert list(server.run_task("calc", {"expression": "1+1"})) == ["2"]
+        with pytest.raises(StiltsError):
+            list(server.run_task("exit", {}))
+        while server.running:
+            time.sleep(0.05)
+        assert not server.healthy()
+
+        server.ensure_running()
+        assert server.starts == 2
+        assert server.healthy()
+    assert not server.running
+
+
+def test_taplint_server(taplint_output: Path) -> None:
+    """Test that taplint runs in the server, failing if it has no totals."""
+    with StiltsServer(Path("stilts.jar"), startup_timeout=10) as server:
+        report = _run_taplint(server)
+        assert report.complete
+        assert (report.errors, report.exit_status) == (1, 0)
+
+        taplint_output.write_text(TAPLINT_OUTPUT.split("Section CAP")[0])
+        report = _run_taplint(server)
+        assert not report.complete
+        assert report.exit_status == 1
+        assert report.error == "taplint ended before printing its totals"
+        assert server.starts == 1
+
+
+def test_taplint_server_fallback(
+    taplint_output: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test that taplint runs in its own JVM if the server cannot start."""
+    monkeypatch.setenv("FAKE_STILTS_SERVER", "fail")
+    server = StiltsServer(Path("stilts.jar"), startup_timeout=10)
+    with pytest.raises(StiltsError, match="Address already in use"):
+        server.start()
+
+    report = _run_taplint(server)
+    assert report.complete
+    assert (report.errors, report.exit_status) == (1, 0)
+    assert server.starts == 2
+    assert not server.running
+    server.close()
@@ -1,48 +1,37 @@
 """TAPlint tests of the TAP Services."""
 
-from pathlib import Path
+import pytest
 
-from ..config import TOKEN
-from ..services.configreader import ConfigReaderService
-from ..services.taplint import TaplintService
+from ..models.taplint import TaplintReport
 from ..services.validation import TaplintValidationService
 
+# Both apps are checked at once by the fixture, which should run once
+pytestmark = pytest.mark.xdist_group("taplint")
 
-def test_stilts_taplint_sso(stilts_jar: Path) -> None:
+
+def test_stilts_taplint_sso(taplint_reports: dict[str, TaplintReport]) -> None:
     """
     Test the SSO TAP service with STILTS taplint.
 
     Parameters
     ----------
-    stilts_jar
-        The Path to the stilts jar
+    taplint_reports
+        The taplint reports of the TAP apps.
     """
-    tap_url = ConfigReaderService.get_url("ssotap")
-    username = "x-oauth-token"
-    password = TOKEN
-
-    stdout, exit_status = TaplintService.run(stilts_jar, tap_url, username, password)
-
-    assert exit_status == 0, f"STILTS TAPLINT failed with exit status {exit_status}"
-
-    TaplintValidationService(app="ssotap", output=stdout).validate_summary()
+    TaplintValidationService(
+        app="ssotap", report=taplint_reports["ssotap"]
+    ).validate_summary()
 
 
-def test_stilts_taplint_tap(stilts_jar: Path) -> None:
+def test_stilts_taplint_tap(taplint_reports: dict[str, TaplintReport]) -> None:
     """
     Test the TAP service with STILTS taplint.
 
     Parameters
     ----------
-    stilts_jar
-        The Path to the stilts jar
+    taplint_reports
+        The taplint reports of the TAP apps.
     """
-    tap_url = ConfigReaderService.get_url("tap")
-    username = "x-oauth-token"
-    password = TOKEN
-
-    stdout, exit_status = TaplintService.run(stilts_jar, tap_url, username, password)
-
-    assert exit_status == 0, f"STILTS TAPLINT failed with exit status {exit_status}"
-
-    TaplintValidationService(app="tap", output=stdout).validate_summary()
+    TaplintValidationService(
+        app="tap", report=taplint_reports["tap"]
+    ).validate_summary()
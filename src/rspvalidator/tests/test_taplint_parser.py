@@ -0,0 +1,108 @@
+"""Tests of the parsing and merging of taplint output."""
+
+from pathlib import Path
+
+from ..models.taplint import Severity
+from ..services.taplint import TaplintOrchestrator, TaplintParser
+
+TAPLINT_OUTPUT = """\
+This is STILTS taplint, 3.5-1/abc (2024-06-01)
+Static report types: ERROR(166), WARNING(88), INFO(42), SUMMARY(9), FAILURE(25)
+
+Section TMV: Validate table metadata against XML schema
+I-TMV-VURL-1 Validating https://example.org/api/tap/tables as tableset (xsd)
+S-TMV-VALI-1 SAX report: warnings 0, errors 0, fatal 0
+
+Section TME: Check content of tables metadata from /tables
+W-TME-CDTY-1 Column tap_schema.columns.size has undeclared datatype
+W-TME-CDTY-2 Column tap_schema.columns.principal has undeclared datatype
+E-TME-FKIT-1 Foreign key target table dp02_dc2_catalogs.Object not found,
+E-TME-FKIT-1+referenced from dp02_dc2_catalogs.Source
+S-TME-SUMM-1 Schemas: 4, Tables: 27, Columns: 1312, Foreign Keys: 3
+
+Section CAP: Check TAP and TAPRegExt content of capabilities document
+I-CAP-CURL-1 Reading capability metadata from https://example.org/api/tap/capabilities
+F-CAP-CAPX-1 Capabilities document could not be parsed
+
+Totals: Errors: 1; Warnings: 2; Infos: 2; Summaries: 2; Failures: 1
+"""
+
+
+def test_taplint_parser() -> None:
+    """Test that taplint output is parsed into stages and findings."""
+    clock = iter(range(0, 100, 5))
+    parser = TaplintParser(clock=lambda: float(next(clock)))
+    findings = [parser.feed(line) for line in TAPLINT_OUTPUT.splitlines(True)]
+    report = parser.close()
+
+    assert report.complete
+    assert (report.errors, report.warnings) == (1, 2)
+    assert report.count(Severity.FAILURE) == 1
+    assert [s.code for s in report.stages] == ["TMV", "TME", "CAP"]
+    assert [s.duration for s in report.stages] == [5.0, 5.0, 5.0]
+    tme = report.stage("TME")
+    assert tme is not None
+    assert tme.description == "Check content of tables metadata from /tables"
+    assert (tme.errors, tme.warnings) == (1, 2)
+    assert tme.counts[Severity.SUMMARY] == 1
+
+    # Only errors, warnings and failures are kept, with continuations joined
+    assert [f.label for f in report.findings] == [
+        "W-TME-CDTY-1",
+        "W-TME-CDTY-2",
+        "E-TME-FKIT-1",
+        "F-CAP-CAPX-1",
+    ]
+    assert report.findings[2].text.endswith(
+        "not found,\nreferenced from dp02_dc2_catalogs.Source"
+    )
+    assert sum(f is not None for f in findings) == 8
+
+    # An interrupted run is counted from its findings
+    lines = TAPLINT_OUTPUT.splitlines()[:-2]
+    interrupted = TaplintParser.parse(lines)
+    assert not interrupted.complete
+    assert (interrupted.errors, interrupted.warnings) == (1, 2)
+
+
+def test_taplint_merge() -> None:
+    """Test that taplint runs of stage groups merge into one report."""
+    orchestrator = TaplintOrchestrator(
+        Path("stilts.jar"), "x-oauth-token", "token", stage_groups=[["TMV", "TME"]]
+    )
+    assert orchestrator.stage_options() == [None]
+    orchestrator.stage_groups = [["TMV", "TME"], ["TMV", "CAP"]]
+    first, second = orchestrator.stage_options()
+    assert first == "+TMV +TME -CAP"
+    assert second is not None
+    assert second.startswith("+TMV +CAP -AVV ")
+    assert "-TME" in second.split()
+    assert "-QAS" in second.split()
+
+    # The stage both runs share is counted once, from the first run
+    lines = TAPLINT_OUTPUT.splitlines()
+    sections = [i for i, line in enumerate(lines) if line.startswith("Section")]
+    cap = lines[sections[2] : sections[2] + 3]
+    part1 = [*lines[: sections[2]], "Totals: Errors: 1; Warnings: 2; Infos: 1"]
+    part2 = [*lines[sections[0] : sections[1]], *cap, "Totals: Failures: 1; Infos: 2"]
+    merged = TaplintOrchestrator.merge(
+        [TaplintParser.parse(part1), TaplintParser.parse(part2)]
+    )
+    expected = TaplintParser.parse(lines)
+    assert [s.code for s in merged.stages] == ["TMV", "TME", "CAP"]
+    assert merged.findings == expected.findings
+    assert merged.totals == {
+        Severity.ERROR: 1,
+        Severity.WARNING: 2,
+        Severity.INFO: 2,
+        Severity.FAILURE: 1,
+    }
+
+    # A run that failed makes the merged report fail
+    part2 = [*lines[sections[0] : sections[1]], *cap]
+    failed = TaplintParser.parse(part2)
+    failed.exit_status, failed.error = -1, "Timeout occurred after 10 seconds"
+    merged = TaplintOrchestrator.merge([TaplintParser.parse(part1), failed])
+    assert not merged.complete
+    assert (merged.exit_status, merged.error) == (-1, failed.error)
+    assert (merged.errors, merged.warnings) == (1, 2)
@@ -0,0 +1,74 @@
+"""Generate request arrival schedules for open-loop load tests."""
+
+import random
+from collections.abc import Iterator
+
+from ..models.test import ArrivalPattern
+
+__all__ = ["arrival_offsets"]
+
+
+def arrival_offsets(
+    pattern: ArrivalPattern,
+    rate: float,
+    duration: float,
+    *,
+    ramp_steps: int = 1,
+    seed: int | None = None,
+) -> Iterator[float]:
+    """
+    Generate the arrival times of requests for an open-loop load test.
+
+    Parameters
+    ----------
+    pattern
+        The arrival pattern.
+    rate
+        The target arrival rate in requests per second. For a ramp this is
+        the rate of the final step.
+    duration
+        The length of the test in seconds.
+    ramp_steps
+        The number of equal-length steps in a ramp.
+    seed
+        Seed for the random number generator used by Poisson arrivals.
+
+    Yields
+    ------
+    float
+        The arrival time of each request, in seconds from the start of the
+        test, in increasing order.
+
+    Raises
+    ------
+    ValueError
+        If the rate, duration or number of ramp steps is not positive.
+    """
+    if rate <= 0 or duration <= 0:
+        raise ValueError("Arrival rate and duration must be positive")
+    if ramp_steps < 1:
+        raise ValueError("Ramp must have at least one step")
+
+    if pattern == ArrivalPattern.CONSTANT:
+        count = int(rate * duration)
+        for i in range(count):
+            yield i / rate
+
+    elif pattern == ArrivalPattern.POISSON:
+        rng = random.Random(seed)  # noqa: S311
+        offset = rng.expovariate(rate)
+        while offset < duration:
+            yield offset
+            offset += rng.expovariate(rate)
+
+    elif pattern == ArrivalPattern.RAMP:
+        step_duration = duration / ramp_steps
+        for step in range(ramp_steps):
+            step_rate = rate * (step + 1) / ramp_steps
+            step_start = step * step_duration
+            count = int(step_rate * step_duration)
+            for i in range(count):
+                yield step_start + i / step_rate
+
+    else:
+        raise ValueError(f"Invalid arrival pattern: {pattern}")
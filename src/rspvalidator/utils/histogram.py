@@ -0,0 +1,273 @@
+"""Record latencies in log-bucketed histograms and summarise them."""
+
+import math
+import threading
+import time
+
+from ..models.test import LatencySummary
+
+__all__ = ["LatencyHistogram", "LatencyRecorder"]
+
+# Number of bits of each value kept when bucketing. Values are stored with a
+# relative error of at most 2 ** -(_SUB_BUCKET_BITS - 1), i.e. under 1%.
+_SUB_BUCKET_BITS = 8
+_SUB_BUCKET_HALF = 1 << (_SUB_BUCKET_BITS - 1)
+_SUB_BUCKET_COUNT = 1 << _SUB_BUCKET_BITS
+
+# Latencies are bucketed as whole microseconds.
+_UNITS_PER_SECOND = 1_000_000
+
+
+def _bucket_index(value: int) -> int:
+    """Map a non-negative integer value to its bucket index."""
+    if value < _SUB_BUCKET_COUNT:
+        return value
+    shift = value.bit_length() - _SUB_BUCKET_BITS
+    return shift * _SUB_BUCKET_HALF + (value >> shift)
+
+
+def _bucket_bounds(index: int) -> tuple[int, int]:
+    """Return the lowest and highest values that map to a bucket index."""
+    if index < _SUB_BUCKET_COUNT:
+        return index, index
+    shift = (index >> (_SUB_BUCKET_BITS - 1)) - 1
+    mantissa = index - shift * _SUB_BUCKET_HALF
+    return mantissa << shift, ((mantissa + 1) << shift) - 1
+
+
+class LatencyHistogram:
+    """HDR-style histogram of latencies with logarithmic buckets.
+
+    Each value is kept to within 1% (about two significant figures) in a
+    sparse bucket map, so recording is a few integer operations and a dict
+    update, and histograms from different threads or processes can be merged
+    exactly.
+    The minimum, maximum and sum are tracked exactly.
+    """
+
+    __slots__ = ("_counts", "count", "maximum", "minimum", "total")
+
+    def __init__(self) -> None:
+        self._counts: dict[int, int] = {}
+        self.count = 0
+        self.total = 0.0
+        self.minimum = math.inf
+        self.maximum = 0.0
+
+    def record(self, seconds: float) -> None:
+        """Record a single latency.
+
+        Parameters
+        ----------
+        seconds
+            The latency in seconds.
+        """
+        index = _bucket_index(max(int(seconds * _UNITS_PER_SECOND), 0))
+        self._counts[index] = self._counts.get(index, 0) + 1
+        self.count += 1
+        self.total += seconds
+        self.minimum = min(self.minimum, seconds)
+        self.maximum = max(self.maximum, seconds)
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        """Add the contents of another histogram to this one.
+
+        Parameters
+        ----------
+        other
+            The histogram to merge in.
+        """
+        for index, count in other.buckets().items():
+            self._counts[index] = self._counts.get(index, 0) + count
+        self.count += other.count
+        self.total += other.total
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+
+    def buckets(self) -> dict[int, int]:
+        """Return a copy of the non-empty bucket counts keyed by index."""
+        return dict(self._counts)
+
+    @property
+    def mean(self) -> float:
+        """The mean latency in seconds."""
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, percentile: float) -> float:
+        """Return the latency at the given percentile.
+
+        Parameters
+        ----------
+        percentile
+            The percentile, between 0 and 100.
+
+        Returns
+        -------
+        float
+            The latency in seconds. The 100th percentile is the exact maximum,
+            other percentiles are accurate to the bucket resolution.
+
+        Raises
+        ------
+        ValueError
+            If the percentile is out of range.
+        """
+        if not 0 <= percentile <= 100:
+            raise ValueError(f"Invalid percentile: {percentile}")
+        if not self.count:
+            return 0.0
+        if percentile == 100:
+            return self.maximum
+
+        rank = max(math.ceil(percentile / 100 * self.count), 1)
+        seen = 0
+        for index in sorted(self._counts):
+            seen += self._counts[index]
+            if seen >= rank:
+                low, high = _bucket_bounds(index)
+                value = (low + high) / 2 / _UNITS_PER_SECOND
+                return min(max(value, self.minimum), self.maximum)
+        return self.maximum
+
+    def summary(self, elapsed: float = 0.0) -> LatencySummary:
+        """Summarise the histogram.
+
+        Parameters
+        ----------
+        elapsed
+            The wall-clock time over which the latencies were recorded, used
+            to compute the throughput.
+
+        Returns
+        -------
+        LatencySummary
+            The latency percentiles and throughput.
+        """
+        return LatencySummary(
+            count=self.count,
+            mean=self.mean,
+            p50=self.percentile(50),
+            p90=self.percentile(90),
+            p99=self.percentile(99),
+            maximum=self.maximum,
+            throughput=self.count / elapsed if elapsed > 0 else 0.0,
+        )
+
+
+class LatencyRecorder:
+    """Thread-safe recorder of latencies per key and in aggregate.
+
+    One recorder is meant to cover one scenario, with a key per query.
+    Latencies are assumed to be recorded as soon as each call finishes, and
+    throughput is measured from the start of the earliest recorded call
+    until the end of the last one.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._histograms: dict[str, LatencyHistogram] = {}
+        self._total = LatencyHistogram()
+        self._started = math.inf
+        self._finished = -math.inf
+
+    def record(self, key: str, seconds: float) -> None:
+        """Record a latency.
+
+        Parameters
+        ----------
+        key
+            The key to record the latency under, usually the query.
+        seconds
+            The latency in seconds.
+        """
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = LatencyHistogram()
+            histogram.record(seconds)
+            self._total.record(seconds)
+            now = time.perf_counter()
+            self._started = min(self._started, now - seconds)
+            self._finished = max(self._finished, now)
+
+    def merge(self, other: "LatencyRecorder") -> None:
+        """Add the latencies recorded by another recorder to this one.
+
+        Parameters
+        ----------
+        other
+            The recorder to merge in.
+        """
+        histograms = {key: other.histogram(key) for key in other.recorded_keys()}
+        started, finished = other.window
+        with self._lock:
+            for key, histogram in histograms.items():
+                self._histograms.setdefault(key, LatencyHistogram()).merge(histogram)
+                self._total.merge(histogram)
+            self._started = min(self._started, started)
+            self._finished = max(self._finished, finished)
+
+    @property
+    def window(self) -> tuple[float, float]:
+        """The ``perf_counter`` times the first recorded call started and the
+        last one finished.
+        """
+        with self._lock:
+            return self._started, self._finished
+
+    def recorded_keys(self) -> list[str]:
+        """Return the keys that latencies were recorded under."""
+        with self._lock:
+            return list(self._histograms)
+
+    def histogram(self, key: str | None = None) -> LatencyHistogram:
+        """Return a copy of the histogram for a key.
+
+        Parameters
+        ----------
+        key
+            The key, or `None` for the histogram of all latencies.
+
+        Returns
+        -------
+        LatencyHistogram
+            A copy of the histogram, safe to read while recording continues.
+        """
+        copy = LatencyHistogram()
+        with self._lock:
+            copy.merge(self._total if key is None else self._histograms[key])
+        return copy
+
+    def percentile(self, percentile: float, key: str | None = None) -> float:
+        """Return the latency at a percentile.
+
+        Parameters
+        ----------
+        percentile
+            The percentile, between 0 and 100.
+        key
+            The key, or `None` for all latencies.
+
+        Returns
+        -------
+        float
+            The latency in seconds.
+        """
+        return self.histogram(key).percentile(percentile)
+
+    def summary(self, key: str | None = None) -> LatencySummary:
+        """Summarise the latencies for a key.
+
+        Parameters
+        ----------
+        key
+            The key, or `None` for all latencies.
+
+        Returns
+        -------
+        LatencySummary
+            The latency percentiles and throughput.
+        """
+        histogram = self.histogram(key)
+        started, finished = self.window
+        return histogram.summary(elapsed=finished - started)
@@ -0,0 +1,223 @@
+"""HTTP connection pooling with connection reuse and phase accounting."""
+
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import Any
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+
+from ..models.tap import QueryPhase
+
+__all__ = ["ConnectionStats", "InstrumentedHTTPAdapter", "record_phases"]
+
+_local = threading.local()
+
+
+@contextmanager
+def record_phases(phases: dict[str, float]) -> Iterator[dict[str, float]]:
+    """Time the connection phases of the requests made in this thread.
+
+    Only requests sent through an `InstrumentedHTTPAdapter` are timed. The
+    time spent connecting, sending requests and waiting for response headers
+    is added to ``phases`` under the `QueryPhase` values ``connect``,
+    ``send`` and ``ttfb``, summed over all the requests made in the block.
+
+    Parameters
+    ----------
+    phases
+        The durations to add to, in seconds.
+
+    Yields
+    ------
+    dict[str, float]
+        The given durations.
+    """
+    previous = getattr(_local, "phases", None)
+    _local.phases = phases
+    try:
+        yield phases
+    finally:
+        _local.phases = previous
+
+
+def _add_phase(phase: QueryPhase, seconds: float) -> None:
+    """Add a duration to the phases being recorded in this thread, if any."""
+    phases = getattr(_local, "phases", None)
+    if phases is not None:
+        phases[phase.value] = phases.get(phase.value, 0.0) + seconds
+
+
+class _TimedHTTPConnection(HTTPConnection):
+    """urllib3 connection that times the phases of the requests it sends.
+
+    Combined with ``HTTPSConnection`` for HTTPS connections.
+    """
+
+    _connect_duration = 0.0
+
+    def connect(self) -> None:
+        start = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            self._connect_duration = time.perf_counter() - start
+            _add_phase(QueryPhase.CONNECT, self._connect_duration)
+
+    def request(self, *args: Any, **kwargs: Any) -> None:
+        # Connections opened lazily while sending are counted as connecting
+        self._connect_duration = 0.0
+        start = time.perf_counter()
+        try:
+            super().request(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start - self._connect_duration
+            _add_phase(QueryPhase.SEND, elapsed)
+
+    def getresponse(self, *args: Any, **kwargs: Any) -> Any:
+        start = time.perf_counter()
+        try:
+            return super().getresponse(*args, **kwargs)
+        finally:
+            _add_phase(QueryPhase.TTFB, time.perf_counter() - start)
+
+
+class ConnectionStats:
+    """Thread-safe count of HTTP requests and the connections they opened.
+
+    A request that did not open a connection reused a pooled one, so the
+    difference shows how many TCP and TLS handshakes the pool saved.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.opened = 0
+        self.requests = 0
+
+    def connection_opened(self) -> None:
+        """Count a newly opened connection."""
+        with self._lock:
+            self.opened += 1
+
+    def request_sent(self) -> None:
+        """Count a request."""
+        with self._lock:
+            self.requests += 1
+
+    @property
+    def reused(self) -> int:
+        """The number of requests sent over an already open connection."""
+        return max(self.requests - self.opened, 0)
+
+    def reset(self) -> None:
+        """Reset the counts to zero."""
+        with self._lock:
+            self.opened = 0
+            self.requests = 0
+
+    def __str__(self) -> str:
+        return (
+            f"{self.requests} requests opened {self.opened} connections "
+            f"({self.reused} reused)"
+        )
+
+
+class InstrumentedHTTPAdapter(HTTPAdapter):
+    """HTTP adapter with explicit pool limits that counts connection reuse.
+
+    Requests sent through the adapter are also timed by `record_phases`.
+
+    urllib3 keeps one pool per host, so ``pool_maxsize`` is the per-host
+    connection limit and ``pool_connections`` the number of hosts whose
+    pools are kept. With ``pool_block`` set, requests beyond the per-host
+    limit wait for a free connection instead of opening a throwaway one.
+
+    Parameters
+    ----------
+    stats
+        The counts to update.
+    pool_connections
+        The number of per-host connection pools to keep.
+    pool_maxsize
+        The maximum number of connections kept open to each host.
+    pool_block
+        Whether to wait for a free connection when a host's pool is full.
+    max_retries
+        The number of times to retry failed connections, reads and 502, 503
+        or 504 responses to idempotent requests.
+    retry_backoff
+        The backoff factor between retries, in seconds.
+    keep_alive
+        Whether to keep connections open between requests. If false, every
+        request asks the server to close its connection afterwards.
+    """
+
+    def __init__(
+        self,
+        stats: ConnectionStats,
+        *,
+        pool_connections: int = 10,
+        pool_maxsize: int = 10,
+        pool_block: bool = False,
+        max_retries: int = 0,
+        retry_backoff: float = 0.0,
+        keep_alive: bool = True,
+    ) -> None:
+        self.stats = stats
+        self.keep_alive = keep_alive
+        retries = Retry(
+            total=max_retries,
+            backoff_factor=retry_backoff,
+            status_forcelist=(502, 503, 504) if max_retries else (),
+            raise_on_status=False,
+        )
+        super().__init__(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            max_retries=retries,
+            pool_block=pool_block,
+        )
+
+    def init_poolmanager(
+        self,
+        connections: int,
+        maxsize: int,
+        block: bool = False,  # noqa: FBT001, FBT002
+        **pool_kwargs: Any,
+    ) -> None:
+        super().init_poolmanager(connections, maxsize, block=block, **pool_kwargs)
+        stats = self.stats
+
+        class _HTTPConnection(_TimedHTTPConnection):
+            def connect(self) -> None:
+                stats.connection_opened()
+                super().connect()
+
+        class _HTTPSConnection(_TimedHTTPConnection, HTTPSConnection):
+            def connect(self) -> None:
+                stats.connection_opened()
+                super().connect()
+
+        class _HTTPConnectionPool(HTTPConnectionPool):
+            ConnectionCls = _HTTPConnection
+
+        class _HTTPSConnectionPool(HTTPSConnectionPool):
+            ConnectionCls = _HTTPSConnection
+
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _HTTPConnectionPool,
+            "https": _HTTPSConnectionPool,
+        }
+
+    def send(
+        self, request: requests.PreparedRequest, *args: Any, **kwargs: Any
+    ) -> requests.Response:
+        if not self.keep_alive:
+            request.headers["Connection"] = "close"
+        self.stats.request_sent()
+        return super().send(request, *args, **kwargs)
@@ -0,0 +1,309 @@
+"""Compare screenshots pixel by pixel, with arrays instead of per-pixel loops.
+
+The comparison follows pixelmatch: two pixels differ if the YIQ distance
+between their colours, blended with white by their alpha, is above
+``35215 * threshold ** 2``, unless one of them looks like anti-aliasing. A
+pixel looks like anti-aliasing if its neighbours include both a darker and
+a brighter pixel, at most two neighbours have its brightness, and the
+darkest or brightest neighbour has three or more neighbours of the same
+colour in both images.
+
+The colour maths only runs on pixels whose values are not identical, and
+the anti-aliasing checks only on pixels above the threshold, so comparing a
+full-page screenshot that differs in a few places takes milliseconds.
+"""
+
+from collections.abc import Iterable, Mapping
+from dataclasses import dataclass
+
+import numpy as np
+
+__all__ = ["ImageDiff", "ignore_mask", "pixelmatch"]
+
+# Maximum possible value of the YIQ distance between two colours
+MAX_YIQ_DELTA = 35215
+
+# Weights of the YIQ distance and the RGB to YIQ conversion
+_Y_WEIGHT, _I_WEIGHT, _Q_WEIGHT = 0.5053, 0.299, 0.1957
+_RGB2Y = (0.29889531, 0.58662247, 0.11448223)
+_RGB2I = (0.59597799, -0.27417610, -0.32180189)
+_RGB2Q = (0.21147017, -0.52261711, 0.31114694)
+
+# Offsets of the 8 neighbours of a pixel, in the order pixelmatch visits
+# them, which decides which neighbour is the darkest or brightest on ties
+_NEIGHBOURS = [(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1) if dx or dy]
+
+
+def _blend(pixels: np.ndarray) -> np.ndarray:
+    """Return the RGB of RGBA pixels blended with white by their alpha."""
+    rgb = pixels[..., :3].astype(np.float64)
+    alpha = pixels[..., 3:4]
+    translucent = alpha < 255
+    if translucent.any():
+        rgb = np.where(translucent, 255 + (rgb - 255) * (alpha / 255), rgb)
+    return rgb
+
+
+def _convert(rgb: np.ndarray, weights: tuple[float, float, float]) -> np.ndarray:
+    """Return one YIQ component of RGB colours."""
+    return (
+        rgb[..., 0] * weights[0] + rgb[..., 1] * weights[1] + rgb[..., 2] * weights[2]
+    )
+
+
+def _color_delta(pixels1: np.ndarray, pixels2: np.ndarray) -> np.ndarray:
+    """Return the squared YIQ distance between pairs of RGBA pixels."""
+    rgb1 = _blend(pixels1)
+    rgb2 = _blend(pixels2)
+    y = _convert(rgb1, _RGB2Y) - _convert(rgb2, _RGB2Y)
+    i = _convert(rgb1, _RGB2I) - _convert(rgb2, _RGB2I)
+    q = _convert(rgb1, _RGB2Q) - _convert(rgb2, _RGB2Q)
+    return _Y_WEIGHT * y * y + _I_WEIGHT * i * i + _Q_WEIGHT * q * q
+
+
+def _neighbour(
+    ys: np.ndarray, xs: np.ndarray, dx: int, dy: int, shape: tuple[int, ...]
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Return the coordinates of a neighbour of pixels and whether it exists.
+
+    The coordinates of neighbours outside the image are clamped to the
+    image, and are to be ignored.
+    """
+    height, width = shape[:2]
+    nys = ys + dy
+    nxs = xs + dx
+    valid = (nys >= 0) & (nys < height) & (nxs >= 0) & (nxs < width)
+    return np.clip(nys, 0, height - 1), np.clip(nxs, 0, width - 1), valid
+
+
+def _on_edge(ys: np.ndarray, xs: np.ndarray, shape: tuple[int, ...]) -> np.ndarray:
+    """Return whether pixels are on the edge of the image.
+
+    Pixelmatch counts a pixel on the edge as having one equal neighbour.
+    """
+    height, width = shape[:2]
+    return (xs == 0) | (xs == width - 1) | (ys == 0) | (ys == height - 1)
+
+
+def _has_many_siblings(image: np.ndarray, ys: np.ndarray, xs: np.ndarray) -> np.ndarray:
+    """Return whether pixels have 3 or more neighbours of the same colour."""
+    center = image[ys, xs]
+    equal = _on_edge(ys, xs, image.shape).astype(np.int8)
+    for dx, dy in _NEIGHBOURS:
+        nys, nxs, valid = _neighbour(ys, xs, dx, dy, image.shape)
+        equal += valid & np.all(image[nys, nxs] == center, axis=-1)
+    return equal > 2
+
+
+def _antialiased(
+    image: np.ndarray, other: np.ndarray, ys: np.ndarray, xs: np.ndarray
+) -> np.ndarray:
+    """Return whether pixels of an image are likely part of anti-aliasing."""
+    center_y = _convert(_blend(image[ys, xs]), _RGB2Y)
+    zeroes = _on_edge(ys, xs, image.shape).astype(np.int8)
+    darkest: np.ndarray = np.zeros(len(ys))
+    brightest: np.ndarray = np.zeros(len(ys))
+    darkest_ys, darkest_xs = ys.copy(), xs.copy()
+    brightest_ys, brightest_xs = ys.copy(), xs.copy()
+    for dx, dy in _NEIGHBOURS:
+        nys, nxs, valid = _neighbour(ys, xs, dx, dy, image.shape)
+        delta = center_y - _convert(_blend(image[nys, nxs]), _RGB2Y)
+        zeroes += valid & (delta == 0)
+        # Only the first of equally dark or bright neighbours is kept
+        darker = valid & (delta < darkest)
+        darkest = np.where(darker, delta, darkest)
+        darkest_ys = np.where(darker, nys, darkest_ys)
+        darkest_xs = np.where(darker, nxs, darkest_xs)
+        brighter = valid & (delta > brightest)
+        brightest = np.where(brighter, delta, brightest)
+        brightest_ys = np.where(brighter, nys, brightest_ys)
+        brightest_xs = np.where(brighter, nxs, brightest_xs)
+
+    # More than 2 neighbours of the same brightness, or no darker or no
+    # brighter neighbour, rules out anti-aliasing
+    candidates = (zeroes <= 2) & (darkest != 0) & (brightest != 0)
+    return candidates & (
+        (
+            _has_many_siblings(image, darkest_ys, darkest_xs)
+            & _has_many_siblings(other, darkest_ys, darkest_xs)
+        )
+        | (
+            _has_many_siblings(image, brightest_ys, brightest_xs)
+            & _has_many_siblings(other, brightest_ys, brightest_xs)
+        )
+    )
+
+
+@dataclass
+class ImageDiff:
+    """
+    The pixels that differ between two images.
+
+    Attributes
+    ----------
+    shape: tuple[int, int]
+        The height and width of the images.
+    diff: tuple[np.ndarray, np.ndarray]
+        The row and column indices of the pixels that differ.
+    antialiased: tuple[np.ndarray, np.ndarray]
+        The row and column indices of the pixels above the threshold that
+        were ignored as anti-aliasing.
+    """
+
+    shape: tuple[int, int]
+    diff: tuple[np.ndarray, np.ndarray]
+    antialiased: tuple[np.ndarray, np.ndarray]
+
+    @property
+    def mismatch(self) -> int:
+        """The number of pixels that differ."""
+        return len(self.diff[0])
+
+    def render(
+        self,
+        image: np.ndarray,
+        *,
+        alpha: float = 0.1,
+        aa_color: tuple[int, int, int] = (255, 255, 0),
+        diff_color: tuple[int, int, int] = (255, 0, 0),
+        diff_mask: bool = False,
+    ) -> np.ndarray:
+        """Draw the differences over a faded copy of an image, like pixelmatch.
+
+        Parameters
+        ----------
+        image
+            The RGBA image to draw over, usually the first one compared.
+        alpha
+            The opacity of the image in the output.
+        aa_color
+            The colour of the pixels ignored as anti-aliasing.
+        diff_color
+            The colour of the pixels that differ.
+        diff_mask
+            Whether to draw the differences over a transparent background
+            instead of the image, without the anti-aliased pixels.
+
+        Returns
+        -------
+        np.ndarray
+            The RGBA diff image.
+        """
+        if diff_mask:
+            output = np.zeros((*self.shape, 4), dtype=np.uint8)
+        else:
+            # Grey from the pixels' brightness, blended with white
+            brightness = _convert(image[..., :3].astype(np.float64), _RGB2Y)
+            gray = 255 + (brightness - 255) * (alpha * image[..., 3] / 255)
+            output = np.empty((*self.shape, 4), dtype=np.uint8)
+            output[..., :3] = gray[..., None].astype(np.uint8)
+            output[..., 3] = 255
+            output[self.antialiased] = (*aa_color, 255)
+        output[self.diff] = (*diff_color, 255)
+        return output
+
+
+def ignore_mask(
+    shape: tuple[int, ...],
+    regions: Iterable[tuple[float, float, float, float] | Mapping[str, float]],
+) -> np.ndarray:
+    """Make a mask of the regions of an image to ignore.
+
+    Parameters
+    ----------
+    shape
+        The shape of the image; only its height and width are used.
+    regions
+        The regions as ``(x, y, width, height)`` in pixels, or as the
+        bounding box dicts Playwright returns for an element, e.g. the cell
+        of a grid showing a timestamp. Regions are clipped to the image.
+
+    Returns
+    -------
+    np.ndarray
+        A boolean array of the image's height and width, true where pixels
+        are ignored.
+    """
+    height, width = shape[:2]
+    mask = np.zeros((height, width), dtype=bool)
+    for region in regions:
+        if isinstance(region, Mapping):
+            x, y = region["x"], region["y"]
+            w, h = region["width"], region["height"]
+        else:
+            x, y, w, h = region
+        # Partly covered pixels are ignored too
+        left, top = max(int(np.floor(x)), 0), max(int(np.floor(y)), 0)
+        right, bottom = (
+            min(int(np.ceil(x + w)), width),
+            min(int(np.ceil(y + h)), height),
+        )
+        if left < right and top < bottom:
+            mask[top:bottom, left:right] = True
+    return mask
+
+
+def pixelmatch(
+    image1: np.ndarray,
+    image2: np.ndarray,
+    *,
+    threshold: float = 0.1,
+    include_aa: bool = False,
+    ignore: np.ndarray | None = None,
+) -> ImageDiff:
+    """Find the pixels that differ between two RGBA images.
+
+    Parameters
+    ----------
+    image1
+        The first image, as a ``(height, width, 4)`` array of ``uint8``.
+    image2
+        The second image, of the same shape.
+    threshold
+        The matching threshold from 0 to 1; smaller is more sensitive.
+    include_aa
+        Whether to count pixels that look like anti-aliasing as differences.
+    ignore
+        A boolean mask of the pixels to ignore, e.g. from `ignore_mask`.
+
+    Returns
+    -------
+    ImageDiff
+        The pixels that differ.
+
+    Raises
+    ------
+    ValueError
+        If the images are not RGBA images of the same size.
+    """
+    if image1.shape != image2.shape or image1.ndim != 3 or image1.shape[2] != 4:
+        raise ValueError(
+            f"Images must be RGBA images of the same size, got {image1.shape} "
+            f"and {image2.shape}"
+        )
+    shape = image1.shape[:2]
+    empty = (np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp))
+
+    # Identical pixels are never a difference, which spares the colour maths
+    # for nearly all of a screenshot
+    changed = np.any(image1 != image2, axis=-1)
+    if ignore is not None:
+        changed &= ~ignore
+    ys, xs = np.nonzero(changed)
+    if not len(ys):
+        return ImageDiff(shape, empty, empty)
+
+    delta = _color_delta(image1[ys, xs], image2[ys, xs])
+    above = delta > MAX_YIQ_DELTA * threshold * threshold
+    ys, xs = ys[above], xs[above]
+    if include_aa or not len(ys):
+        return ImageDiff(shape, (ys, xs), empty)
+
+    antialiased = _antialiased(image1, image2, ys, xs) | _antialiased(
+        image2, image1, ys, xs
+    )
+    return ImageDiff(
+        shape,
+        (ys[~antialiased], xs[~antialiased]),
+        (ys[antialiased], xs[antialiased]),
+    )
@@ -0,0 +1,298 @@
+"""Counters, gauges and histograms exposed in the Prometheus text format.
+
+Only what the validator needs of the Prometheus client is implemented: each
+metric has a fixed set of label names, samples are kept in memory, and the
+registry renders them in the text exposition format, version 0.0.4, which
+both Prometheus and the node_exporter textfile collector read.
+"""
+
+import bisect
+import math
+import os
+import tempfile
+import threading
+from collections.abc import Iterator, Sequence
+from pathlib import Path
+from typing import Any, TypeVar
+
+__all__ = ["CONTENT_TYPE", "Counter", "Gauge", "Histogram", "MetricsRegistry"]
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Default histogram buckets in seconds, from fast HTTP requests to slow TAP
+# queries
+DEFAULT_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+    120.0,
+    300.0,
+)
+
+_MetricT = TypeVar("_MetricT", bound="_Metric")
+
+
+def _escape(value: str) -> str:
+    """Escape a label value."""
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    """Format a sample value."""
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+def _format_labels(pairs: Sequence[tuple[str, str]]) -> str:
+    """Format the labels of a sample."""
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class _Metric:
+    """A metric with a fixed set of label names.
+
+    Parameters
+    ----------
+    name
+        The name of the metric.
+    documentation
+        The help text of the metric.
+    labels
+        The names of the metric's labels.
+    """
+
+    type = "untyped"
+
+    def __init__(
+        self, name: str, documentation: str, labels: Sequence[str] = ()
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+        self._values: dict[tuple[str, ...], Any] = {}
+
+    def _key(self, labels: dict[str, object]) -> tuple[str, ...]:
+        """Return the label values of a sample, in label name order."""
+        if set(labels) != set(self.label_names):
+            raise ValueError(
+                f"{self.name} has labels {', '.join(self.label_names) or 'none'}, "
+                f"got {', '.join(labels) or 'none'}"
+            )
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def clear(self) -> None:
+        """Remove all samples."""
+        with self._lock:
+            self._values.clear()
+
+    def render(self) -> list[str]:
+        """Return the lines of the metric in the text format."""
+        documentation = self.documentation.replace("\\", "\\\\").replace("\n", "\\n")
+        lines = [
+            f"# HELP {self.name} {documentation}",
+            f"# TYPE {self.name} {self.type}",
+        ]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(
+                self._samples(list(zip(self.label_names, key, strict=True)), value)
+            )
+        return lines
+
+    def _samples(self, labels: list[tuple[str, str]], value: Any) -> Iterator[str]:
+        yield f"{self.name}{_format_labels(labels)} {_format_value(value)}"
+
+
+class Counter(_Metric):
+    """A value that only goes up, such as a number of queries."""
+
+    type = "counter"
+
+    def inc(self, amount: float = 1.0, **labels: object) -> None:
+        """Increase the counter of some labels.
+
+        Raises
+        ------
+        ValueError
+            If the amount is negative or the labels are not the metric's.
+        """
+        if amount < 0:
+            raise ValueError(f"Counter {self.name} can only be increased")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: object) -> float:
+        """Return the counter of some labels."""
+        key = self._key(labels)
+        with self._lock:
+            return self._values.get(key, 0.0)
+
+
+class Gauge(_Metric):
+    """A value that can go up and down, such as a row count."""
+
+    type = "gauge"
+
+    def set(self, value: float, **labels: object) -> None:
+        """Set the gauge of some labels."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def value(self, **labels: object) -> float | None:
+        """Return the gauge of some labels, or `None` if it was never set."""
+        key = self._key(labels)
+        with self._lock:
+            return self._values.get(key)
+
+
+class Histogram(_Metric):
+    """Counts of observations, such as latencies, in cumulative buckets.
+
+    Parameters
+    ----------
+    name
+        The name of the metric.
+    documentation
+        The help text of the metric.
+    labels
+        The names of the metric's labels.
+    buckets
+        The upper bounds of the buckets. A ``+Inf`` bucket is always added.
+    """
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(b for b in buckets if not math.isinf(b)))
+
+    def observe(self, value: float, **labels: object) -> None:
+        """Add an observation for some labels."""
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.get(key, ((0,) * (len(self.buckets) + 1), 0.0))
+            # Samples are replaced rather than updated in place, so that they
+            # can be rendered outside the lock
+            counts = (*counts[:index], counts[index] + 1, *counts[index + 1 :])
+            self._values[key] = (counts, total + value)
+
+    def count(self, **labels: object) -> int:
+        """Return the number of observations for some labels."""
+        key = self._key(labels)
+        with self._lock:
+            counts, _ = self._values.get(key, ((0,), 0.0))
+            return sum(counts)
+
+    def _samples(self, labels: list[tuple[str, str]], value: Any) -> Iterator[str]:
+        counts, total = value
+        cumulative = 0
+        bounds = [*(_format_value(b) for b in self.buckets), "+Inf"]
+        for bound, count in zip(bounds, counts, strict=True):
+            cumulative += count
+            bucket_labels = _format_labels([*labels, ("le", bound)])
+            yield f"{self.name}_bucket{bucket_labels} {cumulative}"
+        yield f"{self.name}_sum{_format_labels(labels)} {_format_value(total)}"
+        yield f"{self.name}_count{_format_labels(labels)} {cumulative}"
+
+
+class MetricsRegistry:
+    """A set of metrics rendered together."""
+
+    def __init__(self) -> None:
+        self._metrics: dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _MetricT) -> _MetricT:
+        """Add a metric to the registry.
+
+        Raises
+        ------
+        ValueError
+            If a metric of the same name is already registered.
+        """
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(
+        self, name: str, documentation: str, labels: Sequence[str] = ()
+    ) -> Counter:
+        """Create and register a counter."""
+        return self._register(Counter(name, documentation, labels))
+
+    def gauge(self, name: str, documentation: str, labels: Sequence[str] = ()) -> Gauge:
+        """Create and register a gauge."""
+        return self._register(Gauge(name, documentation, labels))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        """Create and register a histogram."""
+        return self._register(Histogram(name, documentation, labels, buckets))
+
+    def clear(self) -> None:
+        """Remove the samples of every metric."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            metric.clear()
+
+    def render(self) -> str:
+        """Return every metric in the text format."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "".join(line + "\n" for metric in metrics for line in metric.render())
+
+    def write(self, path: Path) -> None:
+        """Write every metric to a file in the text format.
+
+        The file is replaced atomically, so a collector never reads a
+        partly written file.
+
+        Parameters
+        ----------
+        path
+            The file to write.
+        """
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, temp_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as file:
+                file.write(self.render())
+            Path(temp_name).chmod(0o644)
+            Path(temp_name).replace(path)
+        except BaseException:
+            Path(temp_name).unlink(missing_ok=True)
+            raise
@@ -0,0 +1,66 @@
+"""Statistical tests used to compare benchmark samples."""
+
+import math
+from collections.abc import Sequence
+
+__all__ = ["mann_whitney_u"]
+
+
+def mann_whitney_u(
+    sample: Sequence[float], reference: Sequence[float]
+) -> tuple[float, float]:
+    """
+    One-sided Mann-Whitney U test that ``sample`` tends to exceed
+    ``reference``.
+
+    Uses the normal approximation with tie and continuity corrections, which
+    is accurate enough for the sample sizes of benchmark runs (a handful of
+    values or more on each side) and needs no third party packages.
+
+    Parameters
+    ----------
+    sample
+        The values under test, e.g. the latencies of the current run.
+    reference
+        The reference values, e.g. the latencies of past runs.
+
+    Returns
+    -------
+    tuple[float, float]
+        The U statistic of ``sample`` and the p-value of the hypothesis that
+        ``sample`` is not stochastically larger than ``reference``.
+
+    Raises
+    ------
+    ValueError
+        If either sequence is empty.
+    """
+    n1, n2 = len(sample), len(reference)
+    if not n1 or not n2:
+        raise ValueError("Both samples must be non-empty")
+
+    combined = sorted(
+        [(value, True) for value in sample] + [(value, False) for value in reference]
+    )
+    n = n1 + n2
+    rank_sum = 0.0
+    tie_term = 0.0
+    i = 0
+    while i < n:
+        j = i
+        while j + 1 < n and combined[j + 1][0] == combined[i][0]:
+            j += 1
+        ties = j - i + 1
+        # Tied values share the average of the ranks they span, 1-based
+        average_rank = (i + j) / 2 + 1
+        rank_sum += average_rank * sum(1 for k in range(i, j + 1) if combined[k][1])
+        tie_term += ties**3 - ties
+        i = j + 1
+
+    u = rank_sum - n1 * (n1 + 1) / 2
+    mean = n1 * n2 / 2
+    variance = n1 * n2 / 12 * ((n + 1) - tie_term / (n * (n - 1)))
+    if variance <= 0:
+        return u, 1.0
+    z = (u - mean - 0.5) / math.sqrt(variance)
+    return u, 0.5 * math.erfc(z / math.sqrt(2))